@@ -0,0 +1,206 @@
+from pathlib import Path
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.text import slugify
+from lookaway import versions
+from members.models import MediaUsage
+from objects import blobs, renditions
+from objects.models import Image
+from objects.utils import Text
+from .models import Gallery, Visual
+'''
+Batch gallery uploads.
+
+Many image files are turned into Visuals of a Gallery in one request.
+The uploads are streamed to disk, then the Image and Visual rows are
+created with bulk_create in a single transaction and added to a new or
+existing Gallery. bulk_create does not send the post_save signal that
+builds the renditions of an Image, so a rendition job is queued for each
+Image in the same transaction. The "render_images" management command
+builds the renditions, and until then the upload itself is shown.
+'''
+
+# Attempts to create a batch when another request takes the same titles
+ATTEMPTS = 3
+
+def get_max_files():
+    return getattr(settings, 'GALLERY_UPLOAD_MAX_FILES', 100)
+
+def get_title(file_name):
+    '''
+    Returns - The name of an uploaded file without its extension.
+    '''
+    return Path(file_name).stem.strip() or 'Untitled'
+
+def get_unique_titles(model, titles):
+    '''
+    Give each title a unique title and slug for a model whose title and
+    slug are both unique. Titles that are taken in the database or
+    earlier in the batch get the next free number, e.g. "Title 2" with
+    the slug "title-2". The taken titles are looked up in one query.
+
+    Returns - A list of (title, slug) tuples in the order of the titles.
+    '''
+    title_length = model._meta.get_field('title').max_length - 11
+    slug_length = model._meta.get_field('slug').max_length - 11
+    bases = []
+    for title in titles:
+        title = title[:title_length].strip() or 'Untitled'
+        slug = slugify(title)[:slug_length].strip('-') or 'untitled'
+        bases.append((title, slug))
+    query = Q()
+    for title, slug in set(bases):
+        query |= Q(title=title) | Q(title__startswith=title + ' ')
+        query |= Q(slug=slug) | Q(slug__startswith=slug + '-')
+    taken_titles = set()
+    taken_slugs = set()
+    for title, slug in model.objects.filter(query).values_list('title', 'slug'):
+        taken_titles.add(title)
+        taken_slugs.add(slug)
+    unique = []
+    for title, slug in bases:
+        candidate = (title, slug)
+        n = 1
+        while candidate[0] in taken_titles or candidate[1] in taken_slugs:
+            n += 1
+            candidate = ('{} {}'.format(title, n), '{}-{}'.format(slug, n))
+        taken_titles.add(candidate[0])
+        taken_slugs.add(candidate[1])
+        unique.append(candidate)
+    return unique
+
+def save_files(member, files, artist, date):
+    '''
+    Save each uploaded file as the image file of a new, unsaved Image.
+    Files that were streamed to a temporary file are moved into place.
+
+    Returns - A list of Images.
+    '''
+    images = []
+    try:
+        for upload in files:
+            image = Image(
+                owner=member,
+                creation_date=date,
+                last_modified=date,
+                title=get_title(upload.name)[:63],
+                credit=artist[:256],
+            )
+            image.image_file.save(upload.name, upload, save=False)
+            # Shown until the renditions are built
+            image.thumbnail_file = image.image_file.name
+            image.medium_file = image.image_file.name
+            images.append(image)
+    except Exception:
+        remove_files(images)
+        raise
+    return images
+
+def remove_files(images):
+    for image in images:
+        image.image_file.delete(save=False)
+
+def create_rows(member, images, gallery, gallery_title, artist, date):
+    '''
+    Create the Images, a Visual for each of them and the Gallery
+    if there is none yet, in a single transaction.
+
+    Returns - The Gallery and the list of Visuals.
+    '''
+    titles = get_unique_titles(Visual, [image.title for image in images])
+    with transaction.atomic():
+        if gallery is None:
+            gallery = Gallery(
+                owner=member,
+                creation_date=date,
+                title=gallery_title,
+                artist=artist,
+                slug=Text.slugify_unique(Gallery, gallery_title),
+            )
+            gallery.save()
+            order = 0
+        else:
+            # Concurrent batches for the same Gallery take turns
+            gallery = Gallery.objects.select_for_update().get(pk=gallery.pk)
+            order = gallery.visuals.aggregate(Max('order'))['order__max'] or 0
+        created = Image.objects.bulk_create(images)
+        if created and created[0].pk is None:
+            # The database can not return the new keys from a bulk insert
+            pks = dict(Image.objects.filter(
+                image_file__in=[image.image_file.name for image in created],
+            ).values_list('image_file', 'pk'))
+            for image in created:
+                image.pk = pks[image.image_file.name]
+        visuals = Visual.objects.bulk_create([
+            Visual(
+                owner=member,
+                creation_date=date,
+                last_modified=date,
+                title=title,
+                slug=slug,
+                artist=artist,
+                image=image,
+                order=order + i + 1,
+            )
+            for i, (image, (title, slug)) in enumerate(zip(created, titles))
+        ])
+        if visuals and visuals[0].pk is None:
+            visuals = list(Visual.objects.filter(
+                slug__in=[slug for title, slug in titles],
+            ).order_by('order'))
+        gallery.visuals.add(*visuals)
+        renditions.enqueue(created)
+    return gallery, visuals
+
+def create_gallery(member, files, artist, gallery=None, gallery_title=None):
+    '''
+    Add a Visual to a Gallery for each uploaded image file.
+
+    Arguments
+    member          - The Member who owns the new objects.
+    files           - A list of uploaded image files.
+    artist          - The artist of the Visuals.
+    gallery         - An existing Gallery of the member to add to.
+    gallery_title   - The title of a new Gallery if gallery is None.
+
+    Returns - The Gallery and the list of new Visuals.
+    '''
+    date = timezone.now()
+    images = save_files(member, files, artist, date)
+    for attempt in range(ATTEMPTS):
+        try:
+            gallery, visuals = create_rows(
+                member,
+                images,
+                gallery,
+                gallery_title,
+                artist,
+                date,
+            )
+            break
+        except IntegrityError:
+            # Another request took one of the titles, make new ones
+            if attempt + 1 == ATTEMPTS:
+                remove_files(images)
+                raise
+            for image in images:
+                image.pk = None
+                image._state.adding = True
+        except Exception:
+            remove_files(images)
+            raise
+    # bulk_create does not send post_save, which charges the uploads
+    # and bumps the stamps
+    MediaUsage.record(
+        member.pk,
+        'image_bytes',
+        blobs.get_charged_size(
+            Path(settings.MEDIA_ROOT) / image.image_file.name
+            for image in images
+        ),
+    )
+    versions.bump_on_commit(versions.get_label(Image))
+    versions.bump_on_commit(versions.get_label(Visual))
+    return gallery, visuals
@@ -0,0 +1,9 @@
+from lookaway.feeds import ModelFeed
+from .app_profile_mixins import FeedMixin
+from .models import Gallery, Visual
+
+class VisualFeed(FeedMixin, ModelFeed):
+    model = Visual
+
+class GalleryFeed(FeedMixin, ModelFeed):
+    model = Gallery
@@ -1,8 +1,9 @@
 from django import forms
 from django.forms import Textarea
-from templates.widgets import ImagePreviewWidget, SoundPreviewWidget, VideoPreviewWidget
+from templates.widgets import ImagePreviewWidget, MultipleImageWidget, SoundPreviewWidget, VideoPreviewWidget
 from members.models import Member
 from objects.models import Image, Sound, Video, Code, Link
+from .batch import get_max_files
 from .models import ArtAppProfile, ArtPageSection, Gallery, Visual
 
 class CustomModelChoiceIterator(forms.models.ModelChoiceIterator):
@@ -28,6 +29,18 @@ class CustomModelMultipleChoiceField(forms.models.ModelMultipleChoiceField):
 
     choices = property(_get_choices, forms.MultipleChoiceField._set_choices)
 
+class MultipleImageField(forms.ImageField):
+    '''
+    An ImageField that takes a list of image files.
+    '''
+
+    widget = MultipleImageWidget
+
+    def clean(self, data, initial=None):
+        if not data:
+            return super().clean(None, initial)
+        return [super(MultipleImageField, self).clean(f, initial) for f in data]
+
 # Art app profile form
 class ArtAppProfileForm(forms.ModelForm):
 
@@ -565,3 +578,56 @@ class VisualForm(forms.ModelForm):
         ).order_by(
             '-last_modified',
         )
+
+class GalleryUploadForm(forms.Form):
+
+    image_files = MultipleImageField(
+        label="Images",
+        help_text="""Choose or drop the image files to add to the Gallery
+            A Visual is created for each image and titled after its file name""",
+    )
+    gallery = forms.ModelChoiceField(
+        queryset=Gallery.objects.none(),
+        help_text="""Choose a Gallery to add the Visuals to
+            Leave it empty to create a new Gallery (optional)""",
+        required=False,
+    )
+    title = forms.CharField(
+        help_text="""The title of the new Gallery
+            Not needed when adding to an existing Gallery""",
+        max_length=128,
+        required=False,
+    )
+    artist = forms.CharField(
+        help_text="""Which artist or artists produced the Visuals?""",
+        max_length=128,
+    )
+    title.widget.attrs.update({'class': 'form-text-field'})
+    artist.widget.attrs.update({'class': 'form-text-field'})
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user')
+        super(GalleryUploadForm, self).__init__(*args, **kwargs)
+        self.fields['gallery'].queryset = Gallery.objects.filter(
+            owner=user.pk,
+        ).order_by(
+            '-last_modified',
+        )
+
+    def clean_image_files(self):
+        files = self.cleaned_data['image_files']
+        if len(files) > get_max_files():
+            raise forms.ValidationError(
+                'Upload at most {} images at a time.'.format(get_max_files())
+            )
+        return files
+
+    def clean(self):
+        cleaned_data = super().clean()
+        title = cleaned_data.get('title')
+        if not cleaned_data.get('gallery'):
+            if not title:
+                self.add_error('title', 'Give the new Gallery a title.')
+            elif Gallery.objects.filter(title=title).exists():
+                self.add_error('title', 'A Gallery with this title already exists.')
+        return cleaned_data
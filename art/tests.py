@@ -1,3 +1,137 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from PIL import Image as image
+from django.contrib.auth.models import Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from members.models import MediaUsage, Profile
+from objects.models import RenditionJob
+from objects.utils import TestData
+from . import batch
+from .models import Gallery, Visual
 
 # Create your tests here.
+
+def make_image(name, color='red'):
+    data = BytesIO()
+    image.new('RGB', (64, 48), color).save(data, 'PNG')
+    return SimpleUploadedFile(name, data.getvalue(), content_type='image/png')
+
+
+class GalleryUploadTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(MEDIA_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.member, self.user = TestData().create_test_member()
+        Profile.objects.create(member=self.member, slug=self.member.username)
+        self.user.user_permissions.add(*Permission.objects.filter(
+            codename__in=['add_image', 'add_visual', 'add_gallery'],
+        ))
+        self.client.force_login(self.user)
+
+    def upload(self, files, **data):
+        data.setdefault('artist', 'Fred')
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse('art:gallery_upload'),
+                dict(data, image_files=files),
+            )
+
+    def test_new_gallery(self):
+        response = self.upload(
+            [make_image('sunset.png'), make_image('sunset.png', 'blue'), make_image('cat.png')],
+            title='Holiday',
+        )
+        gallery = Gallery.objects.get()
+        self.assertRedirects(
+            response,
+            gallery.get_absolute_url(),
+            fetch_redirect_response=False,
+        )
+        self.assertEqual(gallery.owner, self.member)
+        visuals = list(gallery.visuals.order_by('order'))
+        self.assertEqual(
+            [v.title for v in visuals],
+            ['sunset', 'sunset 2', 'cat'],
+        )
+        self.assertEqual([v.order for v in visuals], [1, 2, 3])
+        # The uploads are shown until the renditions are built
+        for visual in visuals:
+            self.assertEqual(visual.artist, 'Fred')
+            self.assertEqual(visual.image.thumbnail_file, visual.image.image_file)
+        self.assertEqual(
+            RenditionJob.objects.filter(status=RenditionJob.QUEUED).count(),
+            3,
+        )
+        usage = MediaUsage.objects.get(member=self.member)
+        self.assertGreater(usage.image_bytes, 0)
+        call_command('render_images', once=True, processes=1, stdout=StringIO())
+        self.assertEqual(
+            RenditionJob.objects.filter(status=RenditionJob.DONE).count(),
+            3,
+        )
+        for visual in visuals:
+            visual.image.refresh_from_db()
+            self.assertNotEqual(
+                visual.image.thumbnail_file,
+                visual.image.image_file,
+            )
+            self.assertTrue(os.path.isfile(visual.image.image_file.path))
+            self.assertTrue(os.path.isfile(visual.image.thumbnail_file.path))
+        self.assertFalse(any(usage.reconcile().values()))
+
+    def test_failed_job(self):
+        self.upload([make_image('one.png')], title='Holiday')
+        job = RenditionJob.objects.get()
+        os.remove(job.image.image_file.path)
+        with self.assertLogs('objects.renditions', 'ERROR'):
+            for attempt in range(batch.renditions.get_max_attempts()):
+                pk = batch.renditions.claim_next_job()
+                self.assertEqual(pk, job.pk)
+                batch.renditions.run_job(pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, RenditionJob.FAILED)
+        self.assertIsNone(batch.renditions.claim_next_job())
+
+    def test_existing_gallery(self):
+        self.upload([make_image('one.png')], title='Holiday')
+        gallery = Gallery.objects.get()
+        self.upload([make_image('two.png'), make_image('one.png')], gallery=gallery.pk)
+        self.assertEqual(Gallery.objects.count(), 1)
+        self.assertEqual(
+            list(gallery.visuals.order_by('order').values_list('title', 'order')),
+            [('one', 1), ('two', 2), ('one 2', 3)],
+        )
+
+    def test_rejected_uploads(self):
+        response = self.upload([make_image('one.png')])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('title', response.context['form'].errors)
+        response = self.upload(
+            [SimpleUploadedFile('notes.png', b'not an image')],
+            title='Notes',
+        )
+        self.assertIn('image_files', response.context['form'].errors)
+        self.assertFalse(Visual.objects.exists())
+        with override_settings(GALLERY_UPLOAD_MAX_FILES=1):
+            response = self.upload(
+                [make_image('one.png'), make_image('two.png')],
+                title='Holiday',
+            )
+        self.assertIn('image_files', response.context['form'].errors)
+        self.assertFalse(Gallery.objects.exists())
+
+    def test_unique_titles(self):
+        self.upload([make_image('cat.png')], title='Cats')
+        self.assertEqual(
+            batch.get_unique_titles(Visual, ['cat', 'Cat!', 'dog', 'dog']),
+            [('cat 2', 'cat-2'), ('Cat! 3', 'cat-3'), ('dog', 'dog'), ('dog 2', 'dog-2')],
+        )
@@ -1,6 +1,8 @@
 from django.urls import path
 from django.contrib.staticfiles.urls import static, staticfiles_urlpatterns
 import art.views as views
+import art.feeds as feeds
+from lookaway.feeds import feed_urls
 
 app_name = 'art'
 
@@ -105,6 +107,11 @@ urlpatterns = [
         views.VisualCreateView.as_view(),
         name='visual_create',
     ),
+    path(
+        'upload/gallery/',
+        views.GalleryUploadView.as_view(),
+        name='gallery_upload',
+    ),
     # Update Views
     path(
         'modify/gallery/<slug:slug>/',
@@ -150,3 +157,7 @@ urlpatterns = [
         name='visual_marshmallow',
     ),
 ]
+
+# RSS and Atom feeds
+urlpatterns += feed_urls('feeds/visuals/', feeds.VisualFeed, 'visual')
+urlpatterns += feed_urls('feeds/galleries/', feeds.GalleryFeed, 'gallery')
@@ -7,19 +7,25 @@ from django.contrib.auth.mixins import(
 from django.db.models import Q
 from django.http import HttpResponseRedirect
 from django.template import loader
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.urls import reverse_lazy, reverse
 from django.utils import timezone, text
 from django.views.generic.base import TemplateView
 from django.views.generic.edit import CreateView, FormView, UpdateView, DeleteView
 from django.views.generic.detail import DetailView
 from django.views.generic.list import ListView
-from lookaway.mixins import AppPageMixin
+from lookaway.mixins import (
+    AppPageMixin, ConditionalDetailMixin, SectionDetailMixin,
+)
+from objects.storage import HashingTemporaryFileUploadHandler
 from objects.utils import Text
 from members.models import Member
 from members.mixins import MemberCreateMixin, MemberUpdateMixin, MemberDeleteMixin
 from posts.models import ResponsePost
 from .app_profile_mixins import NewModelListMixin, TopModelListMixin, ModelByMemberMixin, StudioListMixin
-from .forms import ArtAppProfileForm, ArtPageSectionForm, GalleryForm, VisualForm
+from .batch import create_gallery
+from .forms import ArtAppProfileForm, ArtPageSectionForm, GalleryForm, GalleryUploadForm, VisualForm
 from .models import ArtAppProfile, ArtPageSection, Gallery, Visual
 # Create your views here.
 
@@ -41,7 +47,7 @@ class ArtAppProfileUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Updat
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = profile.title
@@ -78,13 +84,22 @@ class ArtPageView(TemplateView, AppPageMixin):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
+        # Cached fragments depend on these models
+        context['fragment_models'] = self.get_fragment_models(
+            ArtAppProfile,
+            ArtPageSection,
+            Gallery,
+            Visual,
+        )
         # SEO stuff
         context['meta_title'] = profile.title
         context['meta_desc'] = profile.meta_description
         # Sections
-        sections = ArtPageSection.objects.filter(
+        sections = ArtPageSection.objects.prefetch_related(
+            *ArtPageSection.get_prefetch_plan()
+        ).filter(
             is_enabled = True,
         ).order_by(
             'order',
@@ -96,14 +111,14 @@ class ArtPageView(TemplateView, AppPageMixin):
                 members_only=True
             )
         # Galleries
-        context['new_galleries'], context['top_galleries'] = self.get_sets(
+        context['new_galleries'], context['top_galleries'] = self.get_lazy_sets(
             Gallery,
             profile.n_galleries,
             show_new=profile.show_new_galleries,
             show_top=profile.show_top_galleries,
         )
         # Visuals
-        context['new_visuals'], context['top_visuals'] = self.get_sets(
+        context['new_visuals'], context['top_visuals'] = self.get_lazy_sets(
             Visual,
             profile.n_visuals,
             show_new=profile.show_new_visuals,
@@ -164,7 +179,7 @@ class ArtPageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Crea
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Page Section"
         context['meta_desc'] = "Add a section to the {} landing page.".format(profile.title)
@@ -186,7 +201,7 @@ class ArtPageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Crea
                 kwargs={'pk': self.object.pk},
             )
 
-class ArtPageSectionDetailView(LoginRequiredMixin, DetailView):
+class ArtPageSectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = ArtPageSection
     context_object_name = 'section'
@@ -194,7 +209,7 @@ class ArtPageSectionDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = profile.title
         # Add art page section button
@@ -227,7 +242,7 @@ class ArtPageSectionUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Memb
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this landing page section.".format(self.object.title)
@@ -274,7 +289,7 @@ class GalleryCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreat
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Gallery"
         context['meta_desc'] = """Submit an Gallery you wish to publish. \
@@ -287,7 +302,98 @@ class GalleryCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreat
         member = Member.objects.get(pk=self.request.user.pk)
         form.instance.creation_date = timezone.now()
         form.instance.owner = member
-        form.instance.slug = Text.slugify_unique(self.model, form.instance.title)
+        Text.set_unique_slug(form.instance, form.instance.title)
+        return super().form_valid(form)
+
+    def get_success_url(self):
+        next_url = self.request.GET.get('next')
+        if next_url:
+            return next_url
+        else:
+            return reverse(
+                'art:gallery_detail',
+                kwargs={'slug': self.object.slug},
+            )
+
+# The CSRF check reads the request body, which must wait until the
+# upload handlers are set, so it is done in post() instead
+@method_decorator(csrf_exempt, name='dispatch')
+class GalleryUploadView(LoginRequiredMixin, PermissionRequiredMixin, FormView):
+
+    permission_required = (
+        'objects.add_image',
+        'art.add_visual',
+        'art.add_gallery',
+    )
+    form_class = GalleryUploadForm
+    template_name = 'art/gallery_upload_form.html'
+
+    def post(self, request, *args, **kwargs):
+        # Stream every image to a temporary file instead of holding
+        # the small ones in memory, many of them add up
+        request.upload_handlers = [HashingTemporaryFileUploadHandler(request)]
+        return self.protected_post(request, *args, **kwargs)
+
+    @method_decorator(csrf_protect)
+    def protected_post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+    def get_form_kwargs(self):
+        kwargs = super(GalleryUploadView, self).get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def get_initial(self):
+        initial = super().get_initial()
+        if 'gallery' in self.request.GET:
+            initial['gallery'] = self.request.GET.get('gallery')
+        return initial
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # App profile
+        profile = ArtAppProfile.get_profile()
+        context['profile'] = profile
+        context['meta_title'] = "Upload a Gallery"
+        context['meta_desc'] = """Choose or drop many image files at once. \
+            A Visual is created for each image and added to a new Gallery \
+            or one of your Galleries."""
+        return context
+
+    def form_valid(self, form):
+        member = Member.objects.get(pk=self.request.user.pk)
+        files = form.cleaned_data['image_files']
+        # Check disk space before saving the uploads
+        has_free_space, free, used = member.check_free_media_capacity()
+        upload_size = sum(f.size for f in files)
+        if not has_free_space or free <= upload_size:
+            messages.add_message(
+                self.request,
+                messages.WARNING,
+                """Upload FAIL: Your media directory only has {} bytes of free \
+capacity. The {} image files of {} bytes are too large.""".format(
+                    free,
+                    len(files),
+                    upload_size,
+                ),
+            )
+            return HttpResponseRedirect(reverse('members:studio'))
+        self.object, visuals = create_gallery(
+            member,
+            files,
+            form.cleaned_data['artist'],
+            gallery=form.cleaned_data['gallery'],
+            gallery_title=form.cleaned_data['title'],
+        )
+        messages.add_message(
+            self.request,
+            messages.INFO,
+            """{} Visuals were added to the Gallery "{}". Their images \
+                will be optimized in the background.""".format(
+                len(visuals),
+                self.object,
+            ),
+        )
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -303,12 +409,11 @@ class GalleryCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreat
 class GalleryListView(NewModelListMixin, ListView):
 
     model = Gallery
-    try:
-        paginate_by = ArtAppProfile.objects.get_or_create(pk=1)[0].gallery_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'galleries'
 
+    def get_paginate_by(self, queryset):
+        return ArtAppProfile.get_profile().gallery_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -322,12 +427,11 @@ class GalleryListView(NewModelListMixin, ListView):
 class TopGalleryListView(TopModelListMixin, ListView):
 
     model = Gallery
-    try:
-        paginate_by = ArtAppProfile.objects.get_or_create(pk=1)[0].gallery_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'galleries'
 
+    def get_paginate_by(self, queryset):
+        return ArtAppProfile.get_profile().gallery_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -341,12 +445,11 @@ class TopGalleryListView(TopModelListMixin, ListView):
 class MemberGalleryView(ModelByMemberMixin, ListView):
 
     model = Gallery
-    try:
-        paginate_by = ArtAppProfile.objects.get_or_create(pk=1)[0].gallery_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'galleries'
 
+    def get_paginate_by(self, queryset):
+        return ArtAppProfile.get_profile().gallery_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(username=self.kwargs['member'])
@@ -373,15 +476,22 @@ class GalleryStudioListView(StudioListMixin, ListView):
             )
         return context
 
-class GalleryDetailView(DetailView):
+class GalleryDetailView(ConditionalDetailMixin, DetailView):
 
     model = Gallery
+    app_profile = ArtAppProfile
+    conditional_related = {
+        'posts.responsepost': 'gallery',
+    }
+    conditional_dependencies = ConditionalDetailMixin.conditional_dependencies + (
+        'art.visual',
+    )
     context_object_name = 'gallery'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
         if self.request.user.is_authenticated:
             member = Member.objects.get(pk=self.request.user.pk)
@@ -466,7 +576,7 @@ class GalleryUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdat
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this gallery.".format(self.object.title)
@@ -576,7 +686,7 @@ class VisualCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreate
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Visual"
         context['meta_desc'] = """Submit a Visual you wish to publish. \
@@ -588,7 +698,7 @@ class VisualCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreate
         member = Member.objects.get(pk=self.request.user.pk)
         form.instance.creation_date = timezone.now()
         form.instance.owner = member
-        form.instance.slug = Text.slugify_unique(self.model, form.instance.title)
+        Text.set_unique_slug(form.instance, form.instance.title)
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -604,12 +714,11 @@ class VisualCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreate
 class VisualListView(NewModelListMixin, ListView):
 
     model = Visual
-    try:
-        paginate_by = ArtAppProfile.objects.get_or_create(pk=1)[0].visual_list_pagination
-    except:
-        paginate_by = 36
     context_object_name = 'visuals'
 
+    def get_paginate_by(self, queryset):
+        return ArtAppProfile.get_profile().visual_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -623,12 +732,11 @@ class VisualListView(NewModelListMixin, ListView):
 class TopVisualListView(TopModelListMixin, ListView):
 
     model = Visual
-    try:
-        paginate_by = ArtAppProfile.objects.get_or_create(pk=1)[0].visual_list_pagination
-    except:
-        paginate_by = 36
     context_object_name = 'visuals'
 
+    def get_paginate_by(self, queryset):
+        return ArtAppProfile.get_profile().visual_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -642,12 +750,11 @@ class TopVisualListView(TopModelListMixin, ListView):
 class MemberVisualView(ModelByMemberMixin, ListView):
 
     model = Visual
-    try:
-        paginate_by = ArtAppProfile.objects.get_or_create(pk=1)[0].visual_list_pagination
-    except:
-        paginate_by = 36
     context_object_name = 'visuals'
 
+    def get_paginate_by(self, queryset):
+        return ArtAppProfile.get_profile().visual_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(username=self.kwargs['member'])
@@ -674,15 +781,19 @@ class VisualStudioListView(StudioListMixin, ListView):
             )
         return context
 
-class VisualDetailView(DetailView):
+class VisualDetailView(ConditionalDetailMixin, DetailView):
 
     model = Visual
+    app_profile = ArtAppProfile
+    conditional_related = {
+        'posts.responsepost': 'visual',
+    }
     context_object_name = 'visual'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
         # Galleries that have the visual in their list
         context['galleries'] = Gallery.objects.filter(
@@ -772,7 +883,7 @@ class VisualUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdate
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ArtAppProfile.objects.get_or_create(pk=1)
+        profile = ArtAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this visual.".format(self.object.title)
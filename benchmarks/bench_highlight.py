@@ -0,0 +1,76 @@
+'''
+Code highlighting benchmark.
+
+Compares rendering a code snippet with the highlight_syntax filter, which
+runs Pygments on every render, with serving the HTML stored when the Code
+was saved. Snippets without a file path make Pygments guess the lexer.
+Reports the render time for snippets of up to 65535 characters.
+
+Run with:
+python manage.py test benchmarks.bench_highlight --pattern="bench_*.py"
+'''
+import time
+from django.template import Context, Template
+from django.test import TestCase
+from objects.models import Code
+from objects.utils import TestData
+
+SIZES = [1000, 16000, 65000]
+RUNS = 5
+LINE = 'def f{0}(x):\n    return [i * {0} for i in range(x) if i % 3]\n'
+
+LEGACY = Template(
+    '{% load custom_filters %}'
+    '{{ code.code|highlight_syntax:code.file_path|safe }}'
+)
+STORED = Template('{{ code.get_highlighted }}')
+
+
+def make_code(n):
+    lines = []
+    i = 0
+    while sum(len(l) for l in lines) < n:
+        lines.append(LINE.format(i))
+        i += 1
+    return ''.join(lines)[:n]
+
+
+class HighlightBenchmark(TestCase):
+
+    def measure(self, template, code):
+        context = Context({'code': code})
+        start = time.perf_counter()
+        for i in range(RUNS):
+            html = template.render(context)
+        return html, (time.perf_counter() - start) / RUNS
+
+    def test_highlight(self):
+        member, user = TestData().create_test_member()
+        print()
+        print('{:>8} {:>8} {:>10} {:>10}'.format(
+            'chars', 'path', 'variant', 'render ms',
+        ))
+        for n in SIZES:
+            for path in ('snippet.py', None):
+                start = time.perf_counter()
+                code = Code.objects.create(
+                    owner=member,
+                    title='snippet',
+                    code=make_code(n),
+                    language='Python',
+                    language_version='3',
+                    file_path=path,
+                )
+                save = time.perf_counter() - start
+                code = Code.objects.get(pk=code.pk)
+                legacy, legacy_wall = self.measure(LEGACY, code)
+                stored, stored_wall = self.measure(STORED, code)
+                self.assertEqual(legacy, stored)
+                for variant, wall in (
+                    ('save', save),
+                    ('legacy', legacy_wall),
+                    ('stored', stored_wall),
+                ):
+                    print('{:>8} {:>8} {:>10} {:>10.2f}'.format(
+                        n, 'yes' if path else 'no', variant, wall * 1000,
+                    ))
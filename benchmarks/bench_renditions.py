@@ -0,0 +1,154 @@
+'''
+Image upload pipeline benchmark.
+
+Compares the rendition pipeline in objects.renditions with the previous
+post_save handler, which encoded the image several times and saved the
+instance twice. Each run happens in a forked process so peak RSS can be
+measured separately.
+
+Run with:
+python manage.py test benchmarks.bench_renditions --pattern="bench_*.py"
+'''
+import multiprocessing
+import resource
+import shutil
+import tempfile
+import time
+import numpy
+from pathlib import Path
+from PIL import Image as img
+from PIL import ImageOps
+from django.test import SimpleTestCase
+from objects import renditions
+from objects.models import ObjectsAppProfile
+
+SIZES = [(1600, 1200), (4000, 3000), (6000, 4000)]
+RUNS = 3
+
+
+def legacy(path, profile):
+    '''
+    The image operations of the previous handle_image_upload signal,
+    without the database writes.
+    '''
+    image = img.open(path)
+    image = ImageOps.exif_transpose(image)
+    image.save(path)
+    w = profile.image_max_width
+    h = profile.image_max_height
+    if image.width > w or image.height > h:
+        image.thumbnail((w, h))
+        image.save(path, 'webp', **image.info)
+    new_path = Path(path).with_name('legacy-full.webp')
+    Path(path).rename(new_path)
+    image.thumbnail((profile.thumbnail_max_width, profile.thumbnail_max_height))
+    image.save(new_path.with_name('legacy-thumbnail.webp'), 'webp')
+    image.close()
+
+def pipeline(path, profile, all_sizes=True):
+    '''
+    Decode once and render the full size and thumbnail images,
+    plus the medium and srcset sizes if all_sizes is True.
+    '''
+    source, save_kwargs = renditions.decode(path, 'webp')
+    targets = [
+        ('full', profile.image_max_width, profile.image_max_height),
+        ('thumbnail', profile.thumbnail_max_width, profile.thumbnail_max_height),
+    ]
+    if all_sizes:
+        targets.append(
+            ('medium', profile.medium_max_width, profile.medium_max_height),
+        )
+        full_width, full_height = renditions.fit(
+            source.size,
+            profile.image_max_width,
+            profile.image_max_height,
+        )
+        for width in renditions.get_srcset_widths(profile):
+            if width < full_width:
+                targets.append((width, width, full_height))
+    renditions.render_all(
+        source,
+        [(n, w, h, str(Path(path).with_name('{}.webp'.format(n)))) for n, w, h in targets],
+        'webp',
+        save_kwargs,
+        profile.image_processes,
+    )
+    source.close()
+
+def pipeline_same_sizes(path, profile):
+    pipeline(path, profile, all_sizes=False)
+
+def measure(function, path, profile, conn):
+    start = time.perf_counter()
+    function(path, profile)
+    wall = time.perf_counter() - start
+    rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    conn.send((wall, rss))
+    conn.close()
+
+
+class RenditionBenchmark(SimpleTestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.profile = ObjectsAppProfile()
+
+    def tearDown(self):
+        shutil.rmtree(self.media)
+
+    def make_source(self, size):
+        # A gradient with some noise compresses like a photograph
+        x = numpy.linspace(0, 255, size[0])
+        y = numpy.linspace(0, 255, size[1])
+        plane = numpy.add.outer(y, x) / 2
+        pixels = numpy.stack([plane, plane[::-1], plane[:, ::-1]], axis=2)
+        pixels += numpy.random.randint(0, 20, pixels.shape)
+        pixels = pixels.clip(0, 255).astype('uint8')
+        path = Path(self.media) / 'source.jpg'
+        img.fromarray(pixels).save(path, 'jpeg', quality=90)
+        return path
+
+    def run_in_child(self, function, size):
+        context = multiprocessing.get_context('fork')
+        results = []
+        for i in range(RUNS):
+            path = self.make_source(size)
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=measure,
+                args=(function, path, self.profile, child),
+            )
+            process.start()
+            results.append(parent.recv())
+            process.join()
+        wall = min(r[0] for r in results)
+        rss = max(r[1] for r in results)
+        return wall, rss
+
+    def test_renditions(self):
+        variants = [
+            ('legacy', legacy),
+            ('same sizes', pipeline_same_sizes),
+            ('all sizes', pipeline),
+        ]
+        print()
+        print('{} CPUs, {} rendition processes'.format(
+            multiprocessing.cpu_count(),
+            self.profile.image_processes,
+        ))
+        print('{:>11} {:>12} {:>10} {:>12}'.format(
+            'size', 'variant', 'wall s', 'peak KiB',
+        ))
+        for size in SIZES:
+            for name, function in variants:
+                wall, rss = self.run_in_child(function, size)
+                print('{:>11} {:>12} {:>10.3f} {:>12}'.format(
+                    '{}x{}'.format(*size),
+                    name,
+                    wall,
+                    rss,
+                ))
@@ -0,0 +1,82 @@
+'''
+Unique slug benchmark.
+
+Compares the previous Text.slugify_unique, which loaded every row of the
+model to collect the slugs, with the indexed prefix query. Reports the
+time taken to pick a slug for a new title and for a title that is
+already taken many times, with up to 100k posts.
+
+Run with:
+python manage.py test benchmarks.bench_slugs --pattern="bench_*.py"
+'''
+import time
+from django.test import TransactionTestCase
+from django.utils import timezone
+from django.utils.text import slugify
+from objects.utils import Text
+from posts.models import Post
+
+SIZES = [1000, 10000, 100000]
+# Posts that share the title "popular"
+POPULAR = 100
+RUNS = 5
+
+
+def legacy_slugify_unique(model, title):
+    slug = slugify(title)
+    existing_slugs = []
+    [existing_slugs.append(str(i.slug)) for i in model.objects.all()]
+    if slug in existing_slugs:
+        date_slug = slug + "-" + timezone.now().strftime("%Y%m%d")
+        if date_slug in existing_slugs:
+            return date_slug + timezone.now().strftime("%m%s")
+        else:
+            return date_slug
+    else:
+        return slug
+
+
+class SlugBenchmark(TransactionTestCase):
+
+    def populate(self, n):
+        Post.objects.all().delete()
+        posts = [
+            Post(title='post {}'.format(i), slug='post-{}'.format(i), text='text')
+            for i in range(n - POPULAR)
+        ]
+        posts.append(Post(title='popular', slug='popular', text='text'))
+        posts += [
+            Post(title='popular', slug='popular-{}'.format(i), text='text')
+            for i in range(2, POPULAR + 1)
+        ]
+        Post.objects.bulk_create(posts, batch_size=5000)
+
+    def measure(self, function, title):
+        times = []
+        for i in range(RUNS):
+            start = time.perf_counter()
+            function(Post, title)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def test_slugs(self):
+        print()
+        print('{:>8} {:>8} {:>10} {:>10}'.format(
+            'posts', 'variant', 'new s', 'taken s',
+        ))
+        for n in SIZES:
+            self.populate(n)
+            for name, function in (
+                ('legacy', legacy_slugify_unique),
+                ('indexed', Text.slugify_unique),
+            ):
+                print('{:>8} {:>8} {:>10.5f} {:>10.5f}'.format(
+                    n,
+                    name,
+                    self.measure(function, 'A brand new title'),
+                    self.measure(function, 'popular'),
+                ))
+            self.assertEqual(
+                Text.slugify_unique(Post, 'popular'),
+                'popular-{}'.format(POPULAR + 1),
+            )
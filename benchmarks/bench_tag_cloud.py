@@ -0,0 +1,109 @@
+'''
+Home page tag cloud benchmark.
+
+Compares the previous tag cloud, which walked every public object and
+OR'd the tag querysets together, with the tag usage index. Reports the
+number of queries and the time taken with up to 100k tagged posts.
+
+Run with:
+python manage.py test benchmarks.bench_tag_cloud --pattern="bench_*.py"
+'''
+import time
+from django.db import DatabaseError, connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from objects.models import Tag, TagUsage
+from posts.models import Post
+
+SIZES = [300, 10000, 100000]
+TAGS = 500
+TAGS_PER_POST = 3
+# The previous implementation adds an OR clause per public object.
+# It is only timed up to this many objects.
+LEGACY_LIMIT = 10000
+
+
+def legacy_tags(model):
+    tags = Tag.objects.none()
+    objects = model.objects.filter(is_public=True).prefetch_related('tags')
+    for o in objects:
+        if o.tags.count() > 0:
+            tags = tags | o.tags.all()
+    return tags.distinct()
+
+def legacy_cloud(models):
+    public_tags = Tag.objects.none()
+    for model in models:
+        public_tags = public_tags | legacy_tags(model)
+    return list(public_tags.order_by('-weight')[:50])
+
+def indexed_cloud(models):
+    return list(Tag.get_public_tags(models).order_by('-weight')[:50])
+
+
+class TagCloudBenchmark(TransactionTestCase):
+
+    def populate(self, n):
+        Post.objects.all().delete()
+        Tag.objects.all().delete()
+        Tag.objects.bulk_create([
+            Tag(key='key{}'.format(i), slug='key{}'.format(i), weight=i)
+            for i in range(TAGS)
+        ])
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        Post.objects.bulk_create(
+            [
+                Post(
+                    title='post {}'.format(i),
+                    slug='post-{}'.format(i),
+                    text='text',
+                    is_public=i % 2 == 0,
+                )
+                for i in range(n)
+            ],
+            batch_size=5000,
+        )
+        through = Post.tags.through
+        through.objects.bulk_create(
+            [
+                through(post_id=pk, tag_id=tag_ids[(pk * 7 + j) % TAGS])
+                for pk in Post.objects.values_list('pk', flat=True)
+                for j in range(TAGS_PER_POST)
+            ],
+            batch_size=5000,
+        )
+        TagUsage.rebuild([Post])
+
+    def measure(self, function):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            result = function([Post])
+            wall = time.perf_counter() - start
+        return result, len(queries), wall
+
+    def test_tag_cloud(self):
+        print()
+        print('{:>8} {:>8} {:>10} {:>10}'.format(
+            'posts', 'variant', 'queries', 'wall s',
+        ))
+        for n in SIZES:
+            self.populate(n)
+            indexed, queries, wall = self.measure(indexed_cloud)
+            print('{:>8} {:>8} {:>10} {:>10.4f}'.format(
+                n, 'index', queries, wall,
+            ))
+            if n > LEGACY_LIMIT:
+                continue
+            try:
+                legacy, queries, wall = self.measure(legacy_cloud)
+            except DatabaseError as e:
+                # The OR'd queryset can outgrow the database's limits
+                print('{:>8} {:>8} failed: {}'.format(n, 'legacy', e))
+                continue
+            print('{:>8} {:>8} {:>10} {:>10.4f}'.format(
+                n, 'legacy', queries, wall,
+            ))
+            self.assertEqual(
+                [t.pk for t in legacy],
+                [t.pk for t in indexed],
+            )
@@ -1,4 +1,5 @@
 from django.db.models import Q
+from django.urls import reverse
 from home.models import HomeAppProfile
 from members.models import Member
 from objects.models import Tag
@@ -18,7 +19,7 @@ class NewModelListMixin:
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "New " + self.model._meta.verbose_name_plural.capitalize()
         # SEO stuff
@@ -45,7 +46,7 @@ class TopModelListMixin:
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "Top " + self.model._meta.verbose_name_plural.capitalize()
         # SEO stuff
@@ -75,7 +76,7 @@ class StudioListMixin:
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(pk=self.request.user.pk)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "All " + self.model._meta.verbose_name_plural.capitalize()
         context['meta_title'] = "Your {}".format(
@@ -104,7 +105,7 @@ class ModelByMemberMixin:
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(username=self.kwargs['member'])
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = self.model._meta.verbose_name_plural.capitalize()
         context['meta_title'] = "{} by {} | {}".format(
@@ -119,3 +120,18 @@ class ModelByMemberMixin:
         )
         context['member'] = member
         return context
+
+class FeedMixin:
+    '''
+    App profile, link and items for feeds of a model. Feeds only list
+    public instances. Also sets the DocumentationAppProfile.
+    '''
+    app_profile = DocumentationAppProfile
+
+    def get_feed_queryset(self):
+        return self.model.objects.filter(
+            is_public=True,
+        )
+
+    def link(self, obj):
+        return reverse('documentation:documentation_page')
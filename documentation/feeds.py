@@ -0,0 +1,9 @@
+from lookaway.feeds import ModelFeed
+from .app_profile_mixins import FeedMixin
+from .models import Article, Story
+
+class ArticleFeed(FeedMixin, ModelFeed):
+    model = Article
+
+class StoryFeed(FeedMixin, ModelFeed):
+    model = Story
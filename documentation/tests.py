@@ -1,3 +1,115 @@
+import os
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from home.models import HomeAppProfile
+from lookaway import versions
+from members.models import Profile
+from objects.utils import TestData
+from posts.models import ResponsePost
+from .models import Article, ArticleSection, DocumentationAppProfile
 
 # Create your tests here.
+
+class ConditionalDetailTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        HomeAppProfile.get_profile()
+        DocumentationAppProfile.get_profile()
+        self.member, self.user = TestData().create_test_member()
+        Profile.objects.create(member=self.member, slug='test')
+        self.article = Article.objects.create(
+            owner=self.member,
+            title='Article',
+            slug='article',
+            is_public=True,
+            publication_date=timezone.now(),
+        )
+        self.section = ArticleSection.objects.create(
+            owner=self.member,
+            article=self.article,
+            title='First section',
+        )
+        self.url = reverse(
+            'documentation:article_detail',
+            kwargs={'slug': self.article.slug},
+        )
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        last_modified = response['Last-Modified']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(
+            self.url,
+            HTTP_IF_MODIFIED_SINCE=last_modified,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_stamp_bumped(self):
+        for name in ('objects.tag', 'home.homeappprofile'):
+            last_modified = self.client.get(self.url)['Last-Modified']
+            versions.bump(name)
+            # HTTP dates are in whole seconds, so the bump is a second later
+            later = parse_http_date(last_modified) + 1
+            os.utime(versions.get_stamp_path(name), (later, later))
+            response = self.client.get(
+                self.url,
+                HTTP_IF_MODIFIED_SINCE=last_modified,
+            )
+            self.assertEqual(response.status_code, 200)
+
+    def test_section_changed(self):
+        etag = self.client.get(self.url)['ETag']
+        ArticleSection.objects.filter(pk=self.section.pk).update(
+            title='Changed',
+            last_modified=timezone.now(),
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Changed')
+
+    def test_section_deleted(self):
+        etag = self.client.get(self.url)['ETag']
+        ArticleSection.objects.filter(pk=self.section.pk).delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_response_added(self):
+        etag = self.client.get(self.url)['ETag']
+        ResponsePost.objects.create(
+            owner=self.member,
+            title='Reply',
+            slug='reply',
+            text='text',
+            article=self.article,
+            is_public=True,
+            members_only=False,
+        )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_viewer_class(self):
+        visitor = self.client.get(self.url)['ETag']
+        self.client.force_login(self.user)
+        owner = self.client.get(self.url)
+        self.assertNotEqual(owner['ETag'], visitor)
+        self.assertFalse(owner.has_header('Last-Modified'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=visitor)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=owner['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing(self):
+        response = self.client.get(reverse(
+            'documentation:article_detail',
+            kwargs={'slug': 'missing'},
+        ))
+        self.assertEqual(response.status_code, 404)
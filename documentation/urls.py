@@ -1,5 +1,7 @@
 from django.urls import path
 import documentation.views as views
+import documentation.feeds as feeds
+from lookaway.feeds import feed_urls
 
 app_name= "documentation"
 
@@ -285,3 +287,7 @@ urlpatterns = [
         name='support_document_marshmallow',
     ),
 ]
+
+# RSS and Atom feeds
+urlpatterns += feed_urls('feeds/articles/', feeds.ArticleFeed, 'article')
+urlpatterns += feed_urls('feeds/stories/', feeds.StoryFeed, 'story')
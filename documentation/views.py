@@ -13,7 +13,9 @@ from django.views.generic.base import TemplateView
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, FormView, UpdateView, DeleteView
 from django.views.generic.list import ListView
-from lookaway.mixins import AppPageMixin
+from lookaway.mixins import (
+    AppPageMixin, ConditionalDetailMixin, SectionDetailMixin,
+)
 from members.models import Member
 from members.mixins import MemberCreateMixin, MemberUpdateMixin, MemberDeleteMixin
 from objects.utils import Text
@@ -42,7 +44,7 @@ class DocumentationAppProfileUpdateView(LoginRequiredMixin, PermissionRequiredMi
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = profile.title
@@ -81,13 +83,23 @@ class DocumentationPageView(TemplateView, AppPageMixin):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
+        # Cached fragments depend on these models
+        context['fragment_models'] = self.get_fragment_models(
+            DocumentationAppProfile,
+            DocumentationPageSection,
+            Article,
+            Story,
+            SupportDocument,
+        )
         # SEO stuff
         context['meta_title'] = profile.title
         context['meta_desc'] = profile.meta_description
         # Sections
-        sections = DocumentationPageSection.objects.filter(
+        sections = DocumentationPageSection.objects.prefetch_related(
+            *DocumentationPageSection.get_prefetch_plan()
+        ).filter(
             is_enabled = True,
         ).order_by(
             'order',
@@ -143,21 +155,21 @@ class DocumentationPageView(TemplateView, AppPageMixin):
                 members_only=True
             )
         # Articles
-        context['new_articles'], context['top_articles'] = self.get_sets(
+        context['new_articles'], context['top_articles'] = self.get_lazy_sets(
             Article,
             profile.n,
             show_new=profile.show_new_articles,
             show_top=profile.show_top_articles,
         )
         # Stories
-        context['new_stories'], context['top_stories'] = self.get_sets(
+        context['new_stories'], context['top_stories'] = self.get_lazy_sets(
             Story,
             profile.n,
             show_new=profile.show_new_stories,
             show_top=profile.show_top_stories,
         )
         # SupportDocuments
-        context['new_documents'], context['top_documents'] = self.get_sets(
+        context['new_documents'], context['top_documents'] = self.get_lazy_sets(
             SupportDocument,
             profile.n,
             show_new=profile.show_new_support_documents,
@@ -181,7 +193,7 @@ class DocumentationPageSectionCreateView(LoginRequiredMixin, PermissionRequiredM
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Page Section"
         context['meta_desc'] = "Add a section to the {} landing page.".format(profile.title)
@@ -203,7 +215,7 @@ class DocumentationPageSectionCreateView(LoginRequiredMixin, PermissionRequiredM
                 kwargs={'pk': self.object.pk},
             )
 
-class DocumentationPageSectionDetailView(LoginRequiredMixin, DetailView):
+class DocumentationPageSectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = DocumentationPageSection
     context_object_name = 'section'
@@ -211,7 +223,7 @@ class DocumentationPageSectionDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = profile.title
         # Add documentation page section button
@@ -244,7 +256,7 @@ class DocumentationPageSectionUpdateView(LoginRequiredMixin, PermissionRequiredM
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this landing page section.".format(self.object.title)
@@ -291,7 +303,7 @@ class ArticleCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreat
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Article"
         context['meta_desc'] = """Create a new article. Once the article is \
@@ -304,7 +316,7 @@ class ArticleCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreat
         member = Member.objects.get(pk=self.request.user.pk)
         form.instance.creation_date = timezone.now()
         form.instance.owner = member
-        form.instance.slug = Text.slugify_unique(self.model, form.instance.title)
+        Text.set_unique_slug(form.instance, form.instance.title)
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -320,12 +332,11 @@ class ArticleCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreat
 class ArticleListView(NewModelListMixin, ListView):
 
     model = Article
-    try:
-        paginate_by = DocumentationAppProfile.objects.get_or_create(pk=1)[0].list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'articles'
 
+    def get_paginate_by(self, queryset):
+        return DocumentationAppProfile.get_profile().list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -339,12 +350,11 @@ class ArticleListView(NewModelListMixin, ListView):
 class TopArticleListView(TopModelListMixin, ListView):
 
     model = Article
-    try:
-        paginate_by = DocumentationAppProfile.objects.get_or_create(pk=1)[0].list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'articles'
 
+    def get_paginate_by(self, queryset):
+        return DocumentationAppProfile.get_profile().list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -358,12 +368,11 @@ class TopArticleListView(TopModelListMixin, ListView):
 class MemberArticleView(ModelByMemberMixin, ListView):
 
     model = Article
-    try:
-        paginate_by = DocumentationAppProfile.objects.get_or_create(pk=1)[0].list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'articles'
 
+    def get_paginate_by(self, queryset):
+        return DocumentationAppProfile.get_profile().list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -390,16 +399,23 @@ class ArticleStudioListView(StudioListMixin, ListView):
             )
         return context
 
-class ArticleDetailView(DetailView):
+class ArticleDetailView(ConditionalDetailMixin, DetailView):
 
     model = Article
+    app_profile = DocumentationAppProfile
+    conditional_related = {
+        'documentation.articlesection': 'article',
+        'posts.responsepost': 'article',
+    }
     context_object_name = 'article'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
-        context['sections'] = ArticleSection.objects.filter(
+        context['sections'] = ArticleSection.objects.prefetch_related(
+            *ArticleSection.get_prefetch_plan()
+        ).filter(
             article=self.get_object(),
         ).order_by('order')
         if self.request.user.is_authenticated:
@@ -499,7 +515,7 @@ class ArticleUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdat
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this article.".format(self.object.title)
@@ -611,7 +627,7 @@ class ArticleSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Memb
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Article Section"
         context['meta_desc'] = """Create a new article section. Once created, \
@@ -635,7 +651,7 @@ class ArticleSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Memb
                 kwargs={'pk': self.object.pk},
             )
 
-class ArticleSectionDetailView(LoginRequiredMixin, DetailView):
+class ArticleSectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = ArticleSection
     context_object_name = 'section'
@@ -643,7 +659,7 @@ class ArticleSectionDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         # Add section button
         if self.request.user.has_perm('documentation.add_articlepagesection'):
@@ -675,7 +691,7 @@ class ArticleSectionUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Memb
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(
             self.object.title,
@@ -755,7 +771,7 @@ class SupportDocumentCreateView(LoginRequiredMixin, PermissionRequiredMixin, Mem
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Document"
         context['meta_desc'] = """Create a new document. Once the document is \
@@ -768,7 +784,7 @@ class SupportDocumentCreateView(LoginRequiredMixin, PermissionRequiredMixin, Mem
         member = Member.objects.get(pk=self.request.user.pk)
         form.instance.creation_date = timezone.now()
         form.instance.owner = member
-        form.instance.slug = Text.slugify_unique(self.model, form.instance.title)
+        Text.set_unique_slug(form.instance, form.instance.title)
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -784,12 +800,11 @@ class SupportDocumentCreateView(LoginRequiredMixin, PermissionRequiredMixin, Mem
 class SupportDocumentListView(NewModelListMixin, ListView):
 
     model = SupportDocument
-    try:
-        paginate_by = DocumentationAppProfile.objects.get_or_create(pk=1)[0].list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'documents'
 
+    def get_paginate_by(self, queryset):
+        return DocumentationAppProfile.get_profile().list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -803,12 +818,11 @@ class SupportDocumentListView(NewModelListMixin, ListView):
 class TopSupportDocumentListView(TopModelListMixin, ListView):
 
     model = SupportDocument
-    try:
-        paginate_by = DocumentationAppProfile.objects.get_or_create(pk=1)[0].list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'documents'
 
+    def get_paginate_by(self, queryset):
+        return DocumentationAppProfile.get_profile().list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -822,12 +836,11 @@ class TopSupportDocumentListView(TopModelListMixin, ListView):
 class MemberSupportDocumentView(ModelByMemberMixin, ListView):
 
     model = SupportDocument
-    try:
-        paginate_by = DocumentationAppProfile.objects.get_or_create(pk=1)[0].list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'documents'
 
+    def get_paginate_by(self, queryset):
+        return DocumentationAppProfile.get_profile().list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -854,22 +867,31 @@ class SupportDocumentStudioListView(StudioListMixin, ListView):
             )
         return context
 
-class SupportDocumentDetailView(DetailView):
+class SupportDocumentDetailView(ConditionalDetailMixin, DetailView):
 
     model = SupportDocument
+    app_profile = DocumentationAppProfile
+    conditional_related = {
+        'documentation.supportdocsection': 'support_document',
+        'posts.responsepost': 'document',
+    }
     context_object_name = 'document'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
-        sections = SupportDocSection.objects.filter(support_reference=self.object.pk)
+        sections = SupportDocSection.objects.select_related(
+            'support_document',
+        ).filter(support_reference=self.object.pk)
         context['refs'] = {}
         for s in sections:
             if s.support_document not in context['refs']:
                 context['refs'][s.support_document] = s.pk
-        context['sections'] = SupportDocSection.objects.filter(
+        context['sections'] = SupportDocSection.objects.prefetch_related(
+            *SupportDocSection.get_prefetch_plan()
+        ).filter(
             support_document=self.get_object(),
         ).order_by('order')
         if self.request.user.is_authenticated:
@@ -969,7 +991,7 @@ class SupportDocumentUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Mem
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this document.".format(self.object.title)
@@ -1081,7 +1103,7 @@ class SupportDocSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, M
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Document Section"
         context['meta_desc'] = """Create a new document section. Once created, \
@@ -1106,7 +1128,7 @@ class SupportDocSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, M
                 kwargs={'pk': self.object.pk},
             )
 
-class SupportDocSectionDetailView(LoginRequiredMixin, DetailView):
+class SupportDocSectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = SupportDocSection
     context_object_name = 'section'
@@ -1114,7 +1136,7 @@ class SupportDocSectionDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         # Add section button
         if self.request.user.has_perm('documentation.add_support_documentpagesection'):
@@ -1146,7 +1168,7 @@ class SupportDocSectionUpdateView(LoginRequiredMixin, PermissionRequiredMixin, M
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(
             self.object.title,
@@ -1225,7 +1247,7 @@ class StoryCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateM
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Story"
         context['meta_desc'] = """Create a new story. Once the story is \
@@ -1238,7 +1260,7 @@ class StoryCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateM
         member = Member.objects.get(pk=self.request.user.pk)
         form.instance.creation_date = timezone.now()
         form.instance.owner = member
-        form.instance.slug = Text.slugify_unique(self.model, form.instance.title)
+        Text.set_unique_slug(form.instance, form.instance.title)
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -1254,12 +1276,11 @@ class StoryCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateM
 class StoryListView(NewModelListMixin, ListView):
 
     model = Story
-    try:
-        paginate_by = DocumentationAppProfile.objects.get_or_create(pk=1)[0].list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'stories'
 
+    def get_paginate_by(self, queryset):
+        return DocumentationAppProfile.get_profile().list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -1273,12 +1294,11 @@ class StoryListView(NewModelListMixin, ListView):
 class TopStoryListView(TopModelListMixin, ListView):
 
     model = Story
-    try:
-        paginate_by = DocumentationAppProfile.objects.get_or_create(pk=1)[0].list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'stories'
 
+    def get_paginate_by(self, queryset):
+        return DocumentationAppProfile.get_profile().list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -1292,12 +1312,11 @@ class TopStoryListView(TopModelListMixin, ListView):
 class MemberStoryView(ModelByMemberMixin, ListView):
 
     model = Story
-    try:
-        paginate_by = DocumentationAppProfile.objects.get_or_create(pk=1)[0].list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'stories'
 
+    def get_paginate_by(self, queryset):
+        return DocumentationAppProfile.get_profile().list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -1323,17 +1342,24 @@ class StoryStudioListView(StudioListMixin, ListView):
             )
         return context
 
-class StoryDetailView(DetailView):
+class StoryDetailView(ConditionalDetailMixin, DetailView):
 
     model = Story
+    app_profile = DocumentationAppProfile
+    conditional_related = {
+        'documentation.storysection': 'story',
+        'posts.responsepost': 'story',
+    }
     context_object_name = 'story'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
-        context['sections'] = StorySection.objects.filter(
+        context['sections'] = StorySection.objects.prefetch_related(
+            *StorySection.get_prefetch_plan()
+        ).filter(
             story=self.get_object(),
         ).order_by('order')
         if self.request.user.is_authenticated:
@@ -1433,7 +1459,7 @@ class StoryUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdateM
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this story.".format(self.object.title)
@@ -1545,7 +1571,7 @@ class StorySectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Member
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Story Section"
         context['meta_desc'] = """Create a new story section. Once created, \
@@ -1570,7 +1596,7 @@ class StorySectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Member
                 kwargs={'pk': self.object.pk},
             )
 
-class StorySectionDetailView(LoginRequiredMixin, DetailView):
+class StorySectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = StorySection
     context_object_name = 'section'
@@ -1578,7 +1604,7 @@ class StorySectionDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         # Add section button
         if self.request.user.has_perm('documentation.add_storypagesection'):
@@ -1610,7 +1636,7 @@ class StorySectionUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Member
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = DocumentationAppProfile.objects.get_or_create(pk=1)
+        profile = DocumentationAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(
             self.object.title,
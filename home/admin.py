@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import HomeAppProfile
+from .models import HomeAppProfile, SearchEntry
 
 # Register your models here.
 admin.site.register(HomeAppProfile)
+admin.site.register(SearchEntry)
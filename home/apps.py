@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class HomeConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'home'
+
+    def ready(self):
+        import home.signals
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from home.templatetags import fragment_cache
+
+
+class Command(BaseCommand):
+
+    help = """Show the hit and miss counts of the landing page fragment \
+        cache. The counts are kept in the default cache, so they are only \
+        shared between workers if that cache is. Each worker adds its \
+        counts every FRAGMENT_CACHE_STATS_INTERVAL seconds."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help="Set the counts back to zero after showing them.",
+        )
+
+    def handle(self, *args, **options):
+        stats = fragment_cache.get_stats(fragment_cache.get_names())
+        self.stdout.write('{:<24} {:>10} {:>10} {:>8}'.format(
+            'fragment', 'hits', 'misses', 'ratio',
+        ))
+        for name, (hits, misses) in sorted(stats.items()):
+            total = hits + misses
+            self.stdout.write('{:<24} {:>10} {:>10} {:>8.1%}'.format(
+                name,
+                hits,
+                misses,
+                hits / total if total else 0,
+            ))
+        if options['reset']:
+            fragment_cache.reset_stats()
+            self.stdout.write('Counts reset')
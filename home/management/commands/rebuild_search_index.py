@@ -0,0 +1,38 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from home import search
+
+
+class Command(BaseCommand):
+
+    help = """Rebuild the site search index from the public objects of \
+        every searchable model, or only the given models. Run this after \
+        the search migration and whenever the index may have drifted."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            help="Model labels such as posts.post. Defaults to every searchable model.",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Objects read and written per batch.",
+        )
+
+    def handle(self, *args, **options):
+        models = []
+        for label in options['models']:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                raise CommandError('Unknown model "{}"'.format(label))
+            if not search.is_searchable(model):
+                raise CommandError('"{}" is not searchable'.format(label))
+            models.append(model)
+        written = search.rebuild(models, batch_size=options['batch_size'])
+        for label, count in written.items():
+            self.stdout.write('{:<32} {:>8}'.format(label, count))
+        self.stdout.write('Indexed {} objects'.format(sum(written.values())))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from home import sitemaps
+
+
+class Command(BaseCommand):
+
+    help = """Write the sitemap index and every sitemap page to \
+        SITEMAP_ROOT and remove pages that are no longer listed. The files \
+        are kept current as content changes, so this is only needed after \
+        deploying or changing the sitemap settings."""
+
+    def handle(self, *args, **options):
+        written = sitemaps.write_all()
+        self.stdout.write('Wrote {} URLs to {}'.format(
+            written,
+            sitemaps.get_root(),
+        ))
@@ -0,0 +1,97 @@
+# Generated by Django 3.2 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+POSTGRESQL = (
+    # Titles rank above body text
+    """ALTER TABLE home_searchentry ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(text, '')), 'B')
+    ) STORED""",
+    """CREATE INDEX home_searchentry_search_vector
+    ON home_searchentry USING GIN (search_vector)""",
+)
+
+SQLITE = (
+    # An external content FTS5 table that reads the entry rows
+    """CREATE VIRTUAL TABLE home_searchentry_fts USING fts5(
+        title, text,
+        content='home_searchentry', content_rowid='id',
+        tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER home_searchentry_fts_insert
+    AFTER INSERT ON home_searchentry BEGIN
+        INSERT INTO home_searchentry_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END""",
+    """CREATE TRIGGER home_searchentry_fts_delete
+    AFTER DELETE ON home_searchentry BEGIN
+        INSERT INTO home_searchentry_fts(home_searchentry_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END""",
+    """CREATE TRIGGER home_searchentry_fts_update
+    AFTER UPDATE ON home_searchentry BEGIN
+        INSERT INTO home_searchentry_fts(home_searchentry_fts, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO home_searchentry_fts(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END""",
+)
+
+SQLITE_REVERSE = (
+    "DROP TRIGGER IF EXISTS home_searchentry_fts_insert",
+    "DROP TRIGGER IF EXISTS home_searchentry_fts_delete",
+    "DROP TRIGGER IF EXISTS home_searchentry_fts_update",
+    "DROP TABLE IF EXISTS home_searchentry_fts",
+)
+
+
+def create_full_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRESQL
+    elif vendor == 'sqlite':
+        statements = SQLITE
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+def drop_full_text_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_REVERSE:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0008_auto_20210506_1747'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=128)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('text', models.TextField(blank=True)),
+                ('url', models.CharField(max_length=255)),
+                ('members_only', models.BooleanField(default=False)),
+                ('weight', models.FloatField(default=0)),
+                ('publication_date', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Search Entry',
+                'verbose_name_plural': 'Search Entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('model', 'object_id'), name='unique_search_entry'),
+        ),
+        migrations.RunPython(create_full_text_index, drop_full_text_index),
+    ]
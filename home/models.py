@@ -1,5 +1,9 @@
+import re
 import socket
-from django.db import models
+from django.db import connection, models
+from django.db.models import Case, ExpressionWrapper, F, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest, Ln
 from lookaway.mixins import AppProfile, Section
 from crypto.models import CryptoWalletsMixin
 
@@ -232,3 +236,122 @@ class HomePageSection(Section):
 
     def __str__(self):
         return self.title
+
+class SearchEntry(models.Model):
+    '''
+    The searchable text of one public site object. Entries are kept
+    current by the home signals and rebuilt by the "rebuild_search_index"
+    command. The full text index itself is created by the migration:
+    a tsvector column with a GIN index on PostgreSQL, or an FTS5 table
+    kept in step by triggers on SQLite. Other databases match the words
+    of a query without an index.
+    '''
+
+    ## The "app_label.model_name" label of the indexed model
+    model = models.CharField(max_length=128)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    text = models.TextField(blank=True)
+    url = models.CharField(max_length=255)
+    members_only = models.BooleanField(default=False)
+    weight = models.FloatField(default=0)
+    publication_date = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        verbose_name = "Search Entry"
+        verbose_name_plural = "Search Entries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['model', 'object_id'],
+                name='unique_search_entry',
+            )
+        ]
+
+    def __str__(self):
+        return '{} - {}'.format(self.model, self.title)
+
+    @staticmethod
+    def get_terms(query):
+        '''
+        Returns - Up to 16 lower case words from a search query.
+        Punctuation is dropped so user input cannot change the
+        meaning of the full text query.
+        '''
+        return re.findall(r'\w+', query.lower())[:16]
+
+    @classmethod
+    def search(cls, query, user=None):
+        '''
+        Find the entries that contain every word of the query.
+
+        Arguments
+        query - The text typed by the visitor.
+        user - request.user. Members only entries are left out
+               for visitors who are not logged in.
+
+        Returns - A queryset ordered by text relevance
+                  multiplied by the weight of the object.
+        '''
+        terms = cls.get_terms(query)
+        if not terms:
+            return cls.objects.none()
+        table = connection.ops.quote_name(cls._meta.db_table)
+        if connection.vendor == 'postgresql':
+            tsquery = "plainto_tsquery('english', %s)"
+            entries = cls.objects.annotate(
+                matched=RawSQL(
+                    '{}.search_vector @@ {}'.format(table, tsquery),
+                    (' '.join(terms),),
+                    output_field=models.BooleanField(),
+                ),
+                rank=RawSQL(
+                    'ts_rank({}.search_vector, {})'.format(table, tsquery),
+                    (' '.join(terms),),
+                    output_field=models.FloatField(),
+                ),
+            ).filter(matched=True)
+        elif connection.vendor == 'sqlite':
+            fts = connection.ops.quote_name(cls._meta.db_table + '_fts')
+            match = ' '.join('"{}"'.format(t) for t in terms)
+            entries = cls.objects.filter(
+                pk__in=RawSQL(
+                    'SELECT rowid FROM {0} WHERE {0} MATCH %s'.format(fts),
+                    (match,),
+                ),
+            ).annotate(
+                # bm25 is lower for better matches, titles count ten times
+                rank=RawSQL(
+                    '(SELECT -bm25({0}, 10.0, 1.0) FROM {0} '
+                    'WHERE {0} MATCH %s AND rowid = {1}.id)'.format(fts, table),
+                    (match,),
+                    output_field=models.FloatField(),
+                ),
+            )
+        else:
+            # Other databases have no full text index, so every word is
+            # looked for anywhere in the title or text
+            in_title = Q()
+            entries = cls.objects.all()
+            for term in terms:
+                entries = entries.filter(
+                    Q(title__icontains=term) | Q(text__icontains=term),
+                )
+                in_title &= Q(title__icontains=term)
+            entries = entries.annotate(
+                rank=Case(
+                    When(in_title, then=Value(10.0)),
+                    default=Value(1.0),
+                    output_field=models.FloatField(),
+                ),
+            )
+        if user is None or not user.is_authenticated:
+            entries = entries.filter(members_only=False)
+        return entries.annotate(
+            score=ExpressionWrapper(
+                F('rank') * (Value(1.0) + Ln(Value(1.0) + Greatest(F('weight'), Value(0.0)))),
+                output_field=models.FloatField(),
+            ),
+        ).order_by('-score', '-publication_date', 'pk')
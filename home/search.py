@@ -0,0 +1,166 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Subquery, prefetch_related_objects
+from lookaway import versions
+from .models import SearchEntry
+'''
+Site search index.
+
+Each searchable model lists the fields whose text is indexed. Articles,
+stories and support documents also index the title and text of their
+sections, except members only sections. Only public objects are indexed,
+and members only objects are marked so the search can leave them out for
+visitors who are not logged in.
+'''
+
+# Searchable models mapped to the fields indexed after the title
+SEARCH_FIELDS = {
+    'posts.post': ('meta_description', 'location', 'text'),
+    'posts.responsepost': ('meta_description', 'location', 'text'),
+    'documentation.article': ('meta_description', 'intro', 'outro'),
+    'documentation.story': ('meta_description', 'author', 'intro', 'outro'),
+    'documentation.supportdocument': ('meta_description', 'intro', 'outro'),
+    'art.visual': ('artist', 'meta_description', 'medium', 'text'),
+    'art.gallery': ('artist', 'meta_description', 'location', 'text'),
+    'music.track': ('artist', 'meta_description', 'genre', 'label', 'text'),
+    'music.album': ('artist', 'meta_description', 'genre', 'label', 'text'),
+    'objects.code': ('language', 'file_path', 'text', 'code'),
+    'objects.tag': ('value',),
+}
+
+# Documents mapped to the related name of their sections
+SECTIONS = {
+    'documentation.article': 'parent_article',
+    'documentation.story': 'parent_story',
+    'documentation.supportdocument': 'parent_doc',
+}
+
+# Section models mapped to the field of their parent document
+SECTION_PARENTS = {
+    'documentation.articlesection': 'article',
+    'documentation.storysection': 'story',
+    'documentation.supportdocsection': 'support_document',
+}
+
+SECTION_FIELDS = ('title', 'text', 'tip', 'warning')
+
+def get_search_models():
+    '''
+    Returns - Every searchable model class.
+    '''
+    return [apps.get_model(label) for label in SEARCH_FIELDS]
+
+def is_searchable(model):
+    return versions.get_label(model) in SEARCH_FIELDS
+
+def get_parent(section):
+    '''
+    Returns - The document a section belongs to, or None if the
+    model is not a document section.
+    '''
+    field = SECTION_PARENTS.get(versions.get_label(section))
+    if field is None or not getattr(section, field + '_id'):
+        return None
+    return getattr(section, field)
+
+def is_public(instance):
+    return getattr(instance, 'is_public', True)
+
+def get_text(instance):
+    '''
+    Returns - The text to index for an instance, joined from its
+    fields and those of its sections.
+    '''
+    values = [
+        getattr(instance, f, None)
+        for f in SEARCH_FIELDS[versions.get_label(instance)]
+    ]
+    sections = SECTIONS.get(versions.get_label(instance))
+    if sections:
+        for section in getattr(instance, sections).all():
+            if not section.members_only:
+                values += [getattr(section, f, None) for f in SECTION_FIELDS]
+    return '\n'.join(str(v) for v in values if v)
+
+def make_entry(instance):
+    '''
+    Returns - An unsaved SearchEntry for a public instance.
+    '''
+    return SearchEntry(
+        model=versions.get_label(instance),
+        object_id=instance.pk,
+        title=str(instance)[:255],
+        text=get_text(instance),
+        url=instance.get_absolute_url()[:255],
+        members_only=getattr(instance, 'members_only', False),
+        weight=instance.weight,
+        publication_date=getattr(instance, 'publication_date', None),
+    )
+
+def index(instance):
+    '''
+    Add, update or remove the entry of a saved instance.
+    '''
+    if not is_public(instance):
+        remove(type(instance), instance.pk)
+        return
+    entry = make_entry(instance)
+    SearchEntry.objects.update_or_create(
+        model=entry.model,
+        object_id=entry.object_id,
+        defaults={
+            f.name: getattr(entry, f.name)
+            for f in SearchEntry._meta.concrete_fields
+            if f.name not in ('id', 'model', 'object_id')
+        },
+    )
+
+def remove(model, pk):
+    SearchEntry.objects.filter(
+        model=versions.get_label(model),
+        object_id=pk,
+    ).delete()
+
+def update_weight(instance):
+    '''
+    Copy the current weight of an object to its entry.
+    '''
+    weight = type(instance).objects.filter(pk=instance.pk).values('weight')
+    SearchEntry.objects.filter(
+        model=versions.get_label(instance),
+        object_id=instance.pk,
+    ).update(weight=Subquery(weight[:1]))
+
+def rebuild(models=None, batch_size=500):
+    '''
+    Replace the entries of the given models with entries built from
+    their public instances. The instances are read in batches.
+
+    Returns - A dict of the number of entries written per model label.
+    '''
+    written = {}
+    for model in models or get_search_models():
+        label = versions.get_label(model)
+        objects = model.objects.order_by('pk')
+        if 'is_public' in [f.name for f in model._meta.get_fields()]:
+            objects = objects.filter(is_public=True)
+        sections = SECTIONS.get(label)
+        written[label] = 0
+        batch = []
+        # Searches see the old entries until the new ones are written
+        with transaction.atomic():
+            SearchEntry.objects.filter(model=label).delete()
+            for instance in objects.iterator(chunk_size=batch_size):
+                batch.append(instance)
+                if len(batch) == batch_size:
+                    written[label] += write_batch(batch, sections)
+                    batch = []
+            if batch:
+                written[label] += write_batch(batch, sections)
+    return written
+
+def write_batch(batch, sections):
+    if sections:
+        prefetch_related_objects(batch, sections)
+    SearchEntry.objects.bulk_create([make_entry(i) for i in batch])
+    return len(batch)
@@ -0,0 +1,98 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from lookaway import versions
+from lookaway.mixins import AppProfile
+from members.models import Marshmallow
+from objects.mixins import MetaDataMixin
+from objects.models import Tag
+from . import search, sitemaps
+
+# Content versions
+
+def is_versioned(model):
+    '''
+    Returns True if changes to the model should bump its version stamp.
+    Site objects, tags, app profiles and members are shown
+    on the landing pages.
+    '''
+    return issubclass(model, (MetaDataMixin, AppProfile, Tag, User))
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_content_version(sender, *args, **kwargs):
+    '''
+    Bump the version stamp of a saved or deleted model. This covers
+    publishing and marshmallows since both save the instance.
+    App profiles bump their own stamp when they are saved.
+    '''
+    if is_versioned(sender) and not issubclass(sender, AppProfile):
+        versions.bump_on_commit(versions.get_label(sender))
+
+@receiver(m2m_changed)
+def bump_relation_version(sender, instance, action, model, *args, **kwargs):
+    '''
+    Adding or removing tags, links, section items or groups
+    does not save either side, so bump their stamps here.
+    '''
+    if not action.startswith('post_'):
+        return
+    if is_versioned(type(instance)):
+        versions.bump_on_commit(versions.get_label(instance))
+    if is_versioned(model):
+        versions.bump_on_commit(versions.get_label(model))
+
+# Search index
+
+@receiver(post_save)
+def index_saved_object(sender, instance, raw=False, *args, **kwargs):
+    '''
+    Index a searchable object when it is saved or published, or
+    the document of a section when the section is saved.
+    '''
+    if raw:
+        return
+    if search.is_searchable(sender):
+        search.index(instance)
+    else:
+        parent = search.get_parent(instance)
+        if parent is not None:
+            search.index(parent)
+
+@receiver(post_delete)
+def remove_deleted_object(sender, instance, *args, **kwargs):
+    '''
+    Remove a deleted object from the search index, or index
+    the document of a deleted section again.
+    '''
+    if search.is_searchable(sender):
+        search.remove(sender, instance.pk)
+    else:
+        try:
+            parent = search.get_parent(instance)
+        except ObjectDoesNotExist:
+            # The section was deleted along with its document
+            return
+        if parent is not None:
+            search.index(parent)
+
+@receiver(m2m_changed)
+def update_search_weight(sender, instance, action, model, *args, **kwargs):
+    '''
+    A marshmallow was added to a searchable object.
+    '''
+    if action == 'post_add' and model is Marshmallow \
+            and search.is_searchable(type(instance)):
+        search.update_weight(instance)
+
+# Sitemaps
+
+@receiver(post_save)
+@receiver(post_delete)
+def update_sitemap(sender, instance, raw=False, *args, **kwargs):
+    '''
+    Rewrite the sitemap page of a published, changed or deleted object.
+    '''
+    if not raw and issubclass(sender, MetaDataMixin):
+        sitemaps.update(sender, instance.pk)
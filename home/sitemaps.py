@@ -1,4 +1,11 @@
+import os
+import tempfile
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, Max
+from django.template.loader import render_to_string
 from art.models import Gallery, Visual
 from documentation.models import Article, Story, SupportDocument
 from music.models import Album, Track
@@ -15,7 +22,7 @@ class GallerySitemap(Sitemap):
         )
 
     def lastmod(self, obj):
-        return obj.publication_date
+        return max(filter(None, (obj.last_modified, obj.publication_date)))
 
 class VisualSitemap(Sitemap):
     changefreq = "daily"
@@ -27,7 +34,7 @@ class VisualSitemap(Sitemap):
         )
 
     def lastmod(self, obj):
-        return obj.publication_date
+        return max(filter(None, (obj.last_modified, obj.publication_date)))
 
 class ArticleSitemap(Sitemap):
     changefreq = "daily"
@@ -39,7 +46,7 @@ class ArticleSitemap(Sitemap):
         )
 
     def lastmod(self, obj):
-        return obj.publication_date
+        return max(filter(None, (obj.last_modified, obj.publication_date)))
 
 class StorySitemap(Sitemap):
     changefreq = "weekly"
@@ -51,7 +58,7 @@ class StorySitemap(Sitemap):
         )
 
     def lastmod(self, obj):
-        return obj.publication_date
+        return max(filter(None, (obj.last_modified, obj.publication_date)))
 
 class SupportDocumentSitemap(Sitemap):
     changefreq = "weekly"
@@ -63,7 +70,7 @@ class SupportDocumentSitemap(Sitemap):
         )
 
     def lastmod(self, obj):
-        return obj.publication_date
+        return max(filter(None, (obj.last_modified, obj.publication_date)))
 
 class AlbumSitemap(Sitemap):
     changefreq = "weekly"
@@ -72,10 +79,11 @@ class AlbumSitemap(Sitemap):
     def items(self):
         return Album.objects.filter(
             is_public=True,
+            members_only=False,
         )
 
     def lastmod(self, obj):
-        return obj.publication_date
+        return max(filter(None, (obj.last_modified, obj.publication_date)))
 
 class TrackSitemap(Sitemap):
     changefreq = "weekly"
@@ -84,10 +92,11 @@ class TrackSitemap(Sitemap):
     def items(self):
         return Track.objects.filter(
             is_public=True,
+            members_only=False,
         )
 
     def lastmod(self, obj):
-        return obj.publication_date
+        return max(filter(None, (obj.last_modified, obj.publication_date)))
 
 class PostsSitemap(Sitemap):
     changefreq = "hourly"
@@ -100,9 +109,10 @@ class PostsSitemap(Sitemap):
         )
 
     def lastmod(self, obj):
-        return obj.publication_date
+        return max(filter(None, (obj.last_modified, obj.publication_date)))
 
 whole_site = {
+    'posts': PostsSitemap,
     'galleries': GallerySitemap,
     'visuals': VisualSitemap,
     'articles': ArticleSitemap,
@@ -111,3 +121,193 @@ whole_site = {
     'albums': AlbumSitemap,
     'tracks': TrackSitemap,
 }
+
+# Pre-generated sitemap files
+'''
+The sitemap index and every page of every section are written to files
+in SITEMAP_ROOT so that nginx can serve them without reaching Django.
+A section page holds the public objects whose pk falls in a fixed range
+of SITEMAP_PAGE_SIZE, so publishing, changing or deleting an object only
+rewrites the one page it is on and the index.
+'''
+
+def get_root():
+    return getattr(
+        settings,
+        'SITEMAP_ROOT',
+        os.path.join(settings.BASE_DIR, 'run', 'sitemaps'),
+    )
+
+def get_page_size():
+    return getattr(settings, 'SITEMAP_PAGE_SIZE', 1000)
+
+def has_base_url():
+    return bool(getattr(settings, 'SITEMAP_BASE_URL', None))
+
+def get_base_url(request=None):
+    '''
+    Returns - The scheme and host of the site without a trailing slash.
+    SITEMAP_BASE_URL is used if it is set, otherwise the host of the
+    request for a sitemap, which Django checks against ALLOWED_HOSTS.
+
+    Raises ImproperlyConfigured if there is neither.
+    '''
+    if has_base_url():
+        return settings.SITEMAP_BASE_URL.rstrip('/')
+    if request is not None:
+        return request.build_absolute_uri('/').rstrip('/')
+    raise ImproperlyConfigured(
+        'SITEMAP_BASE_URL must be set to the scheme and host '
+        'of the site, e.g. "https://www.example.com", to write '
+        'sitemaps outside of a request.'
+    )
+
+def get_index_path():
+    return os.path.join(get_root(), 'sitemap.xml')
+
+def get_page_name(section, page):
+    return '{}-{}.xml'.format(section, page)
+
+def get_page_path(section, page):
+    return os.path.join(get_root(), 'sitemaps', get_page_name(section, page))
+
+def get_section(model):
+    '''
+    Returns - The name of the section that lists the model, or None.
+    '''
+    for name, sitemap in whole_site.items():
+        if sitemap().items().model is model:
+            return name
+    return None
+
+def write_file(path, content):
+    '''
+    Atomically replace a file so nginx never serves a partial sitemap.
+    '''
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.sitemap.')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def remove_file(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+def get_pages(section):
+    '''
+    Returns - A list of (page, lastmod) for each page of the section
+    that has at least one public object, in one grouped query.
+    '''
+    pages = whole_site[section]().items().order_by().annotate(
+        page=F('pk') / get_page_size(),
+    ).values_list('page').annotate(
+        Max('last_modified'),
+        Max('publication_date'),
+    ).order_by('page')
+    return [
+        (page, max(filter(None, dates), default=None))
+        for page, *dates in pages
+    ]
+
+def write_page(section, page, request=None):
+    '''
+    Write one page of a section, or remove it if it is empty.
+
+    Arguments
+    section - The name of the section.
+    page - The number of the page.
+    request - The request for a sitemap, whose host is used when
+              SITEMAP_BASE_URL is not set.
+
+    Returns - The number of URLs written.
+    '''
+    sitemap = whole_site[section]()
+    size = get_page_size()
+    items = sitemap.items().filter(
+        pk__gte=page * size,
+        pk__lt=(page + 1) * size,
+    ).order_by('pk')
+    base_url = get_base_url(request)
+    urls = [
+        {
+            'location': base_url + sitemap.location(item),
+            'lastmod': sitemap.lastmod(item),
+            'changefreq': sitemap.changefreq,
+            'priority': sitemap.priority,
+        }
+        for item in items
+    ]
+    path = get_page_path(section, page)
+    if urls:
+        write_file(path, render_to_string('home/sitemap.xml', {'urlset': urls}))
+    else:
+        remove_file(path)
+    return len(urls)
+
+def write_index(request=None):
+    '''
+    Write the sitemap index that lists every non empty section page.
+    '''
+    base_url = get_base_url(request)
+    sitemaps = [
+        {
+            'location': '{}/sitemaps/{}'.format(base_url, get_page_name(section, page)),
+            'lastmod': lastmod,
+        }
+        for section in whole_site
+        for page, lastmod in get_pages(section)
+    ]
+    write_file(
+        get_index_path(),
+        render_to_string('home/sitemap_index.xml', {'sitemaps': sitemaps}),
+    )
+
+def write_all(request=None):
+    '''
+    Write every page of every section and the index, and remove
+    the files of pages that no longer exist.
+
+    Returns - The number of URLs written.
+    '''
+    written = 0
+    current = set()
+    for section in whole_site:
+        for page, lastmod in get_pages(section):
+            written += write_page(section, page, request)
+            current.add(get_page_name(section, page))
+    directory = os.path.dirname(get_page_path('', 0))
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith('.xml') and name not in current:
+                remove_file(os.path.join(directory, name))
+    write_index(request)
+    return written
+
+def update(model, pk):
+    '''
+    Rewrite the page an object is listed on and the index
+    once the transaction that changed the object commits.
+    Without SITEMAP_BASE_URL they are removed instead, and the
+    sitemap views write them again with the host of the next request.
+    '''
+    section = get_section(model)
+    if section is None:
+        return
+    page = pk // get_page_size()
+    def write():
+        if has_base_url():
+            write_page(section, page)
+            write_index()
+        else:
+            remove_file(get_page_path(section, page))
+            remove_file(get_index_path())
+    transaction.on_commit(write)
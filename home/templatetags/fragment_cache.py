@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import Counter
+from hashlib import md5
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+from lookaway import versions
+
+register = template.Library()
+
+'''
+Cache rendered landing page fragments.
+
+{% fragment_cache 'home_page' fragment_models %}
+  ...
+{% endfragment_cache %}
+
+The key is made from the fragment name, whether the visitor is logged in,
+the buttons the view chose to show and the version stamp of every model
+in fragment_models. Saving, publishing or giving a marshmallow to any of
+those models changes the key, so a stale fragment is never served.
+Members get their own copy because the owner buttons depend on who is
+looking. Visitors who are not logged in share one copy.
+Hits and misses are counted per fragment name. Each process keeps its
+own counts and adds them to the shared cache at most once every
+FRAGMENT_CACHE_STATS_INTERVAL seconds, so a hit does not write to it.
+'''
+
+STATS_PREFIX = 'fragment_cache:stats'
+# Stands in for the CSRF token in cached fragments. It is swapped for
+# the token of the current visitor every time a fragment is served.
+CSRF_PLACEHOLDER = 'FRAGMENTCACHECSRFTOKEN'
+
+def get_timeout():
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600)
+
+def get_stats_key(name, event):
+    return '{}:{}:{}'.format(STATS_PREFIX, name, event)
+
+# Counts of this process that are not in the shared cache yet
+_pending = Counter()
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+def get_stats_interval():
+    return getattr(settings, 'FRAGMENT_CACHE_STATS_INTERVAL', 60)
+
+def count(name, event):
+    with _pending_lock:
+        _pending[get_stats_key(name, event)] += 1
+        due = time.monotonic() - _last_flush >= get_stats_interval()
+    if due:
+        flush_stats()
+
+def flush_stats():
+    '''
+    Add the counts of this process to the shared cache.
+    '''
+    global _last_flush
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    for key, n in pending.items():
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key, n)
+        except ValueError:
+            pass
+
+def get_stats(names):
+    '''
+    Returns - A dict of {name: (hits, misses)} for the given fragment names.
+    Counts that other processes have not added yet are left out.
+    '''
+    flush_stats()
+    keys = [get_stats_key(n, e) for n in names for e in ('hit', 'miss')]
+    values = cache.get_many(keys)
+    return {
+        n: (
+            values.get(get_stats_key(n, 'hit'), 0),
+            values.get(get_stats_key(n, 'miss'), 0),
+        )
+        for n in names
+    }
+
+def get_names():
+    '''
+    Returns - The names of the fragments that have been rendered.
+    '''
+    return cache.get('{}:names'.format(STATS_PREFIX), [])
+
+def add_name(name):
+    names = get_names()
+    if name not in names:
+        cache.set('{}:names'.format(STATS_PREFIX), names + [name], None)
+
+def reset_stats():
+    with _pending_lock:
+        _pending.clear()
+    names = get_names()
+    cache.delete_many(
+        [get_stats_key(n, e) for n in names for e in ('hit', 'miss')]
+    )
+
+def get_fragment_key(name, context, models):
+    request = context.get('request')
+    user = getattr(request, 'user', None)
+    member = user.pk if user and user.is_authenticated else None
+    flat = context.flatten()
+    # The views decide which edit buttons a member may see
+    buttons = sorted(k for k, v in flat.items() if k.startswith('show_') and v)
+    stamps = versions.get_stamps(models)
+    digest = md5(
+        repr((member, buttons, models, stamps)).encode()
+    ).hexdigest()
+    return 'fragment_cache:{}:{}'.format(name, digest)
+
+
+class FragmentCacheNode(template.Node):
+
+    def __init__(self, nodelist, name, models):
+        self.nodelist = nodelist
+        self.name = name
+        self.models = models
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        models = list(self.models.resolve(context) or [])
+        key = get_fragment_key(name, context, models)
+        content = cache.get(key)
+        if content is None:
+            count(name, 'miss')
+            add_name(name)
+            with context.push(csrf_token=CSRF_PLACEHOLDER):
+                content = self.nodelist.render(context)
+            cache.set(key, content, get_timeout())
+        else:
+            count(name, 'hit')
+        if CSRF_PLACEHOLDER in content:
+            content = content.replace(
+                CSRF_PLACEHOLDER,
+                str(context.get('csrf_token', '')),
+            )
+        return mark_safe(content)
+
+@register.tag('fragment_cache')
+def do_fragment_cache(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            "'{}' takes a fragment name and a list of models".format(bits[0])
+        )
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+    )
@@ -1,3 +1,441 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from documentation.models import Article, ArticleSection
+from lookaway import context_processors, versions
+from lookaway.mixins import AppPageMixin
+from members.models import Marshmallow, Profile
+from objects.models import Link
+from objects.utils import TestData
+from posts.models import Post
+from .templatetags import fragment_cache
+from . import sitemaps
+from .models import HomeAppProfile, HomePageSection, SearchEntry
 
 # Create your tests here.
+
+class AppProfileCacheTest(TestCase):
+
+    def setUp(self):
+        HomeAppProfile._profile_cache.clear()
+
+    def test_profile_is_cached(self):
+        HomeAppProfile.get_profile()
+        with self.assertNumQueries(0):
+            profile = HomeAppProfile.get_profile()
+            profile.logo
+            list(profile.links.all())
+
+    def test_save_invalidates(self):
+        profile = HomeAppProfile.get_profile()
+        HomeAppProfile.objects.filter(pk=1).update(title='stale')
+        self.assertNotEqual(HomeAppProfile.get_profile().title, 'stale')
+        updated = HomeAppProfile.objects.get(pk=1)
+        updated.title = 'fresh'
+        with self.captureOnCommitCallbacks(execute=True):
+            updated.save()
+        self.assertEqual(HomeAppProfile.get_profile().title, 'fresh')
+
+    def test_links_invalidate(self):
+        profile = HomeAppProfile.get_profile()
+        link = Link.objects.create(title='link', url='')
+        with self.captureOnCommitCallbacks(execute=True):
+            HomeAppProfile.objects.get(pk=1).links.add(link)
+        self.assertEqual(
+            list(HomeAppProfile.get_profile().links.all()),
+            [link],
+        )
+
+    def test_bump_after_commit(self):
+        profile = HomeAppProfile.get_profile()
+        name = versions.get_label(HomeAppProfile)
+        stamp = versions.get_stamp(name)
+        with self.captureOnCommitCallbacks(execute=True):
+            updated = HomeAppProfile.objects.get(pk=1)
+            updated.title = 'uncommitted'
+            updated.save()
+            # Other processes must not cache the old row under a new stamp
+            self.assertEqual(versions.get_stamp(name), stamp)
+            self.assertNotEqual(
+                HomeAppProfile.get_profile().title,
+                'uncommitted',
+            )
+        self.assertNotEqual(versions.get_stamp(name), stamp)
+
+class SiteContextTest(TestCase):
+
+    def setUp(self):
+        HomeAppProfile._profile_cache.clear()
+        self.factory = RequestFactory()
+
+    def test_context_follows_profile(self):
+        profile = HomeAppProfile.get_profile()
+        context_processors.lookaway_seo(self.factory.get('/'))
+        request = self.factory.get('/')
+        with self.assertNumQueries(0):
+            context = context_processors.lookaway_seo(request)
+            context_processors.nav_buttons(request)
+            context_processors.lookaway_footer(request)
+        self.assertEqual(context['lookaway_title'], profile.title)
+        profile = HomeAppProfile.objects.get(pk=1)
+        profile.title = 'changed'
+        profile.nav_posts_name = 'News'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        request = self.factory.get('/')
+        context = context_processors.lookaway_seo(request)
+        self.assertEqual(context['lookaway_title'], 'changed')
+        buttons = context_processors.nav_buttons(request)
+        self.assertEqual(buttons['nav_posts_name'], 'News')
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+})
+class FragmentCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        fragment_cache.reset_stats()
+        HomeAppProfile._profile_cache.clear()
+
+    def test_hit_does_not_write(self):
+        self.client.get(reverse('home:index'))
+        with mock.patch.object(fragment_cache, 'cache', wraps=cache) as shared:
+            self.client.get(reverse('home:index'))
+        shared.get.assert_called()
+        shared.add.assert_not_called()
+        shared.incr.assert_not_called()
+        shared.set.assert_not_called()
+
+    def test_page_is_cached_until_content_changes(self):
+        self.client.get(reverse('home:index'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(
+            fragment_cache.get_stats(['home_page'])['home_page'],
+            (1, 1),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(
+                title='A new post',
+                slug='a-new-post',
+                text='text',
+                is_public=True,
+                members_only=False,
+                publication_date=timezone.now(),
+            )
+        response = self.client.get(reverse('home:index'))
+        self.assertContains(response, 'A new post')
+
+def legacy_sets(model, n, show_new=True, show_top=True):
+    '''
+    The previous AppPageMixin.get_sets(), for comparison.
+    '''
+    public = model.objects.filter(is_public=True).exclude(members_only=True)
+    new, top = model.objects.none(), model.objects.none()
+    if n > 0 and public.count() >= n and show_new:
+        new = public.order_by('-publication_date')[:n]
+    if n > 0 and public.count() >= n and show_top:
+        date = public.order_by('-publication_date')[n-1].publication_date
+        if show_new:
+            top = public.order_by('-weight').exclude(
+                publication_date__gte=date,
+            )[:n]
+        else:
+            top = public.order_by('-weight')[:n]
+    elif n > 0:
+        if show_new:
+            new = public.order_by('-publication_date')[:n]
+        elif show_top:
+            top = public.order_by('-weight')[:n]
+    return list(new), list(top)
+
+
+class GetSetsTest(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        for i in range(12):
+            Post.objects.create(
+                title='post {}'.format(i),
+                slug='post-{}'.format(i),
+                text='text',
+                is_public=i != 3,
+                members_only=i == 4,
+                publication_date=now - timezone.timedelta(days=i),
+                weight=(i * 7) % 12,
+            )
+
+    def test_same_as_legacy(self):
+        mixin = AppPageMixin()
+        for n in (0, 1, 5, 10, 20):
+            for show_new in (True, False):
+                for show_top in (True, False):
+                    self.assertEqual(
+                        mixin.get_sets(Post, n, show_new, show_top),
+                        legacy_sets(Post, n, show_new, show_top),
+                        (n, show_new, show_top),
+                    )
+
+    def test_query_count(self):
+        mixin = AppPageMixin()
+        # One query for both lists and one for their tags
+        with self.assertNumQueries(2):
+            new, top = mixin.get_sets(Post, 5)
+            for post in new + top:
+                post.owner
+                post.image
+                list(post.tags.all())
+        self.assertEqual(len(new), 5)
+        self.assertEqual(len(top), 5)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+})
+class SectionPrefetchTest(TestCase):
+
+    def setUp(self):
+        self.member, user = TestData().create_test_member()
+        Profile.objects.create(member=self.member, slug=self.member.username)
+
+    def add_section(self, i):
+        section = HomePageSection.objects.create(
+            owner=self.member,
+            title='section {}'.format(i),
+            order=i,
+            is_enabled=True,
+            members_only=False,
+        )
+        for j in range(2):
+            section.links.add(
+                Link.objects.create(
+                    owner=self.member,
+                    title='link {} {}'.format(i, j),
+                    url='',
+                ),
+            )
+            section.posts.add(Post.objects.create(
+                owner=self.member,
+                title='post {} {}'.format(i, j),
+                slug='post-{}-{}'.format(i, j),
+                text='text',
+                is_public=True,
+            ))
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home:index'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_constant_queries(self):
+        self.add_section(0)
+        self.client.get(reverse('home:index'))
+        one = self.count_queries()
+        for i in range(1, 4):
+            self.add_section(i)
+        self.client.get(reverse('home:index'))
+        self.assertEqual(self.count_queries(), one)
+
+
+class SearchTest(TestCase):
+
+    def setUp(self):
+        self.member, self.user = TestData().create_test_member()
+        Profile.objects.create(member=self.member, slug=self.member.username)
+
+    def create_post(self, title, text, **kwargs):
+        fields = {'is_public': True, 'members_only': False}
+        fields.update(kwargs)
+        return Post.objects.create(
+            owner=self.member,
+            title=title,
+            slug=title.lower().replace(' ', '-'),
+            text=text,
+            **fields
+        )
+
+    def search(self, query, user=None):
+        return [
+            e.title for e in SearchEntry.search(query, user or AnonymousUser())
+        ]
+
+    def test_index_follows_saves(self):
+        post = self.create_post('Marshmallow roasting', 'Campfire tips', is_public=False)
+        self.assertEqual(self.search('campfire'), [])
+        post.publish(post, self.member)
+        self.assertEqual(self.search('campfire'), ['Marshmallow roasting'])
+        post.text = 'Hiking tips'
+        post.save()
+        self.assertEqual(self.search('campfire'), [])
+        self.assertEqual(self.search('hiking tips!'), ['Marshmallow roasting'])
+        post.delete()
+        self.assertEqual(self.search('hiking'), [])
+
+    def test_members_only(self):
+        self.create_post('Secret recipe', 'Toasted', members_only=True)
+        self.assertEqual(self.search('toasted'), [])
+        self.assertEqual(self.search('toasted', self.user), ['Secret recipe'])
+
+    def test_rank_uses_title_and_weight(self):
+        self.create_post('Guitar', 'Strings')
+        self.create_post('Strings', 'Guitar')
+        self.assertEqual(self.search('guitar'), ['Guitar', 'Strings'])
+        self.create_post('Banjo', 'Strings', weight=1000)
+        self.assertEqual(self.search('strings')[0], 'Banjo')
+
+    def test_other_databases(self):
+        self.create_post('Guitar', 'Strings and frets')
+        self.create_post('Strings', 'Guitar')
+        self.create_post('Drums', 'Sticks')
+        # The queries are built for another database and run on this one
+        with mock.patch.object(connections['default'], 'vendor', 'mysql'):
+            results = [
+                SearchEntry.search(query)
+                for query in ('guitar', 'frets guitar', '%')
+            ]
+        self.assertEqual(
+            [[e.title for e in entries] for entries in results],
+            [['Guitar', 'Strings'], ['Guitar'], []],
+        )
+
+    def test_marshmallow_weight(self):
+        post = self.create_post('Cocoa', 'Warm')
+        Post.objects.filter(pk=post.pk).update(weight=12)
+        post.marshmallows.add(Marshmallow.objects.create(member=self.member, weight=12))
+        self.assertEqual(SearchEntry.objects.get(object_id=post.pk, model='posts.post').weight, 12)
+
+    def test_sections_are_indexed(self):
+        article = Article.objects.create(
+            owner=self.member,
+            title='Field guide',
+            slug='field-guide',
+            is_public=True,
+        )
+        section = ArticleSection.objects.create(
+            owner=self.member,
+            article=article,
+            title='Owls',
+            text='Nocturnal birds',
+        )
+        self.assertEqual(self.search('nocturnal'), ['Field guide'])
+        section.members_only = True
+        section.save()
+        self.assertEqual(self.search('nocturnal'), [])
+
+    def test_rebuild_command(self):
+        self.create_post('Kites', 'Windy day')
+        SearchEntry.objects.all().delete()
+        self.assertEqual(self.search('windy'), [])
+        call_command('rebuild_search_index', 'posts.post', batch_size=1, stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.search('windy'), ['Kites'])
+
+    def test_search_view(self):
+        self.create_post('Lanterns', 'Paper & glue')
+        response = self.client.get(reverse('home:search'), {'q': 'paper "glue'})
+        self.assertContains(response, 'Lanterns')
+        response = self.client.get(reverse('home:search'), {'q': '*'})
+        self.assertEqual(len(response.context['results']), 0)
+
+
+class SitemapTest(TestCase):
+
+    def setUp(self):
+        self.member, self.user = TestData().create_test_member()
+        Profile.objects.create(member=self.member, slug=self.member.username)
+        self.root = tempfile.mkdtemp()
+        self.settings = override_settings(
+            SITEMAP_ROOT=self.root,
+            SITEMAP_PAGE_SIZE=2,
+            SITEMAP_BASE_URL='https://example.com',
+        )
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.root)
+
+    def create_post(self, i):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(
+                owner=self.member,
+                title='post {}'.format(i),
+                slug='post-{}'.format(i),
+                text='text',
+                is_public=True,
+                members_only=False,
+            )
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_base_url_from_request(self):
+        with override_settings(
+            SITEMAP_BASE_URL=None,
+            ALLOWED_HOSTS=['lookaway.test'],
+        ):
+            self.create_post(0)
+            # Saves can not write the files without a host
+            self.assertFalse(os.path.exists(sitemaps.get_index_path()))
+            with self.assertRaises(ImproperlyConfigured):
+                sitemaps.write_all()
+            response = self.client.get('/sitemap.xml', HTTP_HOST='lookaway.test')
+            self.assertIn(
+                b'http://lookaway.test/sitemaps/posts-',
+                b''.join(response.streaming_content),
+            )
+        with override_settings(SITEMAP_BASE_URL='https://www.example.com/'):
+            self.assertEqual(sitemaps.get_base_url(), 'https://www.example.com')
+
+    def test_write_all(self):
+        posts = [self.create_post(i) for i in range(5)]
+        shutil.rmtree(self.root)
+        self.assertEqual(sitemaps.write_all(), 5)
+        index = self.read(sitemaps.get_index_path())
+        pages = {p.pk // 2 for p in posts}
+        self.assertEqual(index.count('<sitemap>'), len(pages))
+        for page in pages:
+            self.assertIn('https://example.com/sitemaps/posts-{}.xml'.format(page), index)
+        page = self.read(sitemaps.get_page_path('posts', posts[0].pk // 2))
+        self.assertIn('https://example.com' + posts[0].get_absolute_url(), page)
+        self.assertIn('<lastmod>', page)
+
+    def test_incremental_updates(self):
+        post = self.create_post(0)
+        path = sitemaps.get_page_path('posts', post.pk // 2)
+        self.assertIn(post.get_absolute_url(), self.read(path))
+        # Unpublishing the only post on the page removes the page
+        with self.captureOnCommitCallbacks(execute=True):
+            post.is_public = False
+            post.save()
+        self.assertFalse(os.path.exists(path))
+        self.assertNotIn('posts-', self.read(sitemaps.get_index_path()))
+        # Writing one page reads only that page's posts
+        post = self.create_post(1)
+        with self.assertNumQueries(1):
+            sitemaps.write_page('posts', post.pk // 2)
+
+    def test_views(self):
+        post = self.create_post(0)
+        shutil.rmtree(self.root)
+        response = self.client.get('/sitemap.xml')
+        self.assertEqual(response['Content-Type'], 'application/xml')
+        self.assertIn(b'posts-', b''.join(response.streaming_content))
+        response = self.client.get('/sitemaps/posts-{}.xml'.format(post.pk // 2))
+        self.assertIn(post.get_absolute_url().encode(), b''.join(response.streaming_content))
+        self.assertEqual(self.client.get('/sitemaps/posts-999.xml').status_code, 404)
+        self.assertEqual(self.client.get('/sitemaps/nothing-0.xml').status_code, 404)
@@ -6,6 +6,8 @@ app_name = 'home'
 urlpatterns = [
     # Landing page
     path('', views.IndexView.as_view(), name='index'),
+    # Site search
+    path('search/', views.SearchView.as_view(), name='search'),
     # Home app profile
     ## Update
     path(
@@ -1,10 +1,13 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
+import os
+from django.http import FileResponse, Http404
 from django.shortcuts import render, reverse
 from django.utils import timezone
 from django.views.generic.base import TemplateView
 from django.views.generic.detail import DetailView
 from django.views.generic.edit import CreateView, FormView, UpdateView, DeleteView
-from lookaway.mixins import AppPageMixin
+from django.views.generic.list import ListView
+from lookaway.mixins import AppPageMixin, SectionDetailMixin
 from members.models import Member
 from members.mixins import MemberCreateMixin, MemberUpdateMixin, MemberDeleteMixin
 from objects.models import Tag
@@ -14,7 +17,8 @@ from music.models import Album, Track
 from documentation.models import Article, Story, SupportDocument
 from posts.models import Post, ResponsePost
 from .forms import HomeAppProfileForm, HomeAppProfileSettings, HomePageSectionForm, SiteProfileForm
-from .models import HomeAppProfile, HomePageSection
+from .models import HomeAppProfile, HomePageSection, SearchEntry
+from . import sitemaps
 
 # Create your views here.
 
@@ -34,7 +38,7 @@ class SiteProfileUpdateView(LoginRequiredMixin, PermissionRequiredMixin, UpdateV
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = HomeAppProfile.objects.get_or_create(pk=1)
+        profile = HomeAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = profile.title
@@ -66,7 +70,7 @@ class HomeAppProfileUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Upda
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = HomeAppProfile.objects.get_or_create(pk=1)
+        profile = HomeAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = profile.title
@@ -118,7 +122,7 @@ class HomeAppProfileSettingsUpdateView(LoginRequiredMixin, PermissionRequiredMix
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = HomeAppProfile.objects.get_or_create(pk=1)
+        profile = HomeAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = profile.title
@@ -139,20 +143,36 @@ class IndexView(TemplateView, AppPageMixin):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Create a public object tags context
-        public_tags = Tag.objects.none()
-        tag_models = {Post, Gallery, Visual, Album, Track, Article, SupportDocument}
-        for model in tag_models:
-            public_tags = public_tags | Tag.get_tags_from_public(model)
-        context['tags'] = public_tags.order_by('-weight')[:50]
         # App profile
-        profile, created = HomeAppProfile.objects.get_or_create(pk=1)
+        profile = HomeAppProfile.get_profile()
         context['profile'] = profile
+        # Cached fragments depend on these models
+        context['fragment_models'] = self.get_fragment_models(
+            HomeAppProfile,
+            HomePageSection,
+            Tag,
+            Post,
+            ResponsePost,
+            Article,
+            Story,
+            SupportDocument,
+            Visual,
+            Gallery,
+            Track,
+            Album,
+        )
+        # Create a public object tags context
+        tag_models = [Post, Gallery, Visual, Album, Track, Article, SupportDocument]
+        context['tags'] = Tag.get_public_tags(tag_models).order_by(
+            '-weight',
+        )[:profile.n_tags]
         # SEO stuff
         context['meta_title'] = profile.title
         context['meta_desc'] = profile.meta_description
         # Sections
-        sections = HomePageSection.objects.filter(
+        sections = HomePageSection.objects.prefetch_related(
+            *HomePageSection.get_prefetch_plan()
+        ).filter(
             is_enabled = True,
         ).order_by(
             'order',
@@ -164,63 +184,63 @@ class IndexView(TemplateView, AppPageMixin):
                 members_only=True
             )
         # New and top Post model instances
-        context['new_posts'], context['top_posts'] = self.get_sets(
+        context['new_posts'], context['top_posts'] = self.get_lazy_sets(
             Post,
             profile.n_posts,
             show_new=profile.show_new_posts,
             show_top=profile.show_top_posts,
         )
         # New and top Response model instances
-        context['new_responses'], context['top_responses'] = self.get_sets(
+        context['new_responses'], context['top_responses'] = self.get_lazy_sets(
             ResponsePost,
             profile.n_responses,
             show_new=profile.show_new_responses,
             show_top=profile.show_top_responses,
         )
         # New and top Article model instances
-        context['new_articles'], context['top_articles'] = self.get_sets(
+        context['new_articles'], context['top_articles'] = self.get_lazy_sets(
             Article,
             profile.n_articles,
             show_new=profile.show_new_articles,
             show_top=profile.show_top_articles,
         )
         # New and top Story model instances
-        context['new_stories'], context['top_stories'] = self.get_sets(
+        context['new_stories'], context['top_stories'] = self.get_lazy_sets(
             Story,
             profile.n_stories,
             show_new=profile.show_new_stories,
             show_top=profile.show_top_stories,
         )
         # New and top Document model instances
-        context['new_documents'], context['top_documents'] = self.get_sets(
+        context['new_documents'], context['top_documents'] = self.get_lazy_sets(
             SupportDocument,
             profile.n_documents,
             show_new=profile.show_new_documents,
             show_top=profile.show_top_documents,
         )
         # New and top Visual model instances
-        context['new_visuals'], context['top_visuals'] = self.get_sets(
+        context['new_visuals'], context['top_visuals'] = self.get_lazy_sets(
             Visual,
             profile.n_visuals,
             show_new=profile.show_new_visuals,
             show_top=profile.show_top_visuals,
         )
         # New and top Gallery model instances
-        context['new_galleries'], context['top_galleries'] = self.get_sets(
+        context['new_galleries'], context['top_galleries'] = self.get_lazy_sets(
             Gallery,
             profile.n_galleries,
             show_new=profile.show_new_galleries,
             show_top=profile.show_top_galleries,
         )
         # New and top Track model instances
-        context['new_tracks'], context['top_tracks'] = self.get_sets(
+        context['new_tracks'], context['top_tracks'] = self.get_lazy_sets(
             Track,
             profile.n_tracks,
             show_new=profile.show_new_tracks,
             show_top=profile.show_top_tracks,
         )
         # New and top Album model instances
-        context['new_albums'], context['top_albums'] = self.get_sets(
+        context['new_albums'], context['top_albums'] = self.get_lazy_sets(
             Album,
             profile.n_albums,
             show_new=profile.show_new_albums,
@@ -262,6 +282,39 @@ class IndexView(TemplateView, AppPageMixin):
             context['show_home_page_section_delete_button'] = True
         return context
 
+# Site search
+class SearchView(ListView):
+
+    model = SearchEntry
+    context_object_name = 'results'
+    template_name = 'home/search.html'
+    paginate_by = 25
+
+    def get_queryset(self):
+        return SearchEntry.search(
+            self.request.GET.get('q', ''),
+            self.request.user,
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # App profile
+        profile = HomeAppProfile.get_profile()
+        context['profile'] = profile
+        query = self.request.GET.get('q', '').strip()
+        context['query'] = query
+        # SEO stuff
+        if query:
+            context['meta_title'] = "Search results for \"{}\" | {}".format(
+                query,
+                profile.title,
+            )
+        else:
+            context['meta_title'] = "Search | {}".format(profile.title)
+        context['meta_desc'] = "Search the posts, documents, art, music \
+            and code on {}.".format(profile.title)
+        return context
+
 class HomePageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMixin, CreateView):
 
     permission_required = 'home.add_homepagesection'
@@ -277,7 +330,7 @@ class HomePageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Mem
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = HomeAppProfile.objects.get_or_create(pk=1)
+        profile = HomeAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Page Section"
         context['meta_desc'] = "Add a section to the {} landing page.".format(profile.title)
@@ -300,7 +353,7 @@ class HomePageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Mem
                 kwargs={'pk': self.object.pk},
             )
 
-class HomePageSectionDetailView(LoginRequiredMixin, DetailView):
+class HomePageSectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = HomePageSection
     context_object_name = 'section'
@@ -308,7 +361,7 @@ class HomePageSectionDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = HomeAppProfile.objects.get_or_create(pk=1)
+        profile = HomeAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = profile.title
         # Add home page section button
@@ -341,7 +394,7 @@ class HomePageSectionUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Mem
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = HomeAppProfile.objects.get_or_create(pk=1)
+        profile = HomeAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this landing page section.".format(self.object.title)
@@ -372,3 +425,21 @@ class HomePageSectionDeleteView(LoginRequiredMixin, PermissionRequiredMixin, Del
         return reverse(
             'home:home_page',
         )
+
+# Sitemaps
+## nginx serves the sitemap files directly. These views serve them
+## when it does not, and write any file that does not exist yet.
+
+def sitemap_index_view(request):
+    path = sitemaps.get_index_path()
+    if not os.path.exists(path):
+        sitemaps.write_all(request)
+    return FileResponse(open(path, 'rb'), content_type='application/xml')
+
+def sitemap_page_view(request, section, page):
+    if section not in sitemaps.whole_site:
+        raise Http404
+    path = sitemaps.get_page_path(section, page)
+    if not os.path.exists(path) and not sitemaps.write_page(section, page, request):
+        raise Http404
+    return FileResponse(open(path, 'rb'), content_type='application/xml')
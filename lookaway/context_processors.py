@@ -10,80 +10,97 @@ Custom context processors for site wide template context :)
 * Set the agreement text for the member registration page
 '''
 
-# Use the main AppProfile from the home app
-profile, created = HomeAppProfile.objects.get_or_create(pk=1)
+# Use the main AppProfile from the home app.
+# The context is built once per profile version and shared by every
+# request. Each request checks the version once and keeps the result.
+_site_context = (None, {})
+
+# Apps with a nav button
+NAV_APPS = ('posts', 'documentation', 'art', 'music', 'members', 'objects')
+
+def build_site_context(profile):
+    '''
+    Returns the SEO, nav, footer and CSS context for the given profile.
+    '''
+    context = {
+        # SEO stuff
+        "lookaway_title": profile.title,
+        "lookaway_meta_desc": profile.meta_description,
+        # Navbar stuff
+        ## Only show the app if it is installed and we want to show it.
+        ## The core apps, home, objects, members, posts, must be installed.
+        "nav_show_posts": bool(profile.nav_show_posts),
+        "nav_show_members": bool(profile.nav_show_members),
+        "nav_show_documentation": 'documentation' in APPS and bool(profile.nav_show_documentation),
+        "nav_show_art": 'art' in APPS and bool(profile.nav_show_art),
+        "nav_show_music": 'music' in APPS and bool(profile.nav_show_music),
+        "nav_show_objects": bool(profile.nav_show_objects),
+        # Footer
+        "lookaway_notice": profile.legal_notice,
+        "lookaway_email": profile.admin_email,
+        # CSS
+        "lookaway_css_path": profile.css_path,
+    }
+    ## Each app has a name and, optionally, an image.
+    ## If the app has an image, it will be used instead of the name.
+    buttons = {}
+    for app in NAV_APPS:
+        buttons['nav_{}_name'.format(app)] = getattr(
+            profile,
+            'nav_{}_name'.format(app),
+        )
+        # The nav images are joined when the profile is fetched
+        image = getattr(profile, 'nav_{}_image'.format(app))
+        if image:
+            buttons['nav_{}_image'.format(app)] = image.image_file.url
+    context['nav_buttons'] = buttons
+    return context
+
+def get_site_context(request):
+    '''
+    Returns the site wide context for this request, rebuilding it
+    if the home app profile or its images have changed.
+    '''
+    global _site_context
+    try:
+        return request._lookaway_context
+    except AttributeError:
+        pass
+    version = HomeAppProfile.get_profile_version()
+    if _site_context[0] != version:
+        _site_context = (
+            version,
+            build_site_context(HomeAppProfile.get_profile()),
+        )
+    request._lookaway_context = _site_context[1]
+    return _site_context[1]
+
+def get_items(request, keys):
+    context = get_site_context(request)
+    return {key: context[key] for key in keys}
 
 # SEO stuff
 ## In case we don't get a title sent to a template
 def lookaway_seo(request):
-    return {
-        "lookaway_title": profile.title,
-        "lookaway_meta_desc": profile.meta_description,
-    }
+    return get_items(request, (
+        "lookaway_title",
+        "lookaway_meta_desc",
+    ))
 
 
 # Navbar stuff
-## Only show the app if it is installed and we want to show it. 
-## The core apps, home, objects, members, posts, must be installed.
 def nav_apps(request):
-    if profile.nav_show_posts:
-        show_posts = True
-    else:
-        show_posts = False
-    if profile.nav_show_members:
-        show_members = True
-    else:
-        show_members = False
-    if 'documentation' in APPS and profile.nav_show_documentation:
-        show_documentation = True
-    else:
-        show_documentation = False
-    if 'art' in APPS and profile.nav_show_art:
-        show_art = True
-    else:
-        show_art = False
-    if 'music' in APPS and profile.nav_show_music:
-        show_music = True
-    else:
-        show_music = False
-    if profile.nav_show_objects:
-        show_objects = True
-    else:
-        show_objects = False
-    return {
-        "nav_show_posts": show_posts,
-        "nav_show_members": show_members,
-        "nav_show_documentation": show_documentation,
-        "nav_show_art": show_art,
-        "nav_show_music": show_music,
-        "nav_show_objects": show_objects,
-    }
+    return get_items(request, (
+        "nav_show_posts",
+        "nav_show_members",
+        "nav_show_documentation",
+        "nav_show_art",
+        "nav_show_music",
+        "nav_show_objects",
+    ))
 
-## Each app has a name and, optionally, an image.
-## If the app has an image, it will be used instead of the name.
-## Posts
 def nav_buttons(request):
-    buttons = {
-        "nav_posts_name": profile.nav_posts_name,
-        "nav_documentation_name": profile.nav_documentation_name,
-        "nav_art_name": profile.nav_art_name,
-        "nav_music_name": profile.nav_music_name,
-        "nav_members_name": profile.nav_members_name,
-        "nav_objects_name": profile.nav_objects_name,
-    }
-    if profile.nav_posts_image:
-        buttons['nav_posts_image'] = profile.nav_posts_image.image_file.url
-    if profile.nav_documentation_image:
-        buttons['nav_documentation_image'] = profile.nav_documentation_image.image_file.url
-    if profile.nav_art_image:
-        buttons['nav_art_image'] = profile.nav_art_image.image_file.url
-    if profile.nav_music_image:
-        buttons['nav_music_image'] = profile.nav_music_image.image_file.url
-    if profile.nav_members_image:
-        buttons['nav_members_image'] = profile.nav_members_image.image_file.url
-    if profile.nav_objects_image:
-        buttons['nav_objects_image'] = profile.nav_objects_image.image_file.url
-    return buttons
+    return dict(get_site_context(request)['nav_buttons'])
 
 # Buttons
 
@@ -96,10 +113,10 @@ register.filter('lookup', lookup)
 
 # Footer
 def lookaway_footer(request):
-    return {
-        "lookaway_notice": profile.legal_notice,
-        "lookaway_email": profile.admin_email,
-    }
+    return get_items(request, (
+        "lookaway_notice",
+        "lookaway_email",
+    ))
 
 # CSS
 ## Use a different css file. This is optional. The base template uses
@@ -107,9 +124,9 @@ def lookaway_footer(request):
 ## for provided paths. Most browsers will fail silently if the given path is
 ## unavailable resulting in no styling.
 def lookaway_css_path(request):
-    return {
-        "lookaway_css_path": profile.css_path
-    }
+    return get_items(request, (
+        "lookaway_css_path",
+    ))
 
 ## Objects
 
@@ -119,18 +136,6 @@ def get_domain(value):
     o = urlparse(value)
     return o.hostname
 
-@register.filter
-def highlight_sytax(code, path):
-    from pygments import highlight
-    from pygments.lexers import guess_lexer, get_lexer_for_filename
-    from pygments.formatters import HtmlFormatter
-    if path:
-        lexer = get_lexer_for_filename(path)
-    else:
-        lexer = guess_lexer(code)
-    formatter = HtmlFormatter(linenos=True, cssclass="source")
-    return highlight(code, lexer, formatter)
-
 
 ## Music
 
@@ -0,0 +1,171 @@
+from calendar import timegm
+from hashlib import md5
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import http_date
+from lookaway import versions
+from members.models import Member
+from objects.models import Tag
+'''
+Syndication feeds.
+
+A feed lists the newest public items of a model, optionally by one member
+or with one tag. Rendered feeds are cached under the version stamps of
+every model they show, so a feed is only rendered again after one of
+those models has changed. Feed readers that send the ETag or date of the
+copy they have get a 304 without a database query.
+'''
+
+def get_feed_timeout():
+    return getattr(settings, 'FEED_CACHE_TIMEOUT', 3600)
+
+
+class ModelFeed(Feed):
+    '''
+    A feed of a model's public items. Subclasses set "model" and use
+    an app's FeedMixin for the app profile, link and public items.
+    '''
+
+    model = None
+    n_items = 30
+
+    def __init__(self, atom=False):
+        super().__init__()
+        self.feed_type = Atom1Feed if atom else Rss201rev2Feed
+
+    def __call__(self, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            response = super().__call__(request, *args, **kwargs)
+            etag = '"{}"'.format(md5(response.content).hexdigest())
+            cached = (
+                etag,
+                self.get_last_modified(request, *args, **kwargs),
+                response['Content-Type'],
+                response.content,
+            )
+            cache.set(key, cached, get_feed_timeout())
+        etag, last_modified, content_type, content = cached
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_cache_key(self, request):
+        '''
+        Returns - A key that changes when the feed's model, tags,
+        members or app profile change.
+        '''
+        labels = (
+            versions.get_label(self.model),
+            versions.get_label(self.app_profile),
+            versions.get_label(Tag),
+            versions.get_label(Member),
+        )
+        return 'feed:{}'.format(md5(repr((
+            request.path,
+            self.feed_type.__name__,
+            versions.get_stamps(labels),
+        )).encode()).hexdigest())
+
+    def get_last_modified(self, request, *args, **kwargs):
+        '''
+        Returns - The newest publication or modification time of the
+        items as a timestamp, or None if the feed is empty.
+        '''
+        dates = self.get_items(self.get_object(request, *args, **kwargs)).aggregate(
+            Max('publication_date'),
+            Max('last_modified'),
+        )
+        newest = max(filter(None, dates.values()), default=None)
+        return timegm(newest.utctimetuple()) if newest else None
+
+    def get_object(self, request, member=None, tag=None):
+        if member:
+            return get_object_or_404(Member, username=member)
+        if tag:
+            return get_object_or_404(Tag, slug=tag)
+        return None
+
+    def get_items(self, obj):
+        items = self.get_feed_queryset()
+        if isinstance(obj, Member):
+            items = items.filter(owner=obj)
+        elif isinstance(obj, Tag):
+            items = items.filter(tags=obj)
+        return items
+
+    def items(self, obj):
+        return self.get_items(obj).select_related('owner').order_by(
+            '-publication_date',
+        )[:self.n_items]
+
+    def title(self, obj):
+        title = '{} | {}'.format(
+            self.model._meta.verbose_name_plural.capitalize(),
+            self.app_profile.get_profile().title,
+        )
+        if obj is not None:
+            title = '{} - {}'.format(obj, title)
+        return title
+
+    def description(self, obj):
+        return 'New {} on {}'.format(
+            self.model._meta.verbose_name_plural,
+            self.app_profile.get_profile().title,
+        )
+
+    def item_title(self, item):
+        return str(item)
+
+    def item_description(self, item):
+        return getattr(item, 'meta_description', None) or ''
+
+    def item_author_name(self, item):
+        return str(item.owner) if item.owner else None
+
+    def item_pubdate(self, item):
+        return item.publication_date
+
+    def item_updateddate(self, item):
+        return item.last_modified
+
+def feed_urls(prefix, feed, name):
+    '''
+    Returns - URL patterns for the RSS and Atom feeds of a model,
+    of one member's items and of the items with one tag.
+    '''
+    patterns = []
+    for scope, scope_name in (
+        ('', ''),
+        ('member/<slug:member>/', 'member_'),
+        ('tag/<slug:tag>/', 'tag_'),
+    ):
+        patterns += [
+            path(
+                '{}{}'.format(prefix, scope),
+                feed(),
+                name='{}_{}feed'.format(name, scope_name),
+            ),
+            path(
+                '{}{}atom/'.format(prefix, scope),
+                feed(atom=True),
+                name='{}_{}atom_feed'.format(name, scope_name),
+            ),
+        ]
+    return patterns
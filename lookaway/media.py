@@ -0,0 +1,328 @@
+import mimetypes
+import os
+import re
+from functools import lru_cache
+from hashlib import md5
+from stat import S_ISREG
+from urllib.parse import quote
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Exists, OuterRef, Q
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from home.search import SECTION_PARENTS
+from lookaway import versions
+from lookaway.mixins import AppProfile, Section
+from objects.models import Blob
+'''
+Media delivery.
+
+Uploaded images, sounds and videos are only served to visitors who may
+see them. A file is public if its Image, Sound or Video is public or if
+it is shown on a public page, for members if it is only shown on members
+only pages, and otherwise only for its owner and staff. Other files in
+MEDIA_ROOT are public, except for the blob store.
+
+The visibility of each file is kept in the cache under the version stamps
+of the models that refer to it. Once access is granted the transfer is
+handed to nginx with X-Accel-Redirect when MEDIA_ACCEL_REDIRECT is set,
+or streamed by Django with support for Range requests.
+'''
+
+# Media models mapped to their file fields
+MEDIA_FILES = {
+    'objects.image': ('image_file', 'thumbnail_file', 'medium_file'),
+    'objects.sound': ('sound_file', 'peaks_file'),
+    'objects.video': ('video_file', 'hls_playlist'),
+}
+
+# Responsive renditions share the name of the full size image
+RENDITION = re.compile(r'-\d+w(\.\w+)$')
+# HLS playlists and segments share the directory of the master playlist
+HLS_DIR = re.compile(r'^(.+-hls/)')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Types that mimetypes does not know or gets wrong
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+PUBLIC = 'public'
+MEMBERS = 'members'
+OWNER = 'owner'
+
+def get_cache_timeout():
+    return getattr(settings, 'MEDIA_CACHE_TIMEOUT', 86400)
+
+def get_accel_prefix():
+    return getattr(settings, 'MEDIA_ACCEL_REDIRECT', None)
+
+# Visibility
+
+def find_media(name):
+    '''
+    Returns - A tuple of the media model and the values of the
+    instance that owns the named file, or None.
+    '''
+    full_size = RENDITION.sub(r'\1', name)
+    for label, fields in MEDIA_FILES.items():
+        model = apps.get_model(label)
+        q = Q()
+        for field in fields:
+            q |= Q(**{field: name})
+        if label == 'objects.image' and full_size != name:
+            q |= Q(image_file=full_size)
+        if label == 'objects.video' and HLS_DIR.match(name):
+            q |= Q(hls_playlist__startswith=HLS_DIR.match(name).group(1))
+        row = model.objects.filter(q).values(
+            'pk',
+            'owner_id',
+            'is_public',
+        ).first()
+        if row:
+            return model, row
+    return None
+
+@lru_cache(maxsize=None)
+def get_references(model):
+    '''
+    Returns - A list of the models that refer to the media model, each
+    with the name of the field that refers to it and the conditions
+    under which the referring instance is shown to visitors and members.
+    '''
+    references = []
+    for relation in model._meta.related_objects:
+        related = relation.related_model
+        names = [f.name for f in related._meta.get_fields()]
+        if issubclass(related, AppProfile):
+            # App profiles are shown on the landing pages
+            shown, public = Q(), Q()
+        elif issubclass(related, Section):
+            parent = SECTION_PARENTS.get(versions.get_label(related))
+            shown = Q(**{parent + '__is_public': True}) if parent else Q()
+            public = Q(members_only=False)
+        elif 'is_public' in names:
+            shown = Q(is_public=True)
+            public = Q(members_only=False) if 'members_only' in names else Q()
+        else:
+            continue
+        references.append((related, relation.field.name, shown, public))
+    return references
+
+def get_dependencies(model):
+    '''
+    Returns - The labels of the media model and of every model
+    that may change who can see one of its files.
+    '''
+    labels = {versions.get_label(model)}
+    for related, field, shown, public in get_references(model):
+        labels.add(versions.get_label(related))
+        parent = SECTION_PARENTS.get(versions.get_label(related))
+        if parent:
+            labels.add(versions.get_label(
+                related._meta.get_field(parent).related_model
+            ))
+    return tuple(sorted(labels))
+
+def get_level(model, row):
+    '''
+    Returns - The visibility of a media instance's files.
+    '''
+    if row['is_public']:
+        return PUBLIC
+    annotations = {}
+    for i, (related, field, shown, public) in enumerate(get_references(model)):
+        referrers = related.objects.filter(shown, **{field: OuterRef('pk')})
+        annotations['public_{}'.format(i)] = Exists(referrers.filter(public))
+        annotations['members_{}'.format(i)] = Exists(referrers)
+    if not annotations:
+        return OWNER
+    found = model.objects.filter(pk=row['pk']).annotate(
+        **annotations
+    ).values(*annotations).first() or {}
+    if any(v for k, v in found.items() if k.startswith('public')):
+        return PUBLIC
+    if any(found.values()):
+        return MEMBERS
+    return OWNER
+
+def get_visibility(name):
+    '''
+    Returns - A tuple of the visibility of the named file and the pk of
+    its owner. Files that do not belong to a media instance are public.
+    '''
+    key = 'media_visibility:{}'.format(md5(name.encode()).hexdigest())
+    labels = tuple(sorted(
+        label
+        for media in MEDIA_FILES
+        for label in get_dependencies(apps.get_model(media))
+    ))
+    stamps = versions.get_stamps(labels)
+    cached = cache.get(key)
+    if cached and cached[0] == stamps:
+        return cached[1]
+    found = find_media(name)
+    if found is None:
+        visibility = (PUBLIC, None)
+    else:
+        model, row = found
+        visibility = (get_level(model, row), row['owner_id'])
+    cache.set(key, (stamps, visibility), get_cache_timeout())
+    return visibility
+
+def can_view(user, visibility):
+    level, owner_id = visibility
+    if level == PUBLIC:
+        return True
+    if not user.is_authenticated:
+        return False
+    if level == MEMBERS or user.is_staff:
+        return True
+    return user.pk == owner_id
+
+# Responses
+
+def get_content_type(name):
+    extension = os.path.splitext(name)[1].lower()
+    if extension in CONTENT_TYPES:
+        return CONTENT_TYPES[extension]
+    content_type, encoding = mimetypes.guess_type(name)
+    return content_type or 'application/octet-stream'
+
+def accel_redirect(name, prefix):
+    '''
+    Returns - A response that has nginx send the file from its
+    internal location.
+    '''
+    response = HttpResponse(content_type=get_content_type(name))
+    response['X-Accel-Redirect'] = prefix + quote(name)
+    return response
+
+class RangeFile:
+    '''
+    A file that can only be read up to a number of bytes from its
+    current position. It keeps the file's descriptor so WSGI servers
+    can still send it with sendfile().
+    '''
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+def get_range(request, size, etag, last_modified):
+    '''
+    Returns - The first and last byte asked for by a single Range
+    header, None to send the whole file, or False if the range
+    can not be satisfied.
+    '''
+    header = request.META.get('HTTP_RANGE', '')
+    match = RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    # A range of a file that changed since If-Range is not sent
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range:
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+    first, last = match.groups()
+    if first:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+    else:
+        # The last n bytes
+        first = max(size - int(last), 0)
+        last = size - 1
+    if first > last or first >= size:
+        return False
+    return first, last
+
+def serve_file(request, path, name):
+    '''
+    Returns - A response with the file or the byte range asked for.
+    Unchanged files get a 304.
+    '''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise Http404
+    if not S_ISREG(stat.st_mode):
+        raise Http404
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = '"{:x}-{:x}"'.format(stat.st_mtime_ns, size)
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified,
+    )
+    if response is None:
+        byte_range = get_range(request, size, etag, last_modified)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(size)
+        else:
+            first, last = byte_range or (0, size - 1)
+            file = open(path, 'rb')
+            file.seek(first)
+            response = FileResponse(
+                RangeFile(file, last - first + 1),
+                content_type=get_content_type(name),
+                status=206 if byte_range else 200,
+            )
+            response['Content-Length'] = str(last - first + 1)
+            if byte_range:
+                response['Content-Range'] = 'bytes {}-{}/{}'.format(
+                    first,
+                    last,
+                    size,
+                )
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+def serve_media(request, path):
+    '''
+    Serve a file from MEDIA_ROOT to visitors who may see it.
+    Files they may not see are not found.
+    '''
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    name = os.path.relpath(full_path, settings.MEDIA_ROOT)
+    # Blobs are only served through the media files linked to them
+    if name.startswith(Blob.DIRECTORY + '/'):
+        raise Http404
+    visibility = get_visibility(name)
+    if not can_view(request.user, visibility):
+        raise Http404
+    prefix = get_accel_prefix()
+    if prefix:
+        response = accel_redirect(name, prefix)
+    else:
+        response = serve_file(request, full_path, name)
+    if visibility[0] != PUBLIC:
+        patch_cache_control(response, private=True)
+    return response
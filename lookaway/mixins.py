@@ -1,9 +1,52 @@
+from hashlib import md5
+from django.apps import apps
+from django.contrib.messages import get_messages
 from django.db import models
+from django.db.models import (
+    Count, ExpressionWrapper, Max, OuterRef, Prefetch, Q, Subquery,
+)
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+from lookaway import versions
 from objects.mixins import MetaDataMixin
 from crypto.models import CryptoWalletsMixin
 from members.mixins import MarshmallowMixin
 
 
+# Helpers
+
+def get_item_related_fields(model):
+    '''
+    Returns the related fields that the item templates show for
+    instances of the given model, for use with select_related().
+    '''
+    names = [f.name for f in model._meta.get_fields()]
+    fields = []
+    if 'owner' in names:
+        fields.append('owner__profile__image')
+    if 'profile' in names and model._meta.get_field('profile').one_to_one:
+        fields.append('profile__image')
+    for name in ('image', 'cover'):
+        if name in names and model._meta.get_field(name).many_to_one:
+            fields.append(name)
+    return fields
+
+def get_item_queryset(model):
+    '''
+    Returns a queryset of the given model with the owner, image and tags
+    that the item templates show. It is always ordered so that first()
+    and indexing can use prefetched results.
+    '''
+    queryset = model.objects.select_related(*get_item_related_fields(model))
+    if 'tags' in [f.name for f in model._meta.get_fields()]:
+        queryset = queryset.prefetch_related('tags')
+    if not queryset.ordered:
+        queryset = queryset.order_by('pk')
+    return queryset
+
 # Model Mixins 
 
 class AppProfile(models.Model):
@@ -33,9 +76,65 @@ class AppProfile(models.Model):
         'objects.link',
         blank=True,
     )
+
+    # Process local cache of the singleton profile of each app.
+    # It is shared by every subclass and keyed by the model class.
+    _profile_cache = {}
+    # Models that are pre-fetched along with the profile.
+    # The cached profile is discarded when any of them change.
+    profile_dependencies = (
+        'objects.image',
+        'objects.link',
+        'crypto.bitcoinwallet',
+        'crypto.litecoinwallet',
+    )
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        versions.bump_on_commit(versions.get_label(self))
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        versions.bump_on_commit(versions.get_label(self))
+        return result
+
+    @classmethod
+    def get_profile_version(cls):
+        return versions.get_stamps(
+            (versions.get_label(cls),) + cls.profile_dependencies
+        )
+
+    @classmethod
+    def get_profile(cls):
+        '''
+        Returns the app's profile, creating it if it does not exist.
+        The profile, its images, wallets and links are fetched once per
+        process and reused until a version stamp shows that the profile or
+        one of the objects it refers to has been changed by any worker.
+        '''
+        # Read the version before the profile so a change made while
+        # fetching it invalidates the cache on the next call
+        version = cls.get_profile_version()
+        cached = cls._profile_cache.get(cls)
+        if cached and cached[0] == version:
+            return cached[1]
+        related = [
+            f.name for f in cls._meta.get_fields()
+            if f.many_to_one and f.concrete
+        ]
+        queryset = cls.objects.select_related(*related).prefetch_related('links')
+        try:
+            profile = queryset.get(pk=1)
+        except cls.DoesNotExist:
+            cls.objects.get_or_create(pk=1)
+            version = cls.get_profile_version()
+            profile = queryset.get(pk=1)
+        cls._profile_cache[cls] = (version, profile)
+        return profile
+
 class Section(MetaDataMixin):
     '''
     An ordered page section that may contain multimedia objects.
@@ -49,6 +148,23 @@ class Section(MetaDataMixin):
     def next_order(self):
         return self.order + 1
 
+    @classmethod
+    def get_prefetch_plan(cls):
+        '''
+        Returns Prefetch objects for the owner, the parent document and
+        every list of items a section may contain, with the owner, images
+        and tags of each item joined. Pass them to prefetch_related() when
+        fetching sections to render so each page costs the same number of
+        queries however many sections it has.
+        '''
+        return [
+            Prefetch(f.name, queryset=get_item_queryset(f.related_model))
+            for f in cls._meta.get_fields()
+            if f.concrete
+            and (f.many_to_many or f.many_to_one)
+            and f.name != 'tags'
+        ]
+
     order = models.DecimalField(
         max_digits=8,
         decimal_places=4,
@@ -131,6 +247,152 @@ class Doc(MetaDataMixin, MarshmallowMixin, CryptoWalletsMixin):
         return self.title
 
 # View mixins
+class SectionDetailMixin:
+    '''
+    Fetch the items of a section along with the section
+    for use with DetailViews of Section models.
+    '''
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return queryset.prefetch_related(*self.model.get_prefetch_plan())
+
+class ConditionalDetailMixin:
+    '''
+    Answer conditional GET requests to DetailViews of MetaDataMixin models
+    with a 304 before the page's context is built.
+
+    The validator is read with one query from the last_modified of the
+    object and of the sections or responses shown with it, and is combined
+    with the version stamps of the other models on the page and the class
+    of the viewer. Owners and members see other buttons than visitors, so
+    each of them gets their own ETag.
+
+    Last-Modified is the latest of those times and stamps. It is only
+    sent to visitors, since what a member may do on the page has no
+    time of its own and signed in viewers are told apart by the ETag.
+    '''
+    # The app profile shown on the page
+    app_profile = None
+    # Models shown with the object mapped to their foreign key to it
+    conditional_related = {}
+    # Other models shown on the page
+    conditional_dependencies = (
+        'objects.image',
+        'objects.sound',
+        'objects.video',
+        'objects.code',
+        'objects.link',
+    )
+    # Models shown on every page
+    site_dependencies = (
+        'home.homeappprofile',
+        'members.profile',
+        'objects.tag',
+        'auth.user',
+        'crypto.bitcoinwallet',
+        'crypto.litecoinwallet',
+    )
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+        etag, last_modified = validators
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Browsers keep the page but ask if it has changed every time
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    def get_validators(self):
+        '''
+        Returns - A tuple of the ETag and the last modified time of the
+        page as a timestamp, or None if the page must be rendered.
+        The last modified time is None for signed in viewers.
+        '''
+        # Messages are only shown once so the page is rendered for them
+        if len(get_messages(self.request)):
+            return None
+        queryset = self.get_queryset()
+        pk = self.kwargs.get(self.pk_url_kwarg)
+        slug = self.kwargs.get(self.slug_url_kwarg)
+        if pk is not None:
+            queryset = queryset.filter(pk=pk)
+        if slug is not None:
+            queryset = queryset.filter(**{self.get_slug_field(): slug})
+        annotations = {}
+        for i, (label, field) in enumerate(self.conditional_related.items()):
+            related = apps.get_model(label).objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field)
+            annotations['related_modified_{}'.format(i)] = Subquery(
+                related.annotate(m=Max('last_modified')).values('m')
+            )
+            annotations['related_count_{}'.format(i)] = Subquery(
+                related.annotate(n=Count('pk')).values('n')
+            )
+        row = queryset.annotate(**annotations).values(
+            'pk',
+            'owner_id',
+            'last_modified',
+            *annotations,
+        ).first()
+        if row is None:
+            return None
+        labels = (
+            (versions.get_label(self.model),)
+            + tuple(self.conditional_related)
+            + self.conditional_dependencies
+            + self.site_dependencies
+        )
+        if self.app_profile is not None:
+            labels += (versions.get_label(self.app_profile),)
+        stamps = versions.get_stamps(labels)
+        viewer = self.get_viewer(row['owner_id'])
+        validator = (sorted(row.items()), stamps, viewer)
+        etag = '"{}"'.format(md5(repr(validator).encode()).hexdigest())
+        if viewer != ('visitor',):
+            return etag, None
+        # A stamp is bumped every time one of the other models changes
+        last_modified = max(
+            [
+                v.timestamp() for k, v in row.items()
+                if k.endswith('modified') and v is not None
+            ] + [stamp[0] / 1e9 for stamp in stamps if stamp]
+        )
+        return etag, int(last_modified)
+
+    def get_viewer(self, owner_id):
+        '''
+        Returns - A tuple that tells visitors, members and the owner
+        apart, along with what the member may do on the page.
+        '''
+        user = self.request.user
+        if not user.is_authenticated:
+            return ('visitor',)
+        member = apps.get_model('members', 'member')(
+            pk=user.pk,
+            date_joined=user.date_joined,
+        )
+        can_add_marshmallow = (
+            member.check_can_allocate() and not member.check_is_new()
+        )
+        return (
+            'owner' if user.pk == owner_id else 'member',
+            user.pk,
+            can_add_marshmallow,
+        )
+
 class AppPageMixin:
     '''
     A collection of methods for use with Lookaway app landing views.
@@ -138,29 +400,31 @@ class AppPageMixin:
 
     def get_sets(self, model, n, show_new=True, show_top=True, member=None):
         '''
-        A method for fetching two model querysets from a Django model.
+        A method for fetching two lists of model instances from a Django model.
         Given a model, it will return a list of the newest n items
         whose 'is_public' field is set to true.
         If the number of public models is sufficent, it will
-        also return a queryset of at most, the top n items by 'weight'.
-        Items that appear in the 'new' queryset will be excluded from
-        the 'top' queryset.
+        also return a list of at most, the top n items by 'weight'.
+        Items that appear in the 'new' list will be excluded from
+        the 'top' list.
+        Both lists are fetched with a single query, along with the
+        owner and image of each item, and the tags are prefetched.
         Useful for assigning context in the 'get_context_data()' method.
 
         Args:
         instance -  A Django instance with 'is_public', 'publication_date'
                     and 'weight' fields.
-        n -         The number of items in each queryset.
-        show_new -  If set to False, the 'new_instances' queryset will be empty.
-        show_top -  If set to False, the 'top_instances' queryset will be empty.
+        n -         The number of items in each list.
+        show_new -  If set to False, the 'new_instances' list will be empty.
+        show_top -  If set to False, the 'top_instances' list will be empty.
 
         Returns:
-        new_instances - A queryset of n new public instances of the given instance.
-                     Queryset may be less than n if the number of instances
+        new_instances - A list of n new public instances of the given instance.
+                     The list may be less than n if the number of instances
                      is insufficent.
-        top_instances - A queryset of the top n public instances by weight
+        top_instances - A list of the top n public instances by weight
                      of the given instance excluding instances in new_instances.
-                     Queryset may be less than n if the number of instances
+                     The list may be less than n if the number of instances
                      is insufficent.
         '''
         # Initialize variables.
@@ -174,44 +438,86 @@ class AppPageMixin:
             public_instances = model.objects.filter(is_public=True)
             if member != None:
                 public_instances = public_instances.all().filter(owner=member)
-        new_instances = model.objects.none()
-        top_instances = model.objects.none()
-        # If there are public instances and we want to show the newest n
-        if n > 0 and public_instances.count() >= n and show_new:
-            # Get the n newest instances.
-            new_instances = public_instances.order_by(
-                '-publication_date',
-            )[:n]
-        # If there are public instances and we want to show the top n
-        if n > 0 and public_instances.count() >= n and show_top:
-            # Get the date of the nth newest instance
-            # if there are n or more instances.
-            last_new_instance_date = public_instances.order_by(
-                '-publication_date',
-            )[n-1].publication_date
-            # Exclude any instance that appears in the new instances list
-            # from the top instance list.
-            if show_new:
-                top_instances = public_instances.order_by(
-                    '-weight',
-                ).exclude(
-                    publication_date__gte=last_new_instance_date,
-                )[:n]
-            # Unless new instances aren't being shown, of course
-            else:
-                top_instances = public_instances.order_by('-weight')[:n]
-        # In the event there are less than n instances,
-        # include them in the new model list.
-        elif n > 0:
-            if show_new:
-                new_instances = public_instances.order_by(
-                    '-publication_date',
-                )[:n]
-            # Or in the top list if we don't want to show new_models
-            elif show_top:
-                top_instances = public_instances.order_by(
-                    '-weight',
-                )[:n]
-        # Return the querysets
+        if n <= 0 or not (show_new or show_top):
+            return [], []
+        newest = public_instances.order_by('-publication_date')
+        # The n newest instances
+        new_ids = newest.values('pk')[:n]
+        # The top n instances by weight. If new instances are shown, any
+        # instance as new as the nth newest instance is excluded.
+        top_instances = public_instances.order_by('-weight')
+        if show_new:
+            last_new_instance_date = newest.values('publication_date')[n-1:n]
+            top_instances = top_instances.exclude(
+                publication_date__gte=Subquery(last_new_instance_date),
+            )
+        top_ids = top_instances.values('pk')[:n]
+        # Fetch both sets at once, flagging the set each instance belongs to.
+        selected = Q()
+        if show_new:
+            selected |= Q(pk__in=new_ids)
+        if show_top:
+            selected |= Q(pk__in=top_ids)
+        instances = list(
+            newest.filter(selected).annotate(
+                is_new=ExpressionWrapper(
+                    Q(pk__in=new_ids),
+                    output_field=models.BooleanField(),
+                ),
+                is_top=ExpressionWrapper(
+                    Q(pk__in=top_ids),
+                    output_field=models.BooleanField(),
+                ),
+            ).select_related(
+                *get_item_related_fields(model)
+            ).prefetch_related('tags')
+        )
+        new_instances = [i for i in instances if i.is_new]
+        top_instances = sorted(
+            [i for i in instances if i.is_top],
+            key=lambda i: i.weight,
+            reverse=True,
+        )
+        if show_new:
+            # If there are less than n instances they are all
+            # in the new list and the top list is left empty.
+            if len(new_instances) < n:
+                top_instances = []
+        else:
+            new_instances = []
+        if not show_top:
+            top_instances = []
+        # Return the lists
         return new_instances, top_instances
 
+    def get_lazy_sets(self, *args, **kwargs):
+        '''
+        The same as get_sets() but nothing is fetched until the template
+        uses one of the sets. A landing page served from the fragment
+        cache does not query the models at all.
+
+        Returns:
+        new_instances, top_instances - Lazy objects that act like the
+                    lists returned by get_sets().
+        '''
+        sets = SimpleLazyObject(lambda: self.get_sets(*args, **kwargs))
+        return (
+            SimpleLazyObject(lambda: sets[0]),
+            SimpleLazyObject(lambda: sets[1]),
+        )
+
+    def get_fragment_models(self, *models):
+        '''
+        Returns the stamp names that the cached fragments of a landing
+        page depend on. That is the given models, the models their foreign
+        keys and many to many fields point to, and the models that app
+        profiles pre-fetch.
+        '''
+        labels = set(AppProfile.profile_dependencies)
+        for model in models:
+            labels.add(versions.get_label(model))
+            for field in model._meta.get_fields():
+                if field.concrete and field.is_relation and field.related_model:
+                    labels.add(versions.get_label(field.related_model))
+        return sorted(labels)
+
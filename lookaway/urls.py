@@ -10,21 +10,23 @@ Class-based views
     1. Add an import:  from other_app.views import Home
     2. Add a URL to urlpatterns:  path('', Home.as_view(), name='home')
 Including another URLconf
-    1. Import the include() function: from django.urls import include, path
+    1. Import the include() function: from django.urls import include, path, re_path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
 from django.contrib.auth import views as auth_views
-from django.contrib.sitemaps.views import sitemap
-from django.contrib.staticfiles.urls import static, staticfiles_urlpatterns
-from django.urls import include, path
-from home.sitemaps import whole_site
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
+from django.urls import include, path, re_path
+from home.views import sitemap_index_view, sitemap_page_view
 from members.views import InviteLinkCreateView, InviteLinkDetailView, MemberUpdateView, MemberProfileView, PasswordChangeDone
-from . import settings
+from . import media, settings
 
 urlpatterns = [
-    path('sitemap.xml', sitemap, {'sitemaps': whole_site},
-        name='django.contrib.sitemaps.views.sitemap'
+    path('sitemap.xml', sitemap_index_view, name='sitemap'),
+    path(
+        'sitemaps/<slug:section>-<int:page>.xml',
+        sitemap_page_view,
+        name='sitemap_page',
     ),
     path('admin/', admin.site.urls),
     path(
@@ -117,4 +119,11 @@ urlpatterns = [
     ),
 ]
 urlpatterns += staticfiles_urlpatterns()
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Uploaded media are checked for access before they are served
+urlpatterns += [
+    re_path(
+        r'^{}(?P<path>.+)$'.format(settings.MEDIA_URL.lstrip('/')),
+        media.serve_media,
+        name='media',
+    ),
+]
@@ -0,0 +1,70 @@
+import os
+import tempfile
+from django.conf import settings
+from django.db import transaction
+'''
+Version stamps shared by every worker process on a host.
+
+A stamp is an empty file in VERSION_STAMP_DIR. Bumping a stamp replaces
+the file, which changes its modification time and inode. Each process
+compares the stamp it saw when it cached something with the current one
+to find out if another process has changed the data behind the cache.
+Reading a stamp is a single stat() call and never touches the database.
+'''
+
+def get_stamp_dir():
+    return getattr(
+        settings,
+        'VERSION_STAMP_DIR',
+        os.path.join(settings.BASE_DIR, 'run', 'versions'),
+    )
+
+def get_label(model):
+    '''
+    Returns - The stamp name of a model class or instance.
+    Proxy models share the stamp of the model they proxy.
+    '''
+    return model._meta.concrete_model._meta.label_lower
+
+def get_stamp_path(name):
+    return os.path.join(get_stamp_dir(), name)
+
+def get_stamp(name):
+    '''
+    Returns - A value that changes every time the named stamp is bumped.
+    A stamp that has never been bumped has the value 0.
+    '''
+    try:
+        stat = os.stat(get_stamp_path(name))
+    except OSError:
+        return 0
+    return (stat.st_mtime_ns, stat.st_ino)
+
+def get_stamps(names):
+    '''
+    Returns - A tuple of the current value of each named stamp.
+    '''
+    return tuple(get_stamp(name) for name in names)
+
+def bump(name):
+    '''
+    Atomically replace the named stamp so that every process
+    sees a new value the next time it reads it.
+    '''
+    directory = get_stamp_dir()
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.{}.'.format(name))
+    os.close(fd)
+    try:
+        os.replace(tmp, get_stamp_path(name))
+    except OSError:
+        os.unlink(tmp)
+        raise
+
+def bump_on_commit(name):
+    '''
+    Bump the named stamp once the current transaction commits.
+    Bumping earlier would let another process cache the old data
+    under the new stamp. Outside of a transaction it bumps at once.
+    '''
+    transaction.on_commit(lambda: bump(name))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Member, MembersAppProfile, MembersPageSection, Marshmallow, Profile, MemberProfileSection, InviteLink
+from .models import Member, MembersAppProfile, MembersPageSection, Marshmallow, MarshmallowCounter, Profile, MemberProfileSection, InviteLink, MediaUsage
 # Register your models here.
 
 admin.site.register(Member)
@@ -9,3 +9,5 @@ admin.site.register(Marshmallow)
 admin.site.register(Profile)
 admin.site.register(MemberProfileSection)
 admin.site.register(InviteLink)
+admin.site.register(MediaUsage)
+admin.site.register(MarshmallowCounter)
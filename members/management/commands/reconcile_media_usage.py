@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from members.models import Member, MediaUsage
+
+
+class Command(BaseCommand):
+
+    help = """Rescan member media directories and report where the media \
+        usage ledger has drifted from the files on disk."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'members',
+            nargs='*',
+            type=int,
+            help="Member pks to check. Defaults to every member.",
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help="Correct the ledger to match the files on disk.",
+        )
+
+    def handle(self, *args, **options):
+        members = Member.objects.order_by('pk')
+        if options['members']:
+            members = members.filter(pk__in=options['members'])
+        checked = 0
+        drifted = 0
+        for member in members.iterator():
+            usage, created = MediaUsage.objects.get_or_create(member=member)
+            usage.member = member
+            drift = usage.reconcile(fix=options['fix'])
+            checked += 1
+            if any(drift.values()):
+                drifted += 1
+                self.stdout.write('{} (pk {}): {}'.format(
+                    member,
+                    member.pk,
+                    ', '.join(
+                        '{} {:+d}'.format(f, d) for f, d in drift.items() if d
+                    ),
+                ))
+        self.stdout.write('Checked {} members, {} {}'.format(
+            checked,
+            drifted,
+            'fixed' if options['fix'] else 'drifted',
+        ))
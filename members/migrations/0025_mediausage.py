@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-18 11:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0024_auto_20210428_1522'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image_bytes', models.BigIntegerField(default=0)),
+                ('sound_bytes', models.BigIntegerField(default=0)),
+                ('video_bytes', models.BigIntegerField(default=0)),
+                ('other_bytes', models.BigIntegerField(default=0)),
+                ('last_reconciled', models.DateTimeField(blank=True, null=True)),
+                ('member', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='media_usage', to='members.member')),
+            ],
+            options={
+                'verbose_name': 'Media Usage',
+                'verbose_name_plural': 'Media Usage',
+            },
+        ),
+    ]
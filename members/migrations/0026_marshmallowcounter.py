@@ -0,0 +1,73 @@
+# Generated by Django 3.2 on 2026-10-18 13:40
+
+import datetime
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def build_marshmallow_counters(apps, schema_editor):
+    '''
+    Count the Marshmallows allocated in the last 30 days
+    per member, model and day.
+    '''
+    MarshmallowCounter = apps.get_model('members', 'MarshmallowCounter')
+    t = timezone.now() - datetime.timedelta(days=30)
+    counters = []
+    for model in apps.get_models():
+        try:
+            field = model._meta.get_field('marshmallows')
+        except Exception:
+            continue
+        if not field.many_to_many or model._meta.proxy:
+            continue
+        rows = field.remote_field.through.objects.filter(
+            marshmallow__date__gte=t,
+        ).annotate(
+            day=TruncDate('marshmallow__date'),
+        ).values(
+            'marshmallow__member_id',
+            'day',
+        ).annotate(count=Count('pk'))
+        counters += [
+            MarshmallowCounter(
+                member_id=row['marshmallow__member_id'],
+                model=model._meta.label_lower,
+                day=row['day'],
+                count=row['count'],
+            )
+            for row in rows
+        ]
+    MarshmallowCounter.objects.bulk_create(counters, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('members', '0025_mediausage'),
+        ('art', '0007_alter_artpagesection_order'),
+        ('documentation', '0023_auto_20210428_1522'),
+        ('music', '0010_alter_musicpagesection_order'),
+        ('objects', '0022_code_highlighted'),
+        ('posts', '0017_auto_20210507_2126'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarshmallowCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=128)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='members.member')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='marshmallowcounter',
+            constraint=models.UniqueConstraint(fields=('member', 'model', 'day'), name='unique_marshmallow_counter'),
+        ),
+        migrations.RunPython(build_marshmallow_counters, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,6 @@
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.http import HttpResponseRedirect
 
 class MarshmallowMixin(models.Model):
@@ -13,16 +13,44 @@ class MarshmallowMixin(models.Model):
 
 class MemberCreateMixin:
 
+    # Times to pick a new slug when another request takes the same one
+    slug_attempts = 5
+
+    def save_form(self, form):
+        '''
+        Save the form. If the instance was given a slug with
+        Text.set_unique_slug and the slug is taken before the save,
+        a new slug is made and the save is tried again.
+
+        Returns - The saved instance.
+        '''
+        from objects.utils import Text
+        title = getattr(form.instance, '_slug_title', None)
+        for attempt in range(self.slug_attempts):
+            try:
+                with transaction.atomic():
+                    return form.save()
+            except IntegrityError:
+                # Give up if the slug was not the problem
+                model = type(form.instance)
+                taken = (
+                    title is not None
+                    and model.objects.filter(slug=form.instance.slug).exists()
+                )
+                if not taken or attempt + 1 == self.slug_attempts:
+                    raise
+                Text.set_unique_slug(form.instance, title)
+
     def form_valid(self, form):
-        instance = form.save()
+        self.object = self.save_form(form)
         messages.add_message(
             self.request, messages.INFO,
             'The {} "{}" has been successfully created.'.format(
                 self.model.__name__,
-                instance,
+                self.object,
             )
         )
-        return super().form_valid(form)
+        return HttpResponseRedirect(self.get_success_url())
 
 class MemberUpdateMixin:
 
@@ -3,14 +3,18 @@ import os
 import pytz
 from hashlib import md5
 from random import randrange
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.utils import timezone
+from lookaway import versions
 from lookaway.mixins import AppProfile, Section
 from lookaway.settings import BASE_DIR, DEFAULT_MEMBER_STORAGE, FOUNDER_CUTOFF
 from crypto.models import CryptoWalletsMixin
-from objects.models import Image
+from objects.models import Blob, BlobLink, Image
 
 
 class Member(User):
@@ -23,6 +27,46 @@ class Member(User):
             '-date_joined',
         ]
 
+    # Groups shown as badges mapped to their bit in the roles annotation
+    ROLES = {
+        'Members': 1,
+        'Contributors': 2,
+        'Writers': 4,
+        'Artists': 8,
+        'Musicians': 16,
+    }
+
+    @classmethod
+    def with_roles(cls, queryset=None):
+        '''
+        Annotate each Member with a bitmask of their groups and join their
+        profile and profile image, so a list of members can show names,
+        images and badges without a query per member.
+
+        Arguments
+        queryset - A Member queryset. Defaults to every Member.
+
+        Returns - The annotated queryset.
+        '''
+        if queryset is None:
+            queryset = cls.objects.all()
+        through = User.groups.through
+        roles = through.objects.filter(
+            user_id=OuterRef('pk'),
+        ).values('user_id').annotate(
+            bits=Sum(Case(
+                *[When(group__name=n, then=Value(b)) for n, b in cls.ROLES.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            )),
+        ).values('bits')
+        return queryset.annotate(
+            roles=Coalesce(
+                Subquery(roles, output_field=IntegerField()),
+                Value(0),
+            ),
+        ).select_related('profile__image')
+
     def check_is_founder(self):
         '''
         Checks to see if the Member joined before the FOUNDER_CUTOFF date
@@ -47,20 +91,30 @@ class Member(User):
         else:
             return True
 
+    def check_has_role(self, name):
+        '''
+        Returns True if the Member is in the named group. Members loaded
+        with with_roles() are checked without a query.
+        '''
+        roles = getattr(self, 'roles', None)
+        if roles is None:
+            return self.groups.filter(name=name).exists()
+        return bool(roles & Member.ROLES[name])
+
     def check_is_contributor(self):
-        return self.groups.filter(name="Contributors").exists()
+        return self.check_has_role("Contributors")
 
     def check_is_member(self):
-        return self.groups.filter(name="Members").exists()
+        return self.check_has_role("Members")
 
     def check_is_writer(self):
-        return self.groups.filter(name="Writers").exists()
+        return self.check_has_role("Writers")
 
     def check_is_artist(self):
-        return self.groups.filter(name="Artists").exists()
+        return self.check_has_role("Artists")
 
     def check_is_musician(self):
-        return self.groups.filter(name="Musicians").exists()
+        return self.check_has_role("Musicians")
 
     def check_can_allocate(self, n=300):
         '''
@@ -70,13 +124,13 @@ class Member(User):
         '''
         # get n seconds ago
         t = timezone.now() - datetime.timedelta(seconds=n)
-        try:
-            q = Profile.objects.select_related('member').get(member=self).last_marshmallow_time
-            if t > q:
-                return True
-            else:
-                return False
-        except:
+        q = Profile.objects.filter(member=self).values_list(
+            'last_marshmallow_time',
+            flat=True,
+        ).first()
+        if q and t > q:
+            return True
+        else:
             return False
 
     def get_dir_size(self, path='.'):
@@ -93,14 +147,25 @@ class Member(User):
                 total += self.get_dir_size(entry.path)
         return total
 
-    def check_free_media_capacity(self, directory):
+    def get_media_usage(self):
+        '''
+        Returns the MediaUsage ledger for this member.
+        The ledger is created from a scan of the member's media
+        directory the first time it is needed.
+        '''
+        usage, created = MediaUsage.objects.get_or_create(member=self)
+        if created:
+            usage.reconcile(fix=True)
+        return usage
+
+    def check_free_media_capacity(self, directory=None):
         '''
-        Checks total bytes under a dir and compares to the members capacity
-        indicated bt the models .
+        Compares the bytes recorded in the member's media usage ledger
+        to the member's capacity.
 
         Arguments
-        directory   - A string that indicates the relative directory path to check.
-                      Uses BASE_DIR as the working directory.
+        directory   - Unused. Kept for callers which still pass the
+                      member's media directory.
 
         Returns
         Boolean     - True if the bytes used is less than the given capacity.
@@ -108,12 +173,7 @@ class Member(User):
                       Returns 0 if the bytes used is over capacity.
         used        - The total bytes used.
         '''
-        try:
-            bytes_used = self.get_dir_size(
-                os.path.join(BASE_DIR, directory),
-            )
-        except:
-            bytes_used = 0
+        bytes_used = self.get_media_usage().get_total()
         capacity = self.profile.media_capacity
         if bytes_used < capacity:
             bytes_free = capacity - bytes_used
@@ -133,85 +193,80 @@ class Member(User):
                 Default is 5.
         model   - the model recieving the marshmallow
         '''
-        # get n days ago
-        t = timezone.now() - datetime.timedelta(days=n)
         ## number marshmallows allocated by the user in the last n days
-        if 'model' in kwargs:
-            q = kwargs['model'].objects.filter(
-                marshmallows__member=self,
-                marshmallows__date__gte=t,
-            ).count()
-        else:
-            q = Marshmallow.objects.filter(member=self, date__gte=t).count()
+        q = MarshmallowCounter.get_count(self, kwargs.get('model'), n)
         if q == 0:
             q += 1
-        # Debug line
-        #print('number of marshmalows allocated in last {0} days by {1}: {2}'.format(n, q, self))
         # weight allocation period
         p = n / q 
         # apply the multiplier
         return p * m
 
-    def allocate_marshmallow(self, instance, *args, **kwargs):
+    def allocate_marshmallow(self, instance, n=300, *args, **kwargs):
         '''
         If the methods check_can_allocate() and check_is_new() return True,
         allocate a Marshmallow to a model instance. The Marshmallow's weight attribute
         is determined by the get_adjusted_weight() method.
 
+        The allocation is one transaction. The member's Profile row is
+        locked so that parallel requests from the same member are handled
+        one at a time, and the instance weight is added in the database
+        so that parallel allocations from different members are all kept.
+
         Arguments
         instance - A database model instance that uses Marshmallow Mixin
+        n        - Seconds the member must wait between allocations
         model    - the model recieving the marshmallow
 
         Returns 
-        self - The Member calling this function
-        instance - The updated instance
+        successful - True if the Marshmallow was allocated
         m.weight - The weight of the newly created Marshmallow model object as a float
+        amount - A description of the weight
         '''
-        if  self.check_can_allocate() and not self.check_is_new():
-            if 'model' in kwargs:
-                # Create new Marshmallow adjusted by single model
-                m = Marshmallow(
-                    member=self, 
-                    date=timezone.now(), 
-                    weight=self.get_adjusted_weight(model=kwargs['model'])
-                )
-                m.save()
-            else:
-                # Create new Marshmallow adjusted universaly
-                m = Marshmallow(
-                    member=self, 
-                    date=timezone.now(), 
-                    weight=self.get_adjusted_weight()
-                )
-                m.save()
+        if self.check_is_new():
+            return False, 0, 0
+        model = kwargs.get('model')
+        with transaction.atomic():
+            p = Profile.objects.select_for_update().only(
+                'pk',
+                'last_marshmallow_time',
+            ).filter(member=self).first()
+            now = timezone.now()
+            if p is None or now - p.last_marshmallow_time <= datetime.timedelta(seconds=n):
+                return False, 0, 0
+            m = Marshmallow.objects.create(
+                member=self, 
+                date=now, 
+                weight=self.get_adjusted_weight(model=model),
+            )
+            type(instance).objects.filter(pk=instance.pk).update(
+                weight=F('weight') + m.weight,
+            )
             # Add the Marshmalow to the object
             instance.marshmallows.add(m)
-            instance.weight += m.weight
-            instance.save()
-            print('{} gave a {} marshmallows to {}'.format(self, m.weight, instance))
-            if m.weight > 100:
-                amount = "a shipment of marshmallows"
-            elif m.weight > 50:
-                amount = "several bags of marshmallows"
-            elif m.weight > 10:
-                amount = "a grip of marshmallows"
-            elif m.weight > 5:
-                amount = "a handful of marshmallows"
-            elif m.weight > 1:
-                amount = "a few marshmallows"
-            elif m.weight == 1:
-                amount = "a marshmallow"
-            elif m.weight < 1 and m.weight > 0.05 :
-                amount = "a piece of marshmallow"
-            else:
-                amount = "a spec of marshmallow"
-            p = Profile.objects.select_related('member').get(member=self)
-            p.last_marshmallow_time = timezone.now()
-            p.save()
-            return True, m.weight, amount
+            MarshmallowCounter.record(self, model or type(instance), now)
+            p.last_marshmallow_time = now
+            p.save(update_fields=['last_marshmallow_time'])
+        instance.refresh_from_db(fields=['weight'])
+        # The weight is not saved with the instance so bump its stamp here
+        versions.bump_on_commit(versions.get_label(instance))
+        if m.weight > 100:
+            amount = "a shipment of marshmallows"
+        elif m.weight > 50:
+            amount = "several bags of marshmallows"
+        elif m.weight > 10:
+            amount = "a grip of marshmallows"
+        elif m.weight > 5:
+            amount = "a handful of marshmallows"
+        elif m.weight > 1:
+            amount = "a few marshmallows"
+        elif m.weight == 1:
+            amount = "a marshmallow"
+        elif m.weight < 1 and m.weight > 0.05 :
+            amount = "a piece of marshmallow"
         else:
-            print("could not allocate weight")
-            return False, 0, 0
+            amount = "a spec of marshmallow"
+        return True, m.weight, amount
         
     def __str__(self):
         if self.first_name and self.last_name:
@@ -441,6 +496,131 @@ class MemberProfileSection(Section):
     def __str__(self):
         return self.title
 
+class MediaUsage(models.Model):
+    '''
+    A running total of the bytes each member stores in their media
+    directory. The upload, transcode and delete handlers adjust it as
+    files are written and removed so the capacity check does not have
+    to walk the filesystem. The "reconcile_media_usage" command rescans
+    the directories and corrects any drift.
+    '''
+
+    # Media directory names mapped to ledger fields
+    DIRECTORIES = {
+        'images': 'image_bytes',
+        'thumbnails': 'image_bytes',
+        'sounds': 'sound_bytes',
+        'videos': 'video_bytes',
+    }
+    FIELDS = ('image_bytes', 'sound_bytes', 'video_bytes', 'other_bytes')
+
+    member = models.OneToOneField(
+        Member,
+        on_delete=models.CASCADE,
+        related_name='media_usage',
+    )
+    image_bytes = models.BigIntegerField(default=0)
+    sound_bytes = models.BigIntegerField(default=0)
+    video_bytes = models.BigIntegerField(default=0)
+    other_bytes = models.BigIntegerField(default=0)
+    last_reconciled = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        verbose_name = "Media Usage"
+        verbose_name_plural = "Media Usage"
+
+    def __str__(self):
+        return '{} - {} bytes'.format(self.member, self.get_total())
+
+    def get_total(self):
+        return sum(getattr(self, f) for f in self.FIELDS)
+
+    def get_directory(self):
+        return os.path.join(settings.MEDIA_ROOT, 'member_{}'.format(self.member_id))
+
+    @classmethod
+    def record(cls, member_id, field, delta):
+        '''
+        Add delta bytes to one field of a member's ledger
+        with a single UPDATE. Use a negative delta for removed files.
+        '''
+        if not member_id or not delta:
+            return
+        updated = cls.objects.filter(member_id=member_id).update(
+            **{field: F(field) + delta}
+        )
+        if not updated:
+            # No ledger yet, create it from the files already on disk
+            member = Member.objects.filter(pk=member_id).first()
+            if member:
+                member.get_media_usage()
+
+    def scan(self):
+        '''
+        Walk the member's media directory. Files in the blob store are
+        counted the way blobs.get_charged_size charges them: content
+        linked more than once in the directory is counted once, and
+        files that are not linked are counted at their own size.
+
+        Returns - A dict of bytes used for each ledger field.
+        '''
+        totals = dict.fromkeys(self.FIELDS, 0)
+        directory = self.get_directory()
+        if not os.path.isdir(directory):
+            return totals
+        links = dict(BlobLink.objects.filter(
+            name__startswith=os.path.basename(directory) + '/',
+        ).values_list('name', 'blob_id'))
+        sizes = dict(Blob.objects.filter(
+            pk__in=set(links.values()),
+        ).values_list('pk', 'size'))
+        counted = set()
+        for entry in os.scandir(directory):
+            field = self.DIRECTORIES.get(entry.name, 'other_bytes')
+            if entry.is_dir():
+                paths = (
+                    os.path.join(root, file_name)
+                    for root, dirs, files in os.walk(entry.path)
+                    for file_name in files
+                )
+            elif entry.is_file():
+                paths = [entry.path]
+            else:
+                continue
+            for path in paths:
+                name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+                blob_id = links.get(name)
+                if blob_id is None:
+                    totals[field] += os.path.getsize(path)
+                elif blob_id not in counted:
+                    counted.add(blob_id)
+                    totals[field] += sizes[blob_id]
+        return totals
+
+    def reconcile(self, fix=False):
+        '''
+        Compare the ledger to the files on disk.
+
+        Arguments
+        fix - Overwrite the ledger with the scanned totals.
+
+        Returns - A dict of the drift, scanned minus recorded, per field.
+        '''
+        totals = self.scan()
+        recorded = MediaUsage.objects.filter(pk=self.pk).values(*self.FIELDS)[0]
+        drift = {f: totals[f] - recorded[f] for f in self.FIELDS}
+        if fix:
+            # Apply the drift as a delta so concurrent updates are kept
+            MediaUsage.objects.filter(pk=self.pk).update(
+                last_reconciled=timezone.now(),
+                **{f: F(f) + d for f, d in drift.items() if d},
+            )
+            self.refresh_from_db()
+        return drift
+
 class Marshmallow(models.Model):
 
     member = models.ForeignKey(Member, on_delete=models.CASCADE)
@@ -450,6 +630,59 @@ class Marshmallow(models.Model):
     def __str__(self):
         return '{} - {} - {}'.format(self.member, self.date, self.weight) 
 
+class MarshmallowCounter(models.Model):
+    '''
+    The number of Marshmallows each member allocated to each model per
+    day. The adjusted weight of a new Marshmallow depends on how many the
+    member allocated in the last 30 days, which is a sum of at most 30
+    rows here instead of a count over every Marshmallow.
+    '''
+
+    member = models.ForeignKey(Member, on_delete=models.CASCADE)
+    # Label of the model that received the Marshmallows
+    model = models.CharField(max_length=128)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['member', 'model', 'day'],
+                name='unique_marshmallow_counter',
+            ),
+        ]
+
+    def __str__(self):
+        return '{} - {} - {} - {}'.format(self.member, self.model, self.day, self.count)
+
+    @classmethod
+    def get_count(cls, member, model=None, n=30):
+        '''
+        Returns - The number of Marshmallows the member allocated in the
+        last n days, to the model if one is given.
+        '''
+        counters = cls.objects.filter(
+            member=member,
+            day__gt=timezone.localdate() - datetime.timedelta(days=n),
+        )
+        if model is not None:
+            counters = counters.filter(model=versions.get_label(model))
+        return counters.aggregate(total=Sum('count'))['total'] or 0
+
+    @classmethod
+    def record(cls, member, model, date):
+        '''
+        Count one Marshmallow allocated by the member to the model.
+        Call this inside the allocation transaction.
+        '''
+        label = versions.get_label(model)
+        day = timezone.localdate(date)
+        updated = cls.objects.filter(member=member, model=label, day=day).update(
+            count=F('count') + 1,
+        )
+        if not updated:
+            cls.objects.create(member=member, model=label, day=day, count=1)
+
 class InviteLink(models.Model):
 
     slug = models.SlugField(
@@ -1,3 +1,193 @@
-from django.test import TestCase
+import datetime
+import shutil
+import tempfile
+import threading
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from objects.models import Image
+from objects.utils import TestData
+from posts.models import Post
+from .models import MediaUsage, Member, MembersAppProfile, Marshmallow, MarshmallowCounter, Profile
 
 # Create your tests here.
+
+class MediaUsageTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(MEDIA_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.data = TestData()
+        self.member, self.user = self.data.create_test_member()
+        Profile.objects.create(member=self.member, slug=self.member.username)
+
+    def test_image_upload_and_delete(self):
+        before = self.member.get_media_usage().image_bytes
+        self.data.small_image(self.member)
+        image = Image.objects.get(owner=self.member)
+        usage = MediaUsage.objects.get(member=self.member)
+        self.assertGreater(usage.image_bytes, before)
+        # The ledger matches the files on disk
+        self.assertFalse(any(usage.reconcile().values()))
+        image.delete()
+        usage.refresh_from_db()
+        self.assertEqual(usage.image_bytes, before)
+
+    def test_capacity_uses_ledger(self):
+        usage = self.member.get_media_usage()
+        capacity = self.member.profile.media_capacity
+        MediaUsage.record(self.member.pk, 'video_bytes', capacity)
+        has_free, free, used = self.member.check_free_media_capacity()
+        self.assertFalse(has_free)
+        self.assertEqual(used, usage.get_total() + capacity)
+
+
+class MemberRolesTest(TestCase):
+
+    def setUp(self):
+        self.contributors = Group.objects.create(name='Contributors')
+        self.writers = Group.objects.create(name='Writers')
+        self.artists = Group.objects.create(name='Artists')
+        MembersAppProfile.objects.create(pk=1, contributors_list_pagination=100)
+
+    def create_members(self, start, n):
+        for i in range(start, start + n):
+            member = Member.objects.create_user(username='member{}'.format(i))
+            Profile.objects.create(member=member, slug=member.username)
+            member.groups.add(self.contributors)
+            if i % 2:
+                member.groups.add(self.writers)
+            if i % 3:
+                member.groups.add(self.artists)
+
+    def test_roles_match_groups(self):
+        self.create_members(0, 6)
+        for member in Member.with_roles():
+            self.assertEqual(member.check_is_writer(), member.groups.filter(name='Writers').exists())
+            self.assertEqual(member.check_is_artist(), member.groups.filter(name='Artists').exists())
+            self.assertTrue(member.check_is_contributor())
+            self.assertFalse(member.check_is_musician())
+
+    def test_list_queries_are_constant(self):
+        self.create_members(0, 3)
+        self.client.get(reverse('members:contributor_list'))
+        with self.assertNumQueries(2) as queries:
+            response = self.client.get(reverse('members:contributor_list'))
+        self.assertContains(response, 'Writer')
+        self.create_members(3, 12)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(reverse('members:contributor_list'))
+        self.assertEqual(len(response.context['members']), 15)
+
+
+class MarshmallowTest(TransactionTestCase):
+
+    def create_voter(self, i):
+        user = Member.objects.create_user(
+            username='voter{}'.format(i),
+            password='password',
+        )
+        Member.objects.filter(pk=user.pk).update(
+            date_joined=timezone.now() - datetime.timedelta(days=60),
+        )
+        Profile.objects.create(
+            member=user,
+            slug=user.username,
+            last_marshmallow_time=timezone.now() - datetime.timedelta(days=1),
+        )
+        return Member.objects.get(pk=user.pk)
+
+    def setUp(self):
+        self.post = Post.objects.create(title='post', slug='post', text='text')
+
+    def allocate(self, voters, results):
+        barrier = threading.Barrier(len(voters))
+        def run(voter):
+            barrier.wait()
+            try:
+                results.append(voter.allocate_marshmallow(
+                    Post.objects.get(pk=self.post.pk),
+                    model=Post,
+                ))
+            finally:
+                connection.close()
+        threads = [threading.Thread(target=run, args=(v,)) for v in voters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_stale_instances(self):
+        # Each request loads its own copy of the object before allocating
+        copies = [Post.objects.get(pk=self.post.pk) for i in range(3)]
+        weights = [
+            self.create_voter(i).allocate_marshmallow(copy, model=Post)[1]
+            for i, copy in enumerate(copies)
+        ]
+        self.post.refresh_from_db()
+        self.assertAlmostEqual(self.post.weight, sum(weights))
+
+    def test_sequential_double_allocations(self):
+        # The double allocations of the parallel tests, one after the
+        # other, so they also run on SQLite
+        first, second = self.create_voter(0), self.create_voter(1)
+        post = Post.objects.get(pk=self.post.pk)
+        results = [
+            first.allocate_marshmallow(post, model=Post),
+            first.allocate_marshmallow(post, model=Post),
+            second.allocate_marshmallow(Post.objects.get(pk=self.post.pk), model=Post),
+        ]
+        self.assertEqual([r[0] for r in results], [True, False, True])
+        self.post.refresh_from_db()
+        self.assertAlmostEqual(self.post.weight, results[0][1] + results[2][1])
+        # The instance that was allocated to is refreshed from the F() update
+        self.assertAlmostEqual(post.weight, results[0][1])
+        self.assertEqual(self.post.marshmallows.count(), 2)
+        self.assertEqual(MarshmallowCounter.get_count(first, Post), 1)
+        self.assertEqual(MarshmallowCounter.get_count(second, Post), 1)
+        self.assertEqual(MarshmallowCounter.get_count(first), 1)
+
+    # SQLite does not lock rows and its in memory test database
+    # fails parallel writers instead of making them wait.
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_parallel_allocations(self):
+        voters = [self.create_voter(i) for i in range(8)]
+        results = []
+        self.allocate(voters, results)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(r[0] for r in results))
+        self.post.refresh_from_db()
+        self.assertAlmostEqual(self.post.weight, sum(r[1] for r in results))
+        self.assertEqual(self.post.marshmallows.count(), 8)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_parallel_allocations_by_one_member(self):
+        voter = self.create_voter(0)
+        results = []
+        self.allocate([voter] * 4, results)
+        self.assertEqual([r[0] for r in results].count(True), 1)
+        self.assertEqual(Marshmallow.objects.filter(member=voter).count(), 1)
+        self.assertEqual(MarshmallowCounter.get_count(voter, Post), 1)
+
+    def test_rolling_counter(self):
+        voter = self.create_voter(0)
+        weights = []
+        for i in range(3):
+            Profile.objects.filter(member=voter).update(
+                last_marshmallow_time=timezone.now() - datetime.timedelta(days=1),
+            )
+            successful, weight, amount = voter.allocate_marshmallow(self.post, model=Post)
+            self.assertTrue(successful)
+            weights.append(weight)
+        # The weight is divided by the allocations in the last 30 days
+        self.assertEqual(weights, [150, 150, 75])
+        self.assertEqual(MarshmallowCounter.get_count(voter), 3)
+        self.assertEqual(MarshmallowCounter.get_count(voter, Image), 0)
+        self.assertAlmostEqual(self.post.weight, sum(weights))
+        # Too soon after the last allocation
+        self.assertFalse(voter.allocate_marshmallow(self.post, model=Post)[0])
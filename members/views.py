@@ -13,7 +13,7 @@ from django.utils import timezone, text
 from django.views.generic import ListView, TemplateView
 from django.views.generic.edit import CreateView, FormMixin, UpdateView, DeleteView
 from django.views.generic.detail import DetailView
-from lookaway.mixins import AppPageMixin
+from lookaway.mixins import AppPageMixin, SectionDetailMixin
 from home.models import HomeAppProfile
 from documentation.models import Article, Story, SupportDocument
 from art.models import Gallery, Visual
@@ -36,7 +36,7 @@ class StudioView(LoginRequiredMixin, TemplateView):
         member = Member.objects.get(pk=self.request.user.pk)
         # App profile
         profile, created = Profile.objects.get_or_create(member=member)
-        objects_profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        objects_profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = "{}'s Digital Studio".format(profile.member)
@@ -162,9 +162,7 @@ class StudioView(LoginRequiredMixin, TemplateView):
                 owner=member
             ).order_by('-last_modified')[:10]
         # Check media storage
-        has_free, free, used = member.check_free_media_capacity(
-            directory='media/member_' + str(member.pk),
-        )
+        has_free, free, used = member.check_free_media_capacity()
         capacity = member.profile.media_capacity
         context['media_capacity'] = round(capacity / 10**6) # In MB
         context['media_used'] = round(used / 10**6) # In MB
@@ -189,7 +187,7 @@ class MembersAppProfileUpdateView(LoginRequiredMixin, PermissionRequiredMixin, U
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = profile.title
@@ -227,14 +225,22 @@ class MembersPageView(TemplateView, AppPageMixin):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
+        # Cached fragments depend on these models
+        context['fragment_models'] = self.get_fragment_models(
+            MembersAppProfile,
+            MembersPageSection,
+            Member,
+        )
         # SEO stuff
         context['meta_title'] = profile.title
         context['meta_desc'] = profile.meta_description
 
         # Sections
-        sections = MembersPageSection.objects.filter(
+        sections = MembersPageSection.objects.prefetch_related(
+            *MembersPageSection.get_prefetch_plan()
+        ).filter(
             is_enabled = True,
         ).order_by(
             'order',
@@ -246,7 +252,7 @@ class MembersPageView(TemplateView, AppPageMixin):
                 members_only=True
             )
         # Show members on the landing page
-        members = Member.objects.filter(
+        members = Member.with_roles().filter(
             groups__name="Members",
         ).exclude(
             groups__name="Contributors",
@@ -254,7 +260,7 @@ class MembersPageView(TemplateView, AppPageMixin):
             '-date_joined',
         )[:profile.n_members]
         context['members'] = members
-        contributors = Member.objects.filter(
+        contributors = Member.with_roles().filter(
             groups__name="Contributors",
         ).order_by('-date_joined')
         context['contributors'] = contributors.all()[:profile.n_contributors]
@@ -307,7 +313,7 @@ class MembersPageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin,
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Page Section"
         context['meta_desc'] = "Add a section to the {} landing page.".format(profile.title)
@@ -331,7 +337,7 @@ class MembersPageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin,
             )
 
 # Member page section detail
-class MembersPageSectionDetailView(LoginRequiredMixin, DetailView):
+class MembersPageSectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = MembersPageSection
     context_object_name = 'section'
@@ -339,7 +345,7 @@ class MembersPageSectionDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = profile.title
         # Add members page section button
@@ -373,7 +379,7 @@ class MembersPageSectionUpdateView(LoginRequiredMixin, PermissionRequiredMixin,
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this landing page section.".format(self.object.title)
@@ -411,11 +417,10 @@ class MemberListView(ListView):
 
     model = Member
     context_object_name = 'members'
-    queryset = Member.objects.filter(groups__name='Members')
-    try:
-        paginate_by = MembersAppProfile.objects.get_or_create(pk=1)[0].members_list_pagination
-    except:
-        paginate_by = 10
+    queryset = Member.with_roles().filter(groups__name='Members')
+
+    def get_paginate_by(self, queryset):
+        return MembersAppProfile.get_profile().members_list_pagination
 
     class Meta:
         ordering = ['-date_joined']    
@@ -423,8 +428,8 @@ class MemberListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        home, created = HomeAppProfile.objects.get_or_create(pk=1)
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        home = HomeAppProfile.get_profile()
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "{} Members".format(home.title)
         # SEO stuff
@@ -449,11 +454,10 @@ class ContributorListView(ListView):
 
     model = Member
     context_object_name = 'members'
-    queryset = Member.objects.filter(groups__name='Contributors')
-    try:
-        paginate_by = MembersAppProfile.objects.get_or_create(pk=1)[0].contributors_list_pagination
-    except:
-        paginate_by = 10
+    queryset = Member.with_roles().filter(groups__name='Contributors')
+
+    def get_paginate_by(self, queryset):
+        return MembersAppProfile.get_profile().contributors_list_pagination
 
     class Meta:
         ordering = ['-date_joined']
@@ -461,8 +465,8 @@ class ContributorListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        home, created = HomeAppProfile.objects.get_or_create(pk=1)
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        home = HomeAppProfile.get_profile()
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "{} Contributors".format(home.title)
         # SEO stuff
@@ -488,11 +492,10 @@ class ArtistListView(ListView):
 
     model = Member
     context_object_name = 'members'
-    queryset = Member.objects.filter(groups__name='Artists')
-    try:
-        paginate_by = MembersAppProfile.objects.get_or_create(pk=1)[0].contributors_list_pagination
-    except:
-        paginate_by = 10
+    queryset = Member.with_roles().filter(groups__name='Artists')
+
+    def get_paginate_by(self, queryset):
+        return MembersAppProfile.get_profile().contributors_list_pagination
 
     class Meta:
         ordering = ['-date_joined']
@@ -500,8 +503,8 @@ class ArtistListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        home, created = HomeAppProfile.objects.get_or_create(pk=1)
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        home = HomeAppProfile.get_profile()
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "{} Artists".format(home.title)
         # SEO stuff
@@ -527,11 +530,10 @@ class MusicianListView(ListView):
 
     model = Member
     context_object_name = 'members'
-    queryset = Member.objects.filter(groups__name='Musicians')
-    try:
-        paginate_by = MembersAppProfile.objects.get_or_create(pk=1)[0].contributors_list_pagination
-    except:
-        paginate_by = 10
+    queryset = Member.with_roles().filter(groups__name='Musicians')
+
+    def get_paginate_by(self, queryset):
+        return MembersAppProfile.get_profile().contributors_list_pagination
 
     class Meta:
         ordering = ['-date_joined']
@@ -539,8 +541,8 @@ class MusicianListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        home, created = HomeAppProfile.objects.get_or_create(pk=1)
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        home = HomeAppProfile.get_profile()
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "{} Musicians".format(home.title)
         # SEO stuff
@@ -566,11 +568,10 @@ class WriterListView(ListView):
 
     model = Member
     context_object_name = 'members'
-    queryset = Member.objects.filter(groups__name='Writers')
-    try:
-        paginate_by = MembersAppProfile.objects.get_or_create(pk=1)[0].contributors_list_pagination
-    except:
-        paginate_by = 10
+    queryset = Member.with_roles().filter(groups__name='Writers')
+
+    def get_paginate_by(self, queryset):
+        return MembersAppProfile.get_profile().contributors_list_pagination
 
     class Meta:
         ordering = ['-date_joined']
@@ -578,8 +579,8 @@ class WriterListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        home, created = HomeAppProfile.objects.get_or_create(pk=1)
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        home = HomeAppProfile.get_profile()
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "{} Writers".format(home.title)
         # SEO stuff
@@ -605,11 +606,10 @@ class StaffListView(ListView):
 
     model = Member
     context_object_name = 'members'
-    queryset = Member.objects.filter(is_staff=True)
-    try:
-        paginate_by = MembersAppProfile.objects.get_or_create(pk=1)[0].contributors_list_pagination
-    except:
-        paginate_by = 10
+    queryset = Member.with_roles().filter(is_staff=True)
+
+    def get_paginate_by(self, queryset):
+        return MembersAppProfile.get_profile().contributors_list_pagination
 
     class Meta:
         ordering = ['-date_joined']
@@ -617,8 +617,8 @@ class StaffListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        home, created = HomeAppProfile.objects.get_or_create(pk=1)
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        home = HomeAppProfile.get_profile()
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "{} Staff Contributors".format(home.title)
         # SEO stuff
@@ -653,7 +653,9 @@ class MemberProfileView(DetailView, AppPageMixin):
         context['meta_title'] = self.object.member
         context['meta_desc'] = self.object.meta_description
         # Sections
-        sections = MemberProfileSection.objects.filter(
+        sections = MemberProfileSection.objects.prefetch_related(
+            *MemberProfileSection.get_prefetch_plan()
+        ).filter(
             owner=self.object.member,
             is_enabled = True,
         ).order_by(
@@ -963,7 +965,7 @@ class MemberProfileSectionCreateView(LoginRequiredMixin, MemberCreateMixin, Crea
                 kwargs={'pk': self.object.pk},
             )
 
-class MemberProfileSectionDetailView(LoginRequiredMixin, DetailView):
+class MemberProfileSectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = MemberProfileSection
     context_object_name = 'section'
@@ -1086,8 +1088,8 @@ class InviteLinkCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateVi
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        home, created = HomeAppProfile.objects.get_or_create(pk=1)
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        home = HomeAppProfile.get_profile()
+        profile = MembersAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Invite Link"
         context['meta_desc'] = "Invite someone to join {}".format(home.title)
@@ -1132,7 +1134,7 @@ class InviteLinkDetailView(FormMixin, DetailView):
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MembersAppProfile.objects.get_or_create(pk=1)
+        profile = MembersAppProfile.get_profile()
         context['terms'] = profile.member_agreement
         return context
 
@@ -0,0 +1,9 @@
+from lookaway.feeds import ModelFeed
+from .app_profile_mixins import FeedMixin
+from .models import Album, Track
+
+class TrackFeed(FeedMixin, ModelFeed):
+    model = Track
+
+class AlbumFeed(FeedMixin, ModelFeed):
+    model = Album
@@ -1,3 +1,112 @@
-from django.test import TestCase
+from unittest import mock
+from django.contrib.auth.models import AnonymousUser, Permission
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from home.models import HomeAppProfile
+from objects.models import Sound
+from objects.templatetags.custom_filters import runtime
+from objects.utils import TestData, Text
+from .models import MusicAppProfile, Album, Track
+from .views import AlbumDetailView
 
-# Create your tests here.
+
+class AlbumRuntimeTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        HomeAppProfile.get_profile()
+        MusicAppProfile.get_profile()
+        self.member, self.user = TestData().create_test_member()
+        self.album = Album.objects.create(
+            owner=self.member,
+            title='Album',
+            slug='album',
+            artist='Artist',
+            is_public=True,
+            publication_date=timezone.now(),
+        )
+        for i, duration in enumerate((61.4, 125, None)):
+            sound = Sound.objects.create(
+                owner=self.member,
+                sound_file='member_0/sounds/{}.ogg'.format(i),
+            )
+            Sound.objects.filter(pk=sound.pk).update(duration=duration)
+            track = Track.objects.create(
+                owner=self.member,
+                title='Track {}'.format(i),
+                slug='track-{}'.format(i),
+                artist='Artist',
+                sound=sound,
+                order=i,
+                is_public=i != 1,
+                publication_date=timezone.now(),
+            )
+            self.album.tracks.add(track)
+
+    def test_runtime(self):
+        view = AlbumDetailView()
+        view.request = RequestFactory().get('/')
+        view.request.user = AnonymousUser()
+        view.kwargs = {'slug': self.album.slug}
+        view.object = self.album
+        with self.assertNumQueries(2):
+            context = view.get_context_data()
+            # Only public tracks are listed and counted
+            self.assertEqual(context['runtime'], 61.4)
+            self.assertEqual(
+                [t.title for t in context['tracks']],
+                ['Track 0', 'Track 2'],
+            )
+        self.assertEqual(runtime(context['runtime']), '1:01')
+        self.assertEqual(runtime(3725), '1:02:05')
+        self.assertEqual(runtime(None), '')
+
+
+class UniqueSlugTest(TestCase):
+
+    def setUp(self):
+        self.member, self.user = TestData().create_test_member()
+        self.user.user_permissions.add(*Permission.objects.filter(
+            codename__in=['add_album', 'add_track'],
+        ))
+        self.client.force_login(self.user)
+        self.sound = Sound.objects.create(
+            owner=self.member,
+            sound_file='member_0/sounds/song.ogg',
+        )
+
+    def create(self, url, model, data, **fields):
+        model.objects.create(owner=self.member, title='other', slug='taken', **fields)
+        # Another request took the slug after it was chosen
+        with mock.patch.object(
+            Text,
+            'slugify_unique',
+            side_effect=['taken', 'taken-2'],
+        ):
+            response = self.client.post(url, dict(data, title='taken'))
+        self.assertEqual(
+            response.status_code,
+            302,
+            response.context and response.context['form'].errors,
+        )
+        return model.objects.get(slug='taken-2')
+
+    def test_album_retry_on_conflict(self):
+        album = self.create(reverse('music:album_create'), Album, {
+            'meta_description': 'description',
+            'text': 'text',
+            'artist': 'Artist',
+        })
+        self.assertEqual(album.owner, self.member)
+
+    def test_track_retry_on_conflict(self):
+        track = self.create(reverse('music:track_create'), Track, {
+            'meta_description': 'description',
+            'text': 'text',
+            'artist': 'Artist',
+            'sound': self.sound.pk,
+            'order': 1,
+        }, order=0, sound=self.sound)
+        self.assertEqual(track.sound, self.sound)
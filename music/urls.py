@@ -1,6 +1,8 @@
 from django.urls import path
 from django.contrib.staticfiles.urls import static, staticfiles_urlpatterns
 import music.views as views  
+import music.feeds as feeds
+from lookaway.feeds import feed_urls
 
 app_name = 'music'
 
@@ -150,3 +152,7 @@ urlpatterns = [
         name='track_marshmallow',
     ),
 ]
+
+# RSS and Atom feeds
+urlpatterns += feed_urls('feeds/tracks/', feeds.TrackFeed, 'track')
+urlpatterns += feed_urls('feeds/albums/', feeds.AlbumFeed, 'album')
@@ -4,7 +4,7 @@ from django.contrib.auth.mixins import(
     LoginRequiredMixin,
     PermissionRequiredMixin,
     )
-from django.db.models import Q
+from django.db.models import Q, Sum
 from django.http import HttpResponseRedirect
 from django.template import loader
 from django.urls import reverse_lazy, reverse
@@ -13,7 +13,9 @@ from django.views.generic.base import TemplateView
 from django.views.generic.edit import CreateView, FormView, UpdateView, DeleteView
 from django.views.generic.detail import DetailView
 from django.views.generic.list import ListView
-from lookaway.mixins import AppPageMixin
+from lookaway.mixins import (
+    AppPageMixin, ConditionalDetailMixin, SectionDetailMixin,
+)
 from members.models import Member
 from members.mixins import MemberCreateMixin, MemberUpdateMixin, MemberDeleteMixin
 from objects.utils import Text
@@ -39,7 +41,7 @@ class MusicAppProfileUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Upd
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = profile.title
@@ -77,13 +79,22 @@ class MusicPageView(TemplateView, AppPageMixin):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
+        # Cached fragments depend on these models
+        context['fragment_models'] = self.get_fragment_models(
+            MusicAppProfile,
+            MusicPageSection,
+            Track,
+            Album,
+        )
         # SEO stuff
         context['meta_title'] = profile.title
         context['meta_desc'] = profile.meta_description
         # Sections
-        sections = MusicPageSection.objects.filter(
+        sections = MusicPageSection.objects.prefetch_related(
+            *MusicPageSection.get_prefetch_plan()
+        ).filter(
             is_enabled = True,
         ).order_by(
             'order',
@@ -95,14 +106,14 @@ class MusicPageView(TemplateView, AppPageMixin):
                 members_only=True
             )
         # New and top Track model instances
-        context['new_tracks'], context['top_tracks'] = self.get_sets(
+        context['new_tracks'], context['top_tracks'] = self.get_lazy_sets(
             Track,
             profile.n_tracks,
             show_new=profile.show_new_tracks,
             show_top=profile.show_top_tracks,
         )
         # New and top Album model instances
-        context['new_albums'], context['top_albums'] = self.get_sets(
+        context['new_albums'], context['top_albums'] = self.get_lazy_sets(
             Album,
             profile.n_albums,
             show_new=profile.show_new_albums,
@@ -162,7 +173,7 @@ class MusicPageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Me
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Page Section"
         context['meta_desc'] = "Add a section to the {} landing page.".format(profile.title)
@@ -185,7 +196,7 @@ class MusicPageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Me
                 kwargs={'pk': self.object.pk},
             )
 
-class MusicPageSectionDetailView(LoginRequiredMixin, DetailView):
+class MusicPageSectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = MusicPageSection
     context_object_name = 'section'
@@ -193,7 +204,7 @@ class MusicPageSectionDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = profile.title
         # Add music page section button
@@ -226,7 +237,7 @@ class MusicPageSectionUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Me
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this landing page section.".format(self.object.title)
@@ -258,7 +269,7 @@ class MusicPageSectionDeleteView(LoginRequiredMixin, PermissionRequiredMixin, De
             'music:music_page',
         )
 # Album Views
-class AlbumCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
+class AlbumCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMixin, CreateView):
 
     model = Album
     permission_required = 'music.add_album'
@@ -273,13 +284,13 @@ class AlbumCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
         member = Member.objects.get(pk=self.request.user.pk)
         form.instance.creation_date = timezone.now()
         form.instance.owner = member
-        form.instance.slug = Text.slugify_unique(self.model, form.instance.title)
+        Text.set_unique_slug(form.instance, form.instance.title)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Album"
         context['meta_desc'] = "Submit an Album you wish to publish. Create some Tracks then choose which Tracks will appear on the Album in the form below."
@@ -298,12 +309,11 @@ class AlbumCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
 class AlbumListView(NewModelListMixin, ListView):
 
     model = Album
-    try:
-        paginate_by = MusicAppProfile.objects.get_or_create(pk=1)[0].album_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'albums'
 
+    def get_paginate_by(self, queryset):
+        return MusicAppProfile.get_profile().album_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -317,12 +327,11 @@ class AlbumListView(NewModelListMixin, ListView):
 class TopAlbumListView(TopModelListMixin, ListView):
 
     model = Album
-    try:
-        paginate_by = MusicAppProfile.objects.get_or_create(pk=1)[0].album_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'albums'
 
+    def get_paginate_by(self, queryset):
+        return MusicAppProfile.get_profile().album_list_pagination
+
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -337,12 +346,11 @@ class TopAlbumListView(TopModelListMixin, ListView):
 class MemberAlbumView(ModelByMemberMixin, ListView):
 
     model = Album
-    try:
-        paginate_by = MusicAppProfile.objects.get_or_create(pk=1)[0].album_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'albums'
 
+    def get_paginate_by(self, queryset):
+        return MusicAppProfile.get_profile().album_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(username=self.kwargs['member'])
@@ -358,12 +366,11 @@ class AlbumStudioListView(StudioListMixin, ListView):
 
     model = Album
     template_name = 'music/studio_list.html'
-    try:
-        paginate_by = MusicAppProfile.objects.get_or_create(pk=1)[0].album_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'albums'
 
+    def get_paginate_by(self, queryset):
+        return MusicAppProfile.get_profile().album_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -374,17 +381,30 @@ class AlbumStudioListView(StudioListMixin, ListView):
             )
         return context
 
-class AlbumDetailView(DetailView):
+class AlbumDetailView(ConditionalDetailMixin, DetailView):
 
     model = Album
+    app_profile = MusicAppProfile
+    conditional_related = {
+        'posts.responsepost': 'album',
+    }
+    conditional_dependencies = ConditionalDetailMixin.conditional_dependencies + (
+        'music.track',
+    )
     context_object_name = 'album'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = self.object.title
+        # Track list and total running time
+        tracks = self.object.tracks.filter(is_public=True)
+        context['tracks'] = tracks.select_related('sound')
+        context['runtime'] = tracks.aggregate(
+            runtime=Sum('sound__duration'),
+        )['runtime']
 
         # Check whether or not to display the Marshmallow button
         if self.request.user.is_authenticated:
@@ -480,7 +500,7 @@ class AlbumUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdateM
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this album.".format(self.object.title)
@@ -570,7 +590,7 @@ def publish_album_view(request, pk):
 
 # Track Views
 
-class TrackCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
+class TrackCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMixin, CreateView):
 
     model = Track
     permission_required = 'music.add_track'
@@ -587,13 +607,13 @@ class TrackCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
         member = Member.objects.get(pk=self.request.user.pk)
         form.instance.creation_date = timezone.now()
         form.instance.owner = member
-        form.instance.slug = Text.slugify_unique(self.model, form.instance.title)
+        Text.set_unique_slug(form.instance, form.instance.title)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Track"
         context['meta_desc'] = """Submit a Track you wish to publish. \
@@ -613,12 +633,11 @@ class TrackCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
 class TrackListView(NewModelListMixin, ListView):
 
     model = Track
-    try:
-        paginate_by = MusicAppProfile.objects.get_or_create(pk=1)[0].track_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'tracks'
 
+    def get_paginate_by(self, queryset):
+        return MusicAppProfile.get_profile().track_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -632,12 +651,11 @@ class TrackListView(NewModelListMixin, ListView):
 class TopTrackListView(TopModelListMixin, ListView):
 
     model = Track
-    try:
-        paginate_by = MusicAppProfile.objects.get_or_create(pk=1)[0].track_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'tracks'
 
+    def get_paginate_by(self, queryset):
+        return MusicAppProfile.get_profile().track_list_pagination
+
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -652,12 +670,11 @@ class TopTrackListView(TopModelListMixin, ListView):
 class MemberTrackView(ModelByMemberMixin, ListView):
 
     model = Track
-    try:
-        paginate_by = MusicAppProfile.objects.get_or_create(pk=1)[0].track_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'tracks'
 
+    def get_paginate_by(self, queryset):
+        return MusicAppProfile.get_profile().track_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(username=self.kwargs['member'])
@@ -684,15 +701,19 @@ class TrackStudioListView(StudioListMixin, ListView):
             )
         return context
 
-class TrackDetailView(DetailView):
+class TrackDetailView(ConditionalDetailMixin, DetailView):
 
     model = Track
+    app_profile = MusicAppProfile
+    conditional_related = {
+        'posts.responsepost': 'track',
+    }
     context_object_name = 'track'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = self.object.title
         # Albums that have the Track on their list
@@ -794,7 +815,7 @@ class TrackUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdateM
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = MusicAppProfile.objects.get_or_create(pk=1)
+        profile = MusicAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this track.".format(self.object.title)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ObjectsAppProfile, ObjectsPageSection, Tag, Image, Sound, Video, Code, Link
+from .models import ObjectsAppProfile, ObjectsPageSection, Tag, Image, Sound, Video, Code, Link, TranscodeJob, RenditionJob
 
 # Register your models here.
 
@@ -11,3 +11,5 @@ admin.site.register(Sound)
 admin.site.register(Video)
 admin.site.register(Code)
 admin.site.register(Link)
+admin.site.register(TranscodeJob)
+admin.site.register(RenditionJob)
@@ -16,7 +16,7 @@ class ModelListMixin:
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = self.model._meta.verbose_name_plural.capitalize()
         # SEO stuff
@@ -55,12 +55,12 @@ class ModelByTagMixin:
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App Profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         tag = Tag.objects.get(slug=self.kwargs['slug'])
         context['tag'] = tag
         # Home App profile
-        home, created = HomeAppProfile.objects.get_or_create(pk=1)
+        home = HomeAppProfile.get_profile()
         context['app_list_context'] = self.model._meta.verbose_name_plural.capitalize()
         # SEO stuff
         context['meta_title'] = "{} tagged with {} | {}".format(
@@ -93,7 +93,7 @@ class MemberViewMixin:
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(username=self.kwargs['member'])
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = self.model._meta.verbose_name_plural.capitalize()
         context['meta_title'] = "{} by {} | {}".format(
@@ -120,7 +120,7 @@ class StudioListMixin:
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(pk=self.request.user.pk)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = self.model._meta.verbose_name_plural.capitalize()
         context['meta_title'] = "Your {}".format(
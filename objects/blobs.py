@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import os
+from uuid import uuid4
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BigIntegerField, ExpressionWrapper, F, Q, Sum
+from .models import Blob, BlobLink
+'''
+Content addressed media store.
+
+Every media file is a hard link to a blob in MEDIA_ROOT/blobs named after
+the SHA-256 hash of its content, so files with the same content share
+one copy on disk. A BlobLink row is kept for each linked file and the
+blob is removed when the last file linked to it is deleted.
+
+Files that can not be hard linked, for example on a file system without
+hard links, are left where they are and are not tracked.
+'''
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+
+def get_name(path):
+    '''
+    Returns the path of a media file relative to MEDIA_ROOT.
+    '''
+    name = os.path.relpath(str(path), settings.MEDIA_ROOT)
+    return name.replace(os.sep, '/')
+
+def get_blob_path(sha256):
+    return os.path.join(
+        settings.MEDIA_ROOT,
+        Blob(sha256=sha256).get_name(),
+    )
+
+def hash_file(path):
+    '''
+    Returns the SHA-256 hex digest of a file's content.
+    '''
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def replace_with_link(target, path):
+    '''
+    Atomically replace a file with a hard link to another file.
+    '''
+    temp = '{}.{}.link'.format(path, uuid4().hex)
+    os.link(target, temp)
+    os.replace(temp, path)
+
+def lock_blob(sha256, size):
+    '''
+    Returns - The Blob of some content, created if there is none, with
+    its row locked until the end of the transaction. Storing, unlinking
+    and removing the content of a blob take turns on this lock.
+    '''
+    blob, created = Blob.objects.get_or_create(
+        sha256=sha256,
+        defaults={'size': size},
+    )
+    if created:
+        return blob
+    return Blob.objects.select_for_update().get(pk=blob.pk)
+
+def store(path, sha256=None):
+    '''
+    Put a media file in the store. A file whose content is already
+    stored is replaced with a hard link to the stored copy, otherwise
+    the file becomes the stored copy.
+
+    Arguments
+    path    - The path of a file in MEDIA_ROOT.
+    sha256  - The hash of the file if it is already known.
+
+    Returns - The Blob, or None if the file could not be linked.
+    '''
+    path = str(path)
+    if not os.path.isfile(path):
+        return None
+    if sha256 is None:
+        sha256 = hash_file(path)
+    name = get_name(path)
+    blob_path = get_blob_path(sha256)
+    with transaction.atomic():
+        # The blob file is not removed while the lock is held
+        blob = lock_blob(sha256, os.path.getsize(path))
+        try:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            try:
+                os.link(path, blob_path)
+            except FileExistsError:
+                if not os.path.samefile(path, blob_path):
+                    replace_with_link(blob_path, path)
+        except OSError as e:
+            logger.error('Could not link {} to its blob: {}'.format(name, e))
+            if blob.refcount <= 0:
+                transaction.on_commit(lambda: remove_orphan(sha256))
+            return None
+        link = BlobLink.objects.filter(name=name).first()
+        if link and link.blob_id == blob.pk:
+            return blob
+        if link:
+            # The file was overwritten with other content
+            unlink(link)
+        BlobLink.objects.create(name=name, blob=blob)
+        Blob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+    return blob
+
+def unlink(link):
+    '''
+    Remove a link. The blob is removed after the transaction commits
+    if this was the last link and no other file was stored since.
+    Call this inside a transaction.
+    '''
+    blob = Blob.objects.select_for_update().get(pk=link.blob_id)
+    link.delete()
+    Blob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+    if blob.refcount <= 1:
+        sha256 = blob.sha256
+        transaction.on_commit(lambda: remove_orphan(sha256))
+
+def remove_orphan(sha256):
+    '''
+    Remove a blob and its file if nothing links to it. The refcount is
+    checked again with the row locked, so content stored again after it
+    was unlinked keeps its file.
+    '''
+    with transaction.atomic():
+        orphan = Blob.objects.select_for_update().filter(
+            sha256=sha256,
+            refcount__lte=0,
+        ).first()
+        if orphan is None:
+            return
+        try:
+            os.unlink(get_blob_path(sha256))
+        except FileNotFoundError:
+            pass
+        orphan.delete()
+
+def release(path):
+    '''
+    Forget the link of a media file that is about to be deleted.
+    The blob is removed along with its last link.
+    '''
+    with transaction.atomic():
+        link = BlobLink.objects.filter(name=get_name(path)).first()
+        if link:
+            unlink(link)
+
+def get_charged_size(paths):
+    '''
+    Returns the bytes a set of media files counts against the capacity
+    of the members who own them. Content that is linked more than once
+    is counted once, and not at all if a file outside of the set in the
+    same member directory is linked to it.
+    '''
+    names = {get_name(path): path for path in paths}
+    linked = {
+        link.name: link.blob
+        for link in BlobLink.objects.select_related('blob').filter(
+            name__in=names,
+        )
+    }
+    total = 0
+    for name, path in names.items():
+        if name not in linked:
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+    if not linked:
+        return total
+    in_directory = Q()
+    for name in linked:
+        in_directory |= Q(name__startswith=name.split('/', 1)[0] + '/')
+    shared = set(BlobLink.objects.filter(
+        in_directory,
+        blob__in=linked.values(),
+    ).exclude(name__in=names).values_list('blob_id', flat=True))
+    blobs = {blob.pk: blob for blob in linked.values()}
+    return total + sum(
+        blob.size for pk, blob in blobs.items() if pk not in shared
+    )
+
+def get_report():
+    '''
+    Returns - A dict of the number of blobs and links, the bytes stored
+    on disk, the bytes the links would take as separate copies and the
+    difference between them.
+    '''
+    # Blobs without links are waiting to be removed
+    stored = Blob.objects.filter(refcount__gt=0)
+    totals = stored.aggregate(
+        stored_bytes=Sum('size'),
+        linked_bytes=Sum(ExpressionWrapper(
+            F('size') * F('refcount'),
+            output_field=BigIntegerField(),
+        )),
+    )
+    report = {
+        'blobs': stored.count(),
+        'links': BlobLink.objects.count(),
+        'stored_bytes': totals['stored_bytes'] or 0,
+        'linked_bytes': totals['linked_bytes'] or 0,
+    }
+    report['reclaimed_bytes'] = report['linked_bytes'] - report['stored_bytes']
+    return report
+
+def get_untracked_files():
+    '''
+    Yields the paths of files in the member directories that are not
+    linked to a blob yet.
+    '''
+    linked = set(BlobLink.objects.values_list('name', flat=True))
+    for entry in os.scandir(settings.MEDIA_ROOT):
+        if not entry.is_dir() or not entry.name.startswith('member_'):
+            continue
+        for root, dirs, files in os.walk(entry.path):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                if get_name(path) not in linked:
+                    yield path
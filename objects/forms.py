@@ -1,8 +1,10 @@
 from django import forms
 from django.forms import Textarea
+from django.core.validators import validate_comma_separated_integer_list
 from templates.widgets import ImagePreviewWidget, SoundPreviewWidget, VideoPreviewWidget
 from members.models import Member
 from .models import ObjectsAppProfile, ObjectsPageSection, Image, Sound, Video, Code, Link, Tag 
+from .models import VIDEO_LADDER_VALIDATOR
 
 class CustomModelChoiceIterator(forms.models.ModelChoiceIterator):
 
@@ -287,6 +289,33 @@ class ObjectsAppTranscoderSettingsForm(forms.ModelForm):
             sound and video files.""",
         max_length=128,
     )
+    ffprobe_path = forms.CharField(
+        help_text="""Specify the path to the ffprobe binary. \
+            It is used to report transcoding progress.""",
+        max_length=128,
+    )
+    transcoder_processes = forms.IntegerField(
+        help_text="""Number of sound and video files the background \
+            transcoder will convert at the same time.""",
+        max_value=64,
+        min_value=1,
+        widget=forms.NumberInput(
+            attrs={
+                'class': 'form-text-field',
+            }
+        ),
+    )
+    transcoder_max_attempts = forms.IntegerField(
+        help_text="""Number of times a failed transcode is attempted \
+            before it is given up on.""",
+        max_value=100,
+        min_value=1,
+        widget=forms.NumberInput(
+            attrs={
+                'class': 'form-text-field',
+            }
+        ),
+    )
     image_format = forms.CharField(
         help_text="""Choose the format which will be used to \
             transcode uploaded image files.""",
@@ -334,6 +363,43 @@ class ObjectsAppTranscoderSettingsForm(forms.ModelForm):
             }
         ),
     )
+    medium_max_height = forms.IntegerField(
+        max_value=7000,
+        min_value=250,
+        widget=forms.NumberInput(
+            attrs={
+                'class': 'form-text-field',
+            }
+        ),
+    )
+    medium_max_width = forms.IntegerField(
+        max_value=7000,
+        min_value=250,
+        widget=forms.NumberInput(
+            attrs={
+                'class': 'form-text-field',
+            }
+        ),
+    )
+    srcset_widths = forms.CharField(
+        help_text="""Comma separated widths in pixels. A copy of each \
+            uploaded image is made at every width so browsers can \
+            download the size that fits the screen.""",
+        max_length=64,
+        required=False,
+        validators=[validate_comma_separated_integer_list],
+    )
+    image_processes = forms.IntegerField(
+        help_text="""Number of threads used to resize \
+            uploaded images.""",
+        max_value=64,
+        min_value=1,
+        widget=forms.NumberInput(
+            attrs={
+                'class': 'form-text-field',
+            }
+        ),
+    )
     sound_format = forms.CharField(
         help_text="""Choose the format which will be used to \
             transcode uploaded sound files.""",
@@ -395,23 +461,56 @@ class ObjectsAppTranscoderSettingsForm(forms.ModelForm):
         ),
     )
 
+    video_ladder = forms.CharField(
+        help_text="""Comma separated height:Kbps pairs, for example \
+            360:800,720:2800. Uploaded videos are also packaged for \
+            adaptive streaming with a rendition at every height that \
+            is not taller than the upload. Leave blank to turn it off.""",
+        max_length=128,
+        required=False,
+        validators=[VIDEO_LADDER_VALIDATOR],
+    )
+    hls_segment_seconds = forms.IntegerField(
+        help_text="""Length of each adaptive streaming segment \
+            in seconds.""",
+        max_value=60,
+        min_value=1,
+        widget=forms.NumberInput(
+            attrs={
+                'class': 'form-text-field',
+            }
+        ),
+    )
+
     ffmpeg_path.widget.attrs.update({'class': 'form-text-field'})
+    ffprobe_path.widget.attrs.update({'class': 'form-text-field'})
+    srcset_widths.widget.attrs.update({'class': 'form-text-field'})
+    video_ladder.widget.attrs.update({'class': 'form-text-field'})
 
     class Meta:
         model = ObjectsAppProfile
         fields = (
             'ffmpeg_path',
+            'ffprobe_path',
+            'transcoder_processes',
+            'transcoder_max_attempts',
             'image_format',
             'image_max_height',
             'image_max_width',
             'thumbnail_max_height',
             'thumbnail_max_width',
+            'medium_max_height',
+            'medium_max_width',
+            'srcset_widths',
+            'image_processes',
             'sound_format',
             'sound_bitrate',
             'sound_crf',
             'video_format',
             'video_bitrate',
             'video_crf',
+            'video_ladder',
+            'hls_segment_seconds',
         )
         help_texts = {
             'links': "Add featured links that will appear on the landing page",
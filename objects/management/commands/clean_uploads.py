@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from objects import uploads
+
+
+class Command(BaseCommand):
+
+    help = """Remove resumable uploads that have not received a chunk \
+        for longer than CHUNKED_UPLOAD_EXPIRY hours, along with their \
+        staging files. Run it periodically, for example from cron."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=float,
+            help="Remove uploads idle for this many hours instead.",
+        )
+
+    def handle(self, *args, **options):
+        removed = uploads.remove_expired(options['hours'])
+        self.stdout.write('Removed {} uploads'.format(removed))
@@ -0,0 +1,78 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django import db
+from django.core.management.base import BaseCommand
+from objects import waveform
+from objects.models import ObjectsAppProfile, Sound, TranscodeJob
+
+
+def compute(pk, ffmpeg_cmd):
+    '''
+    Entry point for the worker processes.
+
+    Returns - An error message, or None on success.
+    '''
+    db.close_old_connections()
+    try:
+        sound = Sound.objects.filter(pk=pk).first()
+        if sound is None or not sound.sound_file:
+            return 'sound has no file'
+        waveform.write_peaks(sound, ffmpeg_cmd)
+    except Exception as e:
+        return str(e)
+    finally:
+        db.close_old_connections()
+    return None
+
+
+class Command(BaseCommand):
+
+    help = """Compute the waveform peaks of sounds that do not have them \
+        yet using a pool of worker processes."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            help="""Number of sounds decoded at once. \
+                Defaults to the value in the Objects app profile.""",
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Recompute the peaks of every sound.",
+        )
+
+    def handle(self, *args, **options):
+        profile = ObjectsAppProfile.get_profile()
+        processes = options['processes'] or profile.transcoder_processes or 1
+        sounds = Sound.objects.exclude(sound_file='')
+        if not options['all']:
+            sounds = sounds.filter(peaks_file__isnull=True)
+        # Sounds still waiting for the transcoder get peaks when it is done
+        sounds = sounds.exclude(transcode_jobs__status__in=(
+            TranscodeJob.QUEUED,
+            TranscodeJob.RUNNING,
+        ))
+        pks = list(sounds.values_list('pk', flat=True).distinct())
+        # Worker processes are forked on submit. Close the
+        # connections first so they are not shared with them.
+        db.connections.close_all()
+        failed = 0
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('fork'),
+        ) as executor:
+            futures = {
+                executor.submit(compute, pk, profile.ffmpeg_path): pk
+                for pk in pks
+            }
+            for future in as_completed(futures):
+                error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write('Sound {}: {}'.format(futures[future], error))
+        self.stdout.write('Computed peaks for {} of {} sounds'.format(
+            len(pks) - failed,
+            len(pks),
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from objects import blobs
+
+
+class Command(BaseCommand):
+
+    help = """Report how much space the content addressed media store \
+        saves. Use --store to link media files saved before the store \
+        existed, then run reconcile_media_usage --fix to update the \
+        media usage ledgers."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--store',
+            action='store_true',
+            help="Link the files in the member directories that are not in the store yet.",
+        )
+
+    def handle(self, *args, **options):
+        if options['store']:
+            stored = 0
+            for path in blobs.get_untracked_files():
+                if blobs.store(path):
+                    stored += 1
+            self.stdout.write('Linked {} files'.format(stored))
+        report = blobs.get_report()
+        self.stdout.write('Blobs: {}'.format(report['blobs']))
+        self.stdout.write('Linked files: {}'.format(report['links']))
+        self.stdout.write('Stored: {}'.format(
+            filesizeformat(report['stored_bytes']),
+        ))
+        self.stdout.write('Without sharing: {}'.format(
+            filesizeformat(report['linked_bytes']),
+        ))
+        self.stdout.write('Reclaimed: {} ({} bytes)'.format(
+            filesizeformat(report['reclaimed_bytes']),
+            report['reclaimed_bytes'],
+        ))
@@ -0,0 +1,96 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django import db
+from django.core.management.base import BaseCommand
+from objects import probe
+from objects.models import ObjectsAppProfile, Sound, Video, TranscodeJob
+
+MODELS = {
+    'sound': (Sound, 'sound_file'),
+    'video': (Video, 'video_file'),
+}
+
+
+def compute(kind, pk, ffprobe_cmd):
+    '''
+    Entry point for the worker processes.
+
+    Returns - An error message, or None on success.
+    '''
+    db.close_old_connections()
+    model, field = MODELS[kind]
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is None or not getattr(instance, field):
+            return '{} has no file'.format(kind)
+        probe.write_metadata(instance, ffprobe_cmd)
+    except Exception as e:
+        return str(e)
+    finally:
+        db.close_old_connections()
+    return None
+
+
+class Command(BaseCommand):
+
+    help = """Store the duration, codec, bitrate and stream properties \
+        of sounds and videos that do not have them yet using a pool of \
+        worker processes."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            help="""Number of files probed at once. \
+                Defaults to the value in the Objects app profile.""",
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Probe every sound and video again.",
+        )
+
+    def get_pks(self, kind, probe_all):
+        model, field = MODELS[kind]
+        instances = model.objects.exclude(**{field: ''})
+        if not probe_all:
+            instances = instances.filter(duration__isnull=True)
+        # Files still waiting for the transcoder are probed when it is done
+        instances = instances.exclude(transcode_jobs__status__in=(
+            TranscodeJob.QUEUED,
+            TranscodeJob.RUNNING,
+        ))
+        return list(instances.values_list('pk', flat=True).distinct())
+
+    def handle(self, *args, **options):
+        profile = ObjectsAppProfile.get_profile()
+        processes = options['processes'] or profile.transcoder_processes or 1
+        tasks = [
+            (kind, pk)
+            for kind in MODELS
+            for pk in self.get_pks(kind, options['all'])
+        ]
+        # Worker processes are forked on submit. Close the
+        # connections first so they are not shared with them.
+        db.connections.close_all()
+        failed = 0
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('fork'),
+        ) as executor:
+            futures = {
+                executor.submit(compute, kind, pk, profile.ffprobe_path): (kind, pk)
+                for kind, pk in tasks
+            }
+            for future in as_completed(futures):
+                error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write('{} {}: {}'.format(
+                        *futures[future],
+                        error,
+                    ))
+        self.stdout.write('Probed {} of {} files'.format(
+            len(tasks) - failed,
+            len(tasks),
+        ))
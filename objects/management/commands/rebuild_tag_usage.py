@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from objects.models import TagUsage
+
+
+class Command(BaseCommand):
+
+    help = """Rebuild the tag usage index from the tags of every \
+        public object."""
+
+    def handle(self, *args, **options):
+        written = TagUsage.rebuild()
+        self.stdout.write('Wrote {} tag usage rows'.format(written))
@@ -0,0 +1,119 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from django import db
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from objects import renditions
+
+
+class Command(BaseCommand):
+
+    help = """Build the renditions of queued Images, such as the images \
+        of a gallery upload, using a pool of worker processes."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            help="""Number of images rendered at once. Defaults to \
+                RENDITION_PROCESSES. With one process the images are \
+                rendered in this process.""",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Exit when the queue is empty instead of waiting for jobs.",
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=5,
+            help="Seconds to wait between checks of an empty queue.",
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=30,
+            help="""Minutes after which a running job is assumed to belong \
+                to a dead worker and is queued again.""",
+        )
+
+    def get_executor(self, processes):
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('fork'),
+        )
+
+    def handle(self, *args, **options):
+        processes = (
+            options['processes']
+            or getattr(settings, 'RENDITION_PROCESSES', 1)
+            or 1
+        )
+        requeued = renditions.requeue_stale_jobs(options['stale_after'])
+        if requeued:
+            self.stdout.write('Requeued {} stale jobs'.format(requeued))
+        try:
+            if processes == 1:
+                self.run_inline(options)
+            else:
+                self.run_pool(processes, options)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping renderer')
+
+    def run_inline(self, options):
+        while True:
+            pk = renditions.claim_next_job()
+            if pk is None:
+                if options['once']:
+                    break
+                db.close_old_connections()
+                time.sleep(options['poll'])
+                continue
+            # Rendered with the threads set in the app profile
+            renditions.run_job(pk)
+            self.stdout.write('Finished job {}'.format(pk))
+
+    def run_pool(self, processes, options):
+        running = {}
+        executor = self.get_executor(processes)
+        try:
+            while True:
+                # Keep every worker busy while there are jobs in the queue
+                while len(running) < processes:
+                    pk = renditions.claim_next_job()
+                    if pk is None:
+                        break
+                    # Worker processes are forked on submit. Close the
+                    # connections first so they are not shared with them.
+                    db.connections.close_all()
+                    # The workers already run in parallel, one thread each
+                    running[executor.submit(renditions.run_job, pk, 1)] = pk
+                if not running:
+                    if options['once']:
+                        break
+                    db.close_old_connections()
+                    time.sleep(options['poll'])
+                    continue
+                done, pending = wait(
+                    running,
+                    timeout=options['poll'],
+                    return_when=FIRST_COMPLETED,
+                )
+                broken = False
+                for future in done:
+                    pk = running.pop(future)
+                    error = future.exception()
+                    if error:
+                        # The worker died before it could record the result
+                        renditions.fail_job(pk, repr(error))
+                    self.stdout.write('Finished job {}'.format(pk))
+                    if isinstance(error, BrokenProcessPool):
+                        broken = True
+                if broken and not running:
+                    executor.shutdown(wait=False)
+                    executor = self.get_executor(processes)
+        finally:
+            executor.shutdown(wait=True)
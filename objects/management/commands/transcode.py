@@ -0,0 +1,96 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from django import db
+from django.core.management.base import BaseCommand
+from objects import transcoder
+from objects.models import ObjectsAppProfile
+
+
+class Command(BaseCommand):
+
+    help = """Run the background transcoder. Queued Sound and Video jobs \
+        are converted with ffmpeg using a pool of worker processes."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            help="""Number of parallel ffmpeg jobs. \
+                Defaults to the value in the Objects app profile.""",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Exit when the queue is empty instead of waiting for jobs.",
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=5,
+            help="Seconds to wait between checks of an empty queue.",
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=360,
+            help="""Minutes after which a running job is assumed to belong \
+                to a dead worker and is queued again.""",
+        )
+
+    def get_executor(self, processes):
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('fork'),
+        )
+
+    def handle(self, *args, **options):
+        profile = ObjectsAppProfile.get_profile()
+        processes = options['processes'] or profile.transcoder_processes or 1
+        requeued = transcoder.requeue_stale_jobs(options['stale_after'])
+        if requeued:
+            self.stdout.write('Requeued {} stale jobs'.format(requeued))
+
+        running = {}
+        executor = self.get_executor(processes)
+        try:
+            while True:
+                # Keep every worker busy while there are jobs in the queue
+                while len(running) < processes:
+                    pk = transcoder.claim_next_job()
+                    if pk is None:
+                        break
+                    # Worker processes are forked on submit. Close the
+                    # connections first so they are not shared with them.
+                    db.connections.close_all()
+                    running[executor.submit(transcoder.run_job, pk)] = pk
+                    self.stdout.write('Started job {}'.format(pk))
+                if not running:
+                    if options['once']:
+                        break
+                    db.close_old_connections()
+                    time.sleep(options['poll'])
+                    continue
+                done, pending = wait(
+                    running,
+                    timeout=options['poll'],
+                    return_when=FIRST_COMPLETED,
+                )
+                broken = False
+                for future in done:
+                    pk = running.pop(future)
+                    error = future.exception()
+                    if error:
+                        # The worker died before it could record the result
+                        transcoder.fail_job(pk, repr(error))
+                    self.stdout.write('Finished job {}'.format(pk))
+                    if isinstance(error, BrokenProcessPool):
+                        broken = True
+                if broken and not running:
+                    executor.shutdown(wait=False)
+                    executor = self.get_executor(processes)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping transcoder')
+        finally:
+            executor.shutdown(wait=True)
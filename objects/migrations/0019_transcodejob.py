@@ -0,0 +1,48 @@
+# Generated by Django 3.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objects', '0018_auto_20210428_1522'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='objectsappprofile',
+            name='ffprobe_path',
+            field=models.CharField(default='/usr/bin/ffprobe', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='objectsappprofile',
+            name='transcoder_processes',
+            field=models.PositiveIntegerField(default=2),
+        ),
+        migrations.AddField(
+            model_name='objectsappprofile',
+            name='transcoder_max_attempts',
+            field=models.PositiveIntegerField(default=3),
+        ),
+        migrations.CreateModel(
+            name='TranscodeJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Processing'), ('DONE', 'Done'), ('FAILED', 'Failed')], db_index=True, default='QUEUED', max_length=8)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, max_length=65535, null=True)),
+                ('creation_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('start_date', models.DateTimeField(blank=True, null=True)),
+                ('finish_date', models.DateTimeField(blank=True, null=True)),
+                ('sound', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transcode_jobs', to='objects.sound')),
+                ('video', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transcode_jobs', to='objects.video')),
+            ],
+            options={
+                'ordering': ['creation_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2 on 2026-10-18 10:41
+
+import django.core.validators
+from django.db import migrations, models
+import objects.models
+import re
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objects', '0019_transcodejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='objectsappprofile',
+            name='medium_max_height',
+            field=models.PositiveIntegerField(default=1280),
+        ),
+        migrations.AddField(
+            model_name='objectsappprofile',
+            name='medium_max_width',
+            field=models.PositiveIntegerField(default=1280),
+        ),
+        migrations.AddField(
+            model_name='objectsappprofile',
+            name='srcset_widths',
+            field=models.CharField(blank=True, default='480,960,1920', max_length=64, validators=[django.core.validators.RegexValidator(re.compile('^\\d+(?:,\\d+)*\\Z'), code='invalid', message='Enter only digits separated by commas.')]),
+        ),
+        migrations.AddField(
+            model_name='objectsappprofile',
+            name='image_processes',
+            field=models.PositiveIntegerField(default=2),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='medium_file',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to=objects.models.member_medium_dir),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2 on 2026-10-18 12:05
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def build_tag_usage(apps, schema_editor):
+    '''
+    Count the public instances of every tagged model per tag.
+    '''
+    TagUsage = apps.get_model('objects', 'TagUsage')
+    for model in apps.get_models():
+        try:
+            field = model._meta.get_field('tags')
+            model._meta.get_field('is_public')
+        except Exception:
+            continue
+        if not field.many_to_many or field.related_model._meta.label_lower != 'objects.tag':
+            continue
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name() + '_id'
+        counts = through.objects.filter(
+            **{source + '__is_public': True}
+        ).order_by().values(target).annotate(n=Count('pk')).values_list(target, 'n')
+        TagUsage.objects.bulk_create(
+            [
+                TagUsage(tag_id=pk, model=model._meta.label_lower, count=n)
+                for pk, n in counts
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objects', '0020_image_renditions'),
+        ('art', '0007_alter_artpagesection_order'),
+        ('documentation', '0023_auto_20210428_1522'),
+        ('home', '0008_auto_20210506_1747'),
+        ('members', '0025_mediausage'),
+        ('music', '0010_alter_musicpagesection_order'),
+        ('posts', '0017_auto_20210507_2126'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=128)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='objects.tag')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tagusage',
+            index=models.Index(fields=['model', 'count'], name='objects_tag_model_f122ee_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagusage',
+            constraint=models.UniqueConstraint(fields=('tag', 'model'), name='tag-model pair'),
+        ),
+        migrations.RunPython(build_tag_usage, migrations.RunPython.noop),
+    ]
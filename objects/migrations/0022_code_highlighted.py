@@ -0,0 +1,28 @@
+# Generated by Django 3.2 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objects', '0021_tagusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='code',
+            name='highlighted',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='code',
+            name='highlighted_md5',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name='code',
+            name='lexer',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
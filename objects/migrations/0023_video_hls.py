@@ -0,0 +1,29 @@
+# Generated by Django 3.2 on 2026-10-18 16:40
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objects', '0022_code_highlighted'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='objectsappprofile',
+            name='video_ladder',
+            field=models.CharField(blank=True, default='360:800,720:2800,1080:5000', max_length=128, validators=[django.core.validators.RegexValidator('^(\\d+:\\d+(,\\d+:\\d+)*)?$', 'Enter height:Kbps pairs separated by commas.')]),
+        ),
+        migrations.AddField(
+            model_name='objectsappprofile',
+            name='hls_segment_seconds',
+            field=models.PositiveIntegerField(default=6),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='hls_playlist',
+            field=models.FileField(blank=True, editable=False, max_length=256, null=True, upload_to=''),
+        ),
+    ]
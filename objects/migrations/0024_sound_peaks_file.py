@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objects', '0023_video_hls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sound',
+            name='peaks_file',
+            field=models.FileField(blank=True, editable=False, max_length=256, null=True, upload_to=''),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2 on 2026-10-18 19:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import objects.models
+import objects.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objects', '0025_media_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('creation_date', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BlobLink',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=256, unique=True)),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='links', to='objects.blob')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='image_file',
+            field=models.ImageField(max_length=255, storage=objects.storage.BlobStorage(), upload_to=objects.models.member_image_dir),
+        ),
+        migrations.AlterField(
+            model_name='sound',
+            name='sound_file',
+            field=models.FileField(max_length=256, storage=objects.storage.BlobStorage(), upload_to=objects.models.member_sound_dir),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='video_file',
+            field=models.FileField(max_length=256, storage=objects.storage.BlobStorage(), upload_to=objects.models.member_video_dir),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2 on 2026-10-18 21:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objects', '0027_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenditionJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Processing'), ('DONE', 'Done'), ('FAILED', 'Failed')], db_index=True, default='QUEUED', max_length=8)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, max_length=65535, null=True)),
+                ('creation_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('start_date', models.DateTimeField(blank=True, null=True)),
+                ('finish_date', models.DateTimeField(blank=True, null=True)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rendition_jobs', to='objects.image')),
+            ],
+            options={
+                'ordering': ['creation_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-18 22:05
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def mark_finished(apps, schema_editor):
+    '''
+    Uploads that already made a Sound or Video are finished.
+    '''
+    ChunkedUpload = apps.get_model('objects', 'ChunkedUpload')
+    ChunkedUpload.objects.filter(
+        Q(sound__isnull=False) | Q(video__isnull=False),
+    ).update(finished=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('objects', '0028_renditionjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='finished',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_finished, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,26 @@
 import hashlib
+import os
+import uuid
 from itertools import chain
-from django.db import models
+from django.apps import apps
+from django.conf import settings
+from django.core.validators import (
+    RegexValidator, validate_comma_separated_integer_list,
+)
+from django.db import models, transaction
 from django.urls import reverse
 from django.utils import timezone
 from lookaway.mixins import AppProfile, Section
 from crypto.models import CryptoWalletsMixin
 from members.mixins import MarshmallowMixin
 from .mixins import MetaDataMixin
+from .storage import blob_storage
 
+# Comma separated height:Kbps pairs for adaptive video streaming
+VIDEO_LADDER_VALIDATOR = RegexValidator(
+    r'^(\d+:\d+(,\d+:\d+)*)?$',
+    'Enter height:Kbps pairs separated by commas.',
+)
 
 # Create your models here.
 
@@ -65,12 +78,34 @@ class ObjectsAppProfile(AppProfile, CryptoWalletsMixin):
         max_length=64,
         default="/usr/bin/ffmpeg"
     )
+    ## Path ffprobe binary (ships with ffmpeg)
+    ffprobe_path = models.CharField(
+        max_length=64,
+        default="/usr/bin/ffprobe"
+    )
+
+    ## Background transcoder
+    ## Number of ffmpeg processes run in parallel by the transcode worker
+    transcoder_processes = models.PositiveIntegerField(default=2)
+    ## Number of times a failed job is attempted before it is given up on
+    transcoder_max_attempts = models.PositiveIntegerField(default=3)
 
     ## Image dimensions in pixels
     image_max_height = models.PositiveIntegerField(default=2500)
     image_max_width = models.PositiveIntegerField(default=2500)
     thumbnail_max_height = models.PositiveIntegerField(default=250)
     thumbnail_max_width = models.PositiveIntegerField(default=250)
+    medium_max_height = models.PositiveIntegerField(default=1280)
+    medium_max_width = models.PositiveIntegerField(default=1280)
+    ## Comma separated widths used for responsive srcset renditions
+    srcset_widths = models.CharField(
+        max_length=64,
+        default="480,960,1920",
+        blank=True,
+        validators=[validate_comma_separated_integer_list],
+    )
+    ## Number of threads used to render image sizes in parallel
+    image_processes = models.PositiveIntegerField(default=2)
 
     ## Media formats
     image_format = models.CharField(
@@ -92,6 +127,17 @@ class ObjectsAppProfile(AppProfile, CryptoWalletsMixin):
     video_crf = models.PositiveIntegerField(default=10)
     video_qmin = models.PositiveIntegerField(default=0)
     video_qmax = models.PositiveIntegerField(default=51)
+    ## Adaptive streaming
+    ## Comma separated height:Kbps pairs, one HLS rendition is made for each
+    ## height that is not taller than the upload. Leave blank to turn it off.
+    video_ladder = models.CharField(
+        max_length=128,
+        default="360:800,720:2800,1080:5000",
+        blank=True,
+        validators=[VIDEO_LADDER_VALIDATOR],
+    )
+    ## Length of each HLS segment in seconds
+    hls_segment_seconds = models.PositiveIntegerField(default=6)
 
     class Meta:
         verbose_name = "App Profile"
@@ -171,20 +217,141 @@ class Tag(models.Model):
         '''
         Returns a queryset of tags related to instances of a given model
         for which "is_public" boolean field True.
+        Reads the tag usage index, so this is a single query.
         '''
-        tags = Tag.objects.none()
-        objects = model.objects.filter(is_public=True).prefetch_related('tags')
-        for o in objects:
-            if o.tags.count() > 0:
-                # Merge tags into queryset
-                tags = tags | o.tags.all()
-        return tags.distinct()
+        return Tag.get_public_tags([model])
+
+    def get_public_tags(models):
+        '''
+        Returns a queryset of tags used by at least one public instance
+        of any of the given models.
+        '''
+        return Tag.objects.filter(
+            usage__model__in=[m._meta.label_lower for m in models],
+            usage__count__gt=0,
+        ).distinct()
 
     def __str__(self):
         if self.value:
             return '{}: {}'.format(self.key, self.value)
         else: return '{}'.format(self.key) 
 
+    def get_absolute_url(self):
+        return reverse('objects:tag_detail', kwargs={'slug': self.slug})
+
+class TagUsage(models.Model):
+    '''
+    The number of public instances of a model that use a tag.
+    Kept current by the tag and publishing signals so tag clouds
+    can be read with one query.
+    '''
+
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='usage',
+    )
+    ## The "app_label.model_name" label of the tagged model
+    model = models.CharField(max_length=128)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'model'],
+                name='tag-model pair',
+            )
+        ]
+        indexes = [
+            models.Index(fields=['model', 'count']),
+        ]
+
+    def __str__(self):
+        return '{} - {}: {}'.format(self.tag, self.model, self.count)
+
+    @staticmethod
+    def get_tagged_models():
+        '''
+        Returns every installed model that can be tagged.
+        '''
+        return [m for m in apps.get_models() if issubclass(m, MetaDataMixin)]
+
+    @staticmethod
+    def count_public(model, tag_ids=None):
+        '''
+        Count the public instances of a model per tag in one grouped query.
+
+        Arguments
+        model   - A model that uses MetaDataMixin.
+        tag_ids - Only count these tags. Counts every tag if None.
+
+        Returns - A dict of tag pk to count.
+        '''
+        field = model._meta.get_field('tags')
+        through = field.remote_field.through
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        rows = through.objects.filter(
+            **{'{}__is_public'.format(source): True}
+        )
+        if tag_ids is not None:
+            rows = rows.filter(**{'{}_id__in'.format(target): tag_ids})
+        return dict(
+            rows.order_by().values(
+                '{}_id'.format(target),
+            ).annotate(
+                n=models.Count('pk'),
+            ).values_list('{}_id'.format(target), 'n')
+        )
+
+    @classmethod
+    def refresh(cls, model, tag_ids):
+        '''
+        Recount the given tags for a model and store the results.
+        '''
+        tag_ids = set(tag_ids)
+        if not tag_ids:
+            return
+        label = model._meta.label_lower
+        counts = cls.count_public(model, tag_ids)
+        existing = cls.objects.filter(model=label, tag_id__in=tag_ids)
+        changed = []
+        for usage in existing:
+            count = counts.get(usage.tag_id, 0)
+            tag_ids.discard(usage.tag_id)
+            if usage.count != count:
+                usage.count = count
+                changed.append(usage)
+        if changed:
+            cls.objects.bulk_update(changed, ['count'])
+        new = [
+            cls(tag_id=pk, model=label, count=counts[pk])
+            for pk in tag_ids if counts.get(pk)
+        ]
+        if new:
+            cls.objects.bulk_create(new, ignore_conflicts=True)
+
+    @classmethod
+    def rebuild(cls, models=None):
+        '''
+        Replace the index for the given models, or every tagged model,
+        with counts from the database.
+
+        Returns - The number of rows written.
+        '''
+        written = 0
+        for model in models or cls.get_tagged_models():
+            label = model._meta.label_lower
+            rows = [
+                cls(tag_id=pk, model=label, count=n)
+                for pk, n in cls.count_public(model).items()
+            ]
+            with transaction.atomic():
+                cls.objects.filter(model=label).delete()
+                cls.objects.bulk_create(rows, batch_size=1000)
+            written += len(rows)
+        return written
+
 ### Site Objects
 
 ## Image - Digital visual media uploaded by a Member
@@ -214,11 +381,24 @@ def member_thumbnail_dir(instance, filename):
         )
     )
 
+def member_medium_dir(instance, filename):
+    try:
+        owner = instance.owner.id
+    except:
+        owner = 0
+    return instance.creation_date.strftime(
+        'member_{0}/images/medium/%Y/%m/%d/{1}'.format(
+            owner,
+            filename
+        )
+    )
+
 class Image(MetaDataMixin, MarshmallowMixin):
 
     image_file = models.ImageField(
         upload_to=member_image_dir,
         max_length=255,
+        storage=blob_storage,
     )
     title = models.CharField(
         max_length=64,
@@ -239,12 +419,48 @@ class Image(MetaDataMixin, MarshmallowMixin):
         blank = True,
         null = True,
     )
+    medium_file = models.ImageField(
+        upload_to=member_medium_dir,
+        max_length=255,
+        blank = True,
+        null = True,
+    )
+    ## Responsive renditions, maps the width in pixels to the file path.
+    ## The full size image is included.
+    renditions = models.JSONField(
+        default=dict,
+        blank=True,
+    )
 
     def __str__(self):
         return self.title
 
     def get_absolute_url(self):
         return reverse('objects:image_detail', kwargs={'pk': self.pk})
+
+    def get_file_names(self):
+        '''
+        Returns the set of file names, relative to MEDIA_ROOT,
+        of every rendition of this image.
+        '''
+        names = set(self.renditions.values())
+        for field in (self.image_file, self.thumbnail_file, self.medium_file):
+            if field:
+                names.add(field.name)
+        return names
+
+    def get_srcset(self):
+        '''
+        Returns the renditions of this image as the value of an
+        HTML srcset attribute.
+        '''
+        return ', '.join(
+            '{}{} {}w'.format(settings.MEDIA_URL, path, width)
+            for width, path in sorted(
+                self.renditions.items(),
+                key=lambda r: int(r[0]),
+            )
+        )
    
     class Meta:
         ordering = ['order']
@@ -289,6 +505,43 @@ class Sound(MetaDataMixin, MarshmallowMixin):
     sound_file = models.FileField(
         upload_to=member_sound_dir,
         max_length=256,
+        storage=blob_storage,
+    )
+    ## Waveform peaks sidecar, see objects/waveform.py
+    peaks_file = models.FileField(
+        max_length=256,
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    ## Probed from the transcoded file, see objects/probe.py
+    duration = models.FloatField(
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+    )
+    codec = models.CharField(
+        max_length=32,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+    )
+    bitrate = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    sample_rate = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    channels = models.PositiveSmallIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
     )
     title = models.CharField(
         max_length=64,
@@ -313,6 +566,12 @@ class Sound(MetaDataMixin, MarshmallowMixin):
     def get_absolute_url(self):
         return reverse('objects:sound_detail', kwargs={'pk': self.pk})
 
+    def get_transcode_job(self):
+        '''
+        Returns the most recent transcode job for this sound or None.
+        '''
+        return self.transcode_jobs.order_by('-creation_date').first()
+
 ## Video - Digital video media uploaded by a Member
 
 # User specific path for audio uploads
@@ -334,6 +593,48 @@ class Video(MetaDataMixin, MarshmallowMixin):
     video_file = models.FileField(
         upload_to=member_video_dir,
         max_length=256,
+        storage=blob_storage,
+    )
+    ## HLS master playlist, the segments are kept in the same directory
+    hls_playlist = models.FileField(
+        max_length=256,
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    ## Probed from the transcoded file, see objects/probe.py
+    duration = models.FloatField(
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+    )
+    codec = models.CharField(
+        max_length=32,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
+    )
+    bitrate = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    width = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    height = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    fps = models.FloatField(
+        blank=True,
+        null=True,
+        editable=False,
     )
     title = models.CharField(
         max_length=64,
@@ -358,6 +659,310 @@ class Video(MetaDataMixin, MarshmallowMixin):
     def get_absolute_url(self):
         return reverse('objects:video_detail', kwargs={'pk': self.pk}) 
 
+    def get_transcode_job(self):
+        '''
+        Returns the most recent transcode job for this video or None.
+        '''
+        return self.transcode_jobs.order_by('-creation_date').first()
+
+    def get_hls_dir(self):
+        '''
+        Returns the directory of the HLS playlists and segments,
+        relative to MEDIA_ROOT, or None.
+        '''
+        if not self.hls_playlist:
+            return None
+        return os.path.dirname(self.hls_playlist.name)
+
+## Transcode Job - A queued ffmpeg conversion of an uploaded Sound or Video
+
+class TranscodeJob(models.Model):
+    '''
+    A unit of work for the background transcoder.
+    Uploads are saved as they are and a job is queued. The "transcode"
+    management command claims queued jobs and runs ffmpeg outside of
+    the request cycle.
+    '''
+
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Processing'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    sound = models.ForeignKey(
+        'objects.sound',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='transcode_jobs',
+    )
+    video = models.ForeignKey(
+        'objects.video',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='transcode_jobs',
+    )
+    status = models.CharField(
+        max_length=8,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        db_index=True,
+    )
+    ## Percent complete, reported by ffmpeg while the job is running
+    progress = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(
+        max_length=65535,
+        blank=True,
+        null=True,
+    )
+    creation_date = models.DateTimeField(
+        default=timezone.now,
+    )
+    start_date = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+    finish_date = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        ordering = ['creation_date']
+
+    def __str__(self):
+        return '{} {} ({})'.format(
+            self.get_kind(),
+            self.get_instance(),
+            self.get_status_display(),
+        )
+
+    def get_instance(self):
+        '''
+        Returns the Sound or Video this job belongs to.
+        '''
+        return self.sound or self.video
+
+    def get_kind(self):
+        if self.sound_id:
+            return 'sound'
+        else:
+            return 'video'
+
+    def is_pending(self):
+        return self.status in (self.QUEUED, self.RUNNING)
+
+class RenditionJob(models.Model):
+    '''
+    A unit of work for the background image renderer.
+    Images that are created in bulk, such as the images of a gallery
+    upload, do not send post_save. A job is queued for each of them and
+    the "render_images" management command builds their renditions
+    outside of the request cycle.
+    '''
+
+    QUEUED = 'QUEUED'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Processing'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    image = models.ForeignKey(
+        'objects.image',
+        on_delete=models.CASCADE,
+        related_name='rendition_jobs',
+    )
+    status = models.CharField(
+        max_length=8,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        db_index=True,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(
+        max_length=65535,
+        blank=True,
+        null=True,
+    )
+    creation_date = models.DateTimeField(
+        default=timezone.now,
+    )
+    start_date = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+    finish_date = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        ordering = ['creation_date']
+
+    def __str__(self):
+        return 'image {} ({})'.format(
+            self.image_id,
+            self.get_status_display(),
+        )
+
+    def is_pending(self):
+        return self.status in (self.QUEUED, self.RUNNING)
+
+## Blob - A file in the content addressed store, see objects/blobs.py
+
+class Blob(models.Model):
+    '''
+    One copy of a file's content, kept under its SHA-256 hash.
+    Every media file with the same content is a hard link to it.
+    '''
+
+    # Directory of the blobs in MEDIA_ROOT
+    DIRECTORY = 'blobs'
+
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True,
+    )
+    size = models.BigIntegerField()
+    ## Number of media files linked to the blob
+    refcount = models.PositiveIntegerField(
+        default=0,
+    )
+    creation_date = models.DateTimeField(
+        default=timezone.now,
+    )
+
+    def __str__(self):
+        return self.sha256
+
+    def get_name(self):
+        '''
+        Returns the path of the blob relative to MEDIA_ROOT.
+        '''
+        return '{}/{}/{}/{}'.format(
+            self.DIRECTORY,
+            self.sha256[:2],
+            self.sha256[2:4],
+            self.sha256,
+        )
+
+class BlobLink(models.Model):
+    '''
+    A media file that is a hard link to a blob.
+    '''
+
+    ## Path relative to MEDIA_ROOT
+    name = models.CharField(
+        max_length=256,
+        unique=True,
+    )
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.CASCADE,
+        related_name='links',
+    )
+
+    def __str__(self):
+        return self.name
+
+## Chunked Upload - A resumable upload of a Sound or Video, see objects/uploads.py
+
+class ChunkedUpload(models.Model):
+    '''
+    A large Sound or Video upload sent in chunks. The chunks are written
+    to a staging file until it has the announced length, then the file
+    becomes a new Sound or Video.
+    '''
+
+    SOUND = 'sound'
+    VIDEO = 'video'
+    KIND_CHOICES = [
+        (SOUND, 'Sound'),
+        (VIDEO, 'Video'),
+    ]
+
+    uuid = models.UUIDField(
+        default=uuid.uuid4,
+        unique=True,
+        editable=False,
+    )
+    owner = models.ForeignKey(
+        'members.member',
+        on_delete=models.CASCADE,
+        related_name='chunked_uploads',
+    )
+    kind = models.CharField(
+        max_length=8,
+        choices=KIND_CHOICES,
+    )
+    file_name = models.CharField(
+        max_length=255,
+    )
+    ## Bytes announced when the upload was created
+    length = models.BigIntegerField()
+    ## Bytes received so far
+    offset = models.BigIntegerField(
+        default=0,
+    )
+    creation_date = models.DateTimeField(
+        default=timezone.now,
+    )
+    last_modified = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+    )
+    ## Set by the request that turns the complete upload into a Sound
+    ## or Video, so only one request does
+    finished = models.BooleanField(
+        default=False,
+    )
+    ## The Sound or Video made from the finished upload
+    sound = models.ForeignKey(
+        Sound,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+    video = models.ForeignKey(
+        Video,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+
+    def __str__(self):
+        return '{} {} ({}/{})'.format(
+            self.kind,
+            self.file_name,
+            self.offset,
+            self.length,
+        )
+
+    def get_absolute_url(self):
+        return reverse('objects:chunked_upload', kwargs={'uuid': self.uuid})
+
+    def get_instance(self):
+        '''
+        Returns the Sound or Video made from this upload, or None.
+        '''
+        return self.sound or self.video
+
+    def is_complete(self):
+        return self.offset >= self.length
+
 ## Code - Used to hold examples of code to be displayed on a page inside <pre> tags
 class Code(MetaDataMixin, MarshmallowMixin):
 
@@ -396,6 +1001,21 @@ class Code(MetaDataMixin, MarshmallowMixin):
     md5 = models.CharField(
         max_length=32,
     )
+    # Highlighted HTML and the Pygments lexer used to make it
+    highlighted = models.TextField(
+        blank=True,
+        null=True,
+    )
+    highlighted_md5 = models.CharField(
+        max_length=32,
+        blank=True,
+        null=True,
+    )
+    lexer = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+    )
 
     class Meta:
         ordering = ['order', 'title', 'language',]
@@ -414,6 +1034,76 @@ class Code(MetaDataMixin, MarshmallowMixin):
         digest = md5.hexdigest()
         return digest
 
+    def get_lexer(code, path):
+        '''
+        Returns - A Pygments lexer for the file path. If there is no
+        path or it is not recognized the lexer is guessed from the code,
+        which is slow for large snippets.
+        '''
+        from pygments.lexers import guess_lexer, get_lexer_for_filename
+        from pygments.util import ClassNotFound
+        if path:
+            try:
+                return get_lexer_for_filename(path)
+            except ClassNotFound:
+                pass
+        return guess_lexer(code)
+
+    def highlight_code(code, lexer):
+        '''
+        Returns - The code as highlighted HTML.
+        '''
+        from pygments import highlight
+        from pygments.formatters import HtmlFormatter
+        formatter = HtmlFormatter(cssclass="highlight code-block", style="friendly")
+        return highlight(code, lexer, formatter)
+
+    def update_highlighted(self):
+        '''
+        Highlight the code if it or the file path has changed since
+        it was last highlighted. A lexer that was guessed is kept
+        for as long as the code is the same.
+        '''
+        from pygments.lexers import get_lexer_by_name
+        from pygments.util import ClassNotFound
+        self.md5 = Code.get_md5(self.code)
+        lexer = None
+        if self.file_path:
+            lexer = Code.get_lexer(self.code, self.file_path)
+        elif self.lexer and self.highlighted_md5 == self.md5:
+            try:
+                lexer = get_lexer_by_name(self.lexer)
+            except ClassNotFound:
+                pass
+        if lexer is None:
+            lexer = Code.get_lexer(self.code, None)
+        name = lexer.aliases[0] if lexer.aliases else lexer.name
+        if self.highlighted_md5 != self.md5 or self.lexer != name \
+                or self.highlighted is None:
+            self.highlighted = Code.highlight_code(self.code, lexer)
+            self.highlighted_md5 = self.md5
+            self.lexer = name[:64]
+
+    def get_highlighted(self):
+        '''
+        Returns - The stored highlighted HTML. Code saved before it was
+        stored is highlighted once here and written back.
+        '''
+        from django.utils.safestring import mark_safe
+        if self.highlighted is None or self.highlighted_md5 != Code.get_md5(self.code):
+            self.update_highlighted()
+            Code.objects.filter(pk=self.pk).update(
+                md5=self.md5,
+                highlighted=self.highlighted,
+                highlighted_md5=self.highlighted_md5,
+                lexer=self.lexer,
+            )
+        return mark_safe(self.highlighted)
+
+    def save(self, *args, **kwargs):
+        self.update_highlighted()
+        super().save(*args, **kwargs)
+
 ## Link - External URL for online resources outside of the site domain
 
 class Link(MetaDataMixin, MarshmallowMixin):
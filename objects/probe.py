@@ -0,0 +1,127 @@
+import json
+import subprocess
+from fractions import Fraction
+from lookaway import versions
+from .models import ObjectsAppProfile, Sound
+'''
+Media metadata.
+
+The duration, codec, bitrate and stream properties of each Sound and
+Video are read with ffprobe once after it is transcoded and kept on the
+instance so pages can show them without opening the file.
+'''
+
+def probe(ffprobe_cmd, path):
+    '''
+    Returns - The format and streams of a media file as reported
+    by ffprobe.
+
+    Raises RuntimeError if ffprobe fails.
+    '''
+    command = [
+        ffprobe_cmd,
+        '-v', 'error',
+        '-show_format',
+        '-show_streams',
+        '-of', 'json',
+        str(path),
+    ]
+    try:
+        result = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=60,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(str(e))
+    if result.returncode != 0:
+        raise RuntimeError(
+            'ffprobe exited with status {}\n{}'.format(
+                result.returncode,
+                result.stderr.decode(errors='replace')[-2000:],
+            )
+        )
+    try:
+        return json.loads(result.stdout.decode())
+    except ValueError as e:
+        raise RuntimeError('ffprobe output is not JSON: {}'.format(e))
+
+def to_number(value, kind=float):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+def to_fps(rate):
+    '''
+    Returns - A frame rate like "30000/1001" as a float, or None.
+    '''
+    try:
+        rate = Fraction(rate)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return round(float(rate), 3) if rate > 0 else None
+
+def get_rotation(stream):
+    rotation = stream.get('tags', {}).get('rotate')
+    for side_data in stream.get('side_data_list', []):
+        rotation = side_data.get('rotation', rotation)
+    return to_number(rotation, int) or 0
+
+def get_metadata(data, kind):
+    '''
+    Returns - A dict of the Sound or Video fields from ffprobe data.
+    Missing values are None.
+    '''
+    fmt = data.get('format', {})
+    codec_type = 'audio' if kind == 'sound' else 'video'
+    stream = next(
+        (s for s in data.get('streams', []) if s.get('codec_type') == codec_type),
+        {},
+    )
+    duration = to_number(fmt.get('duration')) or to_number(stream.get('duration'))
+    bitrate = to_number(fmt.get('bit_rate'), int) or to_number(
+        stream.get('bit_rate'),
+        int,
+    )
+    metadata = {
+        'duration': duration,
+        'codec': (stream.get('codec_name') or '')[:32] or None,
+        'bitrate': bitrate,
+    }
+    if kind == 'sound':
+        metadata['sample_rate'] = to_number(stream.get('sample_rate'), int)
+        metadata['channels'] = to_number(stream.get('channels'), int)
+    else:
+        width = to_number(stream.get('width'), int)
+        height = to_number(stream.get('height'), int)
+        # Players show portrait phone videos turned upright
+        if get_rotation(stream) % 180:
+            width, height = height, width
+        metadata['width'] = width
+        metadata['height'] = height
+        metadata['fps'] = to_fps(
+            stream.get('avg_frame_rate')
+        ) or to_fps(stream.get('r_frame_rate'))
+    return metadata
+
+def write_metadata(instance, ffprobe_cmd=None):
+    '''
+    Probe the file of a Sound or Video and store its metadata.
+
+    Returns - The dict of stored fields.
+
+    Raises RuntimeError if ffprobe fails.
+    '''
+    if ffprobe_cmd is None:
+        ffprobe_cmd = ObjectsAppProfile.get_profile().ffprobe_path
+    if isinstance(instance, Sound):
+        kind, field = 'sound', instance.sound_file
+    else:
+        kind, field = 'video', instance.video_file
+    metadata = get_metadata(probe(ffprobe_cmd, field.path), kind)
+    # A queryset update so the upload signals do not fire again
+    type(instance).objects.filter(pk=instance.pk).update(**metadata)
+    versions.bump_on_commit(versions.get_label(instance))
+    return metadata
@@ -0,0 +1,339 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from hashlib import md5
+from pathlib import Path
+from PIL import Image as img
+from PIL import ImageOps
+from django import db
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from lookaway import versions
+from members.models import MediaUsage
+from .models import ObjectsAppProfile, Image, RenditionJob
+from .utils import FileSystemOps
+from . import blobs
+
+logger = logging.getLogger(__name__)
+
+def get_format(profile):
+    '''
+    Returns the Pillow format name and file extension
+    configured in the app profile.
+    '''
+    if profile.image_format == "JPG":
+        return 'jpeg', 'jpeg'
+    else:
+        return 'webp', 'webp'
+
+def get_srcset_widths(profile):
+    '''
+    Returns the srcset widths from the app profile as a sorted list of ints.
+    '''
+    widths = set()
+    for width in profile.srcset_widths.split(','):
+        try:
+            widths.add(int(width))
+        except ValueError:
+            pass
+    return sorted(w for w in widths if w > 0)
+
+def get_targets(profile, instance, size, base_name, img_format):
+    '''
+    Returns a list of renditions to render for an image of the given size.
+    Each rendition is a tuple of (name, max width, max height, path) where
+    the path is relative to MEDIA_ROOT.
+    '''
+    owner = instance.owner.id if instance.owner else 0
+    image_dir = instance.creation_date.strftime(
+        'member_{0}/images/%Y/%m/%d/'.format(owner)
+    )
+    medium_dir = instance.creation_date.strftime(
+        'member_{0}/images/medium/%Y/%m/%d/'.format(owner)
+    )
+    thumb_dir = instance.creation_date.strftime(
+        'member_{0}/thumbnails/%Y/%m/%d/'.format(owner)
+    )
+    # No rendition is served larger than the full size image
+    width, height = fit(size, profile.image_max_width, profile.image_max_height)
+    targets = [
+        (
+            'full',
+            profile.image_max_width,
+            profile.image_max_height,
+            '{}{}.{}'.format(image_dir, base_name, img_format),
+        ),
+        (
+            'thumbnail',
+            profile.thumbnail_max_width,
+            profile.thumbnail_max_height,
+            '{}{}-thumbnail.{}'.format(thumb_dir, base_name, img_format),
+        ),
+        (
+            'medium',
+            min(profile.medium_max_width, width),
+            min(profile.medium_max_height, height),
+            '{}{}-medium.{}'.format(medium_dir, base_name, img_format),
+        ),
+    ]
+    # Only widths smaller than the full size image are worth serving
+    for w in get_srcset_widths(profile):
+        if w < width:
+            targets.append((
+                w,
+                w,
+                height,
+                '{}{}-{}w.{}'.format(image_dir, base_name, w, img_format),
+            ))
+    return targets
+
+def fit(size, max_width, max_height):
+    '''
+    Returns the size that fits inside the given bounds
+    while keeping the aspect ratio. Images are never enlarged.
+    '''
+    width, height = size
+    scale = min(max_width / width, max_height / height, 1)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def render(source, target, img_format, save_kwargs):
+    '''
+    Resize the decoded source image and write one rendition to disk.
+
+    Returns - A tuple of the rendition name, path and width.
+    '''
+    name, max_width, max_height, path = target
+    size = fit(source.size, max_width, max_height)
+    if size == source.size:
+        image = source
+    else:
+        image = source.resize(size, img.LANCZOS, reducing_gap=2.0)
+    output = Path(settings.MEDIA_ROOT) / path
+    output.parent.mkdir(parents=True, exist_ok=True)
+    # Keep the color profile and exif data on the full size image only
+    kwargs = save_kwargs if name == 'full' else {}
+    try:
+        image.save(output, img_format, **kwargs)
+    except (OSError, ValueError):
+        image.save(output, img_format)
+    return name, path, size[0]
+
+def render_all(source, targets, img_format, save_kwargs, processes):
+    '''
+    Render every target from one decoded image. The work is spread across
+    a pool of threads which share the decoded image. Pillow releases the
+    GIL while it resizes and encodes, so the threads run in parallel
+    without forking the process that handles the upload.
+    '''
+    # More threads than CPUs only adds contention
+    processes = min(processes, len(targets), os.cpu_count() or 1)
+    if processes <= 1:
+        return [render(source, t, img_format, save_kwargs) for t in targets]
+    with ThreadPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(render, source, t, img_format, save_kwargs)
+            for t in targets
+        ]
+        return [f.result() for f in futures]
+
+def decode(path, img_format):
+    '''
+    Open and fully decode an image, applying the Exif orientation.
+
+    Returns - The decoded image and keyword arguments for saving the
+    full size rendition.
+    '''
+    with img.open(path) as image:
+        try:
+            decoded = ImageOps.exif_transpose(image)
+        except Exception:
+            logger.error('exif tag tranposition failed for {}'.format(path))
+            decoded = image.copy()
+    decoded.load()
+    info = decoded.info
+    if img_format == 'jpeg' and decoded.mode not in ('RGB', 'L'):
+        decoded = decoded.convert('RGB')
+    elif decoded.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        decoded = decoded.convert('RGBA')
+    save_kwargs = {}
+    for key in ('icc_profile', 'exif'):
+        if info.get(key):
+            save_kwargs[key] = info[key]
+    return decoded, save_kwargs
+
+def process_image(instance, processes=None):
+    '''
+    Build every configured rendition of an uploaded image.
+    The upload is decoded once, the full size image, thumbnail, medium
+    size and srcset widths are rendered in parallel, the original upload
+    is removed and the instance is updated with a single query.
+    The files are given a hard to guess name for added privacy.
+
+    Arguments
+    instance    - An Image with a saved upload.
+    processes   - The number of threads to render with. Defaults to
+                  image_processes from the app profile.
+    '''
+    profile = ObjectsAppProfile.get_profile()
+    if processes is None:
+        processes = profile.image_processes
+    img_format, ext = get_format(profile)
+    src_path = Path(instance.image_file.path)
+    source, save_kwargs = decode(src_path, img_format)
+
+    seed = str(src_path) + str(timezone.now())
+    base_name = md5(seed.encode()).hexdigest()
+    targets = get_targets(profile, instance, source.size, base_name, ext)
+    results = render_all(
+        source,
+        targets,
+        img_format,
+        save_kwargs,
+        processes,
+    )
+    source.close()
+    # Renditions of an image that is already stored become links to it
+    for name, path, width in results:
+        blobs.store(Path(settings.MEDIA_ROOT) / path)
+
+    fields = {
+        'title': src_path.name.split('.')[:-1][0][0:63],
+        'renditions': {},
+    }
+    for name, path, width in results:
+        if name == 'full':
+            fields['image_file'] = path
+            fields['renditions'][str(width)] = path
+        elif name == 'thumbnail':
+            fields['thumbnail_file'] = path
+        elif name == 'medium':
+            fields['medium_file'] = path
+        else:
+            fields['renditions'][str(width)] = path
+    if Path(settings.MEDIA_ROOT) / fields['image_file'] != src_path:
+        FileSystemOps()._delete_file(src_path)
+
+    Image.objects.filter(pk=instance.pk).update(**fields)
+    for field, value in fields.items():
+        setattr(instance, field, value)
+    return fields
+
+# Queue
+
+def get_max_attempts():
+    return getattr(settings, 'RENDITION_MAX_ATTEMPTS', 3)
+
+def get_charged_size(image):
+    return blobs.get_charged_size(
+        Path(settings.MEDIA_ROOT) / name
+        for name in image.get_file_names()
+    )
+
+def enqueue(images):
+    '''
+    Queue a rendition job for each of a list of saved Images. Call this
+    in the transaction that creates the Images so that a job is queued
+    for every Image that is committed.
+
+    Returns - The new RenditionJobs.
+    '''
+    return RenditionJob.objects.bulk_create(
+        [RenditionJob(image_id=image.pk) for image in images]
+    )
+
+def claim_next_job():
+    '''
+    Atomically move the oldest queued job to the running state.
+    The status check in the UPDATE makes sure that two workers
+    never claim the same job.
+
+    Returns - The claimed job pk, or None if the queue is empty.
+    '''
+    queued = RenditionJob.objects.filter(
+        status=RenditionJob.QUEUED,
+    ).order_by('creation_date').values_list('pk', flat=True)[:10]
+    for pk in queued:
+        claimed = RenditionJob.objects.filter(
+            pk=pk,
+            status=RenditionJob.QUEUED,
+        ).update(
+            status=RenditionJob.RUNNING,
+            attempts=F('attempts') + 1,
+            start_date=timezone.now(),
+        )
+        if claimed:
+            return pk
+    return None
+
+def requeue_stale_jobs(minutes):
+    '''
+    Put jobs that have been running for longer than the given number
+    of minutes back in the queue. Jobs are left in the running state
+    when a worker is killed in the middle of a job.
+
+    Returns - The number of jobs requeued.
+    '''
+    cutoff = timezone.now() - timedelta(minutes=minutes)
+    return RenditionJob.objects.filter(
+        status=RenditionJob.RUNNING,
+        start_date__lt=cutoff,
+    ).update(status=RenditionJob.QUEUED)
+
+def fail_job(pk, error):
+    '''
+    Record a failed attempt. The job is queued again until
+    RENDITION_MAX_ATTEMPTS is reached.
+    '''
+    job = RenditionJob.objects.filter(pk=pk).first()
+    if job is None:
+        return
+    job.error = error
+    job.finish_date = timezone.now()
+    if job.attempts < get_max_attempts():
+        job.status = RenditionJob.QUEUED
+    else:
+        job.status = RenditionJob.FAILED
+    job.save()
+    logger.error(
+        'Rendering failed for {} on attempt {}: {}'.format(
+            job,
+            job.attempts,
+            error,
+        )
+    )
+
+def run_job(pk, processes=None):
+    '''
+    Entry point for the worker processes. Builds the renditions
+    of the Image of a claimed job and records the result. The owner
+    is charged for the renditions instead of the upload.
+    '''
+    db.close_old_connections()
+    job = RenditionJob.objects.select_related('image').filter(pk=pk).first()
+    if job is None:
+        # The Image was deleted while the job was queued
+        return
+    try:
+        image = job.image
+        if not image.image_file:
+            raise RuntimeError('image has no file')
+        charged = get_charged_size(image)
+        process_image(image, processes)
+        MediaUsage.record(
+            image.owner_id,
+            'image_bytes',
+            get_charged_size(image) - charged,
+        )
+        versions.bump_on_commit(versions.get_label(Image))
+    except Exception as e:
+        fail_job(pk, str(e))
+    else:
+        RenditionJob.objects.filter(pk=pk).update(
+            status=RenditionJob.DONE,
+            error=None,
+            finish_date=timezone.now(),
+        )
+    finally:
+        db.close_old_connections()
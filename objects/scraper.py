@@ -0,0 +1,318 @@
+import http.client
+import logging
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import md5
+from urllib.parse import urljoin, urlsplit, urlunsplit
+from bs4 import BeautifulSoup
+from django import db
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from lookaway import versions
+from .models import Link
+'''
+Link metadata scraper.
+
+Links are scraped by a small pool of background threads so that a slow
+remote host never holds up the request that created the link. Each fetch
+has one deadline, redirects included, and only reads up to the end of
+the page's <head>.
+Results are kept in the shared cache by normalized URL, and favicons by
+domain, so the same link added by several members is only fetched once.
+'''
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'Lookaway link preview'
+MAX_REDIRECTS = 5
+HEAD_END = re.compile(rb'</head\s*>|<body[\s>]', re.IGNORECASE)
+
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+# URLs
+
+def normalize_url(url):
+    '''
+    Returns - The URL with a lower case scheme and host, no default
+    port, no fragment and a path of at least "/".
+    '''
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    port = parts.port
+    if port and (scheme, port) not in (('http', 80), ('https', 443)):
+        host = '{}:{}'.format(host, port)
+    return urlunsplit((scheme, host, parts.path or '/', parts.query, ''))
+
+def get_cache_key(kind, value):
+    return 'link_metadata:{}:{}'.format(
+        kind,
+        md5(value.encode('utf-8')).hexdigest(),
+    )
+
+# Fetching
+
+def get_connection(scheme, netloc, timeout):
+    '''
+    Returns - A keep-alive connection to the host, reused by later
+    fetches from the same thread.
+    Each thread keeps the most recently used few connections open and
+    closes the least recently used one to make room for another host.
+    '''
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = OrderedDict()
+    key = (scheme, netloc)
+    connection = connections.get(key)
+    if connection is None:
+        if scheme == 'https':
+            connection = http.client.HTTPSConnection(netloc, timeout=timeout)
+        else:
+            connection = http.client.HTTPConnection(netloc, timeout=timeout)
+        connections[key] = connection
+        max_connections = get_setting('LINK_SCRAPER_CONNECTIONS', 4)
+        while len(connections) > max(max_connections, 1):
+            evicted = connections.popitem(last=False)[1]
+            evicted.close()
+    else:
+        connections.move_to_end(key)
+    connection.timeout = timeout
+    return connection
+
+def set_deadline(connection, deadline):
+    '''
+    Shrink the timeout of the connection's socket to the time left
+    before the deadline, so a host that sends a byte at a time can not
+    keep a fetch going past it.
+
+    Raises socket.timeout once the deadline has passed.
+    '''
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise socket.timeout('link scraper deadline passed')
+    connection.timeout = remaining
+    if connection.sock is not None:
+        connection.sock.settimeout(remaining)
+
+def drop_connection(scheme, netloc):
+    connections = getattr(_local, 'connections', {})
+    connection = connections.pop((scheme, netloc), None)
+    if connection is not None:
+        connection.close()
+
+def read_head(response, max_bytes, connection, deadline, until=HEAD_END):
+    '''
+    Read the response until the end of the <head>, max_bytes
+    or the deadline.
+
+    Arguments
+    response - The response to read from.
+    max_bytes - The most bytes to read.
+    connection - The connection the response arrives on.
+    deadline - A time.monotonic() time to stop reading at.
+    until - A pattern to stop reading after, or None to read it all.
+
+    Returns - A tuple of the bytes read and True if the whole
+    response body was read.
+
+    Raises socket.timeout once the deadline has passed.
+    '''
+    data = b''
+    while len(data) < max_bytes:
+        set_deadline(connection, deadline)
+        chunk = response.read1(min(8192, max_bytes - len(data)))
+        if not chunk:
+            # read1() leaves an empty body open, which keeps the
+            # connection from being used again
+            response.close()
+            return data, True
+        data += chunk
+        if until and until.search(data, max(0, len(data) - len(chunk) - 8)):
+            break
+    return data, response.isclosed()
+
+def fetch_head(url, timeout=None, max_bytes=None):
+    '''
+    Fetch the start of an HTML page, following redirects.
+
+    Arguments
+    url - An http or https URL.
+    timeout - Seconds the whole fetch may take, redirects included.
+    max_bytes - The most bytes of the body to read.
+
+    Returns - A tuple of the final URL and the bytes read,
+    or None if the page could not be fetched.
+    '''
+    if timeout is None:
+        timeout = get_setting('LINK_SCRAPER_TIMEOUT', 5)
+    if max_bytes is None:
+        max_bytes = get_setting('LINK_SCRAPER_MAX_BYTES', 65536)
+    deadline = time.monotonic() + timeout
+    for i in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            return None
+        path = urlunsplit(('', '', parts.path or '/', parts.query, ''))
+        # A kept alive connection may have been closed by the host
+        # since it was last used, so try once more on a new one.
+        for attempt in range(2):
+            connection = get_connection(parts.scheme, parts.netloc, timeout)
+            try:
+                set_deadline(connection, deadline)
+                connection.request('GET', path, headers={
+                    'User-Agent': USER_AGENT,
+                    'Accept': 'text/html',
+                })
+                set_deadline(connection, deadline)
+                response = connection.getresponse()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError,
+                    ConnectionResetError):
+                drop_connection(parts.scheme, parts.netloc)
+                if attempt:
+                    return None
+            except (OSError, http.client.HTTPException):
+                drop_connection(parts.scheme, parts.netloc)
+                return None
+        try:
+            if response.status in (301, 302, 303, 307, 308):
+                location = response.getheader('Location')
+                data, complete = read_head(
+                    response,
+                    max_bytes,
+                    connection,
+                    deadline,
+                    until=None,
+                )
+                if not complete:
+                    drop_connection(parts.scheme, parts.netloc)
+                if not location:
+                    return None
+                url = urljoin(url, location)
+                continue
+            if response.status != 200:
+                drop_connection(parts.scheme, parts.netloc)
+                return None
+            data, complete = read_head(response, max_bytes, connection, deadline)
+            # Drain a short remainder so the connection can be reused
+            if not complete and response.length is not None \
+                    and response.length <= max_bytes:
+                complete = read_head(
+                    response,
+                    max_bytes,
+                    connection,
+                    deadline,
+                    until=None,
+                )[1]
+        except (OSError, http.client.HTTPException):
+            drop_connection(parts.scheme, parts.netloc)
+            return None
+        # The connection can only be reused once the body is consumed
+        if not complete:
+            drop_connection(parts.scheme, parts.netloc)
+        return url, data
+    return None
+
+# Parsing
+
+def parse_head(url, data):
+    '''
+    Returns - A dict of the title, description and favicon URI found
+    in the head of the page. Missing fields are left out.
+    '''
+    soup = BeautifulSoup(data, 'html.parser')
+    fields = {}
+    title = soup.find('title')
+    if title and title.string:
+        fields['title'] = title.string.strip()[:256]
+    description = soup.find('meta', {'name': 'description'})
+    if description and description.get('content'):
+        fields['text'] = description.get('content').strip()[:512]
+    icon = soup.find('link', attrs={'rel': 'shortcut icon'})
+    if icon is None:
+        icon = soup.find('link', attrs={'rel': 'icon'})
+    href = icon.get('href', '') if icon else ''
+    if href:
+        href = urljoin(url, href)
+        # Only HTTPS favicons are shown
+        if urlsplit(href).scheme == 'https' and len(href) <= 256:
+            fields['favicon_href'] = href
+    return fields
+
+# Cache
+
+def get_metadata(url):
+    '''
+    Returns - The metadata for the URL from the cache,
+    or fetched from the remote host.
+    '''
+    normalized = normalize_url(url)
+    timeout = get_setting('LINK_SCRAPER_CACHE_TIMEOUT', 86400)
+    key = get_cache_key('url', normalized)
+    fields = cache.get(key)
+    if fields is None:
+        result = fetch_head(normalized)
+        fields = parse_head(*result) if result else {}
+        # Hosts that could not be reached are tried again sooner
+        cache.set(key, fields, timeout if result else min(timeout, 300))
+    domain = urlsplit(normalized).netloc
+    if fields.get('favicon_href'):
+        cache.set(get_cache_key('favicon', domain), fields['favicon_href'], timeout)
+    else:
+        favicon = cache.get(get_cache_key('favicon', domain))
+        if favicon:
+            fields = dict(fields, favicon_href=favicon)
+    return fields
+
+# Background pool
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_setting('LINK_SCRAPER_THREADS', 4),
+                thread_name_prefix='link-scraper',
+            )
+    return _executor
+
+def scrape(pk):
+    '''
+    Fill in the title, description and favicon of a Link.
+
+    Returns - The number of fields that were updated.
+    '''
+    url = Link.objects.filter(pk=pk).values_list('url', flat=True).first()
+    if not url:
+        return 0
+    fields = get_metadata(url)
+    if fields:
+        # Update the columns directly so the save signals are not sent again
+        Link.objects.filter(pk=pk).update(**fields)
+        versions.bump_on_commit(versions.get_label(Link))
+    return len(fields)
+
+def run(pk):
+    try:
+        scrape(pk)
+    except Exception:
+        logger.exception('Could not scrape link %s', pk)
+    finally:
+        db.connection.close()
+
+def enqueue(link):
+    '''
+    Scrape a Link in the background once it has been committed.
+    '''
+    pk = link.pk
+    transaction.on_commit(lambda: get_executor().submit(run, pk))
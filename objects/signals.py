@@ -1,257 +1,78 @@
 import logging
 import re
 import shutil
-import subprocess
-from bs4 import BeautifulSoup
-from urllib import request as rq
-from urllib.parse import urlparse
-from django.db.models.signals import pre_save, post_save, post_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_init, m2m_changed
 from django.dispatch import receiver
-from django.utils import timezone
-from hashlib import md5
 from pathlib import Path
-from PIL import Image as img
-from PIL import ImageOps
-from lookaway.settings import BASE_DIR, MEDIA_ROOT
-from .models import ObjectsAppProfile, Image, Sound, Video, Link
+from django.conf import settings
+from lookaway.settings import BASE_DIR
+from members.models import MediaUsage
+from .mixins import MetaDataMixin
+from .models import ObjectsAppProfile, Tag, TagUsage, Image, Sound, Video, Link
 from .utils import FileSystemOps
+from . import blobs, renditions, scraper, transcoder
 
 logger = logging.getLogger(__name__)
 
-# Transcoder settings
-    
-
 # Upload handlers
 
 @receiver(post_save, sender=Image)
 def handle_image_upload(sender, instance, created, *args, **kwargs):
-    profile, new = ObjectsAppProfile.objects.get_or_create(pk=1)
     '''
     Resize images with a width or height > values
-    from the main Lookaway settings file.
+    from the Objects app profile.
     Converts valid image files to webp.
-    Adds a thumbnail image to the Image model.
+    Adds a thumbnail, a medium size image and srcset renditions
+    to the Image model.
     '''
     if created:
-        # Start with the raw uploaded image
-        image = img.open(instance.image_file.path)
-        original_name = Path(image.filename).name
-
-        # Attempt to transpose Exif tags if the image has them
-        try:
-            image = ImageOps.exif_transpose(image)
-            image.save(instance.image_file.path)
-        except:
-            logger.error(
-                'exif tag tranposition failed for image {} with pk {}'.format(
-                    instance,
-                    instance.pk,
-                )
-            )
-        # Image settings
-        w = profile.image_max_width
-        h = profile.image_max_height
-        if profile.image_format == "JPG":
-            img_format = "jpeg"
-        else:
-            img_format = "webp"
-        # Resize the original if the height or width are 
-        # larger than the height and width specidied in settings
-        if image.width > w or image.height > h:
-            max_size = (w, h)
-            image.thumbnail(max_size)
-            info = image.info
-            try:
-                image.save(instance.image_file.path, img_format, **info)
-            except:
-                img_format = 'webp'
-                image.save(instance.image_file.path, img_format, **info)
-
-        # Give the image a random name and webp extenstion
-        instance.title = original_name.split('.')[:-1][0][0:63]
-        img_path = Path(instance.image_file.path)
-        seed = str(img_path) + str(timezone.now())
-        safe_file_name = md5(seed.encode()).hexdigest() + '.' + img_format
-        new_path = img_path.rename(img_path.parent / safe_file_name)
-        instance.image_file = str(new_path.relative_to(MEDIA_ROOT))
-        instance.save()
-
-        # Create a thumbnail based on the uploaded image
-        h = profile.thumbnail_max_height
-        w = profile.thumbnail_max_width
-        max_size = (h, w)
-        image.thumbnail(max_size)
-        owner = instance.owner.id
-        thumb_dir = instance.creation_date.strftime(
-            'member_{0}/thumbnails/%Y/%m/%d/'.format(owner)
-        )
-        file_name = instance.image_file.name.split('/')[-1].split('.')[0]
-        thumb_file_name = '{}{}{}'.format(
-            file_name,
-            '-thumbnail.',
-            img_format,
+        renditions.process_image(instance)
+        MediaUsage.record(
+            instance.owner_id,
+            'image_bytes',
+            blobs.get_charged_size(
+                Path(settings.MEDIA_ROOT) / name
+                for name in instance.get_file_names()
+            ),
         )
-        p = Path(MEDIA_ROOT)
-        q = p / thumb_dir
-        Path.mkdir(q, parents=True, exist_ok=True)
-        try:
-            image.save(q / thumb_file_name, img_format)
-        except:
-            img_format = 'webp'
-            image.save(q / thumb_file_name, img_format)
-            
-        image.close()
-        p = Path(thumb_dir)
-        q = p / thumb_file_name
-        instance.thumbnail_file = str(q)
-        instance.save()
-    else:
-       pass 
 
 @receiver(post_save, sender=Sound)
 def handle_sound_upload(sender, instance, created, *args, **kwargs):
     '''
-    Converts valid audio files into ogg.
     Sets the instance title to the filename minus the extension.
-    Changes the filename on disk to a hard to guess name
-    for added privacy.
+    Queues a job for the background transcoder which converts
+    the upload into the configured format and gives it a
+    hard to guess name for added privacy.
     '''
-    profile, new = ObjectsAppProfile.objects.get_or_create(pk=1)
     if created:
-        snd_file = instance.sound_file.path
-        # Thanks derekkwok!
-        # https://gist.github.com/derekkwok/4077509
-        # Sound settings
-        ffmpeg_cmd = profile.ffmpeg_path
-        bitrate = str(profile.sound_bitrate)
-        crf = str(profile.sound_crf)
-        qmin = str(profile.sound_qmin)
-        qmax = str(profile.sound_qmax)
-        if profile.sound_format == "MP3":
-            snd_ext = ".mp3"
-        else:
-            snd_ext = ".ogg"
-
-        def encode(snd_file):
-            path = ''.join(snd_file.split('.')[:-1])
-            # Add a "1" to file name if the file is already using the extension configured.
-            # This avoids erroring when trying to convert a file to a new file of  the smae filename.
-            if snd_ext in snd_file:
-                output = '{}1{}'.format(path, snd_ext)
-            else:
-                output = '{}{}'.format(path, snd_ext)
-            # Thanks Vestride
-            # https://gist.github.com/Vestride/278e13915894821e1d6f
-            command = [
-                ffmpeg_cmd,
-                '-y',
-                '-i', snd_file,
-                '-qmin', qmin,
-                '-qmax', qmax,
-                '-b:v', bitrate,
-                '-crf', crf,
-                '-deadline', 'realtime',
-                output
-            ]
-            subprocess.call(command)
-            #Delete the original upload
-            fsop = FileSystemOps()
-            fsop._delete_file(instance.sound_file.path)
-            return output
-
-        try:
-            # Transcode the uploaded file
-            snd_path = Path(encode(snd_file))
-            # Give the image a random name and webp extenstion
-            original_name = Path(snd_file).name
-            instance.title = original_name.split('.')[:-1][0][:63]
-            seed = str(snd_path) + str(timezone.now())
-            safe_file_name = md5(seed.encode()).hexdigest() + snd_ext
-            new_path = snd_path.rename(snd_path.parent / safe_file_name)
-            instance.sound_file = str(new_path.relative_to(MEDIA_ROOT))
-            instance.save()
-        except:
-            instance.title = "failed upload"
-            instance.save()
-            logger.error(
-                'Transcoding failed for sound {} with pk {}'.format(
-                    instance,
-                    instance.pk,
-                )
-            )
+        original_name = Path(instance.sound_file.name).name
+        instance.title = original_name.split('.')[:-1][0][:63]
+        Sound.objects.filter(pk=instance.pk).update(title=instance.title)
+        MediaUsage.record(
+            instance.owner_id,
+            'sound_bytes',
+            blobs.get_charged_size([instance.sound_file.path]),
+        )
+        transcoder.enqueue(instance)
 
 @receiver(post_save, sender=Video)
 def handle_video_upload(sender, instance, created, *args, **kwargs):
     '''
-    Converts valid video files into webm.
     Sets the instance title to the filename minus the extension.
-    Changes the filename on disk to a hard to guess name
-    for added privacy.
+    Queues a job for the background transcoder which converts
+    the upload into the configured format and gives it a
+    hard to guess name for added privacy.
     '''
-    profile, new = ObjectsAppProfile.objects.get_or_create(pk=1)
     if created:
-        vid_file = instance.video_file.path
-        # Thanks derekkwok!
-        # https://gist.github.com/derekkwok/4077509
-        # Video settings
-        ffmpeg_cmd = profile.ffmpeg_path
-        bitrate = str(profile.video_bitrate)
-        crf = str(profile.video_crf)
-        qmin = str(profile.video_qmin)
-        qmax = str(profile.video_qmax)
-        if profile.video_format == "MP4":
-            vid_ext = ".mp4"
-        else:
-            vid_ext = ".webm"
-        
-        def encode(vid_file):
-            path = ''.join(vid_file.split('.')[:-1])
-            # Add a "1" to file name if the file is already using the extension configured.
-            # This avoids erroring when trying to convert a file to a new file of  the smae filename.
-            if vid_ext in vid_file:
-                output = '{}1{}'.format(path, vid_ext)
-            else:
-                output = '{}{}'.format(path, vid_ext)
-            output = '{}.{}'.format(path, vid_ext)
-            # Thanks Vestride
-            # https://gist.github.com/Vestride/278e13915894821e1d6f
-            command = [
-                ffmpeg_cmd,
-                '-y',
-                '-i', vid_file,
-                '-qmin', qmin,
-                '-qmax', qmax,
-                '-b:v', bitrate,
-                '-crf', crf,
-                '-deadline', 'realtime',
-                output
-            ]
-            subprocess.call(command)
-            #Delete the original upload
-            fsop = FileSystemOps()
-            fsop._delete_file(instance.video_file.path)
-            return output
-                
-        try:
-            # Transcode the uploaded file
-            vid_path = Path(encode(vid_file))
-            # Give the image a random name and webp extenstion
-            original_name = Path(vid_file).name
-            instance.title = original_name.split('.')[:-1][0][:63]
-            seed = str(vid_path) + str(timezone.now())
-            safe_file_name = md5(seed.encode()).hexdigest() + vid_ext
-            new_path = vid_path.rename(vid_path.parent / safe_file_name)
-            instance.video_file = str(new_path.relative_to(MEDIA_ROOT))
-            instance.save()
-        except:
-            instance.title = "failed upload"
-            instance.save()
-            logger.error(
-                'Transcoding failed for video {} with pk {}'.format(
-                    instance,
-                    instance.pk,
-                )
-            )
+        original_name = Path(instance.video_file.name).name
+        instance.title = original_name.split('.')[:-1][0][:63]
+        Video.objects.filter(pk=instance.pk).update(title=instance.title)
+        MediaUsage.record(
+            instance.owner_id,
+            'video_bytes',
+            blobs.get_charged_size([instance.video_file.path]),
+        )
+        transcoder.enqueue(instance)
     
 # Cleanup
 @receiver(post_delete, sender=Image)
@@ -260,10 +81,12 @@ def remove_image_files(sender, instance, *args, **kwargs):
     Remove image files related to the deleted Image instance from the filesystem
     '''
     fsop = FileSystemOps()
-    if instance.image_file:
-        fsop._delete_file(instance.image_file.path)
-    if instance.thumbnail_file:
-        fsop._delete_file(instance.thumbnail_file.path)
+    paths = [Path(settings.MEDIA_ROOT) / name for name in instance.get_file_names()]
+    # Counted before the links to the blob store are removed
+    removed = blobs.get_charged_size(paths)
+    for path in paths:
+        fsop._delete_file(path)
+    MediaUsage.record(instance.owner_id, 'image_bytes', -removed)
 
 @receiver(post_delete, sender=Sound)
 def remove_sound_file(sender, instance, *args, **kwargs):
@@ -271,8 +94,11 @@ def remove_sound_file(sender, instance, *args, **kwargs):
     Remove sound file related to the deleted Sound instance from the filesystem
     '''
     fsop = FileSystemOps()
-    if instance.sound_file:
-        fsop._delete_file(instance.sound_file.path)
+    paths = [f.path for f in (instance.sound_file, instance.peaks_file) if f]
+    removed = blobs.get_charged_size(paths)
+    for path in paths:
+        fsop._delete_file(path)
+    MediaUsage.record(instance.owner_id, 'sound_bytes', -removed)
 
 @receiver(post_delete, sender=Video)
 def remove_video_file(sender, instance, *args, **kwargs):
@@ -280,8 +106,86 @@ def remove_video_file(sender, instance, *args, **kwargs):
     Remove video file related to the deleted Video instance from the filesystem
     '''
     fsop = FileSystemOps()
+    removed = 0
     if instance.video_file:
+        removed += blobs.get_charged_size([instance.video_file.path])
         fsop._delete_file(instance.video_file.path)
+    # Adaptive streaming playlists and segments
+    if instance.hls_playlist:
+        hls_dir = Path(settings.MEDIA_ROOT) / instance.get_hls_dir()
+        removed += transcoder.get_dir_size(hls_dir)
+        shutil.rmtree(hls_dir, ignore_errors=True)
+    if removed:
+        MediaUsage.record(instance.owner_id, 'video_bytes', -removed)
+
+# Tag usage index
+
+@receiver(post_init)
+def track_public_state(sender, instance, *args, **kwargs):
+    '''
+    Remember whether a tagged object was public when it was loaded so
+    a change of visibility can be detected when it is saved.
+    '''
+    if isinstance(instance, MetaDataMixin):
+        # Read __dict__ so a deferred field is not fetched
+        instance._was_public = instance.__dict__.get('is_public')
+
+@receiver(post_save)
+def update_tag_usage_on_publish(sender, instance, created, *args, **kwargs):
+    '''
+    Recount the tags of an object whose visibility changed.
+    '''
+    if not isinstance(instance, MetaDataMixin) or created:
+        return
+    if instance._was_public != instance.is_public:
+        TagUsage.refresh(
+            sender,
+            instance.tags.values_list('pk', flat=True),
+        )
+    instance._was_public = instance.is_public
+
+@receiver(m2m_changed)
+def update_tag_usage_on_tag(sender, instance, action, reverse, model, pk_set, *args, **kwargs):
+    '''
+    Recount tags added to or removed from public objects.
+    Handles both object.tags and tag.<model>_set changes.
+    '''
+    if reverse:
+        # Tags were changed from the Tag side, pk_set holds objects
+        if not isinstance(instance, Tag) or not issubclass(model, MetaDataMixin):
+            return
+        if sender is not model.tags.through:
+            return
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            TagUsage.refresh(model, [instance.pk])
+        return
+    if not isinstance(instance, MetaDataMixin):
+        return
+    if sender is not type(instance).tags.through or not instance.is_public:
+        return
+    if action in ('post_add', 'post_remove'):
+        TagUsage.refresh(type(instance), pk_set)
+    elif action == 'pre_clear':
+        instance._cleared_tags = list(
+            instance.tags.values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        TagUsage.refresh(type(instance), instance._cleared_tags)
+
+@receiver(pre_delete)
+def stash_tags_before_delete(sender, instance, *args, **kwargs):
+    if isinstance(instance, MetaDataMixin) and instance.is_public:
+        instance._deleted_tags = list(
+            instance.tags.values_list('pk', flat=True)
+        )
+
+@receiver(post_delete)
+def update_tag_usage_on_delete(sender, instance, *args, **kwargs):
+    '''
+    Recount the tags of a deleted public object.
+    '''
+    if isinstance(instance, MetaDataMixin) and instance.is_public:
+        TagUsage.refresh(sender, getattr(instance, '_deleted_tags', []))
 
 # Links
 
@@ -290,44 +194,7 @@ def remove_video_file(sender, instance, *args, **kwargs):
 def scrape_link_fields(sender, instance, created, *args, **kwargs):
     '''
     Scrape title, description and favicon URI from URL
+    in the background once the new link is committed.
     '''
     if created and instance.url:
-        # Check the instance URL for a good response
-        try:
-            response = rq.urlopen(instance.url)
-            if response.getcode() in (200, 300, 301, 302):
-                soup = BeautifulSoup(response, 'html.parser')
-                # Look for a title
-                try:
-                    instance.title = soup.find('title').string
-                except:
-                    pass
-                # Look for a description
-                try:
-                    instance.text = soup.find('meta', {'name': 'description'}).get('content')
-                except:
-                    pass
-                # Look for the favicon
-                try:
-                    href = soup.find('link',  attrs={'rel':'shortcut icon'}).get('href')
-                except:
-                    href = ''
-                if href != '':
-                    o = urlparse(href)
-                    # Ensure HTTPS in URI and FQDN
-                    if o[0] == 'https' and o[1]:
-                        instance.favicon_href = href
-                    # If no FQDN append the relative path to the FQDN
-                    else:
-                        url = urlparse(instance.url)
-                        # Ensure HTTPS in URI
-                        if url[0] == 'https':
-                            href = url[0] + '://' + url[1] + href
-                            instance.favicon_href = href
-                post_save.disconnect(scrape_link_fields, sender=Link)
-                try:
-                    instance.save()
-                except:
-                    pass
-        except:
-            pass
+        scraper.enqueue(instance)
@@ -0,0 +1,88 @@
+import hashlib
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from django.utils.deconstruct import deconstructible
+'''
+Deduplicating storage for uploaded media.
+
+Uploads are hashed while they are streamed to disk and then handed to
+the content addressed store in objects/blobs.py, which turns a file whose
+content is already stored into a hard link to the stored copy. Add the
+hashing upload handlers to FILE_UPLOAD_HANDLERS so large uploads are
+hashed as they arrive instead of being read again after they are saved.
+'''
+
+class HashingMixin:
+    '''
+    Hash each uploaded file chunk by chunk and set the hex digest as
+    "sha256" on the uploaded file.
+    '''
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # The memory handler passes large files on to the next handler
+        if getattr(self, 'activated', True):
+            self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingMixin, TemporaryFileUploadHandler):
+    pass
+
+
+class HashingContent:
+    '''
+    A file being saved that hashes the chunks it is read in.
+    '''
+
+    def __init__(self, content):
+        self.content = content
+        self.sha256 = hashlib.sha256()
+
+    def chunks(self, *args, **kwargs):
+        for chunk in self.content.chunks(*args, **kwargs):
+            self.sha256.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+            yield chunk
+
+
+@deconstructible
+class BlobStorage(FileSystemStorage):
+    '''
+    File system storage that links saved files into the blob store.
+    '''
+
+    def _save(self, name, content):
+        sha256 = getattr(content, 'sha256', None)
+        if sha256 is None and not hasattr(content, 'temporary_file_path'):
+            content = HashingContent(content)
+        name = super()._save(name, content)
+        if isinstance(content, HashingContent):
+            sha256 = content.sha256.hexdigest()
+        # Imported here since the models use this storage
+        from .blobs import store
+        store(self.path(name), sha256)
+        return name
+
+    def delete(self, name):
+        from .blobs import release
+        if name:
+            release(self.path(name))
+        super().delete(name)
+
+blob_storage = BlobStorage()
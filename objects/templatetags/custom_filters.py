@@ -10,18 +10,28 @@ def get_domain(value):
     o = urlparse(value)
     return o.hostname
 
+@register.filter
+def runtime(seconds):
+    '''
+    Format a duration in seconds as m:ss or h:mm:ss.
+    '''
+    try:
+        seconds = int(round(float(seconds)))
+    except (TypeError, ValueError):
+        return ''
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if hours:
+        return '{}:{:02}:{:02}'.format(hours, minutes, seconds)
+    return '{}:{:02}'.format(minutes, seconds)
+
 @register.filter(needs_autoescape=True)
 def highlight_syntax(code, path, autoescape=True):
-    from pygments import highlight
-    from pygments.lexers import guess_lexer, get_lexer_for_filename
-    from pygments.formatters import HtmlFormatter
+    '''
+    Highlight code that is not stored on a Code object.
+    Use Code.get_highlighted to serve the stored HTML.
+    '''
     from django.utils.safestring import mark_safe
-    if path:
-        try:
-            lexer = get_lexer_for_filename(path)
-        except:
-            lexer = guess_lexer(code)
-    else:
-        lexer = guess_lexer(code)
-    formatter = HtmlFormatter(cssclass="highlight code-block", style="friendly")
-    return mark_safe(highlight(code, lexer, formatter))
+    from objects.models import Code
+    lexer = Code.get_lexer(code, path)
+    return mark_safe(Code.highlight_code(code, lexer))
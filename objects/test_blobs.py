@@ -0,0 +1,155 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from members.models import MediaUsage
+from .models import Blob, BlobLink, Sound
+from .utils import TestData
+from . import blobs
+
+DATA = b'sound' * 1000
+
+
+class BlobStoreTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(MEDIA_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.member, self.user = TestData().create_test_member()
+        MediaUsage.objects.create(member=self.member)
+
+    def upload(self, data=DATA):
+        return Sound.objects.create(
+            owner=self.member,
+            sound_file=SimpleUploadedFile('sound.wav', data),
+        )
+
+    def get_usage(self):
+        return MediaUsage.objects.get(member=self.member).sound_bytes
+
+    def test_duplicates_are_linked(self):
+        first = self.upload()
+        second = self.upload()
+        self.assertNotEqual(first.sound_file.name, second.sound_file.name)
+        self.assertTrue(os.path.samefile(
+            first.sound_file.path,
+            second.sound_file.path,
+        ))
+        blob = Blob.objects.get()
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(blob.size, len(DATA))
+        # The member is only charged for one copy
+        self.assertEqual(self.get_usage(), len(DATA))
+        self.assertEqual(blobs.get_report()['reclaimed_bytes'], len(DATA))
+
+    def test_last_reference_removes_blob(self):
+        first = self.upload()
+        second = self.upload()
+        blob_path = os.path.join(self.root, Blob.objects.get().get_name())
+        first.delete()
+        self.assertEqual(Blob.objects.get().refcount, 1)
+        self.assertTrue(os.path.isfile(blob_path))
+        self.assertTrue(os.path.isfile(second.sound_file.path))
+        self.assertEqual(self.get_usage(), len(DATA))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(blob_path))
+        self.assertEqual(self.get_usage(), 0)
+
+    def test_store_before_removal(self):
+        sound = self.upload()
+        blob_path = os.path.join(self.root, Blob.objects.get().get_name())
+        with self.captureOnCommitCallbacks() as callbacks:
+            sound.delete()
+        # The same content is uploaded again before the removal runs
+        again = self.upload()
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Blob.objects.get().refcount, 1)
+        self.assertTrue(os.path.isfile(blob_path))
+        self.assertTrue(os.path.samefile(blob_path, again.sound_file.path))
+
+    def test_store_existing_file(self):
+        sound = self.upload()
+        path = os.path.join(
+            self.root,
+            'member_{}'.format(self.member.pk),
+            'copy.wav',
+        )
+        with open(path, 'wb') as f:
+            f.write(DATA)
+        self.assertEqual(list(blobs.get_untracked_files()), [path])
+        self.assertEqual(blobs.store(path), Blob.objects.get())
+        self.assertTrue(os.path.samefile(path, sound.sound_file.path))
+        self.assertEqual(BlobLink.objects.count(), 2)
+        # Storing a file again does not count it twice
+        blobs.store(path)
+        self.assertEqual(Blob.objects.get().refcount, 2)
+        # Overwritten files move to the blob of their new content
+        with open(path + '.new', 'wb') as f:
+            f.write(b'other')
+        os.replace(path + '.new', path)
+        blobs.store(path)
+        self.assertEqual(Blob.objects.count(), 2)
+        self.assertEqual(
+            sorted(Blob.objects.values_list('refcount', flat=True)),
+            [1, 1],
+        )
+
+    def test_scan_matches_ledger(self):
+        # A file left behind by an earlier run shares the blob's inode
+        # but is not linked to it
+        sha256 = hashlib.sha256(DATA).hexdigest()
+        blob_path = blobs.get_blob_path(sha256)
+        os.makedirs(os.path.dirname(blob_path))
+        with open(blob_path, 'wb') as f:
+            f.write(DATA)
+        directory = os.path.join(self.root, 'member_{}'.format(self.member.pk))
+        os.makedirs(directory)
+        os.link(blob_path, os.path.join(directory, 'left.wav'))
+        usage = MediaUsage.objects.get(member=self.member)
+        usage.reconcile(fix=True)
+        self.upload()
+        self.upload()
+        self.assertEqual(self.get_usage(), len(DATA))
+        self.assertFalse(any(usage.reconcile().values()))
+
+    @override_settings(FILE_UPLOAD_HANDLERS=[
+        'objects.storage.HashingMemoryFileUploadHandler',
+        'objects.storage.HashingTemporaryFileUploadHandler',
+    ])
+    def test_uploads_are_hashed(self):
+        for size in (10, 3 * 1024 * 1024):
+            data = os.urandom(size)
+            request = RequestFactory().post(
+                '/',
+                {'file': SimpleUploadedFile('upload.bin', data)},
+            )
+            upload = request.FILES['file']
+            self.assertEqual(upload.size, size)
+            sound = Sound.objects.create(owner=self.member, sound_file=upload)
+            self.assertEqual(
+                upload.sha256,
+                blobs.hash_file(sound.sound_file.path),
+            )
+            self.assertEqual(
+                BlobLink.objects.get(name=sound.sound_file.name).blob.sha256,
+                upload.sha256,
+            )
+            upload.close()
+
+    def test_blobs_are_not_served(self):
+        sound = self.upload()
+        sound.is_public = True
+        sound.save()
+        name = Blob.objects.get().get_name()
+        with override_settings(MEDIA_ACCEL_REDIRECT=None):
+            self.assertEqual(self.client.get('/media/' + name).status_code, 404)
+            response = self.client.get('/media/' + sound.sound_file.name)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,158 @@
+import os
+import shutil
+import tempfile
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from posts.models import Post
+from .models import Sound, Video
+from .utils import TestData
+
+NAME = 'member_1/sounds/2026/10/18/sound.ogg'
+DATA = bytes(range(256)) * 4
+
+
+class MediaDeliveryTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(
+            MEDIA_ROOT=self.root,
+            MEDIA_ACCEL_REDIRECT=None,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        path = os.path.join(self.root, NAME)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(DATA)
+        self.member, self.user = TestData().create_test_member()
+        self.other = User.objects.create_user(username='other', password='x')
+        self.sound = Sound.objects.create(owner=self.member, sound_file=NAME)
+        self.url = '/media/' + NAME
+
+    def get(self, **kwargs):
+        response = self.client.get(self.url, **kwargs)
+        if response.streaming:
+            response.data = b''.join(response.streaming_content)
+        return response
+
+    def test_unpublished(self):
+        self.assertEqual(self.get().status_code, 404)
+        self.client.force_login(self.other)
+        self.assertEqual(self.get().status_code, 404)
+        self.client.force_login(self.user)
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, DATA)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_published(self):
+        self.sound.is_public = True
+        self.sound.save()
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Length'], str(len(DATA)))
+        self.assertEqual(response.data, DATA)
+
+    def test_shown_on_post(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                owner=self.member,
+                title='post',
+                slug='post',
+                text='text',
+                sound=self.sound,
+                is_public=True,
+                members_only=True,
+                publication_date=timezone.now(),
+            )
+        self.assertEqual(self.get().status_code, 404)
+        self.client.force_login(self.other)
+        self.assertEqual(self.get().status_code, 200)
+        self.client.logout()
+        post.members_only = False
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self.get().status_code, 200)
+
+    def test_range(self):
+        self.client.force_login(self.user)
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, DATA[10:20])
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(
+            response['Content-Range'],
+            'bytes 10-19/{}'.format(len(DATA)),
+        )
+        response = self.get(HTTP_RANGE='bytes=-5')
+        self.assertEqual(response.data, DATA[-5:])
+        response = self.get(HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response.data, DATA[1000:])
+        response = self.get(HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_if_range(self):
+        self.client.force_login(self.user)
+        etag = self.get()['ETag']
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, DATA)
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_accel_redirect(self):
+        self.client.force_login(self.user)
+        with override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/'):
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + NAME)
+        self.assertEqual(response.content, b'')
+
+    def test_other_files(self):
+        path = os.path.join(self.root, 'site', 'logo.txt')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(b'logo')
+        response = self.client.get('/media/site/logo.txt')
+        self.assertEqual(b''.join(response.streaming_content), b'logo')
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/site/').status_code, 404)
+
+    def test_stream_segments(self):
+        playlist = 'member_1/videos/2026/10/18/abc-hls/master.m3u8'
+        segment = 'member_1/videos/2026/10/18/abc-hls/0/segment_00000.ts'
+        path = os.path.join(self.root, segment)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(DATA)
+        Video.objects.create(
+            owner=self.member,
+            video_file='member_1/videos/2026/10/18/video.mp4',
+            hls_playlist=playlist,
+        )
+        self.assertEqual(self.client.get('/media/' + segment).status_code, 404)
+        self.client.force_login(self.user)
+        response = self.client.get('/media/' + segment)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'video/mp2t')
+
+    def test_waveform_peaks(self):
+        name = 'member_1/sounds/2026/10/18/sound.peaks.json'
+        with open(os.path.join(self.root, name), 'wb') as f:
+            f.write(b'{}')
+        Sound.objects.filter(pk=self.sound.pk).update(peaks_file=name)
+        self.assertEqual(self.client.get('/media/' + name).status_code, 404)
+        self.sound.is_public = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sound.save()
+        response = self.client.get('/media/' + name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
@@ -0,0 +1,66 @@
+import shutil
+import tempfile
+from pathlib import Path
+from PIL import Image as img
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from .models import Image, ObjectsAppProfile
+from .utils import TestData
+from . import renditions
+
+
+class RenditionTargetTest(TestCase):
+
+    def setUp(self):
+        self.member, self.user = TestData().create_test_member()
+        self.profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        self.profile.image_max_width = 2000
+        self.profile.image_max_height = 1000
+        self.profile.srcset_widths = '480,1000,1600'
+        self.instance = Image(owner=self.member, creation_date=timezone.now())
+
+    def get_srcset(self, size):
+        targets = renditions.get_targets(
+            self.profile,
+            self.instance,
+            size,
+            'name',
+            'webp',
+        )
+        return [t[:3] for t in targets[3:]]
+
+    def test_widths_below_fitted_size(self):
+        # A tall image is limited by the height to 1000x1000
+        self.assertEqual(
+            self.get_srcset((3000, 3000)),
+            [(480, 480, 1000)],
+        )
+        # A wide image is limited by the width to 2000x500
+        self.assertEqual(
+            self.get_srcset((4000, 1000)),
+            [(480, 480, 500), (1000, 1000, 500), (1600, 1600, 500)],
+        )
+        # Small images get no smaller copies than they need
+        self.assertEqual(self.get_srcset((400, 300)), [])
+
+    def test_render_all(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        source = img.new('RGB', (3000, 3000), 'red')
+        targets = renditions.get_targets(
+            self.profile,
+            self.instance,
+            source.size,
+            'name',
+            'webp',
+        )
+        with override_settings(MEDIA_ROOT=root):
+            results = renditions.render_all(source, targets, 'webp', {}, 4)
+        # The medium rendition is never larger than the full size image
+        self.assertEqual(
+            [(name, width) for name, path, width in results],
+            [('full', 1000), ('thumbnail', 250), ('medium', 1000), (480, 480)],
+        )
+        for name, path, width in results:
+            with img.open(Path(root) / path) as image:
+                self.assertEqual(image.width, width)
@@ -0,0 +1,183 @@
+import threading
+import time
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from .models import Link
+from .utils import TestData
+from . import scraper
+
+PAGE = b'''<html><head>
+<title>Stub page</title>
+<meta name="description" content="A page served by the stub">
+<link rel="shortcut icon" href="https://static.example.com/favicon.ico">
+</head><body>''' + b'x' * 100000 + b'</body></html>'
+
+PLAIN = b'<html><head><title>No icon</title></head><body></body></html>'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path == '/slow':
+            time.sleep(2)
+        if self.path.startswith('/hop'):
+            # Each hop is quicker than the timeout, all of them are not
+            time.sleep(0.2)
+            self.send_response(302)
+            self.send_header('Location', '/hop{}'.format(len(self.path)))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path == '/drip':
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(PAGE)))
+            self.end_headers()
+            try:
+                for i in range(20):
+                    self.wfile.write(b'<!-- -->')
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except OSError:
+                pass
+            return
+        if self.path == '/moved':
+            self.send_response(302)
+            self.send_header('Location', '/page')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = PLAIN if self.path.startswith('/plain') else PAGE
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # The scraper hangs up once it has read the head
+        pass
+
+
+@override_settings(LINK_SCRAPER_TIMEOUT=0.5, LINK_SCRAPER_MAX_BYTES=4096)
+class LinkScraperTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StubServer(('127.0.0.1', 0), StubHandler)
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        cls.base = 'http://127.0.0.1:{}'.format(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.server.requests.clear()
+
+    def test_reads_only_head(self):
+        url, data = scraper.fetch_head(self.base + '/page')
+        self.assertIn(b'</head>', data)
+        self.assertLessEqual(len(data), 4096)
+        fields = scraper.parse_head(url, data)
+        self.assertEqual(fields['title'], 'Stub page')
+        self.assertEqual(fields['text'], 'A page served by the stub')
+        self.assertEqual(
+            fields['favicon_href'],
+            'https://static.example.com/favicon.ico',
+        )
+
+    def test_timeout(self):
+        start = time.monotonic()
+        self.assertIsNone(scraper.fetch_head(self.base + '/slow'))
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_deadline(self):
+        # A host that keeps sending a little at a time
+        start = time.monotonic()
+        self.assertIsNone(scraper.fetch_head(self.base + '/drip'))
+        self.assertLess(time.monotonic() - start, 1)
+        # Redirects share the deadline
+        self.server.requests.clear()
+        start = time.monotonic()
+        self.assertIsNone(scraper.fetch_head(self.base + '/hop'))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertLessEqual(len(self.server.requests), 3)
+
+    def test_follows_redirect(self):
+        url, data = scraper.fetch_head(self.base + '/moved')
+        self.assertEqual(url, self.base + '/page')
+        self.assertEqual(self.server.requests, ['/moved', '/page'])
+
+    def test_connection_reuse(self):
+        scraper.fetch_head(self.base + '/plain1')
+        connection = scraper.get_connection('http', self.base[7:], 1)
+        scraper.fetch_head(self.base + '/plain2')
+        self.assertIs(scraper.get_connection('http', self.base[7:], 1), connection)
+
+    @override_settings(LINK_SCRAPER_CONNECTIONS=2)
+    def test_connection_limit(self):
+        scraper.fetch_head(self.base + '/plain')
+        connection = scraper.get_connection('http', self.base[7:], 1)
+        self.assertIsNotNone(connection.sock)
+        scraper.get_connection('http', 'a.invalid', 1)
+        scraper.get_connection('http', self.base[7:], 1)
+        scraper.get_connection('http', 'b.invalid', 1)
+        # The least recently used connection is closed to make room
+        self.assertIsNotNone(connection.sock)
+        self.assertEqual(len(scraper._local.connections), 2)
+        scraper.get_connection('http', 'c.invalid', 1)
+        self.assertIsNone(connection.sock)
+        self.assertEqual(len(scraper._local.connections), 2)
+
+    def test_metadata_cache(self):
+        first = scraper.get_metadata(self.base + '/page')
+        second = scraper.get_metadata(self.base.replace('http', 'HTTP') + '/page#top')
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.requests, ['/page'])
+
+    def test_favicon_cached_by_domain(self):
+        scraper.get_metadata(self.base + '/page')
+        fields = scraper.get_metadata(self.base + '/plain')
+        self.assertEqual(fields['title'], 'No icon')
+        self.assertEqual(
+            fields['favicon_href'],
+            'https://static.example.com/favicon.ico',
+        )
+
+    def test_scrape_link(self):
+        member, user = TestData().create_test_member()
+        with mock.patch.object(scraper, 'get_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                link = Link.objects.create(
+                    owner=member,
+                    url=self.base + '/page',
+                )
+        get_executor().submit.assert_called_once_with(scraper.run, link.pk)
+        scraper.scrape(link.pk)
+        link.refresh_from_db()
+        self.assertEqual(link.title, 'Stub page')
+        self.assertEqual(link.text, 'A page served by the stub')
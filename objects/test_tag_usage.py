@@ -0,0 +1,47 @@
+from django.test import TestCase
+from .models import Tag, TagUsage, Code
+from .utils import TestData
+
+
+class TagUsageTest(TestCase):
+
+    def setUp(self):
+        self.data = TestData()
+        self.member, self.user = self.data.create_test_member()
+        self.tag = Tag.objects.create(key='language', value='python', slug='language-python')
+        self.code = Code.objects.create(owner=self.member, **self.data.code_data())
+
+    def get_count(self):
+        usage = TagUsage.objects.filter(tag=self.tag, model='objects.code').first()
+        return usage.count if usage else 0
+
+    def test_publish_and_unpublish(self):
+        self.code.tags.add(self.tag)
+        self.assertEqual(self.get_count(), 0)
+        self.code.publish(self.code, self.member)
+        self.assertEqual(self.get_count(), 1)
+        self.assertEqual(list(Tag.get_tags_from_public(Code)), [self.tag])
+        self.code.is_public = False
+        self.code.save()
+        self.assertEqual(self.get_count(), 0)
+        self.assertEqual(list(Tag.get_tags_from_public(Code)), [])
+
+    def test_tag_changes(self):
+        self.code.publish(self.code, self.member)
+        self.code.tags.add(self.tag)
+        self.assertEqual(self.get_count(), 1)
+        self.code.tags.remove(self.tag)
+        self.assertEqual(self.get_count(), 0)
+        self.tag.code_set.add(self.code)
+        self.assertEqual(self.get_count(), 1)
+        self.code.tags.clear()
+        self.assertEqual(self.get_count(), 0)
+
+    def test_delete_and_rebuild(self):
+        self.code.publish(self.code, self.member)
+        self.code.tags.add(self.tag)
+        TagUsage.objects.all().delete()
+        TagUsage.rebuild()
+        self.assertEqual(self.get_count(), 1)
+        Code.objects.get(pk=self.code.pk).delete()
+        self.assertEqual(self.get_count(), 0)
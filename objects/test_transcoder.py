@@ -0,0 +1,238 @@
+import json
+import tempfile
+from pathlib import Path
+import numpy as np
+from django.test import TestCase, override_settings
+from .models import ObjectsAppProfile, Sound, Video, TranscodeJob
+from .utils import TestData
+from . import probe, transcoder, waveform
+
+
+class TranscodeQueueTest(TestCase):
+
+    def setUp(self):
+        self.data = TestData()
+        self.member, self.user = self.data.create_test_member()
+        self.profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        self.profile.transcoder_max_attempts = 2
+        self.profile.save()
+        self.sound = Sound.objects.create(
+            owner=self.member,
+            sound_file='member_0/sounds/upload.wav',
+        )
+
+    def test_upload_is_queued(self):
+        job = self.sound.get_transcode_job()
+        self.assertEqual(job.status, TranscodeJob.QUEUED)
+        self.assertEqual(Sound.objects.get(pk=self.sound.pk).title, 'upload')
+
+    def test_claim_is_exclusive(self):
+        pk = transcoder.claim_next_job()
+        job = TranscodeJob.objects.get(pk=pk)
+        self.assertEqual(job.status, TranscodeJob.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(transcoder.claim_next_job())
+
+    def test_failed_job_is_retried(self):
+        pk = transcoder.claim_next_job()
+        transcoder.fail_job(pk, 'error')
+        self.assertEqual(
+            TranscodeJob.objects.get(pk=pk).status,
+            TranscodeJob.QUEUED,
+        )
+        self.assertEqual(transcoder.claim_next_job(), pk)
+        transcoder.fail_job(pk, 'error')
+        self.assertEqual(
+            TranscodeJob.objects.get(pk=pk).status,
+            TranscodeJob.FAILED,
+        )
+        self.assertIsNone(transcoder.claim_next_job())
+
+
+class AdaptiveStreamingTest(TestCase):
+
+    def setUp(self):
+        self.profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        self.profile.video_ladder = '720:2800, 360:800,bad,1080:5000'
+        self.profile.hls_segment_seconds = 4
+
+    def test_ladder(self):
+        ladder = transcoder.get_ladder(self.profile)
+        self.assertEqual(ladder, [(360, 800), (720, 2800), (1080, 5000)])
+        self.assertEqual(
+            transcoder.get_renditions(ladder, 720),
+            [(360, 800), (720, 2800)],
+        )
+        # Small uploads are never scaled up
+        self.assertEqual(transcoder.get_renditions(ladder, 241), [(240, 800)])
+        self.profile.video_ladder = ''
+        self.assertEqual(transcoder.get_ladder(self.profile), [])
+
+    def test_hls_command(self):
+        out_dir = Path('/media/member_1/videos/abc-hls')
+        command = transcoder.get_hls_command(
+            self.profile,
+            Path('/media/upload.mov'),
+            out_dir,
+            [(360, 800), (720, 2800)],
+            True,
+        )
+        self.assertIn(
+            '[0:v]split=2[s0][s1];[s0]scale=-2:360[v0];[s1]scale=-2:720[v1]',
+            command,
+        )
+        self.assertEqual(
+            command[command.index('-var_stream_map') + 1],
+            'v:0,a:0 v:1,a:1',
+        )
+        self.assertEqual(command[command.index('-hls_time') + 1], '4')
+        self.assertEqual(command[command.index('-b:v:1') + 1], '2800k')
+        self.assertEqual(command[-1], str(out_dir / '%v' / 'index.m3u8'))
+        silent = transcoder.get_hls_command(
+            self.profile,
+            Path('/media/upload.mov'),
+            out_dir,
+            [(360, 800)],
+            False,
+        )
+        self.assertNotIn('a:0', silent)
+        self.assertEqual(silent[silent.index('-var_stream_map') + 1], 'v:0')
+
+    def test_faststart(self):
+        self.profile.video_format = 'MP4'
+        options = transcoder.get_settings(self.profile, 'video')
+        command = transcoder.get_progressive_command(
+            self.profile,
+            options,
+            Path('upload.mov'),
+            Path('out.mp4'),
+        )
+        self.assertIn('+faststart', command)
+        self.assertNotIn('realtime', command)
+
+    def test_probe_video(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ffprobe = Path(tmp) / 'ffprobe'
+            ffprobe.write_text(
+                '#!/bin/sh\n'
+                'echo \'{"streams": [{"codec_type": "video", "height": 1080},'
+                ' {"codec_type": "audio"}]}\'\n'
+            )
+            ffprobe.chmod(0o755)
+            self.assertEqual(
+                transcoder.probe_video(str(ffprobe), 'upload.mov'),
+                (1080, True),
+            )
+        self.assertIsNone(transcoder.probe_video('/nonexistent', 'upload.mov'))
+
+
+class WaveformTest(TestCase):
+
+    def test_peaks(self):
+        samples = np.array([0, 5, -3, 2, 7, -8, 1], dtype=np.int16)
+        mins, maxs = waveform.get_peaks(samples, 3)
+        self.assertEqual(mins.tolist(), [-3, -8, 1])
+        self.assertEqual(maxs.tolist(), [5, 7, 1])
+        mins, maxs = waveform.get_peaks(samples[:0], 3)
+        self.assertEqual(len(mins), 0)
+
+    def test_levels(self):
+        samples = np.random.default_rng(0).integers(
+            -32768, 32767, 10000, dtype=np.int16,
+        )
+        for samples_per_pixel, mins, maxs in waveform.get_levels(samples):
+            expected = waveform.get_peaks(samples, samples_per_pixel)
+            self.assertEqual(mins.tolist(), expected[0].tolist())
+            self.assertEqual(maxs.tolist(), expected[1].tolist())
+
+    def test_write_peaks(self):
+        member, user = TestData().create_test_member()
+        samples = np.array([-32768, 32767, 256, -256] * 300, dtype='<i2')
+        with tempfile.TemporaryDirectory() as tmp, \
+                override_settings(MEDIA_ROOT=tmp):
+            raw = Path(tmp) / 'samples.raw'
+            raw.write_bytes(samples.tobytes())
+            ffmpeg = Path(tmp) / 'ffmpeg'
+            ffmpeg.write_text('#!/bin/sh\ncat {}\n'.format(raw))
+            ffmpeg.chmod(0o755)
+            (Path(tmp) / 'member_0' / 'sounds').mkdir(parents=True)
+            sound = Sound.objects.create(
+                owner=member,
+                sound_file='member_0/sounds/abc.ogg',
+            )
+            name = waveform.write_peaks(sound, str(ffmpeg))
+            self.assertEqual(name, 'member_0/sounds/abc.peaks.json')
+            self.assertEqual(Sound.objects.get(pk=sound.pk).peaks_file, name)
+            peaks = json.loads((Path(tmp) / name).read_text())
+        level = peaks['levels'][0]
+        self.assertEqual(level['samples_per_pixel'], 256)
+        self.assertEqual(level['length'], 5)
+        self.assertEqual(level['data'][:2], [-128, 127])
+        self.assertEqual(
+            [l['samples_per_pixel'] for l in peaks['levels']],
+            list(waveform.PEAKS_LEVELS),
+        )
+        with self.assertRaises(RuntimeError):
+            waveform.write_peaks(sound, '/nonexistent')
+
+
+PROBE_OUTPUT = {
+    'format': {'duration': '12.500000', 'bit_rate': '2500000'},
+    'streams': [
+        {
+            'codec_type': 'video',
+            'codec_name': 'h264',
+            'width': 1920,
+            'height': 1080,
+            'avg_frame_rate': '30000/1001',
+            'side_data_list': [{'rotation': -90}],
+        },
+        {
+            'codec_type': 'audio',
+            'codec_name': 'aac',
+            'sample_rate': '48000',
+            'channels': 2,
+        },
+    ],
+}
+
+
+class ProbeTest(TestCase):
+
+    def test_video_metadata(self):
+        metadata = probe.get_metadata(PROBE_OUTPUT, 'video')
+        self.assertEqual(metadata, {
+            'duration': 12.5,
+            'codec': 'h264',
+            'bitrate': 2500000,
+            # Rotated a quarter turn
+            'width': 1080,
+            'height': 1920,
+            'fps': 29.97,
+        })
+
+    def test_sound_metadata(self):
+        metadata = probe.get_metadata(PROBE_OUTPUT, 'sound')
+        self.assertEqual(metadata['codec'], 'aac')
+        self.assertEqual(metadata['sample_rate'], 48000)
+        self.assertEqual(metadata['channels'], 2)
+        self.assertEqual(probe.get_metadata({}, 'sound')['duration'], None)
+
+    def test_write_metadata(self):
+        member, user = TestData().create_test_member()
+        video = Video.objects.create(
+            owner=member,
+            video_file='member_0/videos/abc.mp4',
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            ffprobe = Path(tmp) / 'ffprobe'
+            ffprobe.write_text("#!/bin/sh\necho '{}'\n".format(
+                json.dumps(PROBE_OUTPUT),
+            ))
+            ffprobe.chmod(0o755)
+            probe.write_metadata(video, str(ffprobe))
+        video = Video.objects.get(pk=video.pk)
+        self.assertEqual(video.duration, 12.5)
+        self.assertEqual((video.width, video.height), (1080, 1920))
+        with self.assertRaises(RuntimeError):
+            probe.write_metadata(video, '/nonexistent')
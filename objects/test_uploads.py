@@ -0,0 +1,139 @@
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+from datetime import timedelta
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from members.models import Profile
+from .models import ChunkedUpload, Sound
+from .utils import TestData
+from . import uploads
+
+DATA = os.urandom(3000)
+CREATE_URL = '/multimedia/uploads/new/sound/'
+
+
+class ChunkedUploadTest(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(
+            MEDIA_ROOT=os.path.join(self.root, 'media'),
+            CHUNKED_UPLOAD_DIR=os.path.join(self.root, 'uploads'),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        os.makedirs(os.path.join(self.root, 'media'))
+        self.member, self.user = TestData().create_test_member()
+        Profile.objects.create(member=self.member, slug=self.member.username)
+        self.user.user_permissions.add(
+            Permission.objects.get(codename='add_sound'),
+        )
+        self.client.force_login(self.user)
+
+    def create(self, length=len(DATA)):
+        return self.client.post(
+            CREATE_URL,
+            HTTP_UPLOAD_LENGTH=str(length),
+            HTTP_UPLOAD_METADATA='filename ' + base64.b64encode(b'song.wav').decode(),
+            HTTP_TUS_RESUMABLE='1.0.0',
+        )
+
+    def patch(self, location, offset, data, **extra):
+        return self.client.generic(
+            'PATCH',
+            location,
+            data,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+            HTTP_TUS_RESUMABLE='1.0.0',
+            **extra
+        )
+
+    def test_upload_in_chunks(self):
+        response = self.create()
+        self.assertEqual(response.status_code, 201)
+        location = response['Location']
+        upload = ChunkedUpload.objects.get()
+        self.assertEqual(upload.file_name, 'song.wav')
+        response = self.patch(location, 0, DATA[:1000])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], '1000')
+        # A lost response is resumed from the offset the server has
+        self.assertEqual(self.patch(location, 0, DATA[:1000]).status_code, 409)
+        response = self.client.head(location)
+        self.assertEqual(response['Upload-Offset'], '1000')
+        self.assertEqual(response['Upload-Length'], str(len(DATA)))
+        digest = base64.b64encode(hashlib.sha256(DATA[1000:]).digest()).decode()
+        response = self.patch(
+            location,
+            1000,
+            DATA[1000:],
+            HTTP_UPLOAD_CHECKSUM='sha256 ' + digest,
+        )
+        self.assertEqual(response.status_code, 204)
+        sound = Sound.objects.get()
+        self.assertEqual(response['Content-Location'], sound.get_absolute_url())
+        self.assertEqual(sound.owner, self.member)
+        self.assertTrue(sound.sound_file.name.endswith('.wav'))
+        with open(sound.sound_file.path, 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+        self.assertEqual(ChunkedUpload.objects.get().sound, sound)
+        self.assertEqual(os.listdir(os.path.join(self.root, 'uploads')), [])
+
+    def test_finish_once(self):
+        location = self.create()['Location']
+        self.patch(location, 0, DATA)
+        sound = Sound.objects.get()
+        # The last chunk is sent again after its response was lost
+        response = self.patch(location, 0, DATA)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Content-Location'], sound.get_absolute_url())
+        # Another request that reached finish() first has claimed it
+        upload = ChunkedUpload.objects.get()
+        self.assertIsNone(uploads.finish(upload))
+        self.assertEqual(Sound.objects.count(), 1)
+
+    def test_checksum_mismatch(self):
+        location = self.create()['Location']
+        digest = base64.b64encode(hashlib.sha256(b'other').digest()).decode()
+        response = self.patch(
+            location,
+            0,
+            DATA[:1000],
+            HTTP_UPLOAD_CHECKSUM='sha256 ' + digest,
+        )
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(ChunkedUpload.objects.get().offset, 0)
+        path = os.path.join(self.root, 'uploads', str(ChunkedUpload.objects.get().uuid))
+        self.assertEqual(os.path.getsize(path), 0)
+
+    def test_rejected_requests(self):
+        self.assertEqual(self.create(length=8 * 1024**4).status_code, 413)
+        location = self.create()['Location']
+        self.assertEqual(self.patch(location, 0, DATA + b'x').status_code, 413)
+        response = self.client.generic('PATCH', location, DATA, HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.status_code, 415)
+        self.user.user_permissions.clear()
+        self.assertEqual(self.create().status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.head(location).status_code, 404)
+
+    def test_remove_expired(self):
+        location = self.create()['Location']
+        self.patch(location, 0, DATA[:1000])
+        staging = os.path.join(self.root, 'uploads')
+        call_command('clean_uploads', stdout=StringIO())
+        self.assertEqual(ChunkedUpload.objects.count(), 1)
+        ChunkedUpload.objects.update(
+            last_modified=timezone.now() - timedelta(days=2),
+        )
+        call_command('clean_uploads', stdout=StringIO())
+        self.assertFalse(ChunkedUpload.objects.exists())
+        self.assertEqual(os.listdir(staging), [])
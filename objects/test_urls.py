@@ -1,9 +1,11 @@
 import os
+import shutil
+import tempfile
 from io import BytesIO                                # StringIO and BytesIO are parts of io module in python3
 from pathlib import Path
 from django.contrib.auth.models import AnonymousUser, User
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.test import TestCase, Client, RequestFactory
+from django.test import TestCase, Client, RequestFactory, override_settings
 from members.models import Member
 from .models import Tag, Image, Sound, Code, Link
 from .utils import TestData
@@ -11,9 +13,22 @@ from .views import *
 
 # Create your tests here.
 
-class ImageTest(TestCase):
+class MediaTestCase(TestCase):
+    '''
+    Saves test files in a temporary MEDIA_ROOT instead of the site's.
+    '''
 
     def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings = override_settings(MEDIA_ROOT=self.root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+class ImageTest(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
         self.factory = RequestFactory()
         self.client = Client()
         self.data = TestData()
@@ -86,9 +101,10 @@ class ImageTest(TestCase):
         #response = self.client.get(reverse('objects:image_detail', kwargs={'pk':))
         #self.assertEqual(response.status_code, 302)
         
-class SoundTest(TestCase):
+class SoundTest(MediaTestCase):
 
     def setUp(self):
+        super().setUp()
         self.factory = RequestFactory()
         self.data = TestData()
         self.client = Client()
@@ -168,9 +184,10 @@ class SoundTest(TestCase):
         )
         self.assertEqual(response.status_code, 302)
         
-class CodeTest(TestCase):
+class CodeTest(MediaTestCase):
 
     def setUp(self):
+        super().setUp()
         self.factory = RequestFactory()
         self.client = Client()
         self.data = TestData()
@@ -250,9 +267,10 @@ class CodeTest(TestCase):
         )
         self.assertEqual(response.status_code, 302)
         
-class LinkTest(TestCase):
+class LinkTest(MediaTestCase):
 
     def setUp(self):
+        super().setUp()
         self.factory = RequestFactory()
         self.client = Client()
         self.data = TestData()
@@ -32,3 +32,43 @@ class ImageTest(TestCase):
     # Test context
     # Test publish views
     
+
+
+class CodeHighlightTest(TestCase):
+
+    def setUp(self):
+        self.data = TestData()
+        self.member, self.user = self.data.create_test_member()
+        self.code = Code.objects.create(
+            owner=self.member,
+            title='hello',
+            code='def hello():\n    return "world"\n',
+            language='Python',
+            language_version='3',
+            file_path='hello.py',
+        )
+
+    def test_highlighted_on_save(self):
+        self.assertEqual(self.code.md5, Code.get_md5(self.code.code))
+        self.assertEqual(self.code.highlighted_md5, self.code.md5)
+        self.assertEqual(self.code.lexer, 'python')
+        self.assertIn('highlight code-block', self.code.highlighted)
+
+    def test_unchanged_code_is_not_highlighted_again(self):
+        highlighted = self.code.highlighted
+        self.code.highlighted = 'stored'
+        self.code.title = 'renamed'
+        self.code.save()
+        self.assertEqual(self.code.highlighted, 'stored')
+        self.code.code = 'print("changed")\n'
+        self.code.save()
+        self.assertNotEqual(self.code.highlighted, highlighted)
+        self.assertIn('changed', self.code.highlighted)
+
+    def test_missing_highlight_is_stored(self):
+        Code.objects.filter(pk=self.code.pk).update(highlighted=None)
+        code = Code.objects.get(pk=self.code.pk)
+        self.assertIn('highlight code-block', code.get_highlighted())
+        with self.assertNumQueries(0):
+            code.get_highlighted()
+        self.assertIsNotNone(Code.objects.get(pk=self.code.pk).highlighted)
@@ -0,0 +1,488 @@
+import json
+import logging
+import shutil
+import subprocess
+import time
+from collections import deque
+from datetime import timedelta
+from hashlib import md5
+from pathlib import Path
+from django import db
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from members.models import MediaUsage
+from .models import ObjectsAppProfile, Sound, Video, TranscodeJob
+from .utils import FileSystemOps
+from . import blobs, probe, waveform
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress writes to the database while ffmpeg is running
+PROGRESS_INTERVAL = 2
+
+# Name of the HLS master playlist in each video's stream directory
+MASTER_PLAYLIST = 'master.m3u8'
+# Bitrate of the audio in every HLS rendition
+HLS_AUDIO_BITRATE = '128k'
+
+# Queue
+
+def enqueue(instance):
+    '''
+    Queue a transcode job for a freshly uploaded Sound or Video.
+
+    Arguments
+    instance - A Sound or Video instance with a saved source file.
+
+    Returns - The new TranscodeJob.
+    '''
+    if isinstance(instance, Sound):
+        return TranscodeJob.objects.create(sound=instance)
+    else:
+        return TranscodeJob.objects.create(video=instance)
+
+def claim_next_job():
+    '''
+    Atomically move the oldest queued job to the running state.
+    The status check in the UPDATE makes sure that two workers
+    never claim the same job.
+
+    Returns - The claimed job pk, or None if the queue is empty.
+    '''
+    queued = TranscodeJob.objects.filter(
+        status=TranscodeJob.QUEUED,
+    ).order_by('creation_date').values_list('pk', flat=True)[:10]
+    for pk in queued:
+        claimed = TranscodeJob.objects.filter(
+            pk=pk,
+            status=TranscodeJob.QUEUED,
+        ).update(
+            status=TranscodeJob.RUNNING,
+            progress=0,
+            attempts=F('attempts') + 1,
+            start_date=timezone.now(),
+        )
+        if claimed:
+            return pk
+    return None
+
+def requeue_stale_jobs(minutes):
+    '''
+    Put jobs that have been running for longer than the given number
+    of minutes back in the queue. Jobs are left in the running state
+    when a worker is killed in the middle of a transcode.
+
+    Returns - The number of jobs requeued.
+    '''
+    cutoff = timezone.now() - timedelta(minutes=minutes)
+    return TranscodeJob.objects.filter(
+        status=TranscodeJob.RUNNING,
+        start_date__lt=cutoff,
+    ).update(status=TranscodeJob.QUEUED, progress=0)
+
+def fail_job(pk, error):
+    '''
+    Record a failed attempt. The job is queued again until the
+    maximum number of attempts set in the app profile is reached.
+    '''
+    profile = ObjectsAppProfile.get_profile()
+    job = TranscodeJob.objects.select_related('sound', 'video').filter(
+        pk=pk,
+    ).first()
+    if job is None:
+        return
+    job.error = error
+    job.finish_date = timezone.now()
+    if job.attempts < profile.transcoder_max_attempts:
+        job.status = TranscodeJob.QUEUED
+        job.progress = 0
+    else:
+        job.status = TranscodeJob.FAILED
+        instance = job.get_instance()
+        if instance:
+            type(instance).objects.filter(pk=instance.pk).update(
+                title="failed upload",
+            )
+    job.save()
+    logger.error(
+        'Transcoding failed for {} on attempt {}: {}'.format(
+            job,
+            job.attempts,
+            error,
+        )
+    )
+
+# Transcoding
+
+def get_settings(profile, kind):
+    '''
+    Returns the ffmpeg options and output extension from the app profile
+    for the given kind of media, "sound" or "video".
+    '''
+    if kind == 'sound':
+        if profile.sound_format == "MP3":
+            ext = ".mp3"
+        else:
+            ext = ".ogg"
+        return {
+            'bitrate': str(profile.sound_bitrate),
+            'crf': str(profile.sound_crf),
+            'qmin': str(profile.sound_qmin),
+            'qmax': str(profile.sound_qmax),
+            'ext': ext,
+        }
+    else:
+        if profile.video_format == "MP4":
+            ext = ".mp4"
+        else:
+            ext = ".webm"
+        return {
+            'bitrate': str(profile.video_bitrate),
+            'crf': str(profile.video_crf),
+            'qmin': str(profile.video_qmin),
+            'qmax': str(profile.video_qmax),
+            'ext': ext,
+        }
+
+def probe_duration(ffprobe_cmd, path):
+    '''
+    Returns the duration of a media file in seconds, or None if
+    ffprobe is unavailable or can not read the file.
+    '''
+    command = [
+        ffprobe_cmd,
+        '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        path,
+    ]
+    try:
+        output = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            timeout=60,
+        ).stdout
+        return float(output.decode().strip())
+    except Exception:
+        return None
+
+def run_ffmpeg(command, job_pk, duration, start=0, end=99):
+    '''
+    Run ffmpeg and write the percent complete to the job while it runs.
+    ffmpeg is asked to report progress as key=value lines on stdout.
+    The progress of this run is reported between start and end percent
+    so jobs that run ffmpeg more than once keep moving forward.
+
+    Returns - A tuple of the exit code and the last lines of output.
+    '''
+    tail = deque(maxlen=20)
+    last_write = 0
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        universal_newlines=True,
+    )
+    for line in process.stdout:
+        key, sep, value = line.strip().partition('=')
+        if key == 'out_time_ms' and duration:
+            now = time.monotonic()
+            if now - last_write < PROGRESS_INTERVAL:
+                continue
+            try:
+                # out_time_ms is in microseconds despite the name
+                done = int(value) / (duration * 10**6)
+            except ValueError:
+                continue
+            percent = start + int(min(max(done, 0), 1) * (end - start))
+            TranscodeJob.objects.filter(pk=job_pk).update(
+                progress=max(0, min(percent, 99)),
+            )
+            last_write = now
+        elif not sep:
+            tail.append(line.strip())
+    return process.wait(), '\n'.join(tail)
+
+def get_progressive_command(profile, options, src_path, output):
+    '''
+    Returns the ffmpeg command that converts the upload into a single
+    file. MP4 files have their index at the start so browsers can begin
+    playing before the whole file is downloaded. The output is bit exact
+    so the blob store can share the outputs of identical uploads.
+    '''
+    # Thanks Vestride
+    # https://gist.github.com/Vestride/278e13915894821e1d6f
+    command = [
+        profile.ffmpeg_path,
+        '-y',
+        '-nostats',
+        '-loglevel', 'error',
+        '-progress', 'pipe:1',
+        '-i', str(src_path),
+        '-qmin', options['qmin'],
+        '-qmax', options['qmax'],
+        '-b:v', options['bitrate'],
+        '-crf', options['crf'],
+        # No random stream serials, encoder versions or dates in the
+        # output so the same upload always gives the same bytes
+        '-fflags', '+bitexact',
+        '-flags', '+bitexact',
+    ]
+    if options['ext'] == '.mp4':
+        command += ['-movflags', '+faststart']
+    else:
+        command += ['-deadline', 'realtime']
+    return command + [str(output)]
+
+def transcode(job):
+    '''
+    Convert the source file of a job to the format configured in the
+    app profile. Videos are also packaged for adaptive streaming when
+    the app profile has a bitrate ladder. The metadata of the new file
+    is stored and the waveform peaks of sounds are computed from it.
+    The output is given a hard to guess name for added privacy and the
+    original upload is removed.
+
+    Raises RuntimeError if ffmpeg fails.
+    '''
+    profile = ObjectsAppProfile.get_profile()
+    instance = job.get_instance()
+    kind = job.get_kind()
+    field_name = '{}_file'.format(kind)
+    field = getattr(instance, field_name)
+    src_path = Path(field.path)
+    options = get_settings(profile, kind)
+    streaming = kind == 'video' and bool(get_ladder(profile))
+
+    seed = str(src_path) + str(timezone.now())
+    safe_file_name = md5(seed.encode()).hexdigest() + options['ext']
+    output = src_path.parent / safe_file_name
+
+    command = get_progressive_command(profile, options, src_path, output)
+    duration = probe_duration(profile.ffprobe_path, str(src_path))
+    code, tail = run_ffmpeg(
+        command,
+        job.pk,
+        duration,
+        end=50 if streaming else 99,
+    )
+    if code != 0 or not output.is_file():
+        FileSystemOps()._delete_file(output)
+        raise RuntimeError(
+            'ffmpeg exited with status {}\n{}'.format(code, tail)
+        )
+    fields = {field_name: str(output.relative_to(settings.MEDIA_ROOT))}
+    # Uploads of the same file give the same output, which is then shared
+    blobs.store(output)
+    added = blobs.get_charged_size([output])
+
+    # The single file is still served if packaging fails
+    if streaming:
+        try:
+            playlist = package_hls(profile, job, src_path, duration)
+        except RuntimeError as e:
+            logger.error('HLS packaging failed for {}: {}'.format(job, e))
+        else:
+            if playlist:
+                fields['hls_playlist'] = str(playlist.relative_to(settings.MEDIA_ROOT))
+                added += get_dir_size(playlist.parent)
+
+    # Point the instance at the new files and remove the original upload.
+    # A queryset update is used so the upload signals do not fire again.
+    type(instance).objects.filter(pk=instance.pk).update(**fields)
+    fsop = FileSystemOps()
+    delta = added - blobs.get_charged_size([src_path])
+    fsop._delete_file(src_path)
+    MediaUsage.record(instance.owner_id, '{}_bytes'.format(kind), delta)
+
+    # The new file is still served if these stages fail
+    transcoded = type(instance).objects.get(pk=instance.pk)
+    try:
+        probe.write_metadata(transcoded, profile.ffprobe_path)
+    except RuntimeError as e:
+        logger.error('Probing failed for {}: {}'.format(job, e))
+    if kind == 'sound':
+        try:
+            waveform.write_peaks(transcoded, profile.ffmpeg_path)
+        except RuntimeError as e:
+            logger.error('Waveform peaks failed for {}: {}'.format(job, e))
+
+# Adaptive streaming
+
+def get_ladder(profile):
+    '''
+    Returns the HLS renditions configured in the app profile as a
+    sorted list of (height, Kbps) tuples.
+    '''
+    ladder = set()
+    for pair in profile.video_ladder.split(','):
+        height, sep, kbps = pair.partition(':')
+        try:
+            ladder.add((int(height), int(kbps)))
+        except ValueError:
+            pass
+    return sorted((h, k) for h, k in ladder if h > 0 and k > 0)
+
+def get_renditions(ladder, height):
+    '''
+    Returns the renditions of the ladder that are not taller than the
+    source. A source shorter than every rendition gets one rendition
+    at its own height.
+    '''
+    renditions = [(h, k) for h, k in ladder if h <= height]
+    if not renditions and ladder:
+        # Scaled heights must be even for H.264
+        renditions = [(max(2, height - height % 2), ladder[0][1])]
+    return renditions
+
+def probe_video(ffprobe_cmd, path):
+    '''
+    Returns a tuple of the height of the first video stream and True if
+    the file has sound, or None if ffprobe can not read the file.
+    '''
+    command = [
+        ffprobe_cmd,
+        '-v', 'error',
+        '-show_entries', 'stream=codec_type,height',
+        '-of', 'json',
+        path,
+    ]
+    try:
+        output = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            timeout=60,
+        ).stdout
+        streams = json.loads(output.decode()).get('streams', [])
+    except Exception:
+        return None
+    heights = [
+        s.get('height') for s in streams
+        if s.get('codec_type') == 'video' and s.get('height')
+    ]
+    if not heights:
+        return None
+    has_audio = any(s.get('codec_type') == 'audio' for s in streams)
+    return heights[0], has_audio
+
+def get_hls_command(profile, src_path, out_dir, renditions, has_audio):
+    '''
+    Returns the ffmpeg command that encodes every rendition in one pass
+    and writes a media playlist and segments for each of them, along
+    with a master playlist that lists them all. Key frames are forced
+    at segment boundaries so players can switch renditions cleanly.
+    '''
+    seconds = max(1, profile.hls_segment_seconds)
+    n = len(renditions)
+    filters = ['[0:v]split={}{}'.format(
+        n,
+        ''.join('[s{}]'.format(i) for i in range(n)),
+    )]
+    filters += [
+        '[s{0}]scale=-2:{1}[v{0}]'.format(i, height)
+        for i, (height, kbps) in enumerate(renditions)
+    ]
+    command = [
+        profile.ffmpeg_path,
+        '-y',
+        '-nostats',
+        '-loglevel', 'error',
+        '-progress', 'pipe:1',
+        '-i', str(src_path),
+        '-filter_complex', ';'.join(filters),
+    ]
+    stream_map = []
+    for i, (height, kbps) in enumerate(renditions):
+        command += [
+            '-map', '[v{}]'.format(i),
+            '-c:v:{}'.format(i), 'libx264',
+            '-b:v:{}'.format(i), '{}k'.format(kbps),
+            '-maxrate:v:{}'.format(i), '{}k'.format(kbps * 107 // 100),
+            '-bufsize:v:{}'.format(i), '{}k'.format(kbps * 3 // 2),
+        ]
+        if has_audio:
+            command += [
+                '-map', 'a:0',
+                '-c:a:{}'.format(i), 'aac',
+                '-b:a:{}'.format(i), HLS_AUDIO_BITRATE,
+            ]
+            stream_map.append('v:{0},a:{0}'.format(i))
+        else:
+            stream_map.append('v:{}'.format(i))
+    command += [
+        '-preset', 'veryfast',
+        '-pix_fmt', 'yuv420p',
+        '-sc_threshold', '0',
+        '-force_key_frames', 'expr:gte(t,n_forced*{})'.format(seconds),
+        '-f', 'hls',
+        '-hls_time', str(seconds),
+        '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', str(out_dir / '%v' / 'segment_%05d.ts'),
+        '-master_pl_name', MASTER_PLAYLIST,
+        '-var_stream_map', ' '.join(stream_map),
+        str(out_dir / '%v' / 'index.m3u8'),
+    ]
+    return command
+
+def package_hls(profile, job, src_path, duration):
+    '''
+    Package the upload of a video job for HLS in a directory next to it.
+
+    Returns - The path of the master playlist, or None if the upload
+    has no video stream.
+
+    Raises RuntimeError if ffmpeg fails.
+    '''
+    probed = probe_video(profile.ffprobe_path, str(src_path))
+    if probed is None:
+        return None
+    height, has_audio = probed
+    renditions = get_renditions(get_ladder(profile), height)
+    seed = 'hls' + str(src_path) + str(timezone.now())
+    out_dir = src_path.parent / (md5(seed.encode()).hexdigest() + '-hls')
+    command = get_hls_command(profile, src_path, out_dir, renditions, has_audio)
+    code, tail = run_ffmpeg(command, job.pk, duration, start=50)
+    playlist = out_dir / MASTER_PLAYLIST
+    if code != 0 or not playlist.is_file():
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise RuntimeError(
+            'ffmpeg exited with status {}\n{}'.format(code, tail)
+        )
+    return playlist
+
+def get_dir_size(path):
+    '''
+    Returns the total size in bytes of the files in a directory tree.
+    '''
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file())
+
+def run_job(pk):
+    '''
+    Entry point for the worker processes.
+    Transcodes a claimed job and records the result.
+    '''
+    db.close_old_connections()
+    try:
+        job = TranscodeJob.objects.select_related('sound', 'video').get(pk=pk)
+    except TranscodeJob.DoesNotExist:
+        # The Sound or Video was deleted while the job was queued
+        return
+    try:
+        if job.get_instance() is None:
+            raise RuntimeError('job has no sound or video')
+        transcode(job)
+    except Exception as e:
+        fail_job(pk, str(e))
+    else:
+        TranscodeJob.objects.filter(pk=pk).update(
+            status=TranscodeJob.DONE,
+            progress=100,
+            error=None,
+            finish_date=timezone.now(),
+        )
+    finally:
+        db.close_old_connections()
@@ -0,0 +1,338 @@
+import base64
+import binascii
+import hashlib
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File, locks
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.http import http_date
+from django.views.decorators.http import require_http_methods
+from members.models import Member
+from .models import ChunkedUpload, Sound, Video
+'''
+Resumable uploads.
+
+Large sounds and videos can be sent in chunks with the tus protocol
+(https://tus.io/protocols/resumable-upload), using the creation, checksum
+and termination extensions:
+
+    POST   uploads/new/<kind>/   Upload-Length, Upload-Metadata
+    HEAD   uploads/<uuid>/       returns Upload-Offset
+    PATCH  uploads/<uuid>/       Upload-Offset, optional Upload-Checksum
+    DELETE uploads/<uuid>/
+
+Each chunk is streamed from the request straight into a staging file in
+CHUNKED_UPLOAD_DIR. A client whose connection drops asks for the offset
+with HEAD and sends the rest from there. Once the staging file has the
+announced length it is moved into place as a new Sound or Video, which
+is then handled like any other upload. The "clean_uploads" command
+removes uploads that were abandoned.
+'''
+
+TUS_VERSION = '1.0.0'
+TUS_EXTENSIONS = 'creation,checksum,termination'
+CHECKSUM_ALGORITHMS = {
+    'md5': hashlib.md5,
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+}
+# Bytes read from the request at a time
+READ_SIZE = 64 * 1024
+
+MODELS = {
+    ChunkedUpload.SOUND: (Sound, 'sound_file'),
+    ChunkedUpload.VIDEO: (Video, 'video_file'),
+}
+
+def get_upload_dir():
+    return getattr(
+        settings,
+        'CHUNKED_UPLOAD_DIR',
+        os.path.join(settings.BASE_DIR, 'run', 'uploads'),
+    )
+
+def get_max_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 8 * 1024**3)
+
+def get_expiry():
+    return timedelta(hours=getattr(settings, 'CHUNKED_UPLOAD_EXPIRY', 24))
+
+def get_path(upload):
+    return os.path.join(get_upload_dir(), str(upload.uuid))
+
+class StagedFile(File):
+    '''
+    A finished staging file. Storage moves it into place
+    instead of copying it.
+    '''
+
+    def temporary_file_path(self):
+        return self.file.name
+
+# Protocol
+
+def tus_response(status=204, **headers):
+    response = HttpResponse(status=status)
+    response['Tus-Resumable'] = TUS_VERSION
+    response['Cache-Control'] = 'no-store'
+    for name, value in headers.items():
+        response[name.replace('_', '-')] = value
+    return response
+
+def options_response():
+    return tus_response(
+        Tus_Version=TUS_VERSION,
+        Tus_Extension=TUS_EXTENSIONS,
+        Tus_Max_Size=str(get_max_size()),
+        Tus_Checksum_Algorithm=','.join(CHECKSUM_ALGORITHMS),
+    )
+
+def upload_headers(upload):
+    headers = {
+        'Upload_Offset': str(upload.offset),
+        'Upload_Length': str(upload.length),
+        'Upload_Expires': http_date(
+            (upload.last_modified + get_expiry()).timestamp()
+        ),
+    }
+    instance = upload.get_instance()
+    if instance:
+        # Where the client can go once the upload is finished
+        headers['Content_Location'] = instance.get_absolute_url()
+    return headers
+
+def parse_metadata(header):
+    '''
+    Returns - A dict of the comma separated "key base64value" pairs
+    of an Upload-Metadata header.
+    '''
+    metadata = {}
+    for pair in header.split(','):
+        key, sep, value = pair.strip().partition(' ')
+        if not key:
+            continue
+        try:
+            metadata[key] = base64.b64decode(value).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError('Invalid metadata value for {}'.format(key))
+    return metadata
+
+def parse_checksum(header):
+    '''
+    Returns - A tuple of a new hash object and the expected digest from
+    an Upload-Checksum header, or None if there is no header.
+    '''
+    if not header:
+        return None
+    algorithm, sep, value = header.strip().partition(' ')
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError('Unsupported checksum algorithm')
+    try:
+        return CHECKSUM_ALGORITHMS[algorithm](), base64.b64decode(value)
+    except binascii.Error:
+        raise ValueError('Invalid checksum')
+
+def write_chunk(upload, offset, stream, length, checksum):
+    '''
+    Append a chunk from the request stream to the staging file without
+    holding it in memory. The file is locked so only one request writes
+    at a time, and the offset is checked again once the lock is held.
+
+    Returns - The new offset, or None if the offset is out of date.
+
+    Raises ValueError if the chunk does not match its checksum.
+    '''
+    with open(get_path(upload), 'r+b') as f:
+        locks.lock(f, locks.LOCK_EX)
+        try:
+            current = ChunkedUpload.objects.filter(
+                pk=upload.pk,
+            ).values_list('offset', flat=True).first()
+            if current != offset:
+                return None
+            # Drop anything left behind by a chunk that was rejected
+            f.truncate(offset)
+            f.seek(offset)
+            remaining = length
+            while remaining > 0:
+                data = stream.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                f.write(data)
+                if checksum:
+                    checksum[0].update(data)
+                remaining -= len(data)
+            f.flush()
+            received = length - remaining
+            # A partial chunk can not be checked, the client sends it again
+            if checksum and (remaining or checksum[0].digest() != checksum[1]):
+                f.truncate(offset)
+                if not remaining:
+                    raise ValueError('Checksum mismatch')
+                received = 0
+            ChunkedUpload.objects.filter(pk=upload.pk).update(
+                offset=offset + received,
+                last_modified=timezone.now(),
+            )
+            return offset + received
+        finally:
+            locks.unlock(f)
+
+def finish(upload):
+    '''
+    Turn a complete staging file into a Sound or Video in the same
+    way as a form upload. The upload is claimed first with a conditional
+    UPDATE of its finished flag, so when the last chunk is sent twice
+    only one request makes the instance.
+
+    Returns - The new Sound or Video, or None if another request
+    has claimed the upload.
+    '''
+    claimed = ChunkedUpload.objects.filter(
+        pk=upload.pk,
+        finished=False,
+    ).update(finished=True)
+    if not claimed:
+        return None
+    model, field = MODELS[upload.kind]
+    path = get_path(upload)
+    try:
+        instance = model(owner=upload.owner, creation_date=timezone.now())
+        with open(path, 'rb') as f:
+            getattr(instance, field).save(upload.file_name, StagedFile(f), save=False)
+        instance.save()
+    except Exception:
+        # Let the client try again
+        ChunkedUpload.objects.filter(pk=upload.pk).update(finished=False)
+        raise
+    # The staging file is copied when it is on another file system
+    if os.path.exists(path):
+        os.remove(path)
+    ChunkedUpload.objects.filter(pk=upload.pk).update(**{upload.kind: instance})
+    return instance
+
+# Views
+
+@require_http_methods(['POST', 'OPTIONS'])
+def create_upload(request, kind):
+    '''
+    Start a resumable upload of a Sound or Video.
+    '''
+    if request.method == 'OPTIONS':
+        return options_response()
+    if kind not in MODELS:
+        raise Http404
+    if not request.user.has_perm('objects.add_{}'.format(kind)):
+        return tus_response(403)
+    try:
+        length = int(request.headers.get('Upload-Length', ''))
+        metadata = parse_metadata(request.headers.get('Upload-Metadata', ''))
+    except ValueError:
+        return tus_response(400)
+    if length <= 0 or length > get_max_size():
+        return tus_response(413)
+    member = Member.objects.get(pk=request.user.pk)
+    has_free_space, free, used = member.check_free_media_capacity()
+    if not has_free_space or length >= free:
+        return tus_response(413)
+    file_name = os.path.basename(metadata.get('filename', '')) or kind
+    upload = ChunkedUpload.objects.create(
+        owner=member,
+        kind=kind,
+        file_name=file_name[-255:],
+        length=length,
+    )
+    os.makedirs(get_upload_dir(), exist_ok=True)
+    open(get_path(upload), 'wb').close()
+    return tus_response(
+        201,
+        Location=upload.get_absolute_url(),
+        **upload_headers(upload)
+    )
+
+@require_http_methods(['HEAD', 'PATCH', 'DELETE', 'OPTIONS'])
+def chunked_upload(request, uuid):
+    '''
+    Get the offset of, append a chunk to, or cancel a resumable upload.
+    '''
+    if request.method == 'OPTIONS':
+        return options_response()
+    upload = get_object_or_404(
+        ChunkedUpload.objects.select_related('sound', 'video'),
+        uuid=uuid,
+        owner_id=request.user.pk,
+    )
+    if request.method == 'HEAD':
+        return tus_response(200, **upload_headers(upload))
+    if request.method == 'DELETE':
+        if not upload.finished:
+            if os.path.exists(get_path(upload)):
+                os.remove(get_path(upload))
+            upload.delete()
+        return tus_response()
+    if request.content_type != 'application/offset+octet-stream':
+        return tus_response(415)
+    if upload.finished:
+        return tus_response(409, **upload_headers(upload))
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        checksum = parse_checksum(request.headers.get('Upload-Checksum'))
+    except ValueError:
+        return tus_response(400)
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if offset + length > upload.length:
+        return tus_response(413)
+    try:
+        new_offset = write_chunk(upload, offset, request, length, checksum)
+    except ValueError:
+        # 460 Checksum Mismatch from the tus checksum extension
+        return tus_response(460)
+    if new_offset is None:
+        upload.refresh_from_db()
+        return tus_response(409, **upload_headers(upload))
+    upload.refresh_from_db()
+    if upload.is_complete():
+        finish(upload)
+        upload.refresh_from_db()
+    return tus_response(**upload_headers(upload))
+
+# Cleanup
+
+def remove_expired(hours=None):
+    '''
+    Remove unfinished uploads that have not received a chunk before
+    they expired, finished uploads that are as old, and staging files
+    that no longer belong to an upload.
+
+    Arguments
+    hours   - Hours without a chunk after which an upload is removed.
+              Defaults to CHUNKED_UPLOAD_EXPIRY.
+
+    Returns - The number of uploads removed.
+    '''
+    expiry = get_expiry() if hours is None else timedelta(hours=hours)
+    cutoff = timezone.now() - expiry
+    expired = ChunkedUpload.objects.filter(last_modified__lt=cutoff)
+    removed = 0
+    for upload in expired.iterator():
+        path = get_path(upload)
+        if os.path.exists(path):
+            os.remove(path)
+        removed += 1
+    expired.delete()
+    directory = get_upload_dir()
+    if os.path.isdir(directory):
+        known = set(
+            str(u) for u in ChunkedUpload.objects.values_list('uuid', flat=True)
+        )
+        for entry in os.scandir(directory):
+            if (
+                entry.is_file()
+                and entry.name not in known
+                and entry.stat().st_mtime < cutoff.timestamp()
+            ):
+                os.remove(entry.path)
+    return removed
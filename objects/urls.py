@@ -1,6 +1,7 @@
 from django.urls import path
 from django.contrib.staticfiles.urls import static, staticfiles_urlpatterns
 import objects.views as views  
+import objects.uploads as uploads
 
 app_name = 'objects'
 
@@ -195,6 +196,17 @@ urlpatterns = [
         views.TagCreateView.as_view(),
         name='tag_create',
     ),
+    ## Resumable uploads
+    path(
+        'uploads/new/<slug:kind>/',
+        uploads.create_upload,
+        name='chunked_upload_create',
+    ),
+    path(
+        'uploads/<uuid:uuid>/',
+        uploads.chunked_upload,
+        name='chunked_upload',
+    ),
     # Update Views
     path(
         'modify/image/<int:pk>',
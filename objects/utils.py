@@ -1,4 +1,5 @@
 import os
+import re
 from io import BytesIO
 from pathlib import Path
 from django.conf import settings
@@ -6,6 +7,7 @@ from django.contrib.auth.models import User
 from django.utils import timezone
 from members.models import Member
 from .models import Image, Sound
+from . import blobs
 
 class FileSystemOps:
 
@@ -15,14 +17,26 @@ class FileSystemOps:
     def _delete_file(self, path):
         '''
         Delete a file from the filesystem
+        along with its link to the blob store
         '''
         f = Path(path)
         if f.is_file():
+            blobs.release(f)
             f.unlink()
             return 0
         else:
             return 1
 
+    def _get_size(self, path):
+        '''
+        Returns the size of a file in bytes or 0 if it does not exist
+        '''
+        f = Path(path)
+        if f.is_file():
+            return f.stat().st_size
+        else:
+            return 0
+
     def _make_dir(self, path):
         '''
         Checks to see if a path exists as a directory.
@@ -50,6 +64,9 @@ class Text:
         '''
         Given a DB model and a title, return a unique slug that is unique \
         to all other slug fields of the given DB model.
+        If the slug is taken, the next free numbered suffix is added,
+        e.g. "title-2". Only the slugs that share the prefix are looked
+        at, using the index on the slug field.
         
         Arguments
         model - Must be a Django database model that has \
@@ -58,24 +75,54 @@ class Text:
 
         Returns - A slug that is unique across all instances of the model.
         '''
+        from django.core.exceptions import FieldDoesNotExist
+        from django.db import connection
+        from django.db.models.functions import Length
         from django.utils.text import slugify
-        slug = slugify(title)
-        existing_slugs = []
         try:
-            [existing_slugs.append(str(i.slug)) for i in model.objects.all()]
-        except:
+            max_length = model._meta.get_field('slug').max_length
+        except FieldDoesNotExist:
             print("slugify_unique failure! There was no slug field found for {}".format(model))
+            return slugify(title)
+        # Leave room for a suffix
+        slug = slugify(title)[:max_length - 11].strip('-') or 'untitled'
+        if not model.objects.filter(slug=slug).exists():
             return slug
-        if slug in existing_slugs:
-            date_slug = slug + "-" + timezone.now().strftime("%Y%m%d")
-            if date_slug in existing_slugs:
-                long_slug = date_slug + timezone.now().strftime("%m%s")
-                return long_slug
-            else:
-                return date_slug
+        candidates = model.objects.filter(slug__startswith=slug + '-')
+        if connection.vendor == 'sqlite':
+            # SQLite can not use the index for LIKE but it can for a range.
+            # '.' is the character after '-'.
+            candidates = candidates.filter(
+                slug__gte=slug + '-',
+                slug__lt=slug + '.',
+            )
+        # The numbered slug with the longest, then highest suffix
+        # has the largest number
+        last = candidates.filter(
+            slug__regex=r'^{}-[0-9]+$'.format(re.escape(slug)),
+        ).order_by(
+            Length('slug').desc(),
+            '-slug',
+        ).values_list('slug', flat=True).first()
+        if last:
+            n = int(last.rsplit('-', 1)[1]) + 1
         else:
-            return slug
-        
+            n = 2
+        return '{}-{}'.format(slug, n)
+
+    def set_unique_slug(instance, title):
+        '''
+        Give an instance a unique slug made from the title. The instance
+        is not saved. MemberCreateMixin saves it and makes a new slug if
+        another request takes the same slug first.
+
+        Arguments
+        instance - A model instance with a unique field called "slug".
+        title - The string used to create the slug.
+        '''
+        instance.slug = Text.slugify_unique(type(instance), title)
+        instance._slug_title = title
+
 class TestData:
 
     def __init__(self, *args, **kwargs):
@@ -98,9 +145,14 @@ mollit anim id est laborum."""
     url = "https://www.google.com"
     username = "fflinstone"
     
-    # File paths
-    image_path = os.path.join(settings.BASE_DIR, 'media/test.png')
-    sound_path = os.path.join(settings.BASE_DIR, 'media/test.wav')
+    # File paths, in the MEDIA_ROOT the test runs with
+    @property
+    def image_path(self):
+        return os.path.join(settings.MEDIA_ROOT, 'test.png')
+
+    @property
+    def sound_path(self):
+        return os.path.join(settings.MEDIA_ROOT, 'test.wav')
 
     def create_test_member(self):
         '''
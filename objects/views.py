@@ -17,7 +17,9 @@ from django.views.generic.edit import CreateView, FormView, UpdateView, DeleteVi
 from django.views.generic.detail import DetailView
 from django.views.generic.list import ListView
 from documentation.models import Article, Story, SupportDocument
-from lookaway.mixins import AppPageMixin
+from lookaway.mixins import (
+    AppPageMixin, ConditionalDetailMixin, SectionDetailMixin,
+)
 from lookaway.settings import BASE_DIR
 from home.models import HomeAppProfile
 from art.models import Gallery, Visual
@@ -49,7 +51,7 @@ class ObjectsAppProfileUpdateView(LoginRequiredMixin, PermissionRequiredMixin, U
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = profile.title
@@ -103,7 +105,7 @@ class ObjectsAppTranscoderSettingsUpdateView(LoginRequiredMixin, PermissionRequi
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = profile.title
@@ -123,13 +125,25 @@ class ObjectsPageView(LoginRequiredMixin, TemplateView, AppPageMixin):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
+        # Cached fragments depend on these models
+        context['fragment_models'] = self.get_fragment_models(
+            ObjectsAppProfile,
+            ObjectsPageSection,
+            Image,
+            Sound,
+            Video,
+            Code,
+            Link,
+        )
         # SEO stuff
         context['meta_title'] = profile.title
         context['meta_desc'] = profile.meta_description
         # Sections
-        sections = ObjectsPageSection.objects.filter(
+        sections = ObjectsPageSection.objects.prefetch_related(
+            *ObjectsPageSection.get_prefetch_plan()
+        ).filter(
             is_enabled = True,
         ).order_by(
             'order',
@@ -141,35 +155,35 @@ class ObjectsPageView(LoginRequiredMixin, TemplateView, AppPageMixin):
                 members_only=True
             )
         # Images
-        context['new_images'], context['top_images'] = self.get_sets(
+        context['new_images'], context['top_images'] = self.get_lazy_sets(
             Image,
             profile.n_images,
             show_new=profile.show_images,
             show_top=profile.show_images,
         )
         # Sounds
-        context['new_sounds'], context['top_sounds'] = self.get_sets(
+        context['new_sounds'], context['top_sounds'] = self.get_lazy_sets(
             Sound,
             profile.n_sounds,
             show_new=profile.show_sounds,
             show_top=profile.show_sounds,
         )
         # Videos
-        context['new_videos'], context['top_videos'] = self.get_sets(
+        context['new_videos'], context['top_videos'] = self.get_lazy_sets(
             Video,
             profile.n_videos,
             show_new=profile.show_videos,
             show_top=profile.show_videos,
         )
         # Code
-        context['new_codes'], context['top_codes'] = self.get_sets(
+        context['new_codes'], context['top_codes'] = self.get_lazy_sets(
             Code,
             profile.n_codes,
             show_new=profile.show_codes,
             show_top=profile.show_codes,
         )
         # Links
-        context['new_links'], context['top_links'] = self.get_sets(
+        context['new_links'], context['top_links'] = self.get_lazy_sets(
             Link,
             profile.n_links,
             show_new=profile.show_links,
@@ -232,7 +246,7 @@ class ObjectsPageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin,
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Page Section"
         context['meta_desc'] = "Add a section to the {} landing page.".format(profile.title)
@@ -255,7 +269,7 @@ class ObjectsPageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin,
                 kwargs={'pk': self.object.pk},
             )
 
-class ObjectsPageSectionDetailView(LoginRequiredMixin, DetailView):
+class ObjectsPageSectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = ObjectsPageSection
     context_object_name = 'section'
@@ -263,7 +277,7 @@ class ObjectsPageSectionDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = profile.title
         context['sections'] = True
@@ -307,7 +321,7 @@ class ObjectsPageSectionUpdateView(LoginRequiredMixin, PermissionRequiredMixin,
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this landing page section.".format(self.object.title)
@@ -351,9 +365,7 @@ class ImageCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
         
         member = Member.objects.get(pk=self.request.user.pk)
         # Check disk space before uploading
-        has_free_space, free, used = member.check_free_media_capacity(
-            BASE_DIR + '/media/member_{}/'.format(member.pk),
-        )
+        has_free_space, free, used = member.check_free_media_capacity()
         upload_size = self.request.FILES['image_file'].size
         print('{}, {}, {}'.format(has_free_space, free, used))
         if has_free_space:
@@ -398,7 +410,7 @@ class ImageCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Upload an Image File"
         context['meta_desc'] = """Submit an Image you wish to upload. Images \
@@ -415,23 +427,21 @@ class ImageCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
 class ImageListView(ModelListMixin, LoginRequiredMixin, ListView):
 
     model = Image
-    try:
-        paginate_by = ObjectsAppProfile.objects.get_or_create(pk=1)[0].images_list_pagination
-    except:
-        paginate_by = 30
     queryset = Image.objects.filter(is_public=True)
     context_object_name = 'images'
     ordering = ['-weight', '-creation_date']
 
+    def get_paginate_by(self, queryset):
+        return ObjectsAppProfile.get_profile().images_list_pagination
+
 class MemberImageView(MemberViewMixin, LoginRequiredMixin, ListView):
 
     model = Image
-    try:
-        paginate_by = ObjectsAppProfile.objects.get_or_create(pk=1)[0].images_list_pagination
-    except:
-        paginate_by = 30
     context_object_name = 'images'
 
+    def get_paginate_by(self, queryset):
+        return ObjectsAppProfile.get_profile().images_list_pagination
+
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -458,16 +468,17 @@ class ImageStudioListView(StudioListMixin, LoginRequiredMixin, ListView):
             )
         return context
     
-class ImageDetailView(LoginRequiredMixin, DetailView):
+class ImageDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
 
     model = Image
+    app_profile = ObjectsAppProfile
     context_object_name = 'image'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(pk=self.request.user.pk)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         if member.check_can_allocate() and not member.check_is_new():
             context['can_add_marshmallow'] = True
@@ -496,7 +507,7 @@ class ImageUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdateM
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this Image."
@@ -595,9 +606,7 @@ class SoundCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
 
     def form_valid(self, form):
         member = Member.objects.get(pk=self.request.user.pk)
-        has_free_space, free, used = member.check_free_media_capacity(
-            BASE_DIR + '/media/member_{}/'.format(member.pk),
-        )
+        has_free_space, free, used = member.check_free_media_capacity()
         upload_size = self.request.FILES['sound_file'].size
         print('{}, {}, {}'.format(has_free_space, free, used))
         if has_free_space:
@@ -634,7 +643,7 @@ class SoundCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Upload a Sound File"
         context['meta_desc'] = """Submit a sound file you wish to upload. Sounds \
@@ -651,23 +660,21 @@ class SoundCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
 class SoundListView(ModelListMixin, LoginRequiredMixin, ListView):
 
     model = Sound
-    try:
-        paginate_by = ObjectsAppProfile.objects.get_or_create(pk=1)[0].sounds_list_pagination
-    except:
-        paginate_by = 100
     queryset = Sound.objects.filter(is_public=True)
     context_object_name = 'sounds'
     ordering = ['-weight', '-creation_date']
 
+    def get_paginate_by(self, queryset):
+        return ObjectsAppProfile.get_profile().sounds_list_pagination
+
 class MemberSoundView(MemberViewMixin, LoginRequiredMixin, ListView):
 
     model = Sound
-    try:
-        paginate_by = ObjectsAppProfile.objects.get_or_create(pk=1)[0].sounds_list_pagination
-    except:
-        paginate_by = 100
     context_object_name = 'sounds'
 
+    def get_paginate_by(self, queryset):
+        return ObjectsAppProfile.get_profile().sounds_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -694,21 +701,24 @@ class SoundStudioListView(StudioListMixin, LoginRequiredMixin, ListView):
             )
         return context
 
-class SoundDetailView(LoginRequiredMixin, DetailView):
+class SoundDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
 
     model = Sound
+    app_profile = ObjectsAppProfile
     context_object_name = 'sound'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(pk=self.request.user.pk)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         if member.check_can_allocate() and not member.check_is_new():
             context['can_add_marshmallow'] = True
         else:
             context['can_add_marshmallow'] = False
+        # Transcoder status
+        context['transcode_job'] = self.object.get_transcode_job()
         if self.request.user.has_perm('music.add_track') and self.request.user.pk == self.object.owner.pk:
             context['show_track_add_button'] = True
             context['track_add_button'] = {
@@ -732,7 +742,7 @@ class SoundUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdateM
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this Sound."
@@ -831,9 +841,7 @@ class VideoCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
 
     def form_valid(self, form):
         member = Member.objects.get(pk=self.request.user.pk)
-        has_free_space, free, used = member.check_free_media_capacity(
-            BASE_DIR + '/media/member_{}/'.format(member.pk),
-        )
+        has_free_space, free, used = member.check_free_media_capacity()
         upload_size = self.request.FILES['video_file'].size
         print('{}, {}, {}'.format(has_free_space, free, used))
         if has_free_space:
@@ -870,7 +878,7 @@ class VideoCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Upload a Video File"
         context['meta_desc'] = """Submit a Video you wish to upload. Videos \
@@ -887,14 +895,13 @@ class VideoCreateView(LoginRequiredMixin, PermissionRequiredMixin, CreateView):
 class VideoListView(ModelListMixin, LoginRequiredMixin, ListView):
 
     model = Video
-    try:
-        paginate_by = ObjectsAppProfile.objects.get_or_create(pk=1)[0].videos_list_pagination
-    except:
-        paginate_by = 100
     queryset = Video.objects.filter(is_public=True)
     context_object_name = 'videos'
     ordering = ['-weight', '-creation_date']
 
+    def get_paginate_by(self, queryset):
+        return ObjectsAppProfile.get_profile().videos_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         return context
@@ -902,12 +909,11 @@ class VideoListView(ModelListMixin, LoginRequiredMixin, ListView):
 class MemberVideoView(MemberViewMixin, LoginRequiredMixin, ListView):
 
     model = Video
-    try:
-        paginate_by = ObjectsAppProfile.objects.get_or_create(pk=1)[0].videos_list_pagination
-    except:
-        paginate_by = 100
     context_object_name = 'videos'
 
+    def get_paginate_by(self, queryset):
+        return ObjectsAppProfile.get_profile().videos_list_pagination
+
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -934,21 +940,24 @@ class VideoStudioListView(StudioListMixin, LoginRequiredMixin, ListView):
             )
         return context
 
-class VideoDetailView(LoginRequiredMixin, DetailView):
+class VideoDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
 
     model = Video
+    app_profile = ObjectsAppProfile
     context_object_name = 'video'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(pk=self.request.user.pk)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         if member.check_can_allocate() and not member.check_is_new():
             context['can_add_marshmallow'] = True
         else:
             context['can_add_marshmallow'] = False
+        # Transcoder status
+        context['transcode_job'] = self.object.get_transcode_job()
         return context
 
 class VideoUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdateMixin, UpdateView):
@@ -965,7 +974,7 @@ class VideoUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdateM
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this Video."
@@ -1071,7 +1080,7 @@ class CodeCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMi
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Code Sample"
         context['meta_desc'] = """Add a sample of code that can be added to \
@@ -1088,22 +1097,20 @@ class CodeCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMi
 class CodeListView(ModelListMixin, LoginRequiredMixin, ListView):
 
     model = Code
-    try:
-        paginate_by = ObjectsAppProfile.objects.get_or_create(pk=1)[0].codes_list_pagination
-    except:
-        paginate_by = 100
     context_object_name = 'codes'
     ordering = ['-weight', '-creation_date']
 
+    def get_paginate_by(self, queryset):
+        return ObjectsAppProfile.get_profile().codes_list_pagination
+
 class MemberCodeView(MemberViewMixin, LoginRequiredMixin, ListView):
 
     model = Code
-    try:
-        paginate_by = ObjectsAppProfile.objects.get_or_create(pk=1)[0].codes_list_pagination
-    except:
-        paginate_by = 100
     context_object_name = 'codes'
 
+    def get_paginate_by(self, queryset):
+        return ObjectsAppProfile.get_profile().codes_list_pagination
+
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -1130,16 +1137,17 @@ class CodeStudioListView(StudioListMixin, LoginRequiredMixin, ListView):
             )
         return context
 
-class CodeDetailView(LoginRequiredMixin, DetailView):
+class CodeDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
 
     model = Code
+    app_profile = ObjectsAppProfile
     context_object_name = 'code'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(pk=self.request.user.pk)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         if member.check_can_allocate() and not member.check_is_new():
             context['can_add_marshmallow'] = True
@@ -1162,7 +1170,7 @@ class CodeUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdateMi
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         
@@ -1268,7 +1276,7 @@ class LinkCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMi
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Link"
         context['meta_desc'] = """Add a link to an external website."""
@@ -1284,23 +1292,21 @@ class LinkCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMi
 class LinkListView(ModelListMixin, LoginRequiredMixin, ListView):
 
     model = Link
-    try:
-        paginate_by = ObjectsAppProfile.objects.get_or_create(pk=1)[0].links_list_pagination
-    except:
-        paginate_by = 100
     queryset = Link.objects.filter(is_public=True)
     context_object_name = 'links'
     ordering = ['-weight', '-creation_date']
 
+    def get_paginate_by(self, queryset):
+        return ObjectsAppProfile.get_profile().links_list_pagination
+
 class MemberLinkView(MemberViewMixin, LoginRequiredMixin, ListView):
 
     model = Link
-    try:
-        paginate_by = ObjectsAppProfile.objects.get_or_create(pk=1)[0].links_list_pagination
-    except:
-        paginate_by = 100
     context_object_name = 'links'
 
+    def get_paginate_by(self, queryset):
+        return ObjectsAppProfile.get_profile().links_list_pagination
+
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -1327,16 +1333,17 @@ class LinkStudioListView(StudioListMixin, LoginRequiredMixin, ListView):
             )
         return context
 
-class LinkDetailView(LoginRequiredMixin, DetailView):
+class LinkDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
 
     model = Link
+    app_profile = ObjectsAppProfile
     context_object_name = 'link'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(pk=self.request.user.pk)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         if member.check_can_allocate() and not member.check_is_new():
             context['can_add_marshmallow'] = True
@@ -1358,7 +1365,7 @@ class LinkUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdateMi
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update Link"
         context['meta_desc'] = """Change the URL and information about a link."""
@@ -1476,7 +1483,7 @@ class TagCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMix
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Tag"
         context['meta_desc'] = """Add a Tag that can be attached to any site object."""
@@ -1510,7 +1517,7 @@ class TagDetailView(DetailView):
         context = super().get_context_data(**kwargs)
         slug = self.object.slug
         # App profile
-        profile, created = ObjectsAppProfile.objects.get_or_create(pk=1)
+        profile = ObjectsAppProfile.get_profile()
         context['profile'] = profile
         # Send the desired list length
         context['list_length'] = self.list_length
@@ -0,0 +1,146 @@
+import json
+import subprocess
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from lookaway import versions
+from members.models import MediaUsage
+from .models import ObjectsAppProfile, Sound
+from .utils import FileSystemOps
+'''
+Waveform peaks.
+
+Each Sound is decoded once after it is transcoded and the minimum and
+maximum sample of every block of samples is kept at a few zoom levels.
+The peaks are written to a JSON sidecar next to the sound file so players
+can draw a waveform without downloading and decoding the whole sound.
+Every level follows the JSON format of the audiowaveform tool and the
+waveform-data.js library, with 8 bit values in min, max order.
+'''
+
+# Sounds are decoded to mono at this rate, plenty for a picture
+PEAKS_SAMPLE_RATE = 8000
+# Samples per pixel of each level, each a multiple of the one before
+PEAKS_LEVELS = (256, 1024, 4096)
+PEAKS_SUFFIX = '.peaks.json'
+
+def decode(ffmpeg_cmd, path, sample_rate=PEAKS_SAMPLE_RATE):
+    '''
+    Returns - The samples of a sound file as a mono 16 bit numpy array.
+
+    Raises RuntimeError if ffmpeg fails.
+    '''
+    command = [
+        ffmpeg_cmd,
+        '-nostdin',
+        '-loglevel', 'error',
+        '-i', str(path),
+        '-ac', '1',
+        '-ar', str(sample_rate),
+        '-f', 's16le',
+        '-',
+    ]
+    try:
+        result = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=600,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(str(e))
+    if result.returncode != 0:
+        raise RuntimeError(
+            'ffmpeg exited with status {}\n{}'.format(
+                result.returncode,
+                result.stderr.decode(errors='replace')[-2000:],
+            )
+        )
+    # An odd trailing byte would be half a sample
+    data = result.stdout[:len(result.stdout) // 2 * 2]
+    return np.frombuffer(data, dtype='<i2')
+
+def get_peaks(samples, samples_per_pixel):
+    '''
+    Returns - Arrays of the smallest and largest value of each block of
+    samples. The last block is padded with its own last value.
+    '''
+    n = -(-len(samples) // samples_per_pixel)
+    if n == 0:
+        return samples[:0], samples[:0]
+    padded = np.pad(samples, (0, n * samples_per_pixel - len(samples)), 'edge')
+    blocks = padded.reshape(n, samples_per_pixel)
+    return blocks.min(axis=1), blocks.max(axis=1)
+
+def get_levels(samples, levels=PEAKS_LEVELS):
+    '''
+    Returns - A list of (samples per pixel, mins, maxs) tuples. Each level
+    is reduced from the one before so the samples are only scanned once.
+    '''
+    result = []
+    mins = maxs = samples
+    step = 1
+    for samples_per_pixel in levels:
+        factor = samples_per_pixel // step
+        mins = get_peaks(mins, factor)[0]
+        maxs = get_peaks(maxs, factor)[1]
+        step = samples_per_pixel
+        result.append((samples_per_pixel, mins, maxs))
+    return result
+
+def dump(levels, sample_rate=PEAKS_SAMPLE_RATE):
+    '''
+    Returns - The JSON sidecar of the levels as bytes.
+    '''
+    documents = []
+    for samples_per_pixel, mins, maxs in levels:
+        data = np.empty(len(mins) * 2, dtype=np.int8)
+        # 16 bit samples scaled to 8 bits
+        data[0::2] = mins.astype(np.int16) >> 8
+        data[1::2] = maxs.astype(np.int16) >> 8
+        documents.append({
+            'version': 2,
+            'channels': 1,
+            'sample_rate': sample_rate,
+            'samples_per_pixel': samples_per_pixel,
+            'bits': 8,
+            'length': len(mins),
+            'data': data.tolist(),
+        })
+    return json.dumps(
+        {'sample_rate': sample_rate, 'levels': documents},
+        separators=(',', ':'),
+    ).encode()
+
+def get_sidecar_name(sound_name):
+    return str(Path(sound_name).with_suffix(PEAKS_SUFFIX))
+
+def write_peaks(sound, ffmpeg_cmd=None):
+    '''
+    Decode a sound and write its peaks next to its file.
+    The sidecar is named after the sound file so running this again
+    replaces it.
+
+    Returns - The name of the sidecar relative to MEDIA_ROOT.
+
+    Raises RuntimeError if ffmpeg fails.
+    '''
+    if ffmpeg_cmd is None:
+        ffmpeg_cmd = ObjectsAppProfile.get_profile().ffmpeg_path
+    samples = decode(ffmpeg_cmd, sound.sound_file.path)
+    name = get_sidecar_name(sound.sound_file.name)
+    path = Path(settings.MEDIA_ROOT) / name
+    fsop = FileSystemOps()
+    delta = -fsop._get_size(path)
+    if sound.peaks_file and sound.peaks_file.name != name:
+        old = Path(settings.MEDIA_ROOT) / sound.peaks_file.name
+        delta -= fsop._get_size(old)
+        fsop._delete_file(old)
+    path.write_bytes(dump(get_levels(samples)))
+    delta += fsop._get_size(path)
+    # A queryset update so the upload signals do not fire again
+    Sound.objects.filter(pk=sound.pk).update(peaks_file=name)
+    # The name can be guessed, drop any visibility cached before it existed
+    versions.bump_on_commit(versions.get_label(Sound))
+    MediaUsage.record(sound.owner_id, 'sound_bytes', delta)
+    return name
@@ -1,4 +1,5 @@
 from django.db.models import Q
+from django.urls import reverse
 from home.models import HomeAppProfile
 from members.models import Member
 from objects.models import Tag
@@ -23,7 +24,7 @@ class NewModelListMixin:
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "New " + self.model._meta.verbose_name_plural.capitalize()
         # SEO stuff
@@ -55,7 +56,7 @@ class TopModelListMixin:
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "Top " + self.model._meta.verbose_name_plural.capitalize()
         # SEO stuff
@@ -85,7 +86,7 @@ class StudioListMixin:
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(pk=self.request.user.pk)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "All " + self.model._meta.verbose_name_plural.capitalize()
         context['meta_title'] = "Your {}".format(
@@ -114,7 +115,7 @@ class ModelByMemberMixin:
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(username=self.kwargs['member'])
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = self.model._meta.verbose_name_plural.capitalize()
         context['meta_title'] = "{} by {} | {}".format(
@@ -128,3 +129,18 @@ class ModelByMemberMixin:
             profile.title,
         )
         return context
+
+class FeedMixin:
+    '''
+    App profile, link and items for feeds of a model. Feeds only list
+    public instances that are not members only. Also sets the PostsAppProfile.
+    '''
+    app_profile = PostsAppProfile
+
+    def get_feed_queryset(self):
+        return self.model.objects.filter(
+            Q(is_public=True) & Q(members_only=False)
+        )
+
+    def link(self, obj):
+        return reverse('posts:posts_page')
@@ -0,0 +1,6 @@
+from lookaway.feeds import ModelFeed
+from .app_profile_mixins import FeedMixin
+from .models import Post
+
+class PostFeed(FeedMixin, ModelFeed):
+    model = Post
@@ -1,3 +1,150 @@
-from django.test import TestCase
+from unittest import mock
+from django import forms
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.views.generic.edit import CreateView
+from members.mixins import MemberCreateMixin
+from objects.models import Tag
+from objects.utils import TestData, Text
+from .models import Post
 
 # Create your tests here.
+
+class UniqueSlugTest(TestCase):
+
+    def create(self, slug):
+        return Post.objects.create(title=slug, slug=slug, text='text')
+
+    def test_free_slug(self):
+        self.assertEqual(Text.slugify_unique(Post, 'Hello World'), 'hello-world')
+
+    def test_next_suffix(self):
+        self.create('hello')
+        self.assertEqual(Text.slugify_unique(Post, 'Hello'), 'hello-2')
+        self.create('hello-2')
+        self.create('hello-10')
+        # Slugs of other titles that share the prefix are ignored
+        self.create('hello-world')
+        self.create('hello-99-bottles')
+        self.assertEqual(Text.slugify_unique(Post, 'Hello'), 'hello-11')
+
+    def test_retry_on_conflict(self):
+        self.create('taken')
+        form_class = forms.modelform_factory(Post, fields=['title', 'text'])
+        form = form_class({'title': 'taken', 'text': 'text'})
+        self.assertTrue(form.is_valid())
+        # Another request took the slug after it was chosen
+        with mock.patch.object(
+            Text,
+            'slugify_unique',
+            side_effect=['taken', 'taken-2'],
+        ):
+            Text.set_unique_slug(form.instance, 'taken')
+            post = MemberCreateMixin().save_form(form)
+        self.assertEqual(post.slug, 'taken-2')
+        self.assertEqual(Post.objects.filter(title='taken').count(), 2)
+
+    def test_create_view_saves_once(self):
+        class PostCreate(MemberCreateMixin, CreateView):
+            model = Post
+            fields = ['title', 'text']
+            success_url = '/'
+
+            def form_valid(self, form):
+                Text.set_unique_slug(form.instance, form.instance.title)
+                return super().form_valid(form)
+
+        request = RequestFactory().post('/', {'title': 'Once', 'text': 'text'})
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        saves = []
+        receiver = lambda **kwargs: saves.append(kwargs['instance'])
+        post_save.connect(receiver, sender=Post)
+        self.addCleanup(post_save.disconnect, receiver, sender=Post)
+        response = PostCreate.as_view()(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(saves), 1)
+        self.assertEqual(Post.objects.get().slug, 'once')
+
+class PostFeedTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.member, user = TestData().create_test_member()
+        self.tag = Tag.objects.create(key='feed', value='feed', slug='feed')
+        self.post = self.create('public', members_only=False)
+        self.post.tags.add(self.tag)
+        self.create('members', members_only=True)
+
+    def create(self, slug, **kwargs):
+        return Post.objects.create(
+            owner=self.member,
+            title=slug,
+            slug=slug,
+            text='text',
+            is_public=True,
+            publication_date=timezone.now(),
+            **kwargs
+        )
+
+    def test_public_items(self):
+        response = self.client.get(reverse('posts:post_feed'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/posts/public/')
+        self.assertNotContains(response, '/posts/members/')
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_atom(self):
+        response = self.client.get(reverse('posts:post_atom_feed'))
+        self.assertTrue(response['Content-Type'].startswith('application/atom+xml'))
+        self.assertContains(response, '/posts/public/')
+
+    def test_member_and_tag(self):
+        other = Post.objects.create(
+            title='untagged',
+            slug='untagged',
+            text='text',
+            is_public=True,
+            members_only=False,
+            publication_date=timezone.now(),
+        )
+        for url in (
+            reverse('posts:post_member_feed', kwargs={'member': self.member.username}),
+            reverse('posts:post_tag_feed', kwargs={'tag': self.tag.slug}),
+        ):
+            response = self.client.get(url)
+            self.assertContains(response, '/posts/public/')
+            self.assertNotContains(response, '/posts/untagged/')
+        response = self.client.get(reverse(
+            'posts:post_tag_feed',
+            kwargs={'tag': 'missing'},
+        ))
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_modified(self):
+        url = reverse('posts:post_feed')
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_changed(self):
+        url = reverse('posts:post_feed')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create('newer', members_only=False)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/posts/newer/')
+        self.assertNotEqual(response['ETag'], etag)
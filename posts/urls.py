@@ -1,5 +1,7 @@
 from django.urls import path
 import posts.views as views
+import posts.feeds as feeds
+from lookaway.feeds import feed_urls
 
 app_name= "posts"
 
@@ -175,3 +177,6 @@ urlpatterns = [
         name='response_marshmallow',
     ),
 ]
+
+# RSS and Atom feeds
+urlpatterns += feed_urls('feeds/posts/', feeds.PostFeed, 'post')
@@ -13,7 +13,9 @@ from django.views.generic.base import TemplateView
 from django.views.generic.edit import CreateView, FormView, UpdateView, DeleteView
 from django.views.generic.detail import DetailView
 from django.views.generic.list import ListView
-from lookaway.mixins import AppPageMixin
+from lookaway.mixins import (
+    AppPageMixin, ConditionalDetailMixin, SectionDetailMixin,
+)
 from members.models import Member
 from members.mixins import MemberCreateMixin, MemberUpdateMixin, MemberDeleteMixin
 from art.models import Visual, Gallery
@@ -40,7 +42,7 @@ class PostsAppProfileUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Upd
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         # SEO stuff
         context['meta_title'] = profile.title
@@ -87,7 +89,7 @@ class PostsPageSectionCreateView(LoginRequiredMixin, PermissionRequiredMixin, Me
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Page Section"
         context['meta_desc'] = "Add a section to the {} landing page.".format(profile.title)
@@ -116,13 +118,22 @@ class PostsPageView(TemplateView, AppPageMixin):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
+        # Cached fragments depend on these models
+        context['fragment_models'] = self.get_fragment_models(
+            PostsAppProfile,
+            PostsPageSection,
+            Post,
+            ResponsePost,
+        )
         # SEO stuff
         context['meta_title'] = profile.title
         context['meta_desc'] = profile.meta_description
         # Sections
-        sections = PostsPageSection.objects.filter(
+        sections = PostsPageSection.objects.prefetch_related(
+            *PostsPageSection.get_prefetch_plan()
+        ).filter(
             is_enabled = True,
         ).order_by(
             'order',
@@ -134,14 +145,14 @@ class PostsPageView(TemplateView, AppPageMixin):
                 members_only=True
             )
         # New and top Post instances
-        context['new_posts'], context['top_posts'] = self.get_sets(
+        context['new_posts'], context['top_posts'] = self.get_lazy_sets(
             Post,
             profile.n_posts,
             show_new=profile.show_new_posts,
             show_top=profile.show_top_posts,
         )
         # New and top Response instances
-        context['new_responses'], context['top_responses'] = self.get_sets(
+        context['new_responses'], context['top_responses'] = self.get_lazy_sets(
             ResponsePost,
             profile.n_responses,
             show_new=profile.show_new_responses,
@@ -179,7 +190,7 @@ class PostsPageView(TemplateView, AppPageMixin):
             context['show_posts_page_section_delete_button'] = True
         return context
 
-class PostsPageSectionDetailView(LoginRequiredMixin, DetailView):
+class PostsPageSectionDetailView(LoginRequiredMixin, SectionDetailMixin, DetailView):
 
     model = PostsPageSection
     context_object_name = 'section'
@@ -187,7 +198,7 @@ class PostsPageSectionDetailView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = profile.title
         # Add posts page section button
@@ -221,7 +232,7 @@ class PostsPageSectionUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Me
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this landing page section.".format(self.object.title)
@@ -267,7 +278,7 @@ class PostCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMi
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Post"
         context['meta_desc'] = """Submit a Post you wish to publish. Posts \
@@ -278,7 +289,7 @@ class PostCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMi
         member = self.request.user
         form.instance.creation_date = timezone.now()
         form.instance.owner = member
-        form.instance.slug = Text.slugify_unique(self.model, form.instance.title)
+        Text.set_unique_slug(form.instance, form.instance.title)
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -294,12 +305,11 @@ class PostCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCreateMi
 class PostListView(NewModelListMixin, ListView):
 
     model = Post
-    try:
-        paginate_by = PostsAppProfile.objects.get_or_create(pk=1)[0].post_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'posts'
 
+    def get_paginate_by(self, queryset):
+        return PostsAppProfile.get_profile().post_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -313,12 +323,11 @@ class PostListView(NewModelListMixin, ListView):
 class TopPostListView(TopModelListMixin, ListView):
 
     model = Post
-    try:
-        paginate_by = PostsAppProfile.objects.get_or_create(pk=1)[0].post_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'posts'
 
+    def get_paginate_by(self, queryset):
+        return PostsAppProfile.get_profile().post_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Create button
@@ -332,12 +341,11 @@ class TopPostListView(TopModelListMixin, ListView):
 class MemberPostView(ModelByMemberMixin, ListView):
 
     model = Post
-    try:
-        paginate_by = PostsAppProfile.objects.get_or_create(pk=1)[0].post_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'posts'
 
+    def get_paginate_by(self, queryset):
+        return PostsAppProfile.get_profile().post_list_pagination
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(username=self.kwargs['member'])
@@ -365,14 +373,18 @@ class PostStudioListView(StudioListMixin, LoginRequiredMixin, ListView):
             )
         return context
 
-class PostDetailView(DetailView):
+class PostDetailView(ConditionalDetailMixin, DetailView):
 
     model = Post
+    app_profile = PostsAppProfile
+    conditional_related = {
+        'posts.responsepost': 'post',
+    }
     context_object_name = 'post'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         if self.request.user.is_authenticated:
             member = Member.objects.get(pk=self.request.user.pk)
@@ -457,7 +469,7 @@ class PostUpdateView(LoginRequiredMixin, PermissionRequiredMixin, MemberUpdateMi
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         context['meta_desc'] = "Make changes to this Post."
@@ -587,7 +599,7 @@ class ResponsePostCreateView(LoginRequiredMixin, PermissionRequiredMixin, Member
         context = super().get_context_data(**kwargs)
         target = self.get_target()
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Response"
         context['meta_desc'] = "Submit a response to \"{}\".".format(
@@ -620,7 +632,7 @@ class ResponsePostCreateView(LoginRequiredMixin, PermissionRequiredMixin, Member
             form.instance.members_only = self.kwargs['members_only']
         form.instance.creation_date = timezone.now()
         form.instance.owner = member
-        form.instance.slug = Text.slugify_unique(self.model, form.instance.title)
+        Text.set_unique_slug(form.instance, form.instance.title)
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -636,43 +648,51 @@ class ResponsePostCreateView(LoginRequiredMixin, PermissionRequiredMixin, Member
 class ResponsePostListView(NewModelListMixin, ListView):
 
     model = ResponsePost
-    try:
-        paginate_by = PostsAppProfile.objects.get_or_create(pk=1)[0].response_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'responses'
+
+    def get_paginate_by(self, queryset):
+        return PostsAppProfile.get_profile().response_list_pagination
     
 class TopResponsePostListView(TopModelListMixin, ListView):
 
     model = ResponsePost
-    try:
-        paginate_by = PostsAppProfile.objects.get_or_create(pk=1)[0].response_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'responses'
 
+    def get_paginate_by(self, queryset):
+        return PostsAppProfile.get_profile().response_list_pagination
+
 class MemberResponsePostView(ModelByMemberMixin, ListView):
 
     model = ResponsePost
-    try:
-        paginate_by = PostsAppProfile.objects.get_or_create(pk=1)[0].response_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'responses'
 
+    def get_paginate_by(self, queryset):
+        return PostsAppProfile.get_profile().response_list_pagination
+
 class ResponsePostStudioListView(StudioListMixin, LoginRequiredMixin, ListView):
 
     model = ResponsePost
     template_name = 'posts/studio_list.html'
 
-class ResponsePostDetailView(DetailView):
+class ResponsePostDetailView(ConditionalDetailMixin, DetailView):
 
     model = ResponsePost
+    app_profile = PostsAppProfile
+    conditional_dependencies = ConditionalDetailMixin.conditional_dependencies + (
+        'posts.post',
+        'documentation.article',
+        'documentation.story',
+        'documentation.supportdocument',
+        'art.visual',
+        'art.gallery',
+        'music.track',
+        'music.album',
+    )
     context_object_name = 'response'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         if self.request.user.is_authenticated:
             member = Member.objects.get(pk=self.request.user.pk)
@@ -755,7 +775,7 @@ class ResponsePostUpdateView(LoginRequiredMixin, PermissionRequiredMixin, Member
         context = super().get_context_data(**kwargs)
         target = self.get_target()
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "Update \"{}\"".format(self.object.title)
         
@@ -864,7 +884,7 @@ class ReportPostCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCr
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['meta_title'] = "New Report"
         context['meta_desc'] = """Submit a new report."""
@@ -874,7 +894,7 @@ class ReportPostCreateView(LoginRequiredMixin, PermissionRequiredMixin, MemberCr
         member = self.request.user
         form.instance.creation_date = timezone.now()
         form.instance.owner = member
-        form.instance.slug = Text.slugify_unique(self.model, form.instance.title)
+        Text.set_unique_slug(form.instance, form.instance.title)
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -888,12 +908,11 @@ class ReportPostListView(ListView, LoginRequiredMixin, PermissionRequiredMixin):
 
     permission_required = 'posts:delete_reportpost'
     model = ReportPost
-    try:
-        paginate_by = PostsAppProfile.objects.get_or_create(pk=1)[0].response_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'reports'
 
+    def get_paginate_by(self, queryset):
+        return PostsAppProfile.get_profile().response_list_pagination
+
     def get_queryset(self, *args, **kwargs):
         if self.request.user.is_authenticated:
             return ReportPost.objects.filter(
@@ -913,7 +932,7 @@ class ReportPostListView(ListView, LoginRequiredMixin, PermissionRequiredMixin):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "Responses"
         # SEO stuff
@@ -929,12 +948,11 @@ class MemberReportPostView(ListView, LoginRequiredMixin, PermissionRequiredMixin
 
     permission_required = 'posts:delete_reportpost'
     model = ReportPost
-    try:
-        paginate_by = PostsAppProfile.objects.get_or_create(pk=1)[0].response_list_pagination
-    except:
-        paginate_by = 10
     context_object_name = 'reports'
 
+    def get_paginate_by(self, queryset):
+        return PostsAppProfile.get_profile().response_list_pagination
+
     def get_queryset(self, *args, **kwargs):
         member = self.request.user
         if self.request.user.is_authenticated:
@@ -956,7 +974,7 @@ class MemberReportPostView(ListView, LoginRequiredMixin, PermissionRequiredMixin
         context = super().get_context_data(**kwargs)
         member = Member.objects.get(username=self.kwargs['member'])
         # App profile
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
         context['app_list_context'] = "Report Posts"
         context['meta_title'] = "Report Posts by {} | {}".format(
@@ -977,7 +995,7 @@ class ReportPostDetailView(DetailView, LoginRequiredMixin, PermissionRequiredMix
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        profile, created = PostsAppProfile.objects.get_or_create(pk=1)
+        profile = PostsAppProfile.get_profile()
         context['profile'] = profile
 
 class ReportPostDeleteView(LoginRequiredMixin, PermissionRequiredMixin, DeleteView):
@@ -114,7 +114,7 @@ echo $t4
 # Interactive Menu
 echo $h1
 echo ""
-django_vars=("Django Secret Key (autogenerated)" "PostgreSQL Database Name" "PostgreSQL Database User" "PostgreSQL Database Password" "PostgreSQL Database Host" "PostgreSQL Database Port Number" "Email 'from' Name" "Email Server User" "Email Server Password" "Email Server Host" "Email Server Port" "Django Log File" "Exit")
+django_vars=("Django Secret Key (autogenerated)" "PostgreSQL Database Name" "PostgreSQL Database User" "PostgreSQL Database Password" "PostgreSQL Database Host" "PostgreSQL Database Port Number" "Email 'from' Name" "Email Server User" "Email Server Password" "Email Server Host" "Email Server Port" "Django Log File" "Sitemap Base URL" "Exit")
 select var in "${django_vars[@]}"; do
     case $var in
         "Django Secret Key (autogenerated)")
@@ -176,6 +176,10 @@ select var in "${django_vars[@]}"; do
             ## Log File
             insert_env "DJANGO_LOG_PATH" "the path to the file where log entries will be written"
             ;;
+        "Sitemap Base URL")
+            ## Sitemap Base URL
+            insert_env "DJANGO_SITEMAP_BASE_URL" "the scheme and host of the site for the sitemaps, e.g. https://www.example.com"
+            ;;
         "Exit")
             echo $h2
             echo "Bye!"
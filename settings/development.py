@@ -175,6 +175,84 @@ STATICFILES_DIRS = [
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+## Media are served by a view that checks who may see them.
+## Files are streamed by Django when this is None.
+MEDIA_ACCEL_REDIRECT = None
+## Seconds the visibility of a media file is kept in the cache.
+## It is looked up again sooner when the objects that show it change.
+MEDIA_CACHE_TIMEOUT = 86400
+## Uploads are hashed as they arrive for the media blob store
+FILE_UPLOAD_HANDLERS = [
+    'objects.storage.HashingMemoryFileUploadHandler',
+    'objects.storage.HashingTemporaryFileUploadHandler',
+]
+## Large sounds and videos are uploaded in resumable chunks.
+## Keep the staging directory on the same file system as MEDIA_ROOT
+## so finished uploads are moved into place instead of copied.
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'run', 'uploads')
+CHUNKED_UPLOAD_MAX_SIZE = 8 * 1024**3
+## Hours an upload may go without a chunk before clean_uploads removes it
+CHUNKED_UPLOAD_EXPIRY = 24
+## Image files accepted at once by the gallery upload
+GALLERY_UPLOAD_MAX_FILES = 100
+## Worker processes of the render_images command, which builds the
+## renditions of gallery uploads. Images are rendered one at a time in
+## the command's own process when this is 1.
+RENDITION_PROCESSES = 4
+## Attempts to render an image before its job is marked as failed
+RENDITION_MAX_ATTEMPTS = 3
+
+# Version stamps
+
+## Workers compare these files to find out when cached app profiles
+## are out of date. All workers on a host must share this directory.
+VERSION_STAMP_DIR = os.path.join(BASE_DIR, 'run', 'versions')
+
+# Cache
+
+## Rendered landing page fragments and their hit and miss counts.
+## A file based cache is shared by every worker on the host.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'run', 'cache'),
+    }
+}
+## Seconds before a cached fragment is rendered again
+## even if none of its models have changed.
+FRAGMENT_CACHE_TIMEOUT = 600
+## Seconds each worker keeps its hit and miss counts
+## before adding them to the shared cache
+FRAGMENT_CACHE_STATS_INTERVAL = 60
+
+# Link scraper
+
+## New links are scraped for a title, description and favicon
+## by a pool of background threads in each worker.
+LINK_SCRAPER_THREADS = 4
+## Seconds a link may take to fetch, redirects included
+LINK_SCRAPER_TIMEOUT = 5
+## Only the page head is read, up to this many bytes
+LINK_SCRAPER_MAX_BYTES = 65536
+## Keep-alive connections each thread keeps open to recently fetched hosts
+LINK_SCRAPER_CONNECTIONS = 4
+## Seconds to keep scraped metadata for each URL and favicon for each domain
+LINK_SCRAPER_CACHE_TIMEOUT = 86400
+
+# Sitemaps
+
+## The sitemap index and pages are written here for nginx to serve.
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'run', 'sitemaps')
+## The scheme and host of the URLs listed in the sitemaps,
+## e.g. "https://www.example.com". Without it the sitemaps are written
+## when they are requested, with the host of the request.
+SITEMAP_BASE_URL = None
+## Objects on a sitemap page are those with a pk in a range of this size
+SITEMAP_PAGE_SIZE = 1000
+
+## Seconds a rendered RSS or Atom feed is kept in the cache.
+## Feeds are rendered again sooner when the objects they list change.
+FEED_CACHE_TIMEOUT = 3600
 
 # Bootstrap stuff
 
@@ -18,6 +18,48 @@ $(document).on("change", ".file_multi_media", function(evt) {
   }
 });
 
+// Drop many image files on a multiple file input and preview them
+var showPreviews = function(input) {
+  var previews = $(input).siblings('.form-drop-previews').empty();
+  for (let i = 0; i < input.files.length; i++) {
+    var preview = $('<img class="form-drop-preview">');
+    preview.attr('src', URL.createObjectURL(input.files[i]));
+    preview.attr('title', input.files[i].name);
+    preview.on('load', function() {
+      URL.revokeObjectURL(this.src) // free memory
+    });
+    previews.append(preview);
+  }
+};
+
+$(document).on("change", ".file_drop_zone", function(evt) {
+  showPreviews(this);
+});
+
+$(document).on("dragover dragenter", ".form-drop-zone", function(evt) {
+  evt.preventDefault();
+  $(this).addClass('dragover');
+});
+
+$(document).on("dragleave dragend", ".form-drop-zone", function(evt) {
+  $(this).removeClass('dragover');
+});
+
+$(document).on("drop", ".form-drop-zone", function(evt) {
+  evt.preventDefault();
+  $(this).removeClass('dragover');
+  var input = $(this).find('.file_drop_zone')[0];
+  var images = new DataTransfer();
+  var files = evt.originalEvent.dataTransfer.files;
+  for (let i = 0; i < files.length; i++) {
+    if (files[i].type.startsWith('image/')) {
+      images.items.add(files[i]);
+    }
+  }
+  input.files = images.files;
+  showPreviews(input);
+});
+
 // Searchable select field
 // https://stackoverflow.com/questions/18796221/creating-a-select-box-with-a-search-option/57809086#57809086
 $(document).ready(function () {
@@ -25,3 +67,142 @@ $(document).ready(function () {
         sortField: 'text'
     });
 });
+
+// Resumable sound and video uploads
+// The file is sent in chunks with the tus protocol, see objects/uploads.py
+// https://tus.io/protocols/resumable-upload
+var CHUNK_SIZE = 8 * 1024 * 1024;
+var MAX_RETRIES = 5;
+
+var getCookie = function(name) {
+  var match = document.cookie.match('(^|;)\\s*' + name + '=([^;]*)');
+  return match ? decodeURIComponent(match[2]) : '';
+};
+
+var toBase64 = function(buffer) {
+  var bytes = new Uint8Array(buffer);
+  var binary = '';
+  for (let i = 0; i < bytes.length; i++) {
+    binary += String.fromCharCode(bytes[i]);
+  }
+  return btoa(binary);
+};
+
+// Upload-Checksum header for a chunk, if the browser can hash it
+var getChecksum = async function(chunk) {
+  if (!window.crypto || !window.crypto.subtle) {
+    return null;
+  }
+  var digest = await crypto.subtle.digest('SHA-256', await chunk.arrayBuffer());
+  return 'sha256 ' + toBase64(digest);
+};
+
+var tusRequest = function(method, url, headers, body) {
+  headers['Tus-Resumable'] = '1.0.0';
+  headers['X-CSRFToken'] = getCookie('csrftoken');
+  return fetch(url, {
+    method: method,
+    headers: headers,
+    body: body,
+    credentials: 'same-origin',
+  });
+};
+
+// Find an upload of the same file that was started before, or start one
+var startUpload = async function(input, file) {
+  var key = 'upload:' + input.dataset.uploadUrl + ':' + [file.name, file.size, file.lastModified].join(':');
+  var location = localStorage.getItem(key);
+  if (location) {
+    var response = await tusRequest('HEAD', location, {});
+    if (response.ok) {
+      return {key: key, location: location, offset: parseInt(response.headers.get('Upload-Offset'))};
+    }
+    localStorage.removeItem(key);
+  }
+  var response = await tusRequest('POST', input.dataset.uploadUrl, {
+    'Upload-Length': file.size,
+    'Upload-Metadata': 'filename ' + btoa(unescape(encodeURIComponent(file.name))),
+  });
+  if (response.status != 201) {
+    throw response;
+  }
+  location = response.headers.get('Location');
+  localStorage.setItem(key, location);
+  return {key: key, location: location, offset: 0};
+};
+
+var uploadFile = async function(input, file, progress) {
+  var upload = await startUpload(input, file);
+  var offset = upload.offset;
+  var retries = 0;
+  var response = null;
+  while (offset < file.size) {
+    var chunk = file.slice(offset, offset + CHUNK_SIZE);
+    var headers = {
+      'Content-Type': 'application/offset+octet-stream',
+      'Upload-Offset': offset,
+    };
+    var checksum = await getChecksum(chunk);
+    if (checksum) {
+      headers['Upload-Checksum'] = checksum;
+    }
+    try {
+      response = await tusRequest('PATCH', upload.location, headers, chunk);
+    } catch (error) {
+      response = null;
+    }
+    if (response && response.ok) {
+      offset = parseInt(response.headers.get('Upload-Offset'));
+      retries = 0;
+    } else if (response && response.status == 409) {
+      // The server has a different offset, continue from there
+      offset = parseInt(response.headers.get('Upload-Offset'));
+    } else if (retries < MAX_RETRIES && (!response || response.status >= 460)) {
+      // Network errors and bad checksums are sent again after a pause
+      retries++;
+      await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+      var status = await tusRequest('HEAD', upload.location, {});
+      if (status.ok) {
+        offset = parseInt(status.headers.get('Upload-Offset'));
+      }
+    } else {
+      throw response;
+    }
+    progress.val(Math.round(100 * offset / file.size));
+  }
+  localStorage.removeItem(upload.key);
+  var location = response && response.ok && response.headers.get('Content-Location');
+  if (!location) {
+    // The upload was finished before it was resumed,
+    // or the response to the last chunk was lost
+    var status = await tusRequest('HEAD', upload.location, {});
+    location = status.ok && status.headers.get('Content-Location');
+    if (!location) {
+      throw status;
+    }
+  }
+  return location;
+};
+
+$(document).on("submit", "form", function(evt) {
+  var input = $(this).find("input.file_multi_media[data-upload-url]")[0];
+  if (!input || !input.files.length || !window.fetch || !window.localStorage) {
+    return;
+  }
+  evt.preventDefault();
+  var form = $(this);
+  var progress = $('<progress class="form-upload-progress" max="100" value="0"></progress>');
+  form.find(':submit').prop('disabled', true);
+  $(input).after(progress);
+  uploadFile(input, input.files[0], progress).then(function(location) {
+    var next = new URLSearchParams(window.location.search).get('next');
+    window.location = next || location;
+  }).catch(function(response) {
+    progress.remove();
+    form.find(':submit').prop('disabled', false);
+    var status = response && response.status;
+    alert(status == 413 ?
+      'The file is too large for the free capacity of your media directory.' :
+      'The upload failed. Submit the form again to resume it.');
+  });
+});
@@ -3,6 +3,7 @@ from django.utils.html import escape, conditional_escape
 from django.utils.encoding import force_text
 from django.utils.safestring import mark_safe
 from django.forms.widgets import ClearableFileInput, CheckboxInput, Textarea
+from django.urls import reverse
 
 class ImagePreviewWidget(ClearableFileInput):
 
@@ -12,25 +13,44 @@ class ImagePreviewWidget(ClearableFileInput):
         <img class="form-preview-image" id="output"/>'''
         return mark_safe(template)
 
+class MultipleImageWidget(ClearableFileInput):
+
+    def render(self, name, value, attrs=None, renderer=None):
+        template = '''<div class="form-drop-zone">\
+        <input type="file" name="{name}" accept="image/*" multiple \
+        class="file_drop_zone"><br>\
+        <i>Choose or drop image files here</i>\
+        <div class="form-drop-previews"></div>\
+        </div>'''.format(name=name)
+        return mark_safe(template)
+
+    def value_from_datadict(self, data, files, name):
+        return files.getlist(name)
+
+    def value_omitted_from_data(self, data, files, name):
+        return name not in files
+
 class SoundPreviewWidget(ClearableFileInput):
 
     def render(self, name, value, attrs=None, renderer=None):
         template = '''<input type="file" name="sound_file" \
-        class="file_multi_media"><br><br>\
+        class="file_multi_media" data-upload-url="{url}"><br><br>\
         <audio controls="controls">\
           <source src="" type="audio/midi" id="midi">\
           <source src="" type="audio/mpeg" id="mpeg">\
           <source src="" type="audio/ogg" id="ogg">\
           <source src="" type="audio/x-m4a" id="x-m4a">\
           <source src="" type="audio/x-realaudio" id="x-realaudio">\
-        </audio>'''
+        </audio>'''.format(
+            url=reverse('objects:chunked_upload_create', args=['sound']),
+        )
         return mark_safe(template)
 
 class VideoPreviewWidget(ClearableFileInput):
 
     def render(self, name, value, attrs=None, renderer=None):
         template = '''<input type="file" name="video_file"\ 
-        class="file_multi_media"><br><br>\
+        class="file_multi_media" data-upload-url="{url}"><br><br>\
         <video class="video-player-sm" controls="controls">\
           <source src="" type="video/3gpp" id="3gpp">\
           <source src="" type="video/ts" id="ts">\
@@ -45,7 +65,9 @@ class VideoPreviewWidget(ClearableFileInput):
           <source src="" type="video/x-ms-wmv" id="x-ms-wmv">\
           <source src="" type="x-msvideo" id="x-msvideo">\
             Your Browser does not support embedded videos.\
-        </video>'''
+        </video>'''.format(
+            url=reverse('objects:chunked_upload_create', args=['video']),
+        )
         return mark_safe(template)
 
 class CodeWidget(Textarea):